@@ -302,6 +302,6 @@ class AnalyticsAgent(BaseAgent):
 
         for i, player in enumerate(leaderboard):
             medal = medals[i] if i < len(medals) else f"{i+1}."
-            lines.append(f"{medal} Player: ${player.get('total_profit', 0):.2f}")
+            lines.append(f"{medal} {player.get('name', 'Player')}: ${player.get('total_profit', 0):.2f}")
 
         return "\n".join(lines)
@@ -7,6 +7,7 @@ and tool-use orchestration in the ODDSIDE AI service.
 
 import os
 import json
+import time
 from typing import Dict, List, Optional, Any
 import logging
 
@@ -25,6 +26,60 @@ except ImportError:
 ROUTING_MODEL = "claude-haiku-4-5-20251001"  # Fast, cheap for routing decisions
 REASONING_MODEL = "claude-sonnet-4-20250514"  # For complex reasoning
 
+# Tool-use routing prompt. It is sent after the tool list, so a cache
+# breakpoint on it caches tools + system together; keep it free of
+# per-request data or every call becomes a cache miss.
+ROUTING_SYSTEM_PROMPT = """You are the Kvitt poker game assistant. You are conversational and helpful.
+
+Your job is to understand the user's request and either answer directly or call the right tool/agent.
+
+IMPORTANT - USER DATA:
+The user's real data (groups, games, profile, settlements) is provided in the Context under "user_data".
+When users ask about their own data, use this information to give accurate, personalized answers.
+Do NOT say you don't have their data — you do.
+
+RULES:
+- If the user asks about their own groups, games, stats, or settlements and the data is in user_data, respond with helpful text using their actual data.
+- Always call a tool if the request requires an ACTION (creating, scheduling, sending, etc.). Do NOT respond with text if a tool fits.
+- If the request is about game creation, scheduling, or invites, use agent_game_setup.
+- If the request is about notifications, reminders, or alerts, use agent_notification.
+- If the request is about reports, stats, leaderboards, or analytics, use agent_analytics.
+- If the request is about host decisions (approve/reject), game monitoring, settlements, or payment reminders, use agent_host_persona.
+- If the request is about group chat responses or conversation, use agent_group_chat.
+- If the request is about planning next games, suggesting times, holidays, weather, or long weekends, use agent_game_planner.
+- If the request is about evaluating a poker hand, use poker_evaluator.
+- If the request is about tracking/managing payments, use payment_tracker.
+- If the request is about feedback, bug reports, surveys, complaints, feature requests, or reporting issues, use agent_feedback.
+- If the request is about engagement, inactive users/groups, nudges, milestones, or re-engagement, use agent_engagement.
+- For general questions or help, respond with helpful text (don't call a tool).
+- Pass through all context parameters (game_id, group_id, user_id, etc.) from the context to the tool.
+- Set user_input to a clean version of what the user asked.
+
+CONVERSATION STYLE:
+- Be concise, friendly, and conversational. Keep answers under 150 words unless more detail is needed.
+- Reference the conversation history when relevant (the user may say "tell me more" or refer back).
+
+FOLLOW-UP SUGGESTIONS:
+When responding with text (no tool call), always end your response with contextual follow-up suggestions in this exact format:
+
+---FOLLOW_UPS---
+["Suggestion 1?", "Suggestion 2?", "Suggestion 3?"]
+---END_FOLLOW_UPS---
+
+Make follow-ups relevant to what was just discussed and varied. Examples:
+"Want to see your game stats?", "Should I plan a game?", "Check who owes you?"
+"""
+
+# Provider-side prompt caching (5 minute TTL, refreshed on every hit)
+PROMPT_CACHE_CONTROL = {"type": "ephemeral"}
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+def usage_dict(usage: Any) -> Dict[str, int]:
+    """Token counts from an Anthropic response's usage (missing fields as 0)."""
+    return {field: getattr(usage, field, None) or 0 for field in USAGE_FIELDS}
+
 
 class ClaudeClient:
     """
@@ -43,6 +98,7 @@ class ClaudeClient:
         self.model = model or os.getenv("CLAUDE_MODEL", REASONING_MODEL)
         self.client = None
         self.async_client = None
+        self._routing_counters = {"calls": 0, "errors": 0, "cache_hits": 0, **{f: 0 for f in USAGE_FIELDS}}
 
         if ANTHROPIC_AVAILABLE and self.api_key:
             self.client = anthropic.Anthropic(api_key=self.api_key)
@@ -74,57 +130,23 @@ class ClaudeClient:
             model: Override model (defaults to ROUTING_MODEL for speed)
             conversation_history: Prior conversation messages [{role, content}]
 
+        The tool list and system prompt are the same on every call, so the
+        request marks them for provider-side prompt caching; `tools` must be
+        built once and passed in the same order each time for hits.
+
         Returns:
             Dict with:
                 - tool_calls: List of {name, input} dicts Claude wants to execute
                 - text_response: Any text Claude returned (for general responses)
                 - stop_reason: Why Claude stopped ("tool_use" or "end_turn")
+                - usage: Token counts, including cache_read_input_tokens
+                - latency_ms: Time spent in the API call
         """
         if not self.is_available:
             return {"tool_calls": [], "text_response": None, "stop_reason": "unavailable"}
 
         model = model or ROUTING_MODEL
 
-        system_prompt = """You are the Kvitt poker game assistant. You are conversational and helpful.
-
-Your job is to understand the user's request and either answer directly or call the right tool/agent.
-
-IMPORTANT - USER DATA:
-The user's real data (groups, games, profile, settlements) is provided in the Context under "user_data".
-When users ask about their own data, use this information to give accurate, personalized answers.
-Do NOT say you don't have their data — you do.
-
-RULES:
-- If the user asks about their own groups, games, stats, or settlements and the data is in user_data, respond with helpful text using their actual data.
-- Always call a tool if the request requires an ACTION (creating, scheduling, sending, etc.). Do NOT respond with text if a tool fits.
-- If the request is about game creation, scheduling, or invites, use agent_game_setup.
-- If the request is about notifications, reminders, or alerts, use agent_notification.
-- If the request is about reports, stats, leaderboards, or analytics, use agent_analytics.
-- If the request is about host decisions (approve/reject), game monitoring, settlements, or payment reminders, use agent_host_persona.
-- If the request is about group chat responses or conversation, use agent_group_chat.
-- If the request is about planning next games, suggesting times, holidays, weather, or long weekends, use agent_game_planner.
-- If the request is about evaluating a poker hand, use poker_evaluator.
-- If the request is about tracking/managing payments, use payment_tracker.
-- If the request is about feedback, bug reports, surveys, complaints, feature requests, or reporting issues, use agent_feedback.
-- If the request is about engagement, inactive users/groups, nudges, milestones, or re-engagement, use agent_engagement.
-- For general questions or help, respond with helpful text (don't call a tool).
-- Pass through all context parameters (game_id, group_id, user_id, etc.) from the context to the tool.
-- Set user_input to a clean version of what the user asked.
-
-CONVERSATION STYLE:
-- Be concise, friendly, and conversational. Keep answers under 150 words unless more detail is needed.
-- Reference the conversation history when relevant (the user may say "tell me more" or refer back).
-
-FOLLOW-UP SUGGESTIONS:
-When responding with text (no tool call), always end your response with contextual follow-up suggestions in this exact format:
-
----FOLLOW_UPS---
-["Suggestion 1?", "Suggestion 2?", "Suggestion 3?"]
----END_FOLLOW_UPS---
-
-Make follow-ups relevant to what was just discussed and varied. Examples:
-"Want to see your game stats?", "Should I plan a game?", "Check who owes you?"
-"""
 
         # Build messages array with conversation history
         messages = []
@@ -150,13 +172,22 @@ Make follow-ups relevant to what was just discussed and varied. Examples:
         messages = self._sanitize_message_history(messages)
 
         try:
+            started = time.perf_counter()
             response = await self.async_client.messages.create(
                 model=model,
                 max_tokens=1024,
-                system=system_prompt,
+                # Breakpoint after the system block caches the tools + system prefix
+                system=[{"type": "text", "text": ROUTING_SYSTEM_PROMPT, "cache_control": PROMPT_CACHE_CONTROL}],
                 tools=tools,
                 messages=messages
             )
+            latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            usage = self._record_routing_usage(response)
+            logger.info(
+                f"Routing call {latency_ms}ms: {usage['input_tokens']} input, "
+                f"{usage['cache_read_input_tokens']} cached, {usage['cache_creation_input_tokens']} cache-written, "
+                f"{usage['output_tokens']} output tokens"
+            )
 
             tool_calls = []
             text_response = None
@@ -174,13 +205,38 @@ Make follow-ups relevant to what was just discussed and varied. Examples:
             return {
                 "tool_calls": tool_calls,
                 "text_response": text_response,
-                "stop_reason": response.stop_reason
+                "stop_reason": response.stop_reason,
+                "usage": usage,
+                "latency_ms": latency_ms
             }
 
         except Exception as e:
+            self._routing_counters["errors"] += 1
             logger.error(f"Claude tool-use routing error: {e}")
             return {"tool_calls": [], "text_response": None, "stop_reason": "error", "error": str(e)}
 
+    def _record_routing_usage(self, response: Any) -> Dict[str, int]:
+        usage = usage_dict(getattr(response, "usage", None))
+        counters = self._routing_counters
+        counters["calls"] += 1
+        if usage["cache_read_input_tokens"]:
+            counters["cache_hits"] += 1
+        for field in USAGE_FIELDS:
+            counters[field] += usage[field]
+        return usage
+
+    def routing_metrics(self) -> Dict:
+        """Token usage and prompt-cache hit rate across route_with_tools calls."""
+        counters = dict(self._routing_counters)
+        prompt_tokens = (
+            counters["input_tokens"] + counters["cache_creation_input_tokens"] + counters["cache_read_input_tokens"]
+        )
+        counters["cache_hit_rate"] = round(counters["cache_hits"] / counters["calls"], 3) if counters["calls"] else 0.0
+        counters["cached_prompt_share"] = (
+            round(counters["cache_read_input_tokens"] / prompt_tokens, 3) if prompt_tokens else 0.0
+        )
+        return counters
+
     def _sanitize_message_history(self, messages: List[Dict]) -> List[Dict]:
         """
         Ensure messages alternate between user and assistant roles.
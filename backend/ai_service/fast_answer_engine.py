@@ -12,6 +12,7 @@ import logging
 import random
 
 from .intent_router import IntentResult
+from user_stats import get_user_stats, stats_view
 
 logger = logging.getLogger(__name__)
 
@@ -442,8 +443,7 @@ class FastAnswerEngine:
     async def _handle_my_stats(self, user_id: str, params: Dict) -> FastAnswer:
         user = await self.db.users.find_one(
             {"user_id": user_id},
-            {"_id": 0, "name": 1, "level": 1, "total_games": 1,
-             "total_profit": 1, "badges": 1, "created_at": 1}
+            {"_id": 0, "name": 1, "level": 1, "badges": 1, "created_at": 1}
         )
 
         if not user:
@@ -452,10 +452,11 @@ class FastAnswerEngine:
                 follow_ups=["Show my groups"],
             )
 
+        stats = stats_view(await get_user_stats(self.db, user_id))
         name = user.get("name", "there")
         level = user.get("level", "Rookie")
-        total_games = user.get("total_games", 0)
-        total_profit = user.get("total_profit", 0.0)
+        total_games = stats["total_games"]
+        total_profit = stats["net_profit"]
         badges = user.get("badges", [])
         badge_count = len(badges)
         created = user.get("created_at", "")
@@ -488,7 +489,7 @@ class FastAnswerEngine:
     async def _handle_my_record(self, user_id: str, params: Dict) -> FastAnswer:
         user = await self.db.users.find_one(
             {"user_id": user_id},
-            {"_id": 0, "name": 1, "total_games": 1, "total_profit": 1}
+            {"_id": 0, "name": 1}
         )
 
         if not user:
@@ -497,8 +498,9 @@ class FastAnswerEngine:
                 follow_ups=["Show my groups"],
             )
 
-        total_games = user.get("total_games", 0)
-        total_profit = user.get("total_profit", 0.0)
+        stats = stats_view(await get_user_stats(self.db, user_id))
+        total_games = stats["total_games"]
+        total_profit = stats["net_profit"]
 
         if total_games == 0:
             return FastAnswer(
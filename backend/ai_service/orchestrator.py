@@ -15,10 +15,13 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime
 import uuid
 import json
+import hashlib
 import logging
 
 from .tools.registry import ToolRegistry
 from .agents.registry import AgentRegistry
+from .intent_router import IntentRouter
+from .tool_preselector import CATALOG_TOOL_NAME, INTENT_TOOL_HINTS, ToolPreselector, configured_top_k
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +44,10 @@ class AIOrchestrator:
         self.llm_client = llm_client
         self.tool_registry = ToolRegistry()
         self.agent_registry = AgentRegistry()
+        self._tool_schemas: Optional[List[Dict]] = None
+        self.tool_schema_version: Optional[str] = None
+        self._preselector: Optional[ToolPreselector] = None
+        self._intent_router = IntentRouter()
 
         # Initialize tools and agents
         self._setup_tools()
@@ -188,7 +195,14 @@ class AIOrchestrator:
 
         Tools are exposed directly. Agents are exposed as "agent_<name>" tools
         so Claude can pick the right one.
+
+        Built once per orchestrator: the list is the prompt-cached prefix of
+        every routing call, so it must be byte-identical between requests.
+        tool_schema_version (a hash of the list) is logged with each call.
         """
+        if self._tool_schemas is not None:
+            return self._tool_schemas
+
         schemas = []
 
         # Add tool schemas (direct tools like poker_evaluator, payment_tracker)
@@ -199,8 +213,31 @@ class AIOrchestrator:
         for agent in self.agent_registry.get_all_agents():
             schemas.append(agent.to_anthropic_tool())
 
+        serialized = json.dumps(schemas, sort_keys=True, default=str)
+        self.tool_schema_version = hashlib.sha256(serialized.encode()).hexdigest()[:12]
+        self._tool_schemas = schemas
+        # k=0 (the default) keeps the full, prompt-cached catalog (see tool_preselector)
+        self._preselector = ToolPreselector(schemas, k=configured_top_k())
+        logger.info(f"Tool schemas built: {len(schemas)} tools, version {self.tool_schema_version}")
         return schemas
 
+    def _routing_hints(self, user_input: str, context: Dict) -> List[str]:
+        """Tool names the local classifiers point at, strongest first."""
+        hints = []
+        request_type = self._classify_request(user_input, context)
+        if request_type["type"] == "tool":
+            hints.append(request_type["tool"])
+        elif request_type["type"] == "agent":
+            hints.append(f"agent_{request_type['agent']}")
+        intent = self._intent_router.classify(user_input, context)
+        hints.extend(INTENT_TOOL_HINTS.get(intent.intent, []))
+        return hints
+
+    def _preselect_tools(self, user_input: str, context: Dict) -> List[Dict]:
+        """The top-k tools for this request when preselection is enabled, else all of them."""
+        self._build_tool_schemas()
+        return self._preselector.select(user_input, self._routing_hints(user_input, context))
+
     async def process(
         self,
         user_input: str,
@@ -236,7 +273,9 @@ class AIOrchestrator:
         try:
             # Try Claude tool-use routing first
             if self.llm_client and self.llm_client.is_available:
-                result = await self._process_with_llm(user_input, context, user_id)
+                llm_call: Dict = {}
+                log_entry["llm"] = llm_call
+                result = await self._process_with_llm(user_input, context, user_id, llm_call)
                 # _process_with_llm may internally fall back to keywords
                 routing_method = result.pop("_routing_method", "llm_tool_use")
             else:
@@ -274,15 +313,22 @@ class AIOrchestrator:
         self,
         user_input: str,
         context: Dict,
-        user_id: str = None
+        user_id: str = None,
+        llm_call: Dict = None
     ) -> Dict:
         """
         Route the request using Claude's tool-use API.
 
         Claude sees all available tools and agents as tool schemas, then
-        decides which one to call based on the user's input.
+        decides which one to call based on the user's input. Token usage,
+        latency and the schema version of the routing call go into `llm_call`.
+
+        With preselection enabled (TOOL_PRESELECT_K), only the preselected
+        tools are sent at first; if Claude asks for the full catalog
+        (CATALOG_TOOL_NAME) the request is routed again with every tool.
         """
-        tools = self._build_tool_schemas()
+        all_tools = self._build_tool_schemas()
+        tools = self._preselect_tools(user_input, context)
 
         # Extract conversation history before passing context to Claude
         conversation_history = context.pop("conversation_history", [])
@@ -298,6 +344,29 @@ class AIOrchestrator:
             tools=tools,
             conversation_history=conversation_history
         )
+        calls = [routing_result]
+
+        escalated = any(c["name"] == CATALOG_TOOL_NAME for c in routing_result.get("tool_calls", []))
+        if escalated:
+            logger.info("Preselected tools didn't fit, routing again with the full catalog")
+            routing_result = await self.llm_client.route_with_tools(
+                user_input=user_input,
+                context=enriched_context,
+                tools=all_tools,
+                conversation_history=conversation_history
+            )
+            calls.append(routing_result)
+
+        if llm_call is not None:
+            usages = [c["usage"] for c in calls if c.get("usage")]
+            llm_call.update({
+                "tool_schema_version": self.tool_schema_version,
+                "preselected": [t["name"] for t in tools] if tools is not all_tools else None,
+                "escalated": escalated,
+                "usage": {f: sum(u[f] for u in usages) for f in usages[0]} if usages else None,
+                "latency_ms": sum(c.get("latency_ms") or 0 for c in calls),
+                "stop_reason": routing_result.get("stop_reason")
+            })
 
         # If Claude couldn't route (error/unavailable), fall back
         if routing_result.get("stop_reason") in ("error", "unavailable"):
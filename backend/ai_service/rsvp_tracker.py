@@ -53,10 +53,13 @@ class RSVPTrackerService:
             return {"error": "no database"}
 
         # Update player RSVP in game
-        await self.db.game_nights.update_one(
+        result = await self.db.game_nights.update_one(
             {"game_id": game_id, "players.user_id": player_id},
             {"$set": {"players.$.rsvp_status": response}}
         )
+        if result.modified_count > 0:
+            from game_sync import publish_delta
+            await publish_delta(self.db, game_id, user_ids=[player_id])
 
         # Get game info
         game = await self.db.game_nights.find_one(
@@ -0,0 +1,343 @@
+"""
+Tool Preselector
+
+Local first stage of LLM routing: ranks the orchestrator's tool and agent
+schemas against the user's message and exposes only the top k to Claude,
+plus a catch-all tool that escalates to the full catalog. No LLM or network
+call; ranking a message takes well under a millisecond.
+
+Ranking:
+1. Hints from the existing local classifiers (AIOrchestrator._classify_request
+   and IntentRouter) take the first slots
+2. The rest are filled by TF-IDF cosine similarity between the message and
+   each schema's name, description and parameter names
+3. The selection is returned in catalog order, so the same selection is the
+   same (prompt-cacheable) prefix every time
+
+Off by default (TOOL_PRESELECT_K=0). The full catalog is one stable prefix
+that is read from the prompt cache at a tenth of the input price; a subset
+is a different prefix almost every request, so it is billed in full (or as
+a cache write) and usually costs more than the cached catalog it replaces.
+Enable it only when evaluate_tool_preselection.py shows it winning on
+effective (cache-priced) tokens.
+
+evaluate_preselection() replays labeled requests (see
+evaluate_tool_preselection.py, which loads them from ai_orchestrator_logs)
+to measure routing accuracy against prompt tokens and effective cost for
+each k; replay_routing() routes them through Claude for real and prices the
+usage the API reports.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_TOP_K = 8  # selection size for ranking and evaluation
+
+# Prompt-cache pricing relative to the base input price
+CACHE_WRITE_PRICE = 1.25
+CACHE_READ_PRICE = 0.1
+# Shorter prefixes are never cached (1024 tokens on Sonnet/Opus, 2048 on Haiku)
+MIN_CACHEABLE_TOKENS = 1024
+# Ephemeral cache entries live this long after their last use
+CACHE_TTL_SECONDS = 300
+
+CATALOG_TOOL_NAME = "show_all_tools"
+
+# Exposed with every preselection; calling it re-routes with every tool
+CATALOG_TOOL = {
+    "name": CATALOG_TOOL_NAME,
+    "description": (
+        "Call this when the request needs a tool or agent that is not in this list "
+        "(including any tool named in your instructions). You will then see every tool."
+    ),
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "reason": {"type": "string", "description": "What kind of tool the request needs"}
+        },
+        "required": []
+    }
+}
+
+# IntentRouter intents that point at specific tools/agents
+INTENT_TOOL_HINTS = {
+    "PLAN_GAME": ["agent_game_planner", "agent_game_setup"],
+    "CREATE_GAME": ["agent_game_setup", "game_manager"],
+    "SUMMARIZE": ["agent_analytics", "report_generator"],
+    "SEND_REMINDER": ["agent_notification", "notification_sender"],
+    "WHO_OWES_ME": ["agent_payment_reconciliation", "payment_tracker"],
+    "WHAT_I_OWE": ["agent_payment_reconciliation", "payment_tracker"],
+    "MY_STATS": ["agent_analytics"],
+    "MY_RECORD": ["agent_analytics"],
+    "REPORT_ISSUE": ["agent_feedback"],
+}
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do for from get has have how i if in is it its me my "
+    "of on or our please should that the this to use us we what when which who will with "
+    "you your".split()
+)
+
+CHARS_PER_TOKEN = 4
+
+
+# ============== TEXT ==============
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(w) for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOPWORDS]
+
+
+def _schema_text(schema: Dict) -> List[str]:
+    name_words = tokenize(schema["name"].replace("_", " "))
+    params = " ".join(schema.get("input_schema", {}).get("properties", {}).keys()).replace("_", " ")
+    # The name is the strongest signal, so it counts three times
+    return name_words * 3 + tokenize(schema.get("description", "")) + tokenize(params)
+
+
+def estimate_tokens(payload) -> int:
+    """Rough prompt size of a JSON-serializable payload (~4 characters per token)."""
+    text = payload if isinstance(payload, str) else json.dumps(payload)
+    return len(text) // CHARS_PER_TOKEN
+
+
+def configured_top_k() -> int:
+    """TOOL_PRESELECT_K, read when the orchestrator builds its schemas (0 = send every tool)."""
+    return int(os.getenv("TOOL_PRESELECT_K", "0"))
+
+
+# ============== PROMPT CACHE COST ==============
+
+def effective_tokens(usage: Dict) -> float:
+    """Input cost of a call in base-price tokens, from the API's usage fields."""
+    return (
+        (usage.get("input_tokens") or 0)
+        + CACHE_WRITE_PRICE * (usage.get("cache_creation_input_tokens") or 0)
+        + CACHE_READ_PRICE * (usage.get("cache_read_input_tokens") or 0)
+    )
+
+
+class PromptCacheModel:
+    """
+    Simulated prompt cache for offline replays: a call writes its tools +
+    system prefix unless the same prefix was used within CACHE_TTL_SECONDS,
+    in which case it reads it. Calls without a time (at=None) never expire
+    anything, the best case for many distinct subsets.
+    """
+
+    def __init__(self, min_tokens: int = MIN_CACHEABLE_TOKENS, ttl: float = CACHE_TTL_SECONDS):
+        self.min_tokens = min_tokens
+        self.ttl = ttl
+        self._expires: Dict = {}
+
+    def cost(self, prefix_key, prefix_tokens: int, at: Optional[float] = None) -> float:
+        if prefix_tokens < self.min_tokens:
+            return float(prefix_tokens)
+        expires = self._expires.get(prefix_key)
+        self._expires[prefix_key] = math.inf if at is None else at + self.ttl
+        if expires is not None and (at is None or at < expires):
+            return CACHE_READ_PRICE * prefix_tokens
+        return CACHE_WRITE_PRICE * prefix_tokens
+
+
+def _seconds(timestamp) -> Optional[float]:
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+# ============== PRESELECTION ==============
+
+class ToolPreselector:
+    """TF-IDF ranking over a fixed list of Anthropic tool schemas."""
+
+    def __init__(self, schemas: Sequence[Dict], k: int = DEFAULT_TOP_K):
+        # The caller's list itself, so "every tool" is the same object it sends
+        self.schemas = schemas if isinstance(schemas, list) else list(schemas)
+        self.k = k
+        self.names = [s["name"] for s in self.schemas]
+
+        documents = [Counter(_schema_text(s)) for s in self.schemas]
+        doc_freq = Counter(term for doc in documents for term in doc)
+        n = len(documents)
+        self._idf = {term: math.log((n + 1) / (df + 1)) + 1 for term, df in doc_freq.items()}
+        self._vectors = [self._weigh(doc) for doc in documents]
+
+    def _weigh(self, counts: Counter) -> Dict[str, float]:
+        vector = {t: c * self._idf[t] for t, c in counts.items() if t in self._idf}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {t: v / norm for t, v in vector.items()}
+
+    def rank(self, user_input: str) -> List[Tuple[str, float]]:
+        """(name, similarity) for every schema, best first."""
+        query = self._weigh(Counter(tokenize(user_input)))
+        scores = [
+            (name, sum(weight * vector.get(term, 0.0) for term, weight in query.items()))
+            for name, vector in zip(self.names, self._vectors)
+        ]
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+
+    def select_names(self, user_input: str, hints: Iterable[str] = (), k: Optional[int] = None) -> List[str]:
+        """Up to k schema names: hints first, then by similarity (zero scores never fill slots)."""
+        k = self.k if k is None else k
+        chosen = []
+        for name in hints:
+            if name in self.names and name not in chosen and len(chosen) < k:
+                chosen.append(name)
+        for name, score in self.rank(user_input):
+            if len(chosen) >= k or score <= 0:
+                break
+            if name not in chosen:
+                chosen.append(name)
+        return chosen
+
+    def select(self, user_input: str, hints: Iterable[str] = (), k: Optional[int] = None) -> List[Dict]:
+        """
+        The tools to expose: the selection in catalog order plus CATALOG_TOOL,
+        or the full catalog when k covers it (k <= 0 disables preselection).
+        """
+        k = self.k if k is None else k
+        if k <= 0 or k >= len(self.schemas):
+            return self.schemas
+        chosen = set(self.select_names(user_input, hints, k))
+        return [s for s in self.schemas if s["name"] in chosen] + [CATALOG_TOOL]
+
+
+# ============== OFFLINE EVALUATION ==============
+
+def routing_record(log: Dict, catalog: Iterable[str]) -> Optional[Dict]:
+    """
+    A labeled request from an ai_orchestrator_logs entry, or None if the
+    entry can't serve as ground truth. The label is the handler Claude chose
+    with every tool visible (None for a plain-text answer); calls routed over
+    a preselected subset are skipped unless they escalated.
+    """
+    result = log.get("result") or {}
+    if result.get("routing_method") != "llm_tool_use" or not log.get("user_input"):
+        return None
+    llm = log.get("llm") or {}
+    if llm.get("preselected") is not None and not llm.get("escalated"):
+        return None
+
+    handler = result.get("handler")
+    if handler == "llm_general":
+        label = None
+    elif handler in catalog:
+        label = handler
+    else:
+        return None
+    return {"user_input": log["user_input"], "context": log.get("context") or {}, "label": label,
+            "timestamp": log.get("timestamp")}
+
+
+def evaluate_preselection(
+    records: Sequence[Dict],
+    preselector: ToolPreselector,
+    ks: Iterable[int],
+    hints_for: Optional[Callable[[str, Dict], List[str]]] = None,
+    system_prompt: str = "",
+    min_cacheable_tokens: int = MIN_CACHEABLE_TOKENS
+) -> List[Dict]:
+    """
+    Replay labeled requests at each k, oldest first. A request is routed
+    correctly when its label is exposed (plain-text answers need no tool);
+    otherwise Claude has to escalate through CATALOG_TOOL, costing a second
+    full-catalog call. This is the optimistic bound; replay_routing measures
+    what Claude actually picks.
+
+    Returns one row per k: accuracy, escalation_rate, avg_tools,
+    avg_prompt_tokens (tools + system, including escalations) and
+    avg_effective_tokens (the same prompts priced through PromptCacheModel,
+    with cache expiry following each record's timestamp when it has one).
+    """
+    system_tokens = estimate_tokens(system_prompt)
+    full_tokens = estimate_tokens(preselector.schemas) + system_tokens
+    full_key = tuple(preselector.names)
+    rows = []
+    for k in ks:
+        cache = PromptCacheModel(min_cacheable_tokens)
+        correct = escalations = tools_total = tokens_total = 0
+        effective_total = 0.0
+        for record in records:
+            hints = hints_for(record["user_input"], record.get("context") or {}) if hints_for else []
+            exposed = preselector.select(record["user_input"], hints, k)
+            names = tuple(s["name"] for s in exposed)
+            at = _seconds(record.get("timestamp"))
+            tokens = estimate_tokens(exposed) + system_tokens
+            effective = cache.cost(names, tokens, at)
+            if record["label"] is None or record["label"] in names:
+                correct += 1
+            else:
+                escalations += 1
+                tokens += full_tokens
+                effective += cache.cost(full_key, full_tokens, at)
+            tools_total += len(exposed)
+            tokens_total += tokens
+            effective_total += effective
+        n = len(records) or 1
+        rows.append({
+            "k": k,
+            "accuracy": round(correct / n, 3),
+            "escalation_rate": round(escalations / n, 3),
+            "avg_tools": round(tools_total / n, 1),
+            "avg_prompt_tokens": round(tokens_total / n),
+            "avg_effective_tokens": round(effective_total / n),
+            "full_catalog_tokens": full_tokens
+        })
+    return rows
+
+
+def _decision(routing_result: Dict) -> Optional[str]:
+    calls = routing_result.get("tool_calls") or []
+    return calls[0]["name"] if calls else None
+
+
+async def replay_routing(
+    records: Sequence[Dict],
+    exposed_for: Callable[[Dict], List[Dict]],
+    route: Callable[[Dict, List[Dict]], Awaitable[Dict]],
+    catalog: List[Dict]
+) -> Dict:
+    """
+    Route labeled requests through Claude with the tools exposed_for(record)
+    picks (escalating to `catalog` like the orchestrator does) and score the
+    handler Claude actually chose. route(record, tools) returns a
+    route_with_tools result; cost comes from the usage it reports, so the
+    prompt cache is measured, not modeled.
+
+    Returns accuracy, escalation_rate and avg_effective_tokens.
+    """
+    correct = escalations = 0
+    effective_total = 0.0
+    for record in records:
+        result = await route(record, exposed_for(record))
+        effective_total += effective_tokens(result.get("usage") or {})
+        if _decision(result) == CATALOG_TOOL_NAME:
+            escalations += 1
+            result = await route(record, catalog)
+            effective_total += effective_tokens(result.get("usage") or {})
+        if _decision(result) == record["label"]:
+            correct += 1
+    n = len(records) or 1
+    return {
+        "accuracy": round(correct / n, 3),
+        "escalation_rate": round(escalations / n, 3),
+        "avg_effective_tokens": round(effective_total / n)
+    }
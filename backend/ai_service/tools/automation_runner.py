@@ -875,6 +875,9 @@ class AutomationRunnerTool(BaseTool):
                 }
             )
 
+        from game_sync import publish_delta
+        await publish_delta(self.db, game_id, user_ids=[user_id])
+
         return {
             "success": True,
             "message": f"Auto-RSVP: {response} for game {game_id}",
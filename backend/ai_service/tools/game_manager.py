@@ -176,6 +176,10 @@ class GameManagerTool(BaseTool):
                     {"$push": {"players": player_entry}}
                 )
 
+        if self.db is not None and invited:
+            from game_sync import publish_delta
+            await publish_delta(self.db, game_id, user_ids=player_ids)
+
         return ToolResult(
             success=True,
             data={"invited_count": len(invited), "players": invited},
@@ -226,6 +230,8 @@ class GameManagerTool(BaseTool):
                 }
             )
             if result.modified_count > 0:
+                from game_sync import publish_delta
+                await publish_delta(self.db, game_id)
                 return ToolResult(
                     success=True,
                     data={"game_id": game_id, "status": "active"},
@@ -256,6 +262,8 @@ class GameManagerTool(BaseTool):
                 }
             )
             if result.modified_count > 0:
+                from game_sync import publish_delta
+                await publish_delta(self.db, game_id)
                 return ToolResult(
                     success=True,
                     data={"game_id": game_id, "status": "ended"},
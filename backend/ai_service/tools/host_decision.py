@@ -389,6 +389,16 @@ class HostDecisionTool(BaseTool):
 
     async def _execute_approved_action(self, decision: Dict) -> Dict:
         """Execute the action for an approved decision"""
+        result = await self._apply_approved_action(decision)
+        game_id = decision.get("game_id")
+        if game_id and result.get("action") not in (None, "unknown"):
+            from game_sync import publish_delta
+            player_id = decision.get("context", {}).get("player_id")
+            await publish_delta(self.db, game_id, user_ids=[player_id] if player_id else ())
+        return result
+
+    async def _apply_approved_action(self, decision: Dict) -> Dict:
+        """Write an approved decision to the game"""
         decision_type = decision.get("decision_type")
         context = decision.get("context", {})
         game_id = decision.get("game_id")
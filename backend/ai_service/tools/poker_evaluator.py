@@ -4,13 +4,14 @@ Poker Hand Evaluator Tool
 Deterministically evaluates poker hands using code (not LLM).
 """
 
+import asyncio
 from typing import List, Dict
 from .base import BaseTool, ToolResult
 
 # Import the evaluator from the main module
 import sys
 sys.path.append('..')
-from poker_evaluator import evaluate_hand, get_action_suggestion, get_hand_strength
+from poker_evaluator import evaluate_hand, calculate_hand_equity, get_action_suggestion, get_hand_strength
 
 
 class PokerEvaluatorTool(BaseTool):
@@ -27,8 +28,9 @@ class PokerEvaluatorTool(BaseTool):
     @property
     def description(self) -> str:
         return """Evaluates a poker hand and provides strategy suggestions.
-        Takes hole cards (2 cards in player's hand) and community cards (3-5 shared cards).
-        Returns the exact hand type (flush, full house, etc.) and recommended action."""
+        Takes hole cards (2 cards in player's hand) and community cards (none pre-flop, or 3-5 shared cards).
+        Optionally takes the number of opponents still in the hand.
+        Returns the exact hand type (flush, full house, etc.), win/tie odds and recommended action."""
 
     @property
     def parameters(self) -> Dict:
@@ -45,14 +47,20 @@ class PokerEvaluatorTool(BaseTool):
                 "community_cards": {
                     "type": "array",
                     "items": {"type": "string"},
-                    "description": "Community cards (3-5), e.g. ['Q of hearts', 'J of diamonds', '10 of clubs']",
-                    "minItems": 3,
+                    "description": "Community cards (empty pre-flop, or 3-5), e.g. ['Q of hearts', 'J of diamonds', '10 of clubs']",
+                    "minItems": 0,
                     "maxItems": 5
                 },
                 "stage": {
                     "type": "string",
-                    "enum": ["Flop", "Turn", "River"],
+                    "enum": ["Pre-flop", "Flop", "Turn", "River"],
                     "description": "Current betting stage"
+                },
+                "opponents": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 9,
+                    "description": "Number of opponents still in the hand (default 1)"
                 }
             },
             "required": ["hole_cards", "community_cards"]
@@ -62,7 +70,8 @@ class PokerEvaluatorTool(BaseTool):
         self,
         hole_cards: List[str],
         community_cards: List[str],
-        stage: str = None
+        stage: str = None,
+        opponents: int = 1
     ) -> ToolResult:
         """Evaluate the poker hand"""
         try:
@@ -73,15 +82,17 @@ class PokerEvaluatorTool(BaseTool):
                     error="Must provide exactly 2 hole cards"
                 )
 
-            if len(community_cards) < 3:
+            if len(community_cards) in (1, 2) or len(community_cards) > 5:
                 return ToolResult(
                     success=False,
-                    error="Must provide at least 3 community cards"
+                    error="Community cards must be empty (pre-flop) or 3-5 cards"
                 )
 
             # Determine stage if not provided
             if not stage:
-                if len(community_cards) == 3:
+                if not community_cards:
+                    stage = "Pre-flop"
+                elif len(community_cards) == 3:
                     stage = "Flop"
                 elif len(community_cards) == 4:
                     stage = "Turn"
@@ -97,8 +108,17 @@ class PokerEvaluatorTool(BaseTool):
                     error=evaluation["error"]
                 )
 
+            # Equity against random opponent hands
+            equity = await asyncio.to_thread(calculate_hand_equity, hole_cards, community_cards, opponents)
+
+            if "error" in equity:
+                return ToolResult(
+                    success=False,
+                    error=equity["error"]
+                )
+
             # Get action suggestion
-            suggestion = get_action_suggestion(evaluation, stage)
+            suggestion = get_action_suggestion(evaluation, stage, equity)
 
             return ToolResult(
                 success=True,
@@ -109,6 +129,10 @@ class PokerEvaluatorTool(BaseTool):
                     "action": suggestion["action"],
                     "potential": suggestion["potential"],
                     "reasoning": suggestion["reasoning"],
+                    "win_probability": equity["win"],
+                    "tie_probability": equity["tie"],
+                    "equity": equity["equity"],
+                    "opponents": equity["opponents"],
                     "stage": stage
                 },
                 message=f"Hand evaluated: {evaluation['hand_name']}"
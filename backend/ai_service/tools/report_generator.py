@@ -8,6 +8,8 @@ from typing import List, Dict, Optional
 from .base import BaseTool, ToolResult
 from datetime import datetime, timedelta
 
+from group_leaderboards import WINDOW_FOR_PERIOD, compute_group_leaderboard, get_group_leaderboard
+
 
 class ReportGeneratorTool(BaseTool):
     """
@@ -279,46 +281,28 @@ class ReportGeneratorTool(BaseTool):
                 error="Database not available"
             )
 
-        time_filter = self._get_time_filter(time_period)
-
-        query = {"group_id": group_id, "status": {"$in": ["ended", "settled"]}}
-        if time_filter:
-            query["ended_at"] = time_filter
-
-        games = await self.db.game_nights.find(query, {"_id": 0}).to_list(1000)
-
-        player_stats = {}
-        for game in games:
-            for player in game.get("players", []):
-                uid = player.get("user_id")
-                if uid not in player_stats:
-                    player_stats[uid] = {
-                        "user_id": uid,
-                        "games": 0,
-                        "wins": 0,
-                        "total_profit": 0
-                    }
-
-                player_stats[uid]["games"] += 1
-                net = player.get("net_result", 0)
-                player_stats[uid]["total_profit"] += net
-                if net > 0:
-                    player_stats[uid]["wins"] += 1
-
-        # Sort by total profit
-        leaderboard = sorted(
-            player_stats.values(),
-            key=lambda x: x["total_profit"],
-            reverse=True
-        )
-
-        # Add rankings
-        for i, player in enumerate(leaderboard):
-            player["rank"] = i + 1
+        # Month/quarter/all-time are materialized on settle; other periods are computed ad hoc
+        window = WINDOW_FOR_PERIOD.get(time_period)
+        if window:
+            board = await get_group_leaderboard(self.db, group_id, window)
+        else:
+            board = await compute_group_leaderboard(self.db, group_id, self._get_time_span(time_period))
+
+        leaderboard = [
+            {
+                "rank": entry["rank"],
+                "user_id": entry["user_id"],
+                "name": (entry.get("user") or {}).get("name", "Unknown"),
+                "games": entry["total_games"],
+                "wins": entry["wins"],
+                "total_profit": entry["total_profit"]
+            }
+            for entry in board["entries"]
+        ]
 
         return ToolResult(
             success=True,
-            data={"leaderboard": leaderboard, "time_period": time_period, "total_games": len(games)},
+            data={"leaderboard": leaderboard, "time_period": time_period, "total_games": board["total_games"]},
             message=f"Leaderboard for {time_period}"
         )
 
@@ -406,6 +390,15 @@ class ReportGeneratorTool(BaseTool):
             message="Trends analysis"
         )
 
+    def _get_time_span(self, time_period: str) -> Optional[timedelta]:
+        """Rolling window length for a period (None = all time)"""
+        return {
+            "week": timedelta(days=7),
+            "month": timedelta(days=30),
+            "quarter": timedelta(days=90),
+            "year": timedelta(days=365),
+        }.get(time_period)
+
     def _get_time_filter(self, time_period: str) -> Optional[Dict]:
         """Get MongoDB time filter based on period"""
         now = datetime.utcnow()
@@ -132,6 +132,8 @@ class SchedulerTool(BaseTool):
                 {"$set": {"scheduled_time": scheduled_time}}
             )
             if result.modified_count > 0:
+                from game_sync import publish_delta
+                await publish_delta(self.db, game_id, game_fields=["scheduled_time"])
                 return ToolResult(
                     success=True,
                     data={"game_id": game_id, "scheduled_time": scheduled_time},
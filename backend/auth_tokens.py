@@ -0,0 +1,249 @@
+"""
+Supabase Token Verification
+Shared JWT verification for HTTP (get_current_user) and Socket.IO (connect):
+one JWKS key set refreshed in the background and one cache of verified
+claims, so a repeat token costs a dict lookup.
+
+PRINCIPLES:
+1. The event loop never blocks on JWKS: keys are fetched with an async HTTP
+   client at startup and every JWKS_REFRESH_INTERVAL. An unknown kid
+   (key rotation) triggers at most one refetch per JWKS_MIN_REFETCH_GAP
+2. Verified claims are cached under sha256(token) until the token's own exp,
+   never longer. The raw token is never stored
+3. RS256 (JWKS) first, HS256 (legacy shared secret) as fallback, same as
+   before. An expired token raises TokenExpired so HTTP callers can keep
+   answering "Token expired"; anything else invalid returns None
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+import jwt
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+AUDIENCE = "authenticated"
+JWKS_REFRESH_INTERVAL = 6 * 3600  # seconds
+JWKS_MIN_REFETCH_GAP = 30  # seconds between unknown-kid refetches
+JWKS_FETCH_TIMEOUT = 5.0
+CLAIMS_CACHE_SIZE = 10000
+
+
+class TokenExpired(Exception):
+    """The token's signature is valid but it is past its exp."""
+
+
+# ============== JWKS KEY SET ==============
+
+async def _http_fetch_jwks(url: str) -> Dict:
+    async with httpx.AsyncClient(timeout=JWKS_FETCH_TIMEOUT) as http:
+        response = await http.get(url)
+        response.raise_for_status()
+        return response.json()
+
+
+class JWKSKeyStore:
+    """Supabase signing keys by kid, refreshed off the request path."""
+
+    def __init__(
+        self,
+        url: str,
+        refresh_interval: float = JWKS_REFRESH_INTERVAL,
+        fetcher: Optional[Callable[[str], Awaitable[Dict]]] = None
+    ):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self._fetch = fetcher or _http_fetch_jwks
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def kids(self):
+        return set(self._keys)
+
+    async def refresh(self) -> bool:
+        """Fetch the key set. On failure the previous keys stay in place."""
+        async with self._lock:
+            return await self._refresh_locked()
+
+    async def _refresh_locked(self) -> bool:
+        self._fetched_at = time.monotonic()
+        try:
+            data = await self._fetch(self.url)
+            key_set = jwt.PyJWKSet.from_dict(data)
+        except Exception as e:
+            logger.warning(f"JWKS refresh failed ({self.url}): {e}")
+            return False
+        self._keys = {k.key_id: k for k in key_set.keys if k.key_id}
+        logger.info(f"JWKS refreshed: {len(self._keys)} key(s)")
+        return True
+
+    async def get_key(self, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        """Key for `kid`, refetching once (rate limited) when it is unknown."""
+        if not kid:
+            return None
+        key = self._keys.get(kid)
+        if key is None:
+            # Concurrent misses for the same kid share one fetch
+            async with self._lock:
+                key = self._keys.get(kid)
+                if key is None and time.monotonic() - self._fetched_at >= JWKS_MIN_REFETCH_GAP:
+                    logger.info(f"Unknown kid {kid}, refetching JWKS")
+                    await self._refresh_locked()
+                    key = self._keys.get(kid)
+        return key
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def start(self):
+        """Prefetch now and keep refreshing in the background."""
+        if self._task is None:
+            await self.refresh()
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# ============== VERIFIER ==============
+
+class TokenVerifier:
+    """Verifies Supabase JWTs and caches the claims until each token expires."""
+
+    def __init__(
+        self,
+        keys: Optional[JWKSKeyStore] = None,
+        secret: str = "",
+        max_entries: int = CLAIMS_CACHE_SIZE
+    ):
+        self.keys = keys
+        self.secret = secret
+        self.max_entries = max_entries
+        self._claims: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "rejected": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.keys is not None or bool(self.secret)
+
+    @staticmethod
+    def _cache_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def verify(self, token: str) -> Optional[Dict]:
+        """
+        Verified claims for `token`, or None if it isn't a valid Supabase JWT.
+
+        Raises:
+            TokenExpired: the token verified but is past its exp
+        """
+        cache_key = self._cache_key(token)
+        cached = self._claims.get(cache_key)
+        if cached is not None:
+            exp, claims = cached
+            if exp > time.time():
+                self._claims.move_to_end(cache_key)
+                self.stats["hits"] += 1
+                return dict(claims)
+            del self._claims[cache_key]
+            self.stats["expired"] += 1
+            raise TokenExpired()
+
+        self.stats["misses"] += 1
+        claims = await self._decode(token)
+        if claims is None:
+            self.stats["rejected"] += 1
+            return None
+
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            self._store(cache_key, float(exp), claims)
+        return dict(claims)
+
+    async def _decode(self, token: str) -> Optional[Dict]:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError:
+            return None
+
+        # Try JWKS first (RS256); legacy HS256 tokens skip the key lookup
+        if self.keys is not None and header.get("alg") != "HS256":
+            signing_key = await self.keys.get_key(header.get("kid"))
+            if signing_key is not None:
+                try:
+                    payload = jwt.decode(token, signing_key.key, algorithms=["RS256"], audience=AUDIENCE)
+                    logger.debug("JWT verified using JWKS (RS256)")
+                    return payload
+                except jwt.ExpiredSignatureError:
+                    raise TokenExpired()
+                except Exception as e:
+                    logger.debug(f"JWKS verification failed: {e}")
+
+        # Fallback to legacy secret method (HS256)
+        if self.secret:
+            try:
+                payload = jwt.decode(token, self.secret, algorithms=["HS256"], audience=AUDIENCE)
+                logger.debug("JWT verified using legacy secret (HS256)")
+                return payload
+            except jwt.ExpiredSignatureError:
+                raise TokenExpired()
+            except Exception as e:
+                logger.debug(f"Legacy secret verification failed: {e}")
+
+        return None
+
+    def _store(self, cache_key: str, exp: float, claims: Dict):
+        if len(self._claims) >= self.max_entries:
+            now = time.time()
+            for k in [k for k, (e, _) in self._claims.items() if e <= now]:
+                del self._claims[k]
+            while len(self._claims) >= self.max_entries:
+                self._claims.popitem(last=False)
+        self._claims[cache_key] = (exp, claims)
+
+    def clear(self):
+        self._claims.clear()
+
+    async def start(self):
+        if self.keys is not None:
+            await self.keys.start()
+
+    async def stop(self):
+        if self.keys is not None:
+            await self.keys.stop()
+
+
+_verifier: Optional[TokenVerifier] = None
+
+
+def get_token_verifier() -> TokenVerifier:
+    """
+    Process-wide verifier configured from SUPABASE_URL / SUPABASE_JWT_SECRET
+    (read on first use, after server.py has loaded .env).
+    """
+    global _verifier
+    if _verifier is None:
+        supabase_url = os.environ.get('SUPABASE_URL', '')
+        keys = JWKSKeyStore(f"{supabase_url.rstrip('/')}/auth/v1/jwks") if supabase_url else None
+        _verifier = TokenVerifier(keys=keys, secret=os.environ.get('SUPABASE_JWT_SECRET', ''))
+    return _verifier
@@ -0,0 +1,86 @@
+"""
+Build the preflop equity table artifact (data/preflop_equity.bin)
+Run once after changing the evaluator: python build_preflop_table.py
+
+Computes, for all 169 starting-hand classes:
+- equity vs 1..9 random opponents (seeded Monte Carlo via poker_equity)
+- heads-up equity vs every other class, averaged over compatible suit combos
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from poker_engine import evaluate_batch
+from poker_equity import calculate_equity
+from preflop_table import (
+    MATCHUP_SHAPE, MAX_OPPONENTS, NUM_CLASSES, TABLE_PATH, VS_RANDOM_SHAPE,
+    class_combos, class_name, write_table,
+)
+
+
+def build_vs_random(trials: int) -> np.ndarray:
+    """(win, tie, equity) per class and opponent count."""
+    table = np.zeros(VS_RANDOM_SHAPE, dtype=np.float32)
+    for index in range(NUM_CLASSES):
+        # Preflop equity vs random hands only depends on the class, so one combo is enough
+        hole = list(class_combos(index)[0])
+        for opponents in range(1, MAX_OPPONENTS + 1):
+            result = calculate_equity(
+                hole, [], opponents=opponents, trials=trials,
+                time_budget_ms=None, seed=index * 16 + opponents
+            )
+            table[index, opponents - 1] = (result["win"], result["tie"], result["equity"])
+        print(f"  {class_name(index):>4}: {table[index, 0, 2]:.3f} heads-up")
+    return table
+
+
+def _matchup(class_a: int, class_b: int, trials: int, rng: np.random.Generator) -> float:
+    pairs = np.array([
+        (a, b) for a in class_combos(class_a) for b in class_combos(class_b)
+        if not set(a) & set(b)
+    ], dtype=np.int64)
+    holes = pairs[rng.integers(len(pairs), size=trials)]
+
+    # Random 5-card boards avoiding the 4 hole cards of each row
+    keys = rng.random((trials, 52))
+    np.put_along_axis(keys, holes.reshape(trials, 4), 2.0, axis=1)
+    boards = np.argpartition(keys, 5, axis=1)[:, :5]
+
+    hero = evaluate_batch(np.hstack([holes[:, 0], boards]))
+    villain = evaluate_batch(np.hstack([holes[:, 1], boards]))
+    return float(((hero > villain) + 0.5 * (hero == villain)).mean())
+
+
+def build_matchups(trials: int) -> np.ndarray:
+    """Heads-up class-vs-class equities (row vs column)."""
+    table = np.full(MATCHUP_SHAPE, 0.5, dtype=np.float32)
+    rng = np.random.default_rng(169)
+    for a in range(NUM_CLASSES):
+        for b in range(a + 1, NUM_CLASSES):
+            equity = _matchup(a, b, trials, rng)
+            table[a, b] = equity
+            table[b, a] = 1.0 - equity
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trials", type=int, default=20000, help="Monte Carlo trials per class/opponent count")
+    parser.add_argument("--matchup-trials", type=int, default=10000, help="Monte Carlo trials per class matchup")
+    parser.add_argument("--output", default=TABLE_PATH)
+    args = parser.parse_args()
+
+    started = time.time()
+    print(f"Building equity vs random opponents ({args.trials} trials)...")
+    vs_random = build_vs_random(args.trials)
+    print(f"Building class matchups ({args.matchup_trials} trials)...")
+    matchups = build_matchups(args.matchup_trials)
+
+    write_table(args.output, vs_random, matchups)
+    print(f"\n✅ Wrote {args.output} in {time.time() - started:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Batched Enrichment
+Attach related documents (users, games) to lists of records with one `$in`
+query per collection instead of one find_one per record.
+
+PRINCIPLES:
+1. Query count is constant in the number of records: collect ids first,
+   fetch once, join in memory
+2. Missing documents resolve to None, exactly like the find_one they replace
+3. Projections are explicit; callers never get _id or private fields back
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+
+# ============== PROJECTIONS ==============
+
+USER_SUMMARY_PROJECTION = {"_id": 0, "user_id": 1, "name": 1, "picture": 1}
+GAME_SUMMARY_PROJECTION = {"_id": 0, "game_id": 1, "title": 1, "ended_at": 1, "group_id": 1}
+
+
+# ============== FETCHERS ==============
+
+async def fetch_by_ids(collection, key: str, ids: Iterable[Any], projection: Dict) -> Dict[Any, Dict]:
+    """
+    {id: document} for every id found, using a single `$in` query.
+
+    `key` must be part of the projection (it is added when missing).
+    """
+    unique_ids = list(dict.fromkeys(i for i in ids if i is not None))
+    if not unique_ids:
+        return {}
+    if projection.get(key) != 1:
+        projection = {**projection, key: 1}
+    docs = await collection.find({key: {"$in": unique_ids}}, projection).to_list(len(unique_ids))
+    return {doc[key]: doc for doc in docs}
+
+
+async def fetch_users(db, user_ids: Iterable[str], projection: Optional[Dict] = None) -> Dict[str, Dict]:
+    """User summaries keyed by user_id."""
+    return await fetch_by_ids(db.users, "user_id", user_ids, projection or USER_SUMMARY_PROJECTION)
+
+
+async def fetch_games(db, game_ids: Iterable[str], projection: Optional[Dict] = None) -> Dict[str, Dict]:
+    """Game night summaries keyed by game_id."""
+    return await fetch_by_ids(db.game_nights, "game_id", game_ids, projection or GAME_SUMMARY_PROJECTION)
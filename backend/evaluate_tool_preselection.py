@@ -0,0 +1,105 @@
+"""
+Offline evaluation of assistant tool preselection
+Replays routed requests from ai_orchestrator_logs against the local
+preselector and reports routing accuracy vs prompt tokens for each k, and
+the effective cost with prompt caching (cache reads at a tenth of the input
+price), which is what decides whether preselection beats the cached catalog:
+    python evaluate_tool_preselection.py                  # k = 3, 5, 8, 12 and full
+    python evaluate_tool_preselection.py --k 4 --k 6      # specific k values
+    python evaluate_tool_preselection.py --limit 20000    # most recent N logs
+    python evaluate_tool_preselection.py --live 200       # also route 200 requests through Claude
+
+--live calls the Anthropic API (ANTHROPIC_API_KEY) for every k: the
+decisions Claude actually makes and the cache usage it reports.
+"""
+
+import argparse
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from ai_service.claude_client import ROUTING_SYSTEM_PROMPT, ClaudeClient
+from ai_service.orchestrator import AIOrchestrator
+from ai_service.tool_preselector import evaluate_preselection, replay_routing, routing_record
+
+load_dotenv()
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'oddside')
+
+DEFAULT_KS = [3, 5, 8, 12]
+
+
+async def live_rows(orchestrator, records, ks, catalog):
+    client = ClaudeClient()
+    if not client.is_available():
+        print("\n--live needs ANTHROPIC_API_KEY and the anthropic package")
+        return []
+
+    async def route(record, tools):
+        return await client.route_with_tools(
+            user_input=record["user_input"], context=dict(record["context"]), tools=tools
+        )
+
+    rows = []
+    for k in ks:
+        def exposed_for(record, k=k):
+            hints = orchestrator._routing_hints(record["user_input"], dict(record["context"]))
+            return orchestrator._preselector.select(record["user_input"], hints, k)
+
+        rows.append({"k": k, **await replay_routing(records, exposed_for, route, catalog)})
+    return rows
+
+
+async def main(ks, limit, live):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    orchestrator = AIOrchestrator(db=None)
+    catalog = orchestrator._build_tool_schemas()
+    names = {s["name"] for s in catalog}
+
+    print(f"Loading routed requests from database: {DB_NAME}")
+    query = {"result.routing_method": "llm_tool_use"}
+    projection = {"_id": 0, "user_input": 1, "context": 1, "result": 1, "llm": 1, "timestamp": 1}
+    logs = await db.ai_orchestrator_logs.find(query, projection).sort("timestamp", -1).to_list(limit)
+    logs.reverse()  # replay in arrival order, so cache expiry follows real traffic
+    records = [r for r in (routing_record(log, names) for log in logs) if r]
+    print(f"{len(records)} labeled requests out of {len(logs)} logs, {len(catalog)} tools in the catalog")
+
+    if records:
+        rows = evaluate_preselection(
+            records,
+            orchestrator._preselector,
+            ks + [len(catalog)],
+            hints_for=orchestrator._routing_hints,
+            system_prompt=ROUTING_SYSTEM_PROMPT
+        )
+        full = rows[-1]
+        print(f"\n{'k':>5} {'accuracy':>9} {'escalated':>10} {'tools':>6} {'tokens':>7} {'effective':>10} {'vs full':>8}")
+        for row in rows:
+            k = "full" if row["k"] >= len(catalog) else row["k"]
+            versus = row["avg_effective_tokens"] / full["avg_effective_tokens"] - 1
+            print(f"{k:>5} {row['accuracy']:>9.1%} {row['escalation_rate']:>10.1%} "
+                  f"{row['avg_tools']:>6} {row['avg_prompt_tokens']:>7} {row['avg_effective_tokens']:>10} {versus:>+8.0%}")
+        print("(effective = tokens priced with the prompt cache; preselection pays off only below the full row)")
+
+        if live:
+            sample = records[:live]
+            print(f"\nRouting {len(sample)} requests through Claude for each k")
+            for row in await live_rows(orchestrator, sample, ks + [len(catalog)], catalog):
+                k = "full" if row["k"] >= len(catalog) else row["k"]
+                print(f"{k:>5} {row['accuracy']:>9.1%} {row['escalation_rate']:>10.1%} {row['avg_effective_tokens']:>10}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", action="append", type=int, dest="ks", help="tools to preselect (repeatable)")
+    parser.add_argument("--limit", type=int, default=5000, help="most recent logs to replay")
+    parser.add_argument("--live", type=int, default=0, help="requests to route through Claude per k (costs API calls)")
+    args = parser.parse_args()
+    asyncio.run(main(sorted(args.ks or DEFAULT_KS), args.limit, args.live))
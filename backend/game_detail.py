@@ -0,0 +1,222 @@
+"""
+Game Detail
+The GET /games/{game_id} view in one round trip: a single aggregation over
+game_nights that $lookups the caller's membership, the players (with user
+info and transactions), the group and the host.
+
+PRINCIPLES:
+1. One aggregation per read; per-player transactions, buy_in_count and
+   net_result are computed in the pipeline, not in Python
+2. The ETag is (state_version, viewer, cards): every game mutation bumps
+   state_version (see game_sync), the view is per viewer (is_host,
+   current_player), and the embedded group and user cards change without
+   touching the game, so their digest is part of the tag
+3. Revalidation is cheap: a matching If-None-Match needs only point reads
+   (the game's version, the caller's membership, the group and the user
+   cards) and is answered with an empty 304
+"""
+
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional
+
+
+# ============== CONSTANTS ==============
+
+MAX_PLAYERS = 100
+MAX_TRANSACTIONS = 1000
+
+USER_CARD = {"_id": 0, "user_id": 1, "name": 1, "picture": 1}
+
+
+# ============== ETAGS ==============
+
+def game_etag(game_id: str, state_version: int, user_id: str, cards: str = "") -> str:
+    viewer = hashlib.sha256(f"{game_id}:{user_id}:{cards}".encode()).hexdigest()[:16]
+    return f'W/"{viewer}.{state_version}"'
+
+
+def cards_digest(group: Optional[Dict], users: Iterable[Optional[Dict]]) -> str:
+    """
+    Digest of what the view embeds from outside the game: the group document
+    and the host/player user cards. Missing cards are skipped, so the full
+    view and the revalidation reads agree.
+    """
+    cards = {u["user_id"]: u for u in users if u and u.get("user_id")}
+    payload = json.dumps(
+        [group, [cards[uid] for uid in sorted(cards)]],
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def view_cards_digest(game: Dict) -> str:
+    """cards_digest of a finished game view."""
+    return cards_digest(game.get("group"), [game.get("host"), *(p.get("user") for p in game.get("players", []))])
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, so W/ prefixes are ignored)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+# ============== PIPELINE ==============
+
+def _per_player(expression: Dict) -> Dict:
+    """$map over players, merging `expression` (which may use $$p) into each."""
+    return {"$map": {"input": "$players", "as": "p", "in": {"$mergeObjects": ["$$p", expression]}}}
+
+
+def build_game_detail_pipeline(game_id: str, user_id: str) -> List[Dict]:
+    """
+    Aggregation over game_nights for the full game view. `_membership` holds
+    the caller's group membership (empty if not a member).
+    """
+    return [
+        {"$match": {"game_id": game_id}},
+        {"$limit": 1},
+        {"$project": {"_id": 0}},
+        {"$lookup": {
+            "from": "group_members",
+            "localField": "group_id",
+            "foreignField": "group_id",
+            "pipeline": [
+                {"$match": {"user_id": user_id}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "role": 1}}
+            ],
+            "as": "_membership"
+        }},
+        {"$lookup": {
+            "from": "players",
+            "localField": "game_id",
+            "foreignField": "game_id",
+            "pipeline": [
+                {"$limit": MAX_PLAYERS},
+                {"$project": {"_id": 0}},
+                {"$lookup": {
+                    "from": "users",
+                    "localField": "user_id",
+                    "foreignField": "user_id",
+                    "pipeline": [{"$project": USER_CARD}],
+                    "as": "user"
+                }},
+                {"$addFields": {"user": {"$arrayElemAt": ["$user", 0]}}}
+            ],
+            "as": "players"
+        }},
+        # One lookup for the game's transactions, then split per player
+        {"$lookup": {
+            "from": "transactions",
+            "localField": "game_id",
+            "foreignField": "game_id",
+            "pipeline": [{"$limit": MAX_TRANSACTIONS}, {"$project": {"_id": 0}}],
+            "as": "_transactions"
+        }},
+        {"$addFields": {"players": _per_player({
+            "transactions": {"$filter": {
+                "input": "$_transactions", "as": "t",
+                "cond": {"$eq": ["$$t.user_id", "$$p.user_id"]}
+            }}
+        })}},
+        {"$addFields": {"players": _per_player({
+            "buy_in_count": {"$size": {"$filter": {
+                "input": "$$p.transactions", "as": "t",
+                "cond": {"$eq": ["$$t.type", "buy_in"]}
+            }}},
+            "net_result": {"$subtract": [
+                {"$ifNull": ["$$p.cash_out", 0]},
+                {"$ifNull": ["$$p.total_buy_in", 0]}
+            ]}
+        })}},
+        {"$lookup": {
+            "from": "groups",
+            "localField": "group_id",
+            "foreignField": "group_id",
+            "pipeline": [{"$project": {"_id": 0}}],
+            "as": "group"
+        }},
+        {"$lookup": {
+            "from": "users",
+            "localField": "host_id",
+            "foreignField": "user_id",
+            "pipeline": [{"$project": USER_CARD}],
+            "as": "host"
+        }},
+        {"$addFields": {
+            "group": {"$arrayElemAt": ["$group", 0]},
+            "host": {"$arrayElemAt": ["$host", 0]},
+            "is_host": {"$eq": ["$host_id", user_id]},
+            "current_player": {"$arrayElemAt": [
+                {"$filter": {"input": "$players", "as": "p", "cond": {"$eq": ["$$p.user_id", user_id]}}}, 0
+            ]},
+            "state_version": {"$ifNull": ["$state_version", 0]}
+        }},
+        {"$project": {"_transactions": 0}}
+    ]
+
+
+def finish_game_detail(game: Dict) -> Dict:
+    """Missing lookups come back as absent fields; the API has always sent null."""
+    for key in ("group", "host", "current_player"):
+        game.setdefault(key, None)
+    if not game.get("host_id"):
+        game["host"] = None  # a null localField would match users without user_id
+    for player in game.get("players", []):
+        player.setdefault("user", None)
+    return game
+
+
+async def fetch_game_detail(db, game_id: str, user_id: str) -> Optional[Dict]:
+    """The game view (with `_membership`), or None if the game doesn't exist."""
+    rows = await db.game_nights.aggregate(build_game_detail_pipeline(game_id, user_id)).to_list(1)
+    return finish_game_detail(rows[0]) if rows else None
+
+
+async def fetch_game_version(db, game_id: str, user_id: str) -> Optional[Dict]:
+    """
+    What revalidation needs: {"group_id", "state_version", "is_member",
+    "cards"}, or None if the game doesn't exist. The group and user cards
+    are only read for members (nobody else can be answered with a 304).
+    """
+    game = await db.game_nights.find_one(
+        {"game_id": game_id},
+        {"_id": 0, "group_id": 1, "host_id": 1, "state_version": 1}
+    )
+    if not game:
+        return None
+    is_member = False
+    if game.get("group_id"):
+        membership = await db.group_members.find_one(
+            {"group_id": game["group_id"], "user_id": user_id},
+            {"_id": 0, "role": 1}
+        )
+        is_member = membership is not None
+    head = {"group_id": game.get("group_id"), "state_version": game.get("state_version", 0), "is_member": is_member}
+    if is_member:
+        head["cards"] = await fetch_cards_digest(db, game_id, game)
+    return head
+
+
+async def fetch_cards_digest(db, game_id: str, game: Dict) -> str:
+    """cards_digest from point reads, matching view_cards_digest of the full view."""
+    group = await db.groups.find_one({"group_id": game["group_id"]}, {"_id": 0})
+    players = await db.players.find({"game_id": game_id}, {"_id": 0, "user_id": 1}).to_list(MAX_PLAYERS)
+    user_ids = {p["user_id"] for p in players if p.get("user_id")}
+    if game.get("host_id"):
+        user_ids.add(game["host_id"])
+    users = []
+    if user_ids:
+        users = await db.users.find({"user_id": {"$in": list(user_ids)}}, USER_CARD).to_list(len(user_ids))
+    return cards_digest(group, users)
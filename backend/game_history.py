@@ -0,0 +1,173 @@
+"""
+Game History
+Paginated per-user game history for /users/game-history: one aggregation
+per page (players, then $lookup game_nights and groups for that page only).
+
+PAGINATION:
+Keyset on (game_sort_at, game_id), newest first. game_sort_at is the game's
+created_at (or started_at) copied onto each players row when it is written
+(history_fields), so the keyset $match, $sort and $limit run on the
+players (user_id, game_sort_at, game_id) index before any $lookup: a page
+reads limit + 1 index entries and joins only those rows, however long the
+user's history and however deep the page. The cursor is an opaque base64
+token of the last row's sort key, so pages stay stable while new games are
+added. backfill_game_sort_at() covers rows written before the field existed.
+"""
+
+import base64
+import binascii
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from enrichment import fetch_games
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+SORT_FIELD = "game_sort_at"
+
+
+class InvalidCursor(ValueError):
+    """The pagination cursor could not be decoded."""
+
+
+# ============== CURSORS ==============
+
+def encode_cursor(sort_at: str, game_id: str) -> str:
+    raw = json.dumps([sort_at, game_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_at, game_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(sort_at, str) or not isinstance(game_id, str):
+        raise InvalidCursor("malformed cursor")
+    return sort_at, game_id
+
+
+# ============== SORT KEY ==============
+
+def game_sort_at(game: Optional[Dict]) -> str:
+    """A game's history sort key: created_at, else started_at, as a string ("" if neither)."""
+    game = game or {}
+    value = game.get("created_at") or game.get("started_at")
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value) if value else ""
+
+
+def history_fields(game: Optional[Dict]) -> Dict:
+    """Fields to set on a new players row for `game`."""
+    return {SORT_FIELD: game_sort_at(game)}
+
+
+async def backfill_game_sort_at(db, batch_size: int = 500) -> int:
+    """Set game_sort_at on players rows that predate it. Returns how many games were backfilled."""
+    from pymongo import UpdateMany
+
+    backfilled = 0
+    try:
+        while True:
+            rows = await db.players.find(
+                {SORT_FIELD: {"$exists": False}},
+                {"_id": 0, "game_id": 1}
+            ).to_list(batch_size)
+            if not rows:
+                break
+            game_ids = list(dict.fromkeys(r["game_id"] for r in rows))
+            games = await fetch_games(db, game_ids, {"_id": 0, "game_id": 1, "created_at": 1, "started_at": 1})
+            await db.players.bulk_write([
+                UpdateMany(
+                    {"game_id": game_id, SORT_FIELD: {"$exists": False}},
+                    {"$set": history_fields(games.get(game_id))}
+                )
+                for game_id in game_ids
+            ], ordered=False)
+            backfilled += len(game_ids)
+    except Exception as e:
+        logger.exception(f"game_sort_at backfill stopped after {backfilled} games: {e}")
+    if backfilled:
+        logger.info(f"game_sort_at backfilled for players of {backfilled} games")
+    return backfilled
+
+
+# ============== PIPELINE ==============
+
+def build_history_pipeline(user_id: str, limit: int, cursor: Optional[str] = None) -> List[Dict]:
+    """
+    Aggregation over players for one page of history (limit + 1 rows, the
+    extra row only signals that another page exists). Everything before the
+    first $lookup is served by the (user_id, game_sort_at, game_id) index.
+    """
+    match: Dict = {"user_id": user_id}
+    if cursor:
+        sort_at, game_id = decode_cursor(cursor)
+        match["$or"] = [
+            {SORT_FIELD: {"$lt": sort_at}},
+            {SORT_FIELD: sort_at, "game_id": {"$lt": game_id}}
+        ]
+    return [
+        {"$match": match},
+        {"$sort": {SORT_FIELD: -1, "game_id": -1}},
+        {"$limit": limit + 1},
+        {"$lookup": {
+            "from": "game_nights",
+            "localField": "game_id",
+            "foreignField": "game_id",
+            "pipeline": [{"$limit": 1}],
+            "as": "game"
+        }},
+        # Keep rows whose game is gone, so the look-ahead row still counts
+        {"$unwind": {"path": "$game", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {
+            "from": "groups",
+            "localField": "game.group_id",
+            "foreignField": "group_id",
+            "as": "group"
+        }},
+        {"$project": {
+            "_id": 0,
+            "game_id": 1,
+            "title": {"$ifNull": ["$game.title", "Game Night"]},
+            "status": "$game.status",
+            "created_at": {"$ifNull": ["$game.created_at", "$game.started_at"]},
+            "sort_at": {"$ifNull": [f"${SORT_FIELD}", ""]},
+            "missing_game": {"$eq": [{"$type": "$game"}, "missing"]},
+            "group": {"name": {"$ifNull": [{"$arrayElemAt": ["$group.name", 0]}, "Unknown"]}},
+            "net_result": {"$cond": [{"$eq": ["$cashed_out", True]}, {"$ifNull": ["$net_result", 0]}, None]},
+            "total_buy_in": {"$ifNull": ["$total_buy_in", 0]},
+            "cashed_out": {"$ifNull": ["$cashed_out", False]}
+        }}
+    ]
+
+
+def paginate(rows: List[Dict], limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """Trim the look-ahead row, build the next cursor, and drop rows whose game no longer exists."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["sort_at"], rows[-1]["game_id"]) if has_more and rows else None
+    games = []
+    for row in rows:
+        row.pop("sort_at", None)
+        if not row.pop("missing_game", False):
+            games.append(row)
+    return games, next_cursor
+
+
+async def fetch_game_history(db, user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    """One page of history: {"games": [...], "next_cursor": str | None}."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = await db.players.aggregate(build_history_pipeline(user_id, limit, cursor)).to_list(limit + 1)
+    games, next_cursor = paginate(rows, limit)
+    return {"games": games, "next_cursor": next_cursor}
@@ -0,0 +1,189 @@
+"""
+Game State Sync
+Versioned game state for live clients: every mutation of a game bumps its
+state_version and records a compact delta (changed player totals, new
+transactions, game totals) that is pushed over the socket, so clients load
+GET /games/{game_id} once and then stay current from deltas.
+
+PRINCIPLES:
+1. Monotonic: state_version is bumped with an atomic $inc on the game
+   document; deltas are stored under the version they produced
+2. Idempotent: deltas carry absolute player/game totals (not increments) and
+   transactions keyed by transaction_id, so replaying one is harmless
+3. Catch-up: sync_since() returns the retained deltas after a client's
+   version; a client that fell further behind than DELTA_RETENTION is told
+   to reload the full game instead
+4. Every writer of a game goes through here: server endpoints and
+   ai_service tools alike call publish_delta after their update, so no
+   change reaches the database without a version bump
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+DELTA_RETENTION = 500  # deltas kept per game
+PRUNE_EVERY = 50  # prune old deltas every N versions
+
+PLAYER_STATE_FIELDS = (
+    "user_id", "rsvp_status", "total_buy_in", "total_chips", "buy_in_count",
+    "cash_out", "chips_returned", "cashed_out", "cashed_out_at", "net_result"
+)
+
+GAME_STATE_FIELDS = (
+    "status", "total_chips_distributed", "total_chips_returned",
+    "started_at", "ended_at", "is_locked"
+)
+
+
+def _iso(value):
+    # Some writers store datetimes rather than ISO strings; deltas go over JSON
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def player_state(player: Dict) -> Dict:
+    """Compact per-player totals sent in a delta."""
+    state = {k: _iso(player[k]) for k in PLAYER_STATE_FIELDS if k in player}
+    state["net_result"] = (player.get("cash_out") or 0) - (player.get("total_buy_in") or 0)
+    return state
+
+
+# ============== DELTAS ==============
+
+async def record_delta(
+    db,
+    game_id: str,
+    user_ids: Iterable[str] = (),
+    removed: Iterable[str] = (),
+    transactions: Iterable[Dict] = (),
+    game_fields: Iterable[str] = ()
+) -> Optional[Dict]:
+    """
+    Bump the game's state_version and store the resulting delta.
+
+    user_ids: players whose totals changed (current values are read back)
+    removed: players no longer in the game
+    transactions: transaction documents created by the mutation
+    game_fields: game fields changed beyond GAME_STATE_FIELDS (e.g. an edit)
+
+    Returns the delta, or None if the game doesn't exist.
+    """
+    fields = (*GAME_STATE_FIELDS, *game_fields)
+    projection = {"_id": 0, "state_version": 1, **{f: 1 for f in fields}}
+    game = await db.game_nights.find_one_and_update(
+        {"game_id": game_id},
+        {"$inc": {"state_version": 1}},
+        projection=projection,
+        return_document=ReturnDocument.AFTER
+    )
+    if not game:
+        return None
+    version = game.pop("state_version")
+    game = {k: _iso(v) for k, v in game.items()}
+
+    user_ids = list(dict.fromkeys(user_ids))
+    players = []
+    if user_ids:
+        players = await db.players.find(
+            {"game_id": game_id, "user_id": {"$in": user_ids}},
+            {"_id": 0}
+        ).to_list(len(user_ids))
+
+    # Name/picture let clients render players they haven't seen yet
+    users = {}
+    if players:
+        users = {u["user_id"]: u for u in await db.users.find(
+            {"user_id": {"$in": [p["user_id"] for p in players]}},
+            {"_id": 0, "user_id": 1, "name": 1, "picture": 1}
+        ).to_list(len(players))}
+
+    delta = {
+        "version": version,
+        "game": game,
+        "players": [{**player_state(p), "user": users.get(p["user_id"])} for p in players],
+        "removed": list(removed),
+        # insert_one adds _id to the caller's dict
+        "transactions": [
+            {k: _iso(v) for k, v in t.items() if k != "_id"} for t in transactions
+        ],
+    }
+
+    await db.game_state_deltas.insert_one({
+        "game_id": game_id,
+        "version": version,
+        "delta": dict(delta),
+        "created_at": datetime.now(timezone.utc).isoformat()
+    })
+    if version % PRUNE_EVERY == 0:
+        await db.game_state_deltas.delete_many(
+            {"game_id": game_id, "version": {"$lte": version - DELTA_RETENTION}}
+        )
+    return delta
+
+
+async def publish_delta(
+    db,
+    game_id: str,
+    user_ids: Iterable[str] = (),
+    removed: Iterable[str] = (),
+    transactions: Iterable[Dict] = (),
+    game_fields: Iterable[str] = ()
+) -> Optional[Dict]:
+    """
+    record_delta, then push the delta to the game's live room as a
+    state_delta event. Never raises: the write it follows has already
+    happened, and clients that miss the push catch up with sync_since.
+    """
+    try:
+        delta = await record_delta(db, game_id, user_ids, removed, transactions, game_fields)
+        if delta:
+            from websocket_manager import emit_game_event
+            await emit_game_event(game_id, "state_delta", delta)
+        return delta
+    except Exception as e:
+        logger.error(f"State delta for game {game_id} failed: {e}")
+        return None
+
+
+async def sync_since(db, game_id: str, since_version: int) -> Dict:
+    """
+    Deltas after since_version, for a client catching up.
+
+    Returns {"version", "deltas"} with the contiguous run of deltas after
+    since_version (deltas still being written are delivered by the socket),
+    or {"version", "resync": True} when the client must reload the game.
+    """
+    game = await db.game_nights.find_one({"game_id": game_id}, {"_id": 0, "state_version": 1})
+    if not game:
+        return {"version": 0, "resync": True}
+    current = game.get("state_version", 0)
+
+    if since_version > current or since_version < current - DELTA_RETENTION:
+        return {"version": current, "resync": True}
+    if since_version == current:
+        return {"version": current, "deltas": []}
+
+    docs = await db.game_state_deltas.find(
+        {"game_id": game_id, "version": {"$gt": since_version}},
+        {"_id": 0, "version": 1, "delta": 1}
+    ).sort("version", 1).to_list(current - since_version)
+
+    deltas: List[Dict] = []
+    expected = since_version + 1
+    for doc in docs:
+        if doc["version"] != expected:
+            break
+        deltas.append(doc["delta"])
+        expected += 1
+
+    if not deltas and not docs:
+        # Nothing retained (e.g. versions bumped before deltas were recorded)
+        return {"version": current, "resync": True}
+    return {"version": current, "deltas": deltas}
@@ -0,0 +1,183 @@
+"""
+Game Writes
+Atomic buy-in and cash-out writes: a player's totals change in a single
+find_one_and_update that returns the post-update document, then the
+transaction record and the game's chip counter are written together.
+
+PRINCIPLES:
+1. No read-modify-write: totals are never computed in Python and $set, so a
+   host and a player buying in at the same moment both count ($inc, and a
+   pipeline update for the cash-out's net_result)
+2. Guards live in the update filter (e.g. not yet cashed out), so a double
+   submit can't cash a player out twice; the reason is looked up only when
+   the write is rejected
+3. Two round trips on the hot path: the player update, then the transaction
+   insert and the game counter concurrently
+4. One row per (game_id, user_id), enforced by the unique player_game_lookup
+   index: concurrent auto-join upserts can't seat a player twice (the server
+   retries the losing upsert as an update). merge_duplicate_players folds
+   rows left over from before the index so it can be built
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+
+from user_stats import rebuild_user_stats
+
+logger = logging.getLogger(__name__)
+
+
+class PlayerWriteRejected(Exception):
+    """The player can't take this write; str(e) is the client-facing reason."""
+
+
+# Filter for players that haven't cashed out (legacy rows may only set one of the two)
+NOT_CASHED_OUT = {"cash_out": None, "cashed_out": {"$ne": True}}
+
+
+async def _rejection(db, game_id: str, user_id: str, missing: str, closed: str) -> PlayerWriteRejected:
+    player = await db.players.find_one({"game_id": game_id, "user_id": user_id}, {"_id": 0, "user_id": 1})
+    return PlayerWriteRejected(closed if player else missing)
+
+
+async def apply_buy_in(
+    db,
+    txn: Dict,
+    new_player: Optional[Dict] = None,
+    open_only: bool = False,
+    missing: str = "Player not in this game",
+    closed: str = "Player has already cashed out"
+) -> Dict:
+    """
+    Add a buy-in transaction to the player's totals.
+
+    new_player: defaults for auto-joining a player who isn't in the game yet
+        (upsert); without it the player must already exist
+    open_only: reject players who have cashed out
+
+    Returns the player document after the update.
+
+    Raises:
+        PlayerWriteRejected: player missing, or cashed out with open_only
+    """
+    game_id, user_id = txn["game_id"], txn["user_id"]
+    query = {"game_id": game_id, "user_id": user_id}
+    if open_only:
+        query.update(NOT_CASHED_OUT)
+
+    increments = {"total_buy_in": txn["amount"], "total_chips": txn["chips"], "buy_in_count": 1}
+    update = {"$inc": increments}
+    if new_player is not None:
+        update["$setOnInsert"] = {k: v for k, v in new_player.items() if k not in increments}
+
+    player = await db.players.find_one_and_update(
+        query, update,
+        projection={"_id": 0},
+        upsert=new_player is not None,
+        return_document=ReturnDocument.AFTER
+    )
+    if player is None:
+        raise await _rejection(db, game_id, user_id, missing, closed)
+
+    await asyncio.gather(
+        db.transactions.insert_one(txn),
+        db.game_nights.update_one({"game_id": game_id}, {"$inc": {"total_chips_distributed": txn["chips"]}})
+    )
+    return player
+
+
+async def apply_cash_out(
+    db,
+    txn: Dict,
+    cashed_out_at: str,
+    missing: str = "Player not in this game",
+    closed: str = "Player already cashed out"
+) -> Dict:
+    """
+    Cash a player out for txn["chips"] chips worth txn["amount"].
+
+    Returns the player document after the update (with net_result).
+
+    Raises:
+        PlayerWriteRejected: player missing or already cashed out
+    """
+    game_id, user_id = txn["game_id"], txn["user_id"]
+    player = await db.players.find_one_and_update(
+        {"game_id": game_id, "user_id": user_id, **NOT_CASHED_OUT},
+        [{"$set": {
+            "cashed_out": True,
+            "chips_returned": txn["chips"],
+            "cash_out": txn["amount"],
+            "net_result": {"$subtract": [txn["amount"], {"$ifNull": ["$total_buy_in", 0]}]},
+            "cashed_out_at": cashed_out_at
+        }}],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if player is None:
+        raise await _rejection(db, game_id, user_id, missing, closed)
+
+    await asyncio.gather(
+        db.transactions.insert_one(txn),
+        db.game_nights.update_one({"game_id": game_id}, {"$inc": {"total_chips_returned": txn["chips"]}})
+    )
+    return player
+
+
+# Totals added together when duplicate rows of one player are merged
+SUMMED_FIELDS = ("total_buy_in", "total_chips", "buy_in_count")
+PLAYER_KEY = [("game_id", 1), ("user_id", 1)]
+
+
+async def _merge_rows(db, ids) -> int:
+    rows = await db.players.find({"_id": {"$in": ids}}).sort("_id", 1).to_list(None)
+    if len(rows) < 2:
+        return 0
+    keep, extras = rows[0], rows[1:]
+    merged = {f: sum(r.get(f) or 0 for r in rows) for f in SUMMED_FIELDS if any(f in r for r in rows)}
+    for row in extras:
+        for field, value in row.items():
+            if field not in merged and field != "_id" and value is not None and keep.get(field) is None:
+                merged[field] = value
+    cash_out = merged.get("cash_out", keep.get("cash_out"))
+    if cash_out is not None:
+        merged["net_result"] = cash_out - (merged.get("total_buy_in", keep.get("total_buy_in")) or 0)
+
+    if merged:
+        await db.players.update_one({"_id": keep["_id"]}, {"$set": merged})
+    result = await db.players.delete_many({"_id": {"$in": [r["_id"] for r in extras]}})
+    # The removed rows' contributions are still in user_stats
+    await rebuild_user_stats(db, keep["user_id"])
+    logger.warning(f"Merged {len(extras)} duplicate players rows for {keep['user_id']} in {keep['game_id']}")
+    return result.deleted_count
+
+
+async def merge_duplicate_players(db) -> int:
+    """
+    Merge players rows sharing (game_id, user_id) into the oldest one: totals
+    are summed, other fields keep the oldest row's value unless it has none.
+    Run before ensure_indexes so the unique player_game_lookup index can be
+    built; a no-op once it exists. Returns the number of rows removed.
+    Never raises (the index build then fails and is logged).
+    """
+    removed = 0
+    try:
+        indexes = await db.players.index_information()
+        if any(info.get("unique") and [(f, int(d)) for f, d in info["key"]] == PLAYER_KEY for info in indexes.values()):
+            return 0
+
+        groups = await db.players.aggregate([
+            {"$group": {"_id": {"game_id": "$game_id", "user_id": "$user_id"}, "ids": {"$push": "$_id"}}},
+            {"$match": {"ids.1": {"$exists": True}}}
+        ]).to_list(None)
+
+        for group in groups:
+            removed += await _merge_rows(db, group["ids"])
+    except Exception as e:
+        logger.error(f"Merging duplicate players rows failed: {e}")
+    if removed:
+        logger.info(f"Merged duplicate players rows: {removed} removed")
+    return removed
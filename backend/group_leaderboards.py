@@ -0,0 +1,179 @@
+"""
+Group Leaderboards
+Materialized per-group leaderboards (group_leaderboards collection), one
+document per (group_id, window), recomputed when a game settles.
+
+WINDOWS:
+- 30d / 90d: games that ended within the window
+- all_time: every ended or settled game
+
+PRINCIPLES:
+1. Reads are a single indexed find_one; the aggregation runs on settle,
+   not on every page view
+2. Totals are summed in INTEGER CENTS and stored as rounded dollars
+3. Entries carry display fields (name, picture) so readers need no user
+   lookups. A document older than LEADERBOARD_MAX_AGE is recomputed on read,
+   which ages games out of the rolling windows and picks up profile changes
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pymongo import ReplaceOne
+
+from enrichment import fetch_users
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+WINDOWS = {
+    "30d": timedelta(days=30),
+    "90d": timedelta(days=90),
+    "all_time": None,
+}
+DEFAULT_WINDOW = "all_time"
+
+# report_generator time periods that map onto a materialized window
+WINDOW_FOR_PERIOD = {"month": "30d", "quarter": "90d", "all_time": "all_time"}
+
+LEADERBOARD_MAX_AGE = timedelta(hours=1)
+LEADERBOARD_SIZE = 100
+MAX_GROUP_GAMES = 5000
+
+
+# ============== COMPUTATION ==============
+
+def _game_time(game: Dict) -> str:
+    """When the game was played, as a comparable ISO string (legacy rows may hold datetimes)."""
+    at = game.get("ended_at") or game.get("started_at") or game.get("created_at") or ""
+    return at.isoformat() if isinstance(at, datetime) else str(at)
+
+
+def build_leaderboards(
+    games: List[Dict],
+    players: List[Dict],
+    now: datetime,
+    windows: Optional[Dict[str, Optional[timedelta]]] = None
+) -> Dict[str, Dict]:
+    """
+    Fold players rows into one leaderboard per window (WINDOWS by default).
+
+    games:   [{game_id, ended_at/started_at/created_at}] for the group
+    players: [{game_id, user_id, net_result, total_buy_in}] with a result
+    Returns {window: {"total_games", "since", "entries": [...]}} without user display fields.
+    """
+    played_at = {g["game_id"]: _game_time(g) for g in games}
+    boards = {}
+    for window, span in (windows or WINDOWS).items():
+        since = (now - span).isoformat() if span else None
+        in_window = {gid for gid, at in played_at.items() if since is None or at >= since}
+
+        totals: Dict[str, Dict] = {}
+        for p in players:
+            if p["game_id"] not in in_window:
+                continue
+            net = round(p["net_result"] * 100)
+            row = totals.setdefault(p["user_id"], {"total_games": 0, "wins": 0, "profit_cents": 0, "buy_in_cents": 0})
+            row["total_games"] += 1
+            row["wins"] += 1 if net > 0 else 0
+            row["profit_cents"] += net
+            row["buy_in_cents"] += round((p.get("total_buy_in") or 0) * 100)
+
+        ranked = sorted(totals.items(), key=lambda item: (-item[1]["profit_cents"], item[0]))[:LEADERBOARD_SIZE]
+        boards[window] = {
+            "since": since,
+            "total_games": len(in_window),
+            "entries": [
+                {
+                    "rank": i + 1,
+                    "user_id": user_id,
+                    "total_games": row["total_games"],
+                    "wins": row["wins"],
+                    "win_rate": round(row["wins"] / row["total_games"] * 100, 1),
+                    "total_profit": round(row["profit_cents"] / 100, 2),
+                    "total_buy_in": round(row["buy_in_cents"] / 100, 2)
+                }
+                for i, (user_id, row) in enumerate(ranked)
+            ]
+        }
+    return boards
+
+
+# ============== MATERIALIZATION ==============
+
+async def _compute(db, group_id: str, now: datetime, windows: Optional[Dict] = None) -> Dict[str, Dict]:
+    """Load the group's results (two queries), fold them and attach user display fields."""
+    games = await db.game_nights.find(
+        {"group_id": group_id, "status": {"$in": ["ended", "settled"]}},
+        {"_id": 0, "game_id": 1, "ended_at": 1, "started_at": 1, "created_at": 1}
+    ).to_list(MAX_GROUP_GAMES)
+
+    players = []
+    if games:
+        players = await db.players.find(
+            {"game_id": {"$in": [g["game_id"] for g in games]}, "net_result": {"$ne": None}},
+            {"_id": 0, "game_id": 1, "user_id": 1, "net_result": 1, "total_buy_in": 1}
+        ).to_list(None)
+
+    boards = build_leaderboards(games, players, now, windows)
+    users = await fetch_users(db, {e["user_id"] for b in boards.values() for e in b["entries"]})
+    for board in boards.values():
+        for entry in board["entries"]:
+            entry["user"] = users.get(entry["user_id"])
+    return boards
+
+
+async def compute_group_leaderboard(db, group_id: str, span: Optional[timedelta]) -> Dict:
+    """Unstored leaderboard for an ad-hoc window (e.g. a report's "week")."""
+    boards = await _compute(db, group_id, datetime.now(timezone.utc), {"custom": span})
+    return {"group_id": group_id, "window": "custom", **boards["custom"]}
+
+
+async def refresh_group_leaderboards(db, group_id: str) -> Dict[str, Dict]:
+    """Recompute and store every window's leaderboard for a group."""
+    now = datetime.now(timezone.utc)
+    boards = await _compute(db, group_id, now)
+
+    docs = {}
+    for window, board in boards.items():
+        docs[window] = {
+            "group_id": group_id,
+            "window": window,
+            **board,
+            "computed_at": now.isoformat()
+        }
+
+    await db.group_leaderboards.bulk_write([
+        ReplaceOne({"group_id": group_id, "window": window}, doc, upsert=True)
+        for window, doc in docs.items()
+    ], ordered=False)
+    for doc in docs.values():
+        doc.pop("_id", None)
+    return docs
+
+
+async def refresh_group_leaderboards_safe(db, group_id: str) -> None:
+    """refresh_group_leaderboards for the settle path. Never raises."""
+    try:
+        await refresh_group_leaderboards(db, group_id)
+    except Exception as e:
+        logger.error(f"Leaderboard refresh failed for group {group_id}: {e}")
+
+
+async def get_group_leaderboard(db, group_id: str, window: str = DEFAULT_WINDOW) -> Optional[Dict]:
+    """
+    Stored leaderboard for a window, recomputed when missing or older than
+    LEADERBOARD_MAX_AGE. Returns None for an unknown window.
+    """
+    if window not in WINDOWS:
+        return None
+    doc = await db.group_leaderboards.find_one({"group_id": group_id, "window": window}, {"_id": 0})
+    if doc:
+        computed_at = datetime.fromisoformat(doc["computed_at"])
+        if datetime.now(timezone.utc) - computed_at < LEADERBOARD_MAX_AGE:
+            return doc
+    docs = await refresh_group_leaderboards(db, group_id)
+    return docs[window]
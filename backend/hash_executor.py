@@ -0,0 +1,135 @@
+"""
+Bounded Hash Executor
+Runs CPU-heavy password-hash work (bcrypt PIN hashing/verification) on a
+dedicated thread pool, off the event loop.
+
+PRINCIPLES:
+1. The event loop never runs bcrypt: a cost-12 hash is ~250 ms of CPU that
+   would otherwise freeze every request and websocket on the worker
+   (bcrypt releases the GIL, so threads give real parallelism)
+2. Bounded: at most max_workers jobs run and max_queue wait. Beyond that
+   run() fails fast with HashExecutorSaturated so callers can answer 429
+   instead of letting latency grow without limit
+3. Observable: wait time (queued) and compute time (hashing) are tracked
+   separately; a rising wait with flat compute means the pool is undersized
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+# Overridable with PIN_HASH_WORKERS / PIN_HASH_MAX_QUEUE, read when the
+# process-wide executor is created (after load_dotenv), not at import
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_MAX_QUEUE = 32
+METRIC_SAMPLES = 512
+
+
+class HashExecutorSaturated(Exception):
+    """All workers are busy and the wait queue is full."""
+
+
+# ============== EXECUTOR ==============
+
+class BoundedHashExecutor:
+    """Thread pool with a hard cap on queued work and wait/compute metrics."""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_MAX_QUEUE, name: str = "pin-hash"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._pending = 0  # running + queued; only touched on the event loop
+        self._wait_ms = deque(maxlen=METRIC_SAMPLES)
+        self._compute_ms = deque(maxlen=METRIC_SAMPLES)
+        self._counters = {"completed": 0, "failed": 0, "rejected": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a worker."""
+        return max(0, self._pending - self.max_workers)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run fn(*args) on the pool.
+
+        Raises:
+            HashExecutorSaturated: if max_queue jobs are already waiting
+        """
+        if self._pending >= self.max_workers + self.max_queue:
+            self._counters["rejected"] += 1
+            logger.warning(f"{self.name} executor saturated ({self._pending} pending), rejecting")
+            raise HashExecutorSaturated(f"{self.name} executor saturated")
+
+        enqueued = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started, time.perf_counter()
+
+        self._pending += 1
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._pool, timed)
+        except Exception:
+            self._counters["failed"] += 1
+            raise
+        finally:
+            self._pending -= 1
+
+        self._wait_ms.append((started - enqueued) * 1000)
+        self._compute_ms.append((finished - started) * 1000)
+        self._counters["completed"] += 1
+        return result
+
+    def metrics(self) -> Dict:
+        """Counters plus wait/compute percentiles over the last METRIC_SAMPLES jobs."""
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._pending, self.max_workers),
+            "queue_depth": self.queue_depth,
+            **self._counters,
+            "wait_ms": _summary(self._wait_ms),
+            "compute_ms": _summary(self._compute_ms)
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+def _summary(samples: deque) -> Dict:
+    if not samples:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        "avg": round(sum(ordered) / n, 2),
+        "p50": round(ordered[n // 2], 2),
+        "p95": round(ordered[min(n - 1, int(n * 0.95))], 2),
+        "max": round(ordered[-1], 2)
+    }
+
+
+_pin_executor: Optional[BoundedHashExecutor] = None
+
+
+def get_pin_hash_executor() -> BoundedHashExecutor:
+    """Process-wide executor for PIN hashing (created on first use)."""
+    global _pin_executor
+    if _pin_executor is None:
+        _pin_executor = BoundedHashExecutor(
+            max_workers=int(os.environ.get("PIN_HASH_WORKERS", DEFAULT_WORKERS)),
+            max_queue=int(os.environ.get("PIN_HASH_MAX_QUEUE", DEFAULT_MAX_QUEUE))
+        )
+    return _pin_executor
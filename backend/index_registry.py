@@ -0,0 +1,330 @@
+"""
+Index Registry
+Every MongoDB index the backend and ai_service rely on, declared in one
+place and reconciled against the live database at startup (and by
+`python create_indexes.py`).
+
+PRINCIPLES:
+1. Declarative: an index exists because it is listed here, next to the query
+   that needs it; nothing else calls create_index
+2. Idempotent reconciliation: indexes are matched by key pattern, so existing
+   ones (whatever they were named) are left alone and only missing ones are
+   built; a conflicting definition is logged, never dropped or fatal. The
+   one change made in place: an index the registry now declares unique is
+   converted with collMod (MongoDB 6.0+), which fails harmlessly while
+   duplicates remain
+3. Verified: HOT_QUERIES are the request-path queries, and the test suite runs
+   each through explain() against a local mongod and fails on a COLLSCAN
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+ASC, DESC = 1, -1
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    name: Optional[str] = None  # None: MongoDB's default ("field_1_other_-1")
+    unique: bool = False
+    sparse: bool = False
+    expire_after_seconds: Optional[int] = None
+
+    def options(self) -> Dict:
+        """The create_index options that make two indexes with the same keys differ."""
+        options = {}
+        if self.unique:
+            options["unique"] = True
+        if self.sparse:
+            options["sparse"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        return options
+
+    def default_name(self) -> str:
+        return self.name or "_".join(f"{f}_{d}" for f, d in self.keys)
+
+
+def _ix(collection: str, *keys, **options) -> IndexSpec:
+    """_ix("players", "game_id", ("cashed_out_at", DESC), unique=True)"""
+    return IndexSpec(
+        collection,
+        tuple(k if isinstance(k, tuple) else (k, ASC) for k in keys),
+        **options
+    )
+
+
+# ============== REGISTRY ==============
+
+INDEXES: List[IndexSpec] = [
+    # ---- users / auth ----
+    _ix("users", "user_id"),
+    _ix("users", "supabase_id", unique=True, name="user_supabase_id"),
+    _ix("users", "email"),
+    # Prefix search ranges (multikey; see user_search)
+    _ix("users", "search_tokens"),
+    _ix("user_sessions", "session_token"),
+    _ix("user_stats", "user_id", unique=True),
+    _ix("spotify_tokens", "user_id"),
+    _ix("rate_limits", "expires_at", expire_after_seconds=0, name="rate_limit_ttl"),
+    _ix("rate_limits", "key", "endpoint", name="rate_limit_lookup"),
+
+    # ---- groups ----
+    _ix("groups", "group_id"),
+    # {group_id, user_id} and {group_id} use the prefix
+    _ix("group_members", "group_id", "user_id", "status", name="group_member_lookup"),
+    _ix("group_members", "user_id"),
+    _ix("group_invites", "invite_id"),
+    _ix("group_invites", "group_id", ("created_at", DESC)),
+    _ix("group_invites", "invited_user_id", "status"),
+    _ix("group_invites", "invited_email", "status"),
+    _ix("group_messages", "group_id", ("created_at", DESC)),
+    _ix("group_messages", "message_id", unique=True),
+    _ix("group_leaderboards", "group_id", "window", unique=True),
+    _ix("group_ai_settings", "group_id"),
+    _ix("payment_settings", "group_id"),
+    _ix("polls", "group_id", "status"),
+    _ix("polls", "poll_id", unique=True),
+    _ix("host_updates", "group_id", ("created_at", DESC)),
+
+    # ---- games ----
+    _ix("game_nights", "game_id"),
+    _ix("game_nights", "group_id", name="game_group_lookup"),
+    _ix("game_nights", "status", ("created_at", DESC), name="game_status_created"),
+    # AI tools look games up by the embedded roster (multikey)
+    _ix("game_nights", "players.user_id", "status"),
+    # {game_id, user_id} and {game_id} use the prefix. Unique: concurrent
+    # auto-join upserts must not seat a player twice (see game_writes)
+    _ix("players", "game_id", "user_id", unique=True, name="player_game_lookup"),
+    # {user_id} uses the prefix; the sort serves user_stats rebuilds
+    _ix("players", "user_id", ("cashed_out_at", DESC)),
+    # Game history keyset pages (see game_history)
+    _ix("players", "user_id", ("game_sort_at", DESC), ("game_id", DESC), name="player_history"),
+    _ix("transactions", "game_id", "user_id"),
+    _ix("game_threads", "game_id", "created_at"),
+    _ix("game_state_deltas", "game_id", "version", unique=True),
+    _ix("host_decisions", "decision_id"),
+    _ix("host_decisions", "host_id", "status", ("created_at", DESC)),
+    _ix("host_persona_settings", "user_id"),
+
+    # ---- settlement / ledger ----
+    _ix("ledger", "ledger_id"),
+    _ix("ledger", "from_user_id", "status"),
+    _ix("ledger", "to_user_id", "status"),
+    _ix("ledger", "game_id"),
+    _ix("ledger", "netting_run_id", "status"),
+    _ix("ledger_entries", "game_id"),
+    _ix("ledger_entries", "from_user_id", "status"),
+    _ix("ledger_entries", "group_id", "status"),
+    _ix("settlement_runs", "game_id"),
+    _ix("settlement_disputes", "game_id", "status"),
+    _ix("settlement_disputes", "dispute_id"),
+    _ix("pay_net_plans", "plan_id"),
+    _ix("pay_net_plans", "stripe_session_id"),
+    _ix("payment_transactions", "session_id"),
+    _ix("debt_payments", "session_id"),
+    _ix("payment_reminders_log", "group_id", ("sent_at", DESC)),
+
+    # ---- wallets (uniqueness is part of payment safety) ----
+    _ix("wallets", "wallet_id", unique=True, name="wallet_id_unique"),
+    _ix("wallets", "user_id", unique=True, name="wallet_user_unique"),
+    _ix("wallet_transactions", "stripe_payment_intent_id",
+        unique=True, sparse=True, name="wallet_txn_stripe_unique"),
+    _ix("wallet_transactions", "wallet_id", "idempotency_key",
+        unique=True, sparse=True, name="wallet_txn_idempotency_unique"),
+    _ix("wallet_transactions", "wallet_id", ("created_at", DESC), name="wallet_txn_history"),
+    _ix("wallet_audit", "wallet_id", ("created_at", DESC), name="wallet_audit_lookup"),
+    _ix("wallet_deposits", "stripe_session_id"),
+    _ix("wallet_withdrawals", "user_id"),
+
+    # ---- notifications / engagement ----
+    _ix("notifications", "user_id", ("created_at", DESC)),
+    _ix("notifications", "notification_id"),
+    _ix("subscribers", "email"),
+    _ix("engagement_nudges_log", "target_id", "nudge_type", ("sent_at", DESC)),
+    _ix("engagement_nudges_log", "group_id", ("sent_at", DESC)),
+    _ix("engagement_settings", "group_id", unique=True),
+    _ix("engagement_preferences", "user_id"),
+    _ix("engagement_events", "group_id", "event_type", ("created_at", DESC)),
+    _ix("engagement_events", "plan_id", "event_type"),
+    _ix("engagement_jobs", "status", "run_at"),
+
+    # ---- feedback ----
+    _ix("feedback", "user_id", ("created_at", DESC)),
+    _ix("feedback", "group_id", "status"),
+    _ix("feedback", "feedback_id", unique=True),
+    _ix("feedback", "content_hash", "group_id", ("created_at", DESC)),
+    _ix("feedback", "status", "sla_due_at"),
+    _ix("feedback_surveys", "game_id", "user_id"),
+    _ix("feedback_surveys", "survey_id", unique=True),
+    _ix("auto_fix_log", "feedback_id", ("created_at", DESC)),
+    _ix("auto_fix_log", "fix_type", "feedback_id"),
+
+    # ---- automations ----
+    _ix("user_automations", "user_id", "enabled"),
+    _ix("user_automations", "automation_id", unique=True),
+    _ix("user_automations", "trigger.type", "enabled"),
+    _ix("automation_runs", "automation_id", ("started_at", DESC)),
+    _ix("automation_runs", "user_id", ("started_at", DESC)),
+    _ix("automation_runs", "run_id", unique=True),
+    _ix("automation_event_dedupe", "dedupe_key"),
+
+    # ---- AI ----
+    _ix("poker_analysis_logs", "user_id", ("timestamp", DESC)),
+    _ix("poker_stats", "user_id", unique=True),
+    _ix("poker_rescore_jobs", "job_id"),
+    _ix("ai_orchestrator_logs", ("timestamp", DESC)),
+]
+
+
+# Request-path queries that must be served by an index: (collection, filter, sort)
+HOT_QUERIES: List[Tuple[str, Dict, Optional[List[Tuple[str, int]]]]] = [
+    ("users", {"user_id": "u1"}, None),
+    ("users", {"supabase_id": "s1"}, None),
+    ("users", {"email": "a@example.com"}, None),
+    ("users", {"$or": [
+        {"search_tokens": {"$elemMatch": {"$gte": "jo", "$lt": "jp"}}},
+        {"search_tokens": {"$elemMatch": {"$gte": "@jo", "$lt": "@jp"}}},
+    ]}, None),
+    ("user_sessions", {"session_token": "t1"}, None),
+    ("groups", {"group_id": "grp1"}, None),
+    ("group_members", {"group_id": "grp1", "user_id": "u1"}, None),
+    ("group_members", {"group_id": "grp1"}, None),
+    ("group_members", {"user_id": "u1"}, None),
+    ("game_nights", {"game_id": "g1"}, None),
+    ("game_nights", {"group_id": "grp1", "status": {"$in": ["active", "scheduled"]}}, None),
+    ("game_nights", {"players.user_id": "u1", "status": {"$in": ["ended", "settled"]}}, None),
+    ("game_nights", {"game_id": "g1", "players.user_id": "u1"}, None),
+    ("players", {"game_id": "g1", "user_id": "u1"}, None),
+    ("players", {"game_id": "g1"}, None),
+    ("players", {"user_id": "u1"}, None),
+    ("players", {"user_id": "u1", "$or": [
+        {"game_sort_at": {"$lt": "2026-05-01"}},
+        {"game_sort_at": "2026-05-01", "game_id": {"$lt": "g1"}},
+    ]}, [("game_sort_at", DESC), ("game_id", DESC)]),
+    ("transactions", {"game_id": "g1"}, None),
+    ("game_threads", {"game_id": "g1"}, [("created_at", ASC)]),
+    ("game_state_deltas", {"game_id": "g1", "version": {"$gt": 3}}, [("version", ASC)]),
+    ("ledger", {"from_user_id": "u1", "status": "pending"}, None),
+    ("ledger", {"to_user_id": "u1", "status": "pending"}, None),
+    ("ledger", {"game_id": "g1"}, None),
+    ("ledger", {"ledger_id": "l1"}, None),
+    ("notifications", {"user_id": "u1"}, [("created_at", DESC)]),
+    ("wallets", {"user_id": "u1"}, None),
+    ("wallet_transactions", {"wallet_id": "w1"}, [("created_at", DESC)]),
+    ("user_stats", {"user_id": "u1"}, None),
+    ("poker_analysis_logs", {"user_id": "u1", "ai_response": {"$exists": True}}, [("timestamp", DESC)]),
+    ("poker_stats", {"user_id": "u1"}, None),
+]
+
+
+# ============== RECONCILIATION ==============
+
+def _existing_options(info: Dict) -> Dict:
+    # expireAfterSeconds=0 is a real TTL, so only None/False count as unset
+    return {k: info[k] for k in ("unique", "sparse", "expireAfterSeconds") if info.get(k) is not None and info[k] is not False}
+
+
+async def _convert_to_unique(db, collection: str, spec: IndexSpec, label: str, report: Dict[str, List[str]]):
+    key_pattern = dict(spec.keys)
+    try:
+        # prepareUnique makes new duplicate writes fail, then unique checks existing ones
+        await db.command("collMod", collection, index={"keyPattern": key_pattern, "prepareUnique": True})
+        await db.command("collMod", collection, index={"keyPattern": key_pattern, "unique": True})
+        report["converted"].append(label)
+    except OperationFailure as e:
+        logger.error(f"Could not make index {label} unique (duplicates, or MongoDB < 6.0): {e}")
+        report["conflicts"].append(label)
+
+
+async def _reconcile_collection(db, collection: str, specs: List[IndexSpec], report: Dict[str, List[str]]):
+    try:
+        existing = await db[collection].index_information()
+    except OperationFailure as e:
+        logger.warning(f"Index reconciliation skipped for {collection}: {e}")
+        report["failed"].extend(f"{collection}.{s.default_name()}" for s in specs)
+        return
+    by_keys = {
+        tuple((f, d if isinstance(d, str) else int(d)) for f, d in info["key"]): (name, info)
+        for name, info in existing.items()
+    }
+
+    for spec in specs:
+        label = f"{collection}.{spec.default_name()}"
+        match = by_keys.get(spec.keys)
+        if match is not None:
+            name, info = match
+            if _existing_options(info) == spec.options():
+                report["existing"].append(label)
+            elif {**_existing_options(info), "unique": True} == spec.options():
+                await _convert_to_unique(db, collection, spec, label, report)
+            else:
+                logger.warning(
+                    f"Index {collection}.{name} has options {_existing_options(info)}, "
+                    f"registry wants {spec.options()}; leaving it as is"
+                )
+                report["conflicts"].append(label)
+            continue
+        if spec.default_name() in existing:
+            logger.warning(f"Index name {label} is taken by a different key pattern; leaving it as is")
+            report["conflicts"].append(label)
+            continue
+        try:
+            await db[collection].create_index(list(spec.keys), name=spec.default_name(), **spec.options())
+            report["created"].append(label)
+        except OperationFailure as e:
+            # e.g. duplicates blocking a unique index; the app keeps running without it
+            logger.error(f"Failed to create index {label}: {e}")
+            report["failed"].append(label)
+
+
+async def ensure_indexes(db, specs: Iterable[IndexSpec] = INDEXES) -> Dict[str, List[str]]:
+    """
+    Build every registry index that doesn't exist yet.
+
+    Returns {"created", "converted", "existing", "conflicts", "failed"} lists
+    of "collection.index_name".
+    """
+    by_collection: Dict[str, List[IndexSpec]] = {}
+    for spec in specs:
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    report = {"created": [], "converted": [], "existing": [], "conflicts": [], "failed": []}
+    await asyncio.gather(*(
+        _reconcile_collection(db, collection, group, report)
+        for collection, group in by_collection.items()
+    ))
+    logger.info(
+        f"Indexes reconciled: {len(report['created'])} created, {len(report['converted'])} made unique, "
+        f"{len(report['existing'])} existing, {len(report['conflicts'])} conflicts, {len(report['failed'])} failed"
+    )
+    return report
+
+
+# ============== QUERY PLANS ==============
+
+def plan_stages(plan: Dict) -> List[str]:
+    """Every stage name in an explain() plan tree (winningPlan or a sub-plan)."""
+    stages = []
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return stages
+
+
+def winning_plan(explain: Dict) -> Dict:
+    """The winning plan from an explain() result (classic or SBE layout)."""
+    planner = explain.get("queryPlanner", {})
+    return planner.get("winningPlan", {})
@@ -0,0 +1,185 @@
+"""
+Ledger Balance Views
+Read-only balance summaries for the /ledger/balances and /ledger/consolidated*
+endpoints.
+
+Each view runs a fixed number of queries regardless of ledger size: the
+user's pending entries, then one batched fetch per related collection
+(see enrichment).
+"""
+
+from typing import Dict, List
+
+from enrichment import fetch_games, fetch_users
+
+
+# ============== LOADING ==============
+
+async def pending_entries_for_user(db, user_id: str, limit: int = 500) -> List[Dict]:
+    """Pending ledger entries where `user_id` is either side."""
+    return await db.ledger.find(
+        {
+            "$or": [
+                {"from_user_id": user_id, "status": "pending"},
+                {"to_user_id": user_id, "status": "pending"}
+            ]
+        },
+        {"_id": 0}
+    ).to_list(limit)
+
+
+def _totals(consolidated: List[Dict]) -> Dict:
+    total_you_owe = sum(-b["net_amount"] for b in consolidated if b["net_amount"] < 0)
+    total_owed_to_you = sum(b["net_amount"] for b in consolidated if b["net_amount"] > 0)
+    return {
+        "consolidated": consolidated,
+        "total_you_owe": round(total_you_owe, 2),
+        "total_owed_to_you": round(total_owed_to_you, 2),
+        "net_balance": round(total_owed_to_you - total_you_owe, 2),
+        "people_count": len(consolidated)
+    }
+
+
+# ============== VIEWS ==============
+
+async def build_balances(db, user_id: str) -> Dict:
+    """Overall balance summary (who owes/is owed), each entry with its counterparty."""
+    # Amounts user owes
+    owes = await db.ledger.find(
+        {"from_user_id": user_id, "status": "pending"},
+        {"_id": 0}
+    ).to_list(100)
+
+    # Amounts owed to user
+    owed = await db.ledger.find(
+        {"to_user_id": user_id, "status": "pending"},
+        {"_id": 0}
+    ).to_list(100)
+
+    total_owes = sum(e["amount"] for e in owes)
+    total_owed = sum(e["amount"] for e in owed)
+
+    users = await fetch_users(db, [e["to_user_id"] for e in owes] + [e["from_user_id"] for e in owed])
+    for entry in owes:
+        entry["to_user"] = users.get(entry["to_user_id"])
+    for entry in owed:
+        entry["from_user"] = users.get(entry["from_user_id"])
+
+    return {
+        "total_owes": round(total_owes, 2),
+        "total_owed": round(total_owed, 2),
+        # Aliases for mobile compatibility
+        "you_owe": round(total_owes, 2),
+        "owed_to_you": round(total_owed, 2),
+        "net_balance": round(total_owed - total_owes, 2),
+        "owes": owes,
+        "owed": owed
+    }
+
+
+async def build_consolidated(db, user_id: str) -> Dict:
+    """Debts grouped by person across all games, netted to one balance each."""
+    all_entries = await pending_entries_for_user(db, user_id)
+
+    # Consolidate by person
+    person_balances = {}  # other_user_id -> net_amount (positive = they owe you)
+    for entry in all_entries:
+        if entry["from_user_id"] == user_id:
+            other_user = entry["to_user_id"]
+            person_balances[other_user] = person_balances.get(other_user, 0) - entry["amount"]
+        else:
+            other_user = entry["from_user_id"]
+            person_balances[other_user] = person_balances.get(other_user, 0) + entry["amount"]
+
+    open_balances = {u: net for u, net in person_balances.items() if abs(net) >= 0.01}
+    users = await fetch_users(db, open_balances.keys())
+
+    consolidated = [
+        {
+            "user": users.get(other_user_id),
+            "net_amount": round(net_amount, 2),
+            "direction": "owed_to_you" if net_amount > 0 else "you_owe",
+            "display_amount": round(abs(net_amount), 2)
+        }
+        for other_user_id, net_amount in open_balances.items()
+    ]
+
+    # Largest debts first
+    consolidated.sort(key=lambda x: -x["display_amount"])
+    return _totals(consolidated)
+
+
+async def build_consolidated_detailed(db, user_id: str) -> Dict:
+    """
+    Consolidated balances with a per-game breakdown and netting explanation.
+    Groups pending entries by (other_user, game_id).
+    """
+    all_entries = await pending_entries_for_user(db, user_id)
+
+    person_games = {}  # other_user_id -> {game_id -> {"entries": [], "net": 0}}
+    for entry in all_entries:
+        if entry["from_user_id"] == user_id:
+            other_user = entry["to_user_id"]
+            amount = -entry["amount"]  # negative = you owe
+        else:
+            other_user = entry["from_user_id"]
+            amount = entry["amount"]  # positive = owed to you
+
+        game_id = entry.get("game_id", "unknown")
+        game = person_games.setdefault(other_user, {}).setdefault(game_id, {"entries": [], "net": 0})
+        game["entries"].append(entry)
+        game["net"] += amount
+
+    open_people = {
+        other_user_id: games for other_user_id, games in person_games.items()
+        if abs(sum(g["net"] for g in games.values())) >= 0.01
+    }
+    users = await fetch_users(db, open_people.keys())
+    games_info = await fetch_games(db, (game_id for games in open_people.values() for game_id in games))
+
+    consolidated = []
+    for other_user_id, games in open_people.items():
+        total_net = sum(g["net"] for g in games.values())
+
+        game_breakdown = []
+        for game_id, game_data in games.items():
+            game_info = games_info.get(game_id)
+            game_breakdown.append({
+                "game_id": game_id,
+                "game_title": game_info.get("title", "Game Night") if game_info else "Game",
+                "game_date": game_info.get("ended_at") if game_info else None,
+                "amount": round(abs(game_data["net"]), 2),
+                "direction": "owed_to_you" if game_data["net"] > 0 else "you_owe",
+                "ledger_ids": [e["ledger_id"] for e in game_data["entries"]]
+            })
+
+        # Newest game first
+        game_breakdown.sort(key=lambda g: g.get("game_date") or "", reverse=True)
+
+        # Offset explanation only when debts flow both ways
+        you_owe_games = [g for g in game_breakdown if g["direction"] == "you_owe"]
+        they_owe_games = [g for g in game_breakdown if g["direction"] == "owed_to_you"]
+
+        offset_explanation = None
+        if you_owe_games and they_owe_games:
+            gross_you_owe = sum(g["amount"] for g in you_owe_games)
+            gross_they_owe = sum(g["amount"] for g in they_owe_games)
+            offset_explanation = {
+                "offset_amount": round(min(gross_you_owe, gross_they_owe), 2),
+                "gross_you_owe": round(gross_you_owe, 2),
+                "gross_they_owe": round(gross_they_owe, 2)
+            }
+
+        consolidated.append({
+            "user": users.get(other_user_id),
+            "net_amount": round(total_net, 2),
+            "direction": "owed_to_you" if total_net > 0 else "you_owe",
+            "display_amount": round(abs(total_net), 2),
+            "game_count": len(games),
+            "game_breakdown": game_breakdown,
+            "offset_explanation": offset_explanation,
+            "all_ledger_ids": [lid for g in game_breakdown for lid in g["ledger_ids"]]
+        })
+
+    consolidated.sort(key=lambda x: -x["display_amount"])
+    return _totals(consolidated)
@@ -0,0 +1,232 @@
+"""
+Group Ledger Netting
+Collapses every pending IOU in a group (across all games) into the minimum
+set of transfers.
+
+PAYMENT ENGINEERING PRINCIPLES:
+1. All math in INTEGER CENTS; amounts are converted back to dollars only
+   when the new ledger entries are written
+2. Each member's group-wide balance is preserved exactly: netting only
+   changes who pays whom, never how much anyone is up or down
+3. All-or-nothing: the superseded entries are retired and the netted entries
+   inserted by one bulk write inside a transaction. A concurrent payment on
+   any of the entries aborts the run
+4. Entries that are already part of an in-flight Stripe checkout (pay-net
+   plans, single-debt payments) are left untouched
+
+PIPELINE:
+1. load_group_pending_entries: one query for the group's pending entries
+2. compute_group_netting: debt graph -> per-member net -> settlement_engine
+3. apply_netting_plan: bulk write (transactional when the deployment
+   supports it) and a ledger_netting_runs audit record
+"""
+
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+from pymongo import InsertOne, UpdateMany
+from pymongo.errors import OperationFailure
+
+from settlement_engine import optimize_settlement
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+NETTED_GAME_ID = "consolidated"
+MAX_GROUP_ENTRIES = 5000
+
+# "Transaction numbers are only allowed on a replica set member or mongos"
+ILLEGAL_OPERATION = 20
+
+
+class NettingConflict(Exception):
+    """Entries in the plan changed (paid, edited, netted) before it was applied."""
+
+
+# ============== LOADING ==============
+
+async def load_group_pending_entries(db, group_id: str) -> List[Dict]:
+    """
+    All pending ledger entries of a group that are free to be netted.
+
+    Entries referenced by a pending pay-net plan or an open single-debt
+    Stripe checkout are excluded so a payment in progress can't be orphaned.
+    """
+    entries = await db.ledger.find(
+        {"group_id": group_id, "status": "pending"},
+        {"_id": 0}
+    ).to_list(MAX_GROUP_ENTRIES)
+    if not entries:
+        return []
+
+    ledger_ids = [e["ledger_id"] for e in entries]
+    busy = set()
+    async for plan in db.pay_net_plans.find(
+        {"status": "pending", "ledger_ids": {"$in": ledger_ids}},
+        {"_id": 0, "ledger_ids": 1}
+    ):
+        busy.update(plan["ledger_ids"])
+    async for payment in db.debt_payments.find(
+        {"status": "pending", "ledger_id": {"$in": ledger_ids}},
+        {"_id": 0, "ledger_id": 1}
+    ):
+        busy.add(payment["ledger_id"])
+
+    return [e for e in entries if e["ledger_id"] not in busy]
+
+
+# ============== PLANNING ==============
+
+def compute_group_netting(entries: Iterable[Dict]) -> Dict:
+    """
+    Minimum transfer set for a group's pending entries.
+
+    Input:  pending ledger entries (from_user_id, to_user_id, amount in dollars)
+    Output: {
+        "ledger_ids": [str],          # entries the plan supersedes
+        "transfers": [{"from_user_id", "to_user_id", "amount_cents": int, "amount": float}],
+        "net_by_user": {user_id: cents},
+        "stats": {"entries_before", "transfers_after", "members",
+                  "volume_before_cents", "volume_after_cents"},
+        "algorithm_version": str
+    }
+    A plan with fewer transfers than entries is worth applying.
+    """
+    entries = list(entries)
+    net: Dict[str, int] = {}
+    volume_before = 0
+    for entry in entries:
+        cents = round(entry["amount"] * 100)
+        volume_before += cents
+        net[entry["from_user_id"]] = net.get(entry["from_user_id"], 0) - cents
+        net[entry["to_user_id"]] = net.get(entry["to_user_id"], 0) + cents
+
+    result = optimize_settlement([
+        {"user_id": user_id, "net_cents": cents} for user_id, cents in sorted(net.items())
+    ])
+    transfers = [
+        {**t, "amount": t["amount_cents"] / 100} for t in result["transfers"]
+    ]
+
+    return {
+        "ledger_ids": sorted(e["ledger_id"] for e in entries),
+        "transfers": transfers,
+        "net_by_user": net,
+        "stats": {
+            "entries_before": len(entries),
+            "transfers_after": len(transfers),
+            "members": len([c for c in net.values() if c]),
+            "volume_before_cents": volume_before,
+            "volume_after_cents": sum(t["amount_cents"] for t in transfers)
+        },
+        "algorithm_version": result["algorithm_version"]
+    }
+
+
+def build_netted_entries(group_id: str, plan: Dict, run_id: str, now: datetime) -> List[Dict]:
+    """Ledger documents (same shape as server.LedgerEntry) for the plan's transfers."""
+    return [
+        {
+            "ledger_id": f"led_{uuid.uuid4().hex[:12]}",
+            "group_id": group_id,
+            "game_id": NETTED_GAME_ID,
+            "from_user_id": t["from_user_id"],
+            "to_user_id": t["to_user_id"],
+            "amount": t["amount"],
+            "status": "pending",
+            "created_at": now.isoformat(),
+            "paid_at": None,
+            "is_locked": False,
+            "netting_run_id": run_id,
+            "notes": f"Netted from {plan['stats']['entries_before']} entries"
+        }
+        for t in plan["transfers"]
+    ]
+
+
+# ============== APPLYING ==============
+
+async def apply_netting_plan(db, client, group_id: str, plan: Dict, applied_by: str) -> Dict:
+    """
+    Retire the plan's entries and insert the netted transfers.
+
+    Runs as a single ordered bulk_write inside a transaction. On a standalone
+    mongod (no transactions) the same bulk write runs unsessioned and a
+    conflict is undone with a compensating write.
+
+    Raises:
+        NettingConflict: if any planned entry is no longer pending
+    """
+    run_id = f"net_{uuid.uuid4().hex[:12]}"
+    now = datetime.now(timezone.utc)
+    new_entries = build_netted_entries(group_id, plan, run_id, now)
+    ledger_ids = plan["ledger_ids"]
+
+    ops = [
+        UpdateMany(
+            {"ledger_id": {"$in": ledger_ids}, "group_id": group_id, "status": "pending"},
+            {"$set": {
+                "status": "consolidated",
+                "consolidated_at": now.isoformat(),
+                "netting_run_id": run_id
+            }}
+        )
+    ] + [InsertOne(doc) for doc in new_entries]
+
+    transactional = True
+    try:
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                result = await db.ledger.bulk_write(ops, ordered=True, session=session)
+                if result.modified_count != len(ledger_ids):
+                    raise NettingConflict(
+                        f"{len(ledger_ids) - result.modified_count} entries changed since the plan was computed"
+                    )
+    except OperationFailure as e:
+        if e.code != ILLEGAL_OPERATION:
+            raise
+        transactional = False
+        logger.warning(f"Ledger netting {run_id}: transactions unsupported, applying without one")
+        result = await db.ledger.bulk_write(ops, ordered=True)
+        if result.modified_count != len(ledger_ids):
+            await _undo_run(db, run_id)
+            raise NettingConflict(
+                f"{len(ledger_ids) - result.modified_count} entries changed since the plan was computed"
+            )
+
+    for doc in new_entries:
+        doc.pop("_id", None)
+
+    run = {
+        "run_id": run_id,
+        "group_id": group_id,
+        "applied_by": applied_by,
+        "applied_at": now.isoformat(),
+        "transactional": transactional,
+        "ledger_ids": ledger_ids,
+        "new_ledger_ids": [doc["ledger_id"] for doc in new_entries],
+        "stats": plan["stats"],
+        "algorithm_version": plan["algorithm_version"]
+    }
+    await db.ledger_netting_runs.insert_one(run)
+    run.pop("_id", None)
+    run["entries"] = new_entries
+
+    logger.info(
+        f"Ledger netting {run_id} for group {group_id}: "
+        f"{plan['stats']['entries_before']} entries -> {plan['stats']['transfers_after']} transfers"
+    )
+    return run
+
+
+async def _undo_run(db, run_id: str):
+    """Compensating write for a non-transactional run that hit a conflict."""
+    await db.ledger.delete_many({"netting_run_id": run_id, "status": "pending"})
+    await db.ledger.update_many(
+        {"netting_run_id": run_id, "status": "consolidated"},
+        {"$set": {"status": "pending"}, "$unset": {"consolidated_at": "", "netting_run_id": ""}}
+    )
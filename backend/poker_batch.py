@@ -0,0 +1,248 @@
+"""
+Poker History Re-scoring
+
+Re-evaluates stored poker_analysis_logs after evaluator or suggestion changes.
+
+PIPELINE:
+1. Stream logs from MongoDB with a cursor, `batch_size` documents at a time
+2. Score each batch in a process pool (poker_evaluator.analyze_hand)
+3. Apply each scored batch with a single unordered bulk_write
+Reading, scoring and writing overlap: up to 2 batches per worker are in flight.
+
+Progress and throughput (hands/sec) are recorded on a poker_rescore_jobs
+document so a long job can be polled from the admin endpoint.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+from poker_evaluator import ANALYSIS_MODEL, analyze_hand
+from poker_stats import invalidate_poker_stats
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+DEFAULT_BATCH_SIZE = 500
+# Re-scoring favours throughput: fewer Monte Carlo samples, and the turn is
+# sampled instead of enumerated (river heads-up stays exact at 990 hands)
+RESCORE_EQUITY_TRIALS = 1000
+RESCORE_MAX_ENUMERATION = 1000
+PROGRESS_EVERY_BATCHES = 10
+
+LOG_PROJECTION = {"_id": 1, "hole_cards": 1, "community_cards": 1, "ai_response.equity.opponents": 1}
+
+
+# ============== SCORING (runs in worker processes) ==============
+
+def score_batch(rows: List[Dict]) -> List[Tuple[Any, Optional[Dict]]]:
+    """
+    Score a batch of stored logs.
+
+    Returns (_id, $set document) pairs; the document is None when the stored
+    cards can no longer be evaluated.
+    """
+    results = []
+    rescored_at = datetime.now(timezone.utc)
+    for row in rows:
+        opponents = (row.get("ai_response") or {}).get("equity", {}).get("opponents", 1)
+        try:
+            analysis = analyze_hand(
+                row.get("hole_cards") or [],
+                row.get("community_cards") or [],
+                opponents,
+                trials=RESCORE_EQUITY_TRIALS,
+                time_budget_ms=None,
+                max_enumeration=RESCORE_MAX_ENUMERATION
+            )
+        except Exception as e:  # malformed legacy rows must not kill the worker
+            analysis = {"error": str(e)}
+
+        if "error" in analysis:
+            results.append((row["_id"], None))
+            continue
+
+        results.append((row["_id"], {
+            "stage": analysis["stage"],
+            "evaluation": analysis["evaluation"],
+            "ai_response": analysis["ai_response"],
+            "model": ANALYSIS_MODEL,
+            "rescored_at": rescored_at
+        }))
+    return results
+
+
+def evaluate_hands_batch(hands: List[Dict], workers: Optional[int] = None) -> List[Tuple[Any, Optional[Dict]]]:
+    """
+    Synchronous batch entry point: score `hands` (dicts with _id, hole_cards,
+    community_cards) across a process pool. Useful from scripts and tests.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(hands) <= DEFAULT_BATCH_SIZE:
+        return score_batch(hands)
+
+    chunks = [hands[i:i + DEFAULT_BATCH_SIZE] for i in range(0, len(hands), DEFAULT_BATCH_SIZE)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return [item for chunk in pool.map(score_batch, chunks) for item in chunk]
+
+
+# ============== RE-SCORE JOB ==============
+
+async def rescore_poker_history(
+    db,
+    job_id: str,
+    user_id: Optional[str] = None,
+    only_stale: bool = True,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: Optional[int] = None
+) -> Dict:
+    """
+    Re-score poker_analysis_logs and record progress on poker_rescore_jobs.
+
+    Args:
+        db: MongoDB database instance
+        job_id: poker_rescore_jobs.job_id to update (created by start_rescore_job)
+        user_id: Restrict to one user's history
+        only_stale: Skip logs already scored by the current ANALYSIS_MODEL
+        batch_size: Documents per cursor batch / bulk write
+        workers: Process pool size (defaults to CPU count)
+
+    Returns:
+        Final counters: processed, updated, failed, elapsed_seconds, hands_per_sec
+    """
+    query: Dict[str, Any] = {"ai_response": {"$exists": True}}
+    if user_id:
+        query["user_id"] = user_id
+    if only_stale:
+        query["model"] = {"$ne": ANALYSIS_MODEL}
+
+    workers = workers or os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Semaphore(workers * 2)
+    counters = {"processed": 0, "updated": 0, "failed": 0}
+    started = time.perf_counter()
+    batches_done = 0
+
+    async def report(status: str) -> Dict:
+        elapsed = time.perf_counter() - started
+        progress = {
+            **counters,
+            "elapsed_seconds": round(elapsed, 2),
+            "hands_per_sec": round(counters["processed"] / elapsed, 1) if elapsed > 0 else 0.0
+        }
+        update = {"status": status, "progress": progress, "updated_at": datetime.now(timezone.utc)}
+        if status != "running":
+            update["finished_at"] = update["updated_at"]
+        await db.poker_rescore_jobs.update_one({"job_id": job_id}, {"$set": update})
+        return progress
+
+    async def process(pool: ProcessPoolExecutor, rows: List[Dict]):
+        nonlocal batches_done
+        try:
+            scored = await loop.run_in_executor(pool, score_batch, rows)
+            ops = [UpdateOne({"_id": _id}, {"$set": doc}) for _id, doc in scored if doc is not None]
+            if ops:
+                result = await db.poker_analysis_logs.bulk_write(ops, ordered=False)
+                counters["updated"] += result.modified_count
+            counters["processed"] += len(rows)
+            counters["failed"] += len(scored) - len(ops)
+            batches_done += 1
+            if batches_done % PROGRESS_EVERY_BATCHES == 0:
+                await report("running")
+        finally:
+            in_flight.release()
+
+    tasks = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            cursor = db.poker_analysis_logs.find(query, LOG_PROJECTION).sort("_id", 1).batch_size(batch_size)
+            rows = []
+            async for doc in cursor:
+                rows.append(doc)
+                if len(rows) >= batch_size:
+                    await in_flight.acquire()
+                    tasks.append(asyncio.create_task(process(pool, rows)))
+                    rows = []
+            if rows:
+                await in_flight.acquire()
+                tasks.append(asyncio.create_task(process(pool, rows)))
+            await asyncio.gather(*tasks)
+    except Exception as e:
+        logger.exception(f"Poker re-score job {job_id} failed: {e}")
+        await db.poker_rescore_jobs.update_one({"job_id": job_id}, {"$set": {"error": str(e)}})
+        if counters["updated"]:
+            await invalidate_poker_stats(db, user_id)
+        return await report("failed")
+
+    # Re-scored suggestions change the stats counters; they rebuild on next read
+    if counters["updated"]:
+        await invalidate_poker_stats(db, user_id)
+    progress = await report("completed")
+    logger.info(
+        f"Poker re-score {job_id}: {progress['processed']} hands in {progress['elapsed_seconds']}s "
+        f"({progress['hands_per_sec']} hands/sec), {progress['failed']} failed"
+    )
+    return progress
+
+
+# Running jobs (and their failure markers): the event loop only keeps weak
+# references to tasks, so a long job must be held here or it can be
+# garbage-collected mid-run
+_rescore_tasks: Set[asyncio.Task] = set()
+
+
+def _track(task: asyncio.Task) -> asyncio.Task:
+    _rescore_tasks.add(task)
+    task.add_done_callback(_rescore_tasks.discard)
+    return task
+
+
+async def _mark_job_failed(db, job_id: str, error: str):
+    try:
+        now = datetime.now(timezone.utc)
+        await db.poker_rescore_jobs.update_one(
+            {"job_id": job_id},
+            {"$set": {"status": "failed", "error": error, "updated_at": now, "finished_at": now}}
+        )
+    except Exception as e:
+        logger.error(f"Could not mark poker re-score job {job_id} failed: {e}")
+
+
+def _on_rescore_done(db, job_id: str, task: asyncio.Task):
+    """A job that raised past its own error handling (or was cancelled) must not stay `running`."""
+    if task.cancelled():
+        error = "cancelled"
+    elif task.exception() is not None:
+        error = str(task.exception()) or type(task.exception()).__name__
+    else:
+        return
+    logger.error(f"Poker re-score job {job_id} ended abnormally: {error}")
+    _track(asyncio.ensure_future(_mark_job_failed(db, job_id, error)))
+
+
+async def start_rescore_job(db, started_by: str, **options) -> Dict:
+    """Create a poker_rescore_jobs record and run the job in the background."""
+    job = {
+        "job_id": f"rescore_{uuid.uuid4().hex[:12]}",
+        "status": "running",
+        "model": ANALYSIS_MODEL,
+        "options": options,
+        "started_by": started_by,
+        "started_at": datetime.now(timezone.utc),
+        "progress": {"processed": 0, "updated": 0, "failed": 0, "elapsed_seconds": 0, "hands_per_sec": 0.0}
+    }
+    await db.poker_rescore_jobs.insert_one(job)
+    task = _track(asyncio.create_task(rescore_poker_history(db, job["job_id"], **options)))
+    task.add_done_callback(lambda t: _on_rescore_done(db, job["job_id"], t))
+    job.pop("_id", None)
+    return job
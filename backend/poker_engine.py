@@ -0,0 +1,253 @@
+"""
+Integer-Encoded Poker Hand Engine
+
+Table-driven evaluator used by poker_evaluator.evaluate_hand and the equity code.
+
+CARD ENCODING:
+- A card is an int 0..51: rank_index * 4 + suit_index
+- rank_index 0..12 = 2..A, suit_index 0..3 = clubs, diamonds, hearts, spades
+
+HAND VALUE (comparable int, higher is better, fits in 32 bits):
+- bits 20-23: category (1 = high card ... 9 = straight flush)
+- bits 0-19:  the five ranks of the hand as 4-bit nibbles, most significant first
+  (e.g. one pair of 8s with A-K-2 kickers -> 8 8 A K 2)
+
+LOOKUP TABLES (built once at import):
+- FLUSH_TABLE: 13-bit suit mask -> best flush / straight flush value (0 if < 5 cards)
+- RANK_TABLE:  product of rank primes -> best non-flush value for 5, 6 or 7 cards
+
+With 7 or fewer cards a flush can never coexist with a full house or quads,
+so a hit in FLUSH_TABLE is always the best hand.
+"""
+
+from itertools import combinations_with_replacement
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+# ============== CONSTANTS ==============
+
+HIGH_CARD = 1
+ONE_PAIR = 2
+TWO_PAIR = 3
+THREE_OF_A_KIND = 4
+STRAIGHT = 5
+FLUSH = 6
+FULL_HOUSE = 7
+FOUR_OF_A_KIND = 8
+STRAIGHT_FLUSH = 9
+
+RANK_CHARS = "23456789TJQKA"
+RANK_LABELS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+SUIT_NAMES = ['clubs', 'diamonds', 'hearts', 'spades']
+SUIT_INDEX = {name: i for i, name in enumerate(SUIT_NAMES)}
+RANK_INDEX = {label: i for i, label in enumerate(RANK_LABELS)}
+
+# One prime per rank: the product identifies a rank multiset regardless of order
+RANK_PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+
+# Rank masks of the ten straights, best first (the wheel A-2-3-4-5 is last)
+STRAIGHT_MASKS = [(0b11111 << low) for low in range(8, -1, -1)] + [0b1000000001111]
+STRAIGHT_RANKS = [[low + 4, low + 3, low + 2, low + 1, low] for low in range(8, -1, -1)] + [[3, 2, 1, 0, 12]]
+
+FULL_DECK = list(range(52))
+
+
+# ============== VALUE ENCODING ==============
+
+def make_value(category: int, ranks: Sequence[int]) -> int:
+    """Pack a category and five rank indexes into a comparable int."""
+    value = category
+    for r in ranks:
+        value = (value << 4) | r
+    return value
+
+
+def value_category(value: int) -> int:
+    """Category (1-9) of a hand value."""
+    return value >> 20
+
+
+def value_ranks(value: int) -> List[int]:
+    """The five rank indexes packed into a hand value, most significant first."""
+    return [(value >> shift) & 0xF for shift in (16, 12, 8, 4, 0)]
+
+
+# ============== TABLE CONSTRUCTION ==============
+
+def _straight_in_mask(mask: int) -> int:
+    """Index into STRAIGHT_MASKS of the best straight in a rank mask, or -1."""
+    for i, straight in enumerate(STRAIGHT_MASKS):
+        if mask & straight == straight:
+            return i
+    return -1
+
+
+def _best_flush(mask: int) -> int:
+    straight = _straight_in_mask(mask)
+    if straight >= 0:
+        return make_value(STRAIGHT_FLUSH, STRAIGHT_RANKS[straight])
+    top = [r for r in range(12, -1, -1) if mask & (1 << r)][:5]
+    return make_value(FLUSH, top)
+
+
+def _build_flush_table() -> List[int]:
+    table = [0] * 8192
+    for mask in range(8192):
+        if bin(mask).count("1") >= 5:
+            table[mask] = _best_flush(mask)
+    return table
+
+
+def _best_ranks(counts: List[int]) -> int:
+    """Best non-flush value for a rank histogram (index = rank, value = count)."""
+    by_count = {4: [], 3: [], 2: [], 1: []}
+    mask = 0
+    for r in range(12, -1, -1):
+        if counts[r]:
+            by_count[counts[r]].append(r)
+            mask |= 1 << r
+
+    if by_count[4]:
+        quad = by_count[4][0]
+        kicker = max(r for r in range(13) if counts[r] and r != quad)
+        return make_value(FOUR_OF_A_KIND, [quad] * 4 + [kicker])
+
+    if by_count[3]:
+        trip = by_count[3][0]
+        pair_candidates = by_count[3][1:] + by_count[2]
+        if pair_candidates:
+            pair = max(pair_candidates)
+            return make_value(FULL_HOUSE, [trip] * 3 + [pair] * 2)
+
+    straight = _straight_in_mask(mask)
+    if straight >= 0:
+        return make_value(STRAIGHT, STRAIGHT_RANKS[straight])
+
+    if by_count[3]:
+        trip = by_count[3][0]
+        kickers = [r for r in range(12, -1, -1) if counts[r] and r != trip][:2]
+        return make_value(THREE_OF_A_KIND, [trip] * 3 + kickers)
+
+    pairs = by_count[2]
+    if len(pairs) >= 2:
+        high, low = pairs[0], pairs[1]
+        kicker = max(r for r in range(13) if counts[r] and r not in (high, low))
+        return make_value(TWO_PAIR, [high, high, low, low, kicker])
+
+    if pairs:
+        pair = pairs[0]
+        kickers = [r for r in range(12, -1, -1) if counts[r] and r != pair][:3]
+        return make_value(ONE_PAIR, [pair, pair] + kickers)
+
+    return make_value(HIGH_CARD, by_count[1][:5])
+
+
+def _build_rank_table() -> Dict[int, int]:
+    table = {}
+    for size in (5, 6, 7):
+        for ranks in combinations_with_replacement(range(13), size):
+            counts = [0] * 13
+            key = 1
+            for r in ranks:
+                counts[r] += 1
+                key *= RANK_PRIMES[r]
+            if max(counts) > 4:
+                continue
+            table[key] = _best_ranks(counts)
+    return table
+
+
+FLUSH_TABLE = _build_flush_table()
+RANK_TABLE = _build_rank_table()
+
+# NumPy views of the same tables for evaluate_batch (rank keys sorted for searchsorted)
+FLUSH_ARRAY = np.array(FLUSH_TABLE, dtype=np.int32)
+RANK_KEYS = np.array(sorted(RANK_TABLE), dtype=np.int64)
+RANK_VALUES_ARRAY = np.array([RANK_TABLE[k] for k in RANK_KEYS.tolist()], dtype=np.int32)
+PRIME_ARRAY = np.array(RANK_PRIMES, dtype=np.int64)
+CARD_BITS = np.array([1 << ((c & 3) * 13 + (c >> 2)) for c in FULL_DECK], dtype=np.int64)
+
+
+# ============== CARD CONVERSION ==============
+
+def card_from_tuple(rank: str, suit: str) -> int:
+    """Convert a parsed (rank, suit) pair, e.g. ('10', 'hearts'), to its card int."""
+    return RANK_INDEX[rank] * 4 + SUIT_INDEX[suit]
+
+
+def card_to_tuple(card: int) -> Tuple[str, str]:
+    """Convert a card int back to the (rank, suit) tuple used by poker_evaluator."""
+    return (RANK_LABELS[card >> 2], SUIT_NAMES[card & 3])
+
+
+# ============== EVALUATION ==============
+
+def evaluate_cards(cards: Sequence[int]) -> int:
+    """
+    Hand value of the best 5-card hand among 5, 6 or 7 card ints.
+
+    Two hands can be compared directly: the higher value wins, equal values tie.
+    Raises ValueError for any other number of cards.
+    """
+    if not 5 <= len(cards) <= 7:
+        raise ValueError(f"Need 5 to 7 cards, got {len(cards)}")
+    masks = [0, 0, 0, 0]
+    key = 1
+    for c in cards:
+        masks[c & 3] |= 1 << (c >> 2)
+        key *= RANK_PRIMES[c >> 2]
+    for mask in masks:
+        flush = FLUSH_TABLE[mask]
+        if flush:
+            return flush
+    return RANK_TABLE[key]
+
+
+def best_five(cards: Sequence[int], value: int) -> List[int]:
+    """
+    The exact five cards (ints) that make up `value`, in value order.
+
+    `value` must be the result of evaluate_cards(cards).
+    """
+    category = value_category(value)
+    ranks = value_ranks(value)
+
+    if category in (FLUSH, STRAIGHT_FLUSH):
+        masks = [0, 0, 0, 0]
+        for c in cards:
+            masks[c & 3] |= 1 << (c >> 2)
+        suit = next(s for s in range(4) if FLUSH_TABLE[masks[s]])
+        return [r * 4 + suit for r in ranks]
+
+    pool = sorted(cards, reverse=True)
+    used = []
+    for r in ranks:
+        card = next(c for c in pool if c >> 2 == r and c not in used)
+        used.append(card)
+    return used
+
+
+def evaluate_with_cards(cards: Sequence[int]) -> Tuple[int, List[int]]:
+    """Hand value plus the five cards used."""
+    value = evaluate_cards(cards)
+    return value, best_five(cards, value)
+
+
+def evaluate_batch(cards: np.ndarray) -> np.ndarray:
+    """
+    Vectorized evaluate_cards over an (N, k) int array of N hands of k (5-7) cards.
+
+    Returns an (N,) int32 array of hand values.
+    """
+    ranks = cards >> 2
+    keys = PRIME_ARRAY[ranks].prod(axis=1)
+    values = RANK_VALUES_ARRAY[np.searchsorted(RANK_KEYS, keys)]
+
+    # One 52-bit mask per hand, 13 bits per suit; at most one suit can hold a flush
+    hand_masks = CARD_BITS[cards].sum(axis=1)
+    flush = FLUSH_ARRAY[hand_masks & 0x1FFF]
+    for suit in range(1, 4):
+        flush |= FLUSH_ARRAY[(hand_masks >> (13 * suit)) & 0x1FFF]
+    return np.where(flush > 0, flush, values)
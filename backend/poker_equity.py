@@ -0,0 +1,169 @@
+"""
+Poker Equity Calculator
+
+Win / tie / lose probabilities for a hand against N random opponents.
+
+STRATEGY:
+1. Heads-up on the turn or river: exhaustive enumeration of every runout and
+   opponent holding (at most 46 x 990 hands), so the answer is exact
+2. Everything else (flop, preflop, multiway): seeded Monte Carlo, sampled and
+   evaluated in NumPy batches until the trial count or the time budget runs out
+
+All cards are poker_engine ints; poker_evaluator.calculate_hand_equity is the
+string-level entry point used by the API and the assistant tool.
+"""
+
+import time
+from itertools import combinations
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from poker_engine import FULL_DECK, evaluate_batch
+
+
+# ============== CONSTANTS ==============
+
+MAX_OPPONENTS = 9
+MAX_ENUMERATION = 50000  # heads-up turn is 46 x 990 = 45,540 hands
+DEFAULT_TRIALS = 10000
+DEFAULT_TIME_BUDGET_MS = 30.0
+BATCH_SIZE = 2500
+
+
+# ============== PUBLIC API ==============
+
+def calculate_equity(
+    hole_cards: Sequence[int],
+    board: Sequence[int],
+    opponents: int = 1,
+    trials: int = DEFAULT_TRIALS,
+    time_budget_ms: Optional[float] = DEFAULT_TIME_BUDGET_MS,
+    seed: Optional[int] = None,
+    max_enumeration: int = MAX_ENUMERATION
+) -> Dict:
+    """
+    Equity of `hole_cards` on `board` against `opponents` random hands.
+
+    Args:
+        hole_cards: Exactly 2 card ints
+        board: 0, 3, 4 or 5 card ints
+        opponents: Number of opponents (1-9)
+        trials: Monte Carlo sample count (ignored for exhaustive enumeration)
+        time_budget_ms: Stop sampling after this many ms (at least one batch always runs)
+        seed: RNG seed; defaults to one derived from the cards so repeated
+              queries for the same spot give the same answer
+        max_enumeration: Largest heads-up spot (in hands) to enumerate exactly;
+              batch jobs lower it to sample the turn instead
+
+    Returns:
+        Dict with win/tie/lose probabilities, equity (win + split-pot share),
+        sample count, method ("exhaustive" or "monte_carlo") and elapsed_ms.
+
+    Raises:
+        ValueError: On a malformed spot (card counts, duplicates, opponent count)
+    """
+    hole = list(hole_cards)
+    board = list(board)
+    _validate(hole, board, opponents)
+
+    started = time.perf_counter()
+    remaining = np.array([c for c in FULL_DECK if c not in hole and c not in board], dtype=np.int64)
+
+    unknown = len(remaining)
+    enumeration_size = (unknown * (unknown - 1) // 2) * (unknown - 2 if len(board) == 4 else 1)
+    if opponents == 1 and len(board) >= 4 and enumeration_size <= max_enumeration:
+        hero, best_opp, ties = _enumerate_heads_up(hole, board, remaining)
+        method = "exhaustive"
+    else:
+        if seed is None:
+            seed = int.from_bytes(bytes(hole + board + [opponents]), "big")
+        deadline = None if time_budget_ms is None else started + time_budget_ms / 1000.0
+        hero, best_opp, ties = _sample(hole, board, remaining, opponents, trials, deadline, seed)
+        method = "monte_carlo"
+
+    samples = len(hero)
+    win = hero > best_opp
+    tie = hero == best_opp
+    share = win.sum() + (1.0 / (ties[tie] + 1)).sum()
+
+    return {
+        "win": round(float(win.sum()) / samples, 4),
+        "tie": round(float(tie.sum()) / samples, 4),
+        "lose": round(float(samples - win.sum() - tie.sum()) / samples, 4),
+        "equity": round(float(share) / samples, 4),
+        "opponents": opponents,
+        "samples": samples,
+        "method": method,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+# ============== HELPERS ==============
+
+def _validate(hole: list, board: list, opponents: int) -> None:
+    if len(hole) != 2:
+        raise ValueError("Must provide exactly 2 hole cards")
+    if len(board) not in (0, 3, 4, 5):
+        raise ValueError("Board must have 0, 3, 4 or 5 cards")
+    if not 1 <= opponents <= MAX_OPPONENTS:
+        raise ValueError(f"Opponents must be between 1 and {MAX_OPPONENTS}")
+    if len(set(hole + board)) != len(hole) + len(board):
+        raise ValueError("Duplicate cards detected - each card can only appear once")
+
+
+def _enumerate_heads_up(hole: list, board: list, remaining: np.ndarray):
+    """Every (runout, opponent hand) pair for one opponent with 0 or 1 cards to come."""
+    pairs = np.array(list(combinations(remaining.tolist(), 2)), dtype=np.int64)
+
+    if len(board) == 5:
+        runouts = np.empty((1, 0), dtype=np.int64)
+        opp_holes = pairs
+        run_idx = np.zeros(len(pairs), dtype=np.int64)
+    else:
+        runouts = remaining.reshape(-1, 1)
+        run_idx = np.repeat(np.arange(len(runouts)), len(pairs))
+        opp_holes = np.tile(pairs, (len(runouts), 1))
+        river = runouts[run_idx, 0]
+        valid = (opp_holes[:, 0] != river) & (opp_holes[:, 1] != river)
+        run_idx = run_idx[valid]
+        opp_holes = opp_holes[valid]
+
+    boards = np.hstack([np.tile(np.array(board, dtype=np.int64), (len(runouts), 1)), runouts])
+    hero_by_runout = evaluate_batch(np.hstack([np.tile(np.array(hole, dtype=np.int64), (len(runouts), 1)), boards]))
+
+    hero = hero_by_runout[run_idx]
+    opp = evaluate_batch(np.hstack([opp_holes, boards[run_idx]]))
+    return hero, opp, (opp == hero).astype(np.int64)
+
+
+def _sample(hole: list, board: list, remaining: np.ndarray, opponents: int,
+            trials: int, deadline: Optional[float], seed: int):
+    """Monte Carlo batches of random runouts and opponent hands."""
+    rng = np.random.default_rng(seed)
+    need = 5 - len(board)
+    draw = need + 2 * opponents
+    known_board = np.array(board, dtype=np.int64)
+    hole_arr = np.array(hole, dtype=np.int64)
+
+    hero_parts, best_parts, tie_parts = [], [], []
+    done = 0
+    while done < trials:
+        batch = min(BATCH_SIZE, trials - done)
+        drawn = rng.permuted(np.tile(remaining, (batch, 1)), axis=1)[:, :draw]
+        boards = np.hstack([np.tile(known_board, (batch, 1)), drawn[:, :need]])
+
+        hero = evaluate_batch(np.hstack([np.tile(hole_arr, (batch, 1)), boards]))
+        opp_holes = drawn[:, need:].reshape(batch, opponents, 2).transpose(1, 0, 2).reshape(-1, 2)
+        opp = evaluate_batch(np.hstack([opp_holes, np.tile(boards, (opponents, 1))])).reshape(opponents, batch)
+
+        best = opp.max(axis=0)
+        hero_parts.append(hero)
+        best_parts.append(best)
+        tie_parts.append((opp == hero).sum(axis=0))
+        done += batch
+
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+
+    return np.concatenate(hero_parts), np.concatenate(best_parts), np.concatenate(tie_parts)
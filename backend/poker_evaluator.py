@@ -6,9 +6,17 @@ The LLM is only used for strategy suggestions after the hand is evaluated.
 """
 
 from typing import List, Tuple, Dict, Optional
-from collections import Counter
+from functools import lru_cache
 from enum import IntEnum
 
+from poker_engine import (
+    FLUSH, FOUR_OF_A_KIND, FULL_HOUSE, ONE_PAIR, STRAIGHT, STRAIGHT_FLUSH,
+    THREE_OF_A_KIND, TWO_PAIR, card_from_tuple, card_to_tuple, evaluate_cards,
+    evaluate_with_cards, value_category,
+)
+from poker_equity import calculate_equity
+from preflop_table import class_index, class_name, get_preflop_table
+
 
 class HandRank(IntEnum):
     """Poker hand rankings from lowest to highest"""
@@ -32,6 +40,9 @@ RANK_VALUES = {
 
 RANK_NAMES = {v: k for k, v in RANK_VALUES.items()}
 
+# Tag stored on poker_analysis_logs; bump when evaluation or suggestion logic changes
+ANALYSIS_MODEL = "deterministic_v2"
+
 HAND_NAMES = {
     HandRank.HIGH_CARD: "High Card",
     HandRank.ONE_PAIR: "One Pair",
@@ -90,219 +101,227 @@ def parse_card(card_str: str) -> Tuple[str, str]:
     return (rank, suit)
 
 
-def get_rank_counts(cards: List[Tuple[str, str]]) -> Counter:
-    """Get count of each rank"""
-    return Counter(card[0] for card in cards)
-
-
-def get_suit_counts(cards: List[Tuple[str, str]]) -> Counter:
-    """Get count of each suit"""
-    return Counter(card[1] for card in cards)
-
+@lru_cache(maxsize=1024)
+def parse_card_int(card_str: str) -> int:
+    """Parse a card string straight to the engine's int encoding (cached)."""
+    return card_from_tuple(*parse_card(card_str))
 
-def is_flush(cards: List[Tuple[str, str]]) -> Tuple[bool, Optional[str]]:
-    """Check if 5+ cards of same suit exist. Returns (is_flush, suit)"""
-    suit_counts = get_suit_counts(cards)
-    for suit, count in suit_counts.items():
-        if count >= 5:
-            return True, suit
-    return False, None
 
-
-def get_straight_high(ranks: List[int]) -> Optional[int]:
+def describe_value(value: int, cards_used: List[int]) -> Dict:
     """
-    Check if there's a straight in the ranks.
-    Returns the high card of the straight, or None.
+    Build the evaluate_hand result dict for an engine hand value and its 5 cards.
     """
-    unique_ranks = sorted(set(ranks), reverse=True)
-
-    # Check for Ace-low straight (A-2-3-4-5)
-    if set([14, 2, 3, 4, 5]).issubset(set(unique_ranks)):
-        return 5  # 5-high straight
+    category = value_category(value)
+    used = [card_to_tuple(c) for c in cards_used]
+    high = used[0][0]
+    suit = used[0][1]
+
+    if category == STRAIGHT_FLUSH:
+        if used[0][0] == 'A':  # A-K-Q-J-10
+            return _result(HandRank.ROYAL_FLUSH, f"Royal Flush in {suit}!", value, used, [])
+        return _result(HandRank.STRAIGHT_FLUSH, f"Straight Flush, {high}-high in {suit}", value, used, [])
+    if category == FOUR_OF_A_KIND:
+        return _result(HandRank.FOUR_OF_A_KIND, f"Four of a Kind, {high}s", value, used, used[4:])
+    if category == FULL_HOUSE:
+        return _result(HandRank.FULL_HOUSE, f"Full House, {high}s full of {used[3][0]}s", value, used, [])
+    if category == FLUSH:
+        return _result(HandRank.FLUSH, f"Flush, {high}-high in {suit}", value, used, [])
+    if category == STRAIGHT:
+        return _result(HandRank.STRAIGHT, f"Straight, {high}-high", value, used, [])
+    if category == THREE_OF_A_KIND:
+        return _result(HandRank.THREE_OF_A_KIND, f"Three of a Kind, {high}s", value, used, used[3:])
+    if category == TWO_PAIR:
+        return _result(HandRank.TWO_PAIR, f"Two Pair, {high}s and {used[2][0]}s", value, used, used[4:])
+    if category == ONE_PAIR:
+        return _result(HandRank.ONE_PAIR, f"One Pair, {high}s", value, used, used[2:])
+    return _result(HandRank.HIGH_CARD, f"High Card, {high}", value, used, used[1:])
+
+
+def describe_starting_hand(cards: List[int]) -> Dict:
+    """Pre-flop result dict for exactly two hole cards."""
+    used = sorted((card_to_tuple(c) for c in cards), key=lambda c: RANK_VALUES[c[0]], reverse=True)
+    starting_hand = class_name(class_index(*cards))
+    if used[0][0] == used[1][0]:
+        hand_rank, description = HandRank.ONE_PAIR, f"Pocket {used[0][0]}s"
+    else:
+        suited = "suited" if used[0][1] == used[1][1] else "offsuit"
+        hand_rank, description = HandRank.HIGH_CARD, f"{used[0][0]}-{used[1][0]} {suited}"
+    return {
+        "hand_rank": hand_rank,
+        "hand_name": "Pocket Pair" if hand_rank == HandRank.ONE_PAIR else "Starting Hand",
+        "description": description,
+        "cards_used": used,
+        "kickers": [],
+        "starting_hand": starting_hand
+    }
 
-    # Check for regular straights
-    for i in range(len(unique_ranks) - 4):
-        window = unique_ranks[i:i+5]
-        if window[0] - window[4] == 4:
-            return window[0]
 
-    return None
+def _result(hand_rank: HandRank, description: str, value: int, cards_used: List, kickers: List) -> Dict:
+    return {
+        "hand_rank": hand_rank,
+        "hand_name": HAND_NAMES[hand_rank],
+        "description": description,
+        "cards_used": cards_used,
+        "kickers": kickers,
+        "hand_value": value
+    }
 
 
 def evaluate_hand(hole_cards: List[str], community_cards: List[str]) -> Dict:
     """
     Evaluate the best 5-card poker hand from hole cards + community cards.
 
+    Thin adapter over poker_engine: cards are converted to ints and looked up
+    in the precomputed tables.
+
     Returns a dict with:
     - hand_rank: HandRank enum value
     - hand_name: Human-readable name
     - description: Detailed description of the hand
     - cards_used: The 5 cards that make the best hand
     - kickers: Kicker cards for tiebreakers
+    - hand_value: Comparable engine value (higher wins, equal ties)
     """
-    # Parse all cards
-    all_cards = []
-    for card_str in hole_cards + community_cards:
-        try:
-            parsed = parse_card(card_str)
-            all_cards.append(parsed)
-        except ValueError as e:
-            return {"error": str(e)}
-
-    if len(all_cards) < 5:
+    try:
+        cards = [parse_card_int(card_str) for card_str in hole_cards + community_cards]
+    except ValueError as e:
+        return {"error": str(e)}
+
+    if len(set(cards)) != len(cards):
+        return {"error": "Duplicate cards detected - each card can only appear once"}
+
+    if len(cards) > 7:
+        return {"error": f"Too many cards ({len(cards)}) - a hand has at most 7"}
+
+    if len(cards) == 2:
+        return describe_starting_hand(cards)
+
+    if len(cards) < 5:
         return {
             "hand_rank": HandRank.HIGH_CARD,
             "hand_name": "Incomplete Hand",
-            "description": f"Only {len(all_cards)} cards - need at least 5 for a complete hand",
-            "cards_used": all_cards,
+            "description": f"Only {len(cards)} cards - need at least 5 for a complete hand",
+            "cards_used": [card_to_tuple(c) for c in cards],
             "kickers": []
         }
 
-    # Get rank and suit information
-    rank_counts = get_rank_counts(all_cards)
-    suit_counts = get_suit_counts(all_cards)
-    ranks = [RANK_VALUES[card[0]] for card in all_cards]
-
-    # Check for flush
-    has_flush, flush_suit = is_flush(all_cards)
-
-    # Get flush cards if flush exists
-    flush_cards = [c for c in all_cards if c[1] == flush_suit] if has_flush else []
-    flush_ranks = [RANK_VALUES[c[0]] for c in flush_cards] if flush_cards else []
-
-    # Check for straight flush / royal flush
-    if has_flush and len(flush_cards) >= 5:
-        straight_high = get_straight_high(flush_ranks)
-        if straight_high:
-            if straight_high == 14:  # A-K-Q-J-10
-                return {
-                    "hand_rank": HandRank.ROYAL_FLUSH,
-                    "hand_name": "Royal Flush",
-                    "description": f"Royal Flush in {flush_suit}!",
-                    "cards_used": sorted(flush_cards, key=lambda c: RANK_VALUES[c[0]], reverse=True)[:5],
-                    "kickers": []
-                }
-            else:
-                return {
-                    "hand_rank": HandRank.STRAIGHT_FLUSH,
-                    "hand_name": "Straight Flush",
-                    "description": f"Straight Flush, {RANK_NAMES[straight_high]}-high in {flush_suit}",
-                    "cards_used": sorted(flush_cards, key=lambda c: RANK_VALUES[c[0]], reverse=True)[:5],
-                    "kickers": []
-                }
-
-    # Check for four of a kind
-    quads = [rank for rank, count in rank_counts.items() if count == 4]
-    if quads:
-        quad_rank = quads[0]
-        quad_cards = [c for c in all_cards if c[0] == quad_rank]
-        kicker = max([c for c in all_cards if c[0] != quad_rank], key=lambda c: RANK_VALUES[c[0]])
-        return {
-            "hand_rank": HandRank.FOUR_OF_A_KIND,
-            "hand_name": "Four of a Kind",
-            "description": f"Four of a Kind, {quad_rank}s",
-            "cards_used": quad_cards + [kicker],
-            "kickers": [kicker]
-        }
+    value, used = evaluate_with_cards(cards)
+    return describe_value(value, used)
 
-    # Check for full house (three of a kind + pair)
-    trips = [rank for rank, count in rank_counts.items() if count == 3]
-    pairs = [rank for rank, count in rank_counts.items() if count == 2]
-
-    if trips:
-        # Could have multiple trips or trips + pairs
-        trips_sorted = sorted(trips, key=lambda r: RANK_VALUES[r], reverse=True)
-        best_trip = trips_sorted[0]
-
-        # Look for best pair (could be another trip or a pair)
-        other_pairs = [r for r in trips_sorted[1:]] + pairs
-        if other_pairs:
-            best_pair = max(other_pairs, key=lambda r: RANK_VALUES[r])
-            trip_cards = [c for c in all_cards if c[0] == best_trip][:3]
-            pair_cards = [c for c in all_cards if c[0] == best_pair][:2]
-            return {
-                "hand_rank": HandRank.FULL_HOUSE,
-                "hand_name": "Full House",
-                "description": f"Full House, {best_trip}s full of {best_pair}s",
-                "cards_used": trip_cards + pair_cards,
-                "kickers": []
-            }
 
-    # Check for flush (already calculated above)
-    if has_flush:
-        flush_cards_sorted = sorted(flush_cards, key=lambda c: RANK_VALUES[c[0]], reverse=True)[:5]
-        high_card = flush_cards_sorted[0][0]
-        return {
-            "hand_rank": HandRank.FLUSH,
-            "hand_name": "Flush",
-            "description": f"Flush, {high_card}-high in {flush_suit}",
-            "cards_used": flush_cards_sorted,
-            "kickers": []
-        }
+def compare_hands(hand_a: List[str], hand_b: List[str], community_cards: List[str]) -> int:
+    """
+    Compare two sets of hole cards on the same board.
 
-    # Check for straight
-    straight_high = get_straight_high(ranks)
-    if straight_high:
-        return {
-            "hand_rank": HandRank.STRAIGHT,
-            "hand_name": "Straight",
-            "description": f"Straight, {RANK_NAMES[straight_high]}-high",
-            "cards_used": [],  # Would need to track which cards
-            "kickers": []
-        }
+    Returns 1 if hand_a wins, -1 if hand_b wins, 0 for a split pot.
+    """
+    board = [parse_card_int(c) for c in community_cards]
+    value_a = evaluate_cards([parse_card_int(c) for c in hand_a] + board)
+    value_b = evaluate_cards([parse_card_int(c) for c in hand_b] + board)
+    return (value_a > value_b) - (value_a < value_b)
+
+
+def calculate_hand_equity(
+    hole_cards: List[str],
+    community_cards: List[str],
+    opponents: int = 1,
+    **kwargs
+) -> Dict:
+    """
+    Win/tie/lose probabilities against `opponents` random hands.
 
-    # Three of a kind (no full house)
-    if trips:
-        best_trip = max(trips, key=lambda r: RANK_VALUES[r])
-        trip_cards = [c for c in all_cards if c[0] == best_trip][:3]
-        other_cards = sorted([c for c in all_cards if c[0] != best_trip],
-                            key=lambda c: RANK_VALUES[c[0]], reverse=True)[:2]
-        return {
-            "hand_rank": HandRank.THREE_OF_A_KIND,
-            "hand_name": "Three of a Kind",
-            "description": f"Three of a Kind, {best_trip}s",
-            "cards_used": trip_cards + other_cards,
-            "kickers": other_cards
-        }
+    String-level wrapper over poker_equity.calculate_equity; extra keyword
+    arguments (trials, time_budget_ms, seed) are passed through. Pre-flop
+    spots are read from the memory-mapped preflop table when it is available.
+    Returns {"error": ...} on bad input, like evaluate_hand.
+    """
+    try:
+        hole = [parse_card_int(c) for c in hole_cards]
+        board = [parse_card_int(c) for c in community_cards]
+        table = get_preflop_table()
+        if not board and table is not None and len(hole) == 2 and hole[0] != hole[1]:
+            return table.equity_vs_random(hole[0], hole[1], opponents)
+        return calculate_equity(hole, board, opponents=opponents, **kwargs)
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+def preflop_matchup_equity(hand_a: List[str], hand_b: List[str]) -> Dict:
+    """
+    Heads-up preflop equity of one starting hand class against another,
+    e.g. AKs vs QQ, read from the preflop table.
+    """
+    table = get_preflop_table()
+    if table is None:
+        return {"error": "Preflop equity table is not available"}
+    try:
+        class_a = class_index(*[parse_card_int(c) for c in hand_a])
+        class_b = class_index(*[parse_card_int(c) for c in hand_b])
+    except (ValueError, TypeError) as e:
+        return {"error": str(e)}
+    return {
+        "hand_a": class_name(class_a),
+        "hand_b": class_name(class_b),
+        "equity": table.matchup_equity(class_a, class_b)
+    }
 
-    # Two pair
-    if len(pairs) >= 2:
-        pairs_sorted = sorted(pairs, key=lambda r: RANK_VALUES[r], reverse=True)[:2]
-        pair1_cards = [c for c in all_cards if c[0] == pairs_sorted[0]][:2]
-        pair2_cards = [c for c in all_cards if c[0] == pairs_sorted[1]][:2]
-        kicker = max([c for c in all_cards if c[0] not in pairs_sorted],
-                    key=lambda c: RANK_VALUES[c[0]])
-        return {
-            "hand_rank": HandRank.TWO_PAIR,
-            "hand_name": "Two Pair",
-            "description": f"Two Pair, {pairs_sorted[0]}s and {pairs_sorted[1]}s",
-            "cards_used": pair1_cards + pair2_cards + [kicker],
-            "kickers": [kicker]
-        }
 
-    # One pair
-    if pairs:
-        best_pair = max(pairs, key=lambda r: RANK_VALUES[r])
-        pair_cards = [c for c in all_cards if c[0] == best_pair][:2]
-        kickers = sorted([c for c in all_cards if c[0] != best_pair],
-                        key=lambda c: RANK_VALUES[c[0]], reverse=True)[:3]
-        return {
-            "hand_rank": HandRank.ONE_PAIR,
-            "hand_name": "One Pair",
-            "description": f"One Pair, {best_pair}s",
-            "cards_used": pair_cards + kickers,
-            "kickers": kickers
-        }
+def get_stage(community_cards: List[str]) -> str:
+    """Betting stage implied by the number of community cards."""
+    return {3: "Flop", 4: "Turn", 5: "River"}.get(len(community_cards), "Pre-flop")
+
+
+def analyze_hand(
+    hole_cards: List[str],
+    community_cards: List[str],
+    opponents: int = 1,
+    **equity_kwargs
+) -> Dict:
+    """
+    Full analysis pipeline shared by /api/poker/analyze and history re-scoring:
+    evaluate_hand -> calculate_hand_equity -> get_action_suggestion.
+
+    Returns {"stage", "evaluation", "ai_response"} in the shape stored in
+    poker_analysis_logs, or {"error": ...} on bad input.
+    """
+    evaluation = evaluate_hand(hole_cards, community_cards)
+    if "error" in evaluation:
+        return evaluation
+
+    equity = calculate_hand_equity(hole_cards, community_cards, opponents, **equity_kwargs)
+    if "error" in equity:
+        return equity
+
+    stage = get_stage(community_cards)
+    suggestion = get_action_suggestion(evaluation, stage, equity)
 
-    # High card
-    sorted_cards = sorted(all_cards, key=lambda c: RANK_VALUES[c[0]], reverse=True)[:5]
-    high = sorted_cards[0][0]
     return {
-        "hand_rank": HandRank.HIGH_CARD,
-        "hand_name": "High Card",
-        "description": f"High Card, {high}",
-        "cards_used": sorted_cards,
-        "kickers": sorted_cards[1:]
+        "stage": stage,
+        "evaluation": {
+            "hand_rank": int(evaluation["hand_rank"]),
+            "hand_value": evaluation.get("hand_value"),
+            "hand_name": evaluation["hand_name"],
+            "description": evaluation["description"]
+        },
+        "ai_response": {
+            "action": suggestion["action"],
+            "potential": suggestion["potential"],
+            "reasoning": suggestion["reasoning"],
+            # Include detailed evaluation for transparency
+            "hand_details": {
+                "hand_name": evaluation["hand_name"],
+                "description": evaluation["description"],
+                "strength": get_hand_strength(evaluation["hand_rank"])
+            },
+            "equity": {
+                "win": equity["win"],
+                "tie": equity["tie"],
+                "lose": equity["lose"],
+                "equity": equity["equity"],
+                "opponents": equity["opponents"],
+                "method": equity["method"]
+            }
+        }
     }
 
 
@@ -326,11 +345,19 @@ def get_hand_strength(hand_rank: HandRank) -> str:
         return "Very Weak"
 
 
-def get_action_suggestion(evaluation: Dict, stage: str) -> Dict:
+def get_action_suggestion(evaluation: Dict, stage: str, equity: Optional[Dict] = None) -> Dict:
     """
     Get a deterministic action suggestion based on hand strength.
     This is a rule-based system, not LLM-based.
+
+    When an `equity` result (from calculate_hand_equity) is given, the
+    suggestion is based on equity relative to a fair share of the pot, so
+    draws and board texture count; otherwise it falls back to the made-hand
+    category alone.
     """
+    if equity and "error" not in equity:
+        return _equity_suggestion(evaluation, stage, equity)
+
     hand_rank = evaluation.get("hand_rank", HandRank.HIGH_CARD)
     strength = get_hand_strength(hand_rank)
 
@@ -380,6 +407,42 @@ def get_action_suggestion(evaluation: Dict, stage: str) -> Dict:
         }
 
 
+def _equity_suggestion(evaluation: Dict, stage: str, equity: Dict) -> Dict:
+    """Equity-based suggestion: compare equity to the 1/(opponents+1) fair share."""
+    opponents = equity.get("opponents", 1)
+    fair_share = 1.0 / (opponents + 1)
+    ratio = equity["equity"] / fair_share
+    against = "1 opponent" if opponents == 1 else f"{opponents} opponents"
+    odds = (f"You win {equity['win']:.0%} and split {equity['tie']:.0%} against {against} "
+            f"({equity['equity']:.0%} equity vs. a fair share of {fair_share:.0%}).")
+    made = f"You have {evaluation['hand_name']} - {evaluation['description']}."
+
+    if ratio >= 1.3:
+        return {
+            "action": "RAISE",
+            "potential": "High",
+            "reasoning": f"{made} {odds} You are well ahead, raise to build the pot."
+        }
+    elif ratio >= 1.0:
+        return {
+            "action": "CALL",
+            "potential": "Medium",
+            "reasoning": f"{made} {odds} You are ahead of your share, calling is profitable."
+        }
+    elif ratio >= 0.6 and stage != "River":
+        return {
+            "action": "CHECK",
+            "potential": "Medium" if ratio >= 0.8 else "Low",
+            "reasoning": f"{made} {odds} You are behind but live, check to see more cards cheaply."
+        }
+    else:
+        return {
+            "action": "FOLD",
+            "potential": "Low",
+            "reasoning": f"{made} {odds} You are unlikely to win this pot, folding is recommended."
+        }
+
+
 # Test function
 if __name__ == "__main__":
     # Test cases
@@ -0,0 +1,170 @@
+"""
+Materialized Poker Analysis Stats
+One poker_stats document per user, maintained with $inc as hands are
+analyzed, so /poker/stats is a single indexed read however long the
+user's poker_analysis_logs history gets.
+
+PRINCIPLES:
+1. Counters only move forward at log-insert time (record_analysis); anything
+   that rewrites stored analyses (poker_batch re-scoring) drops the affected
+   documents instead, and they are rebuilt from the logs on next read
+2. The recent window is kept sorted by timestamp in the document ($push with
+   $sort/$slice), never taken from an unsorted query
+3. A missing document is rebuilt on first read, so backfill is optional
+4. Only successful analyses count (error logs have no ai_response), matching
+   /poker/history
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+RECENT_LIMIT = 10
+
+ACTIONS = ("FOLD", "CHECK", "CALL", "RAISE")
+POTENTIALS = ("Low", "Medium", "High")
+STAGES = ("Pre-flop", "Flop", "Turn", "River")
+
+LOG_PROJECTION = {"_id": 0, "timestamp": 1, "stage": 1, "ai_response.action": 1, "ai_response.potential": 1}
+
+
+# ============== CONTRIBUTIONS ==============
+
+def analysis_item(log: Dict) -> Dict:
+    """The fields of one analysis that stats use (with the legacy defaults)."""
+    ai_response = log.get("ai_response") or {}
+    return {
+        "timestamp": log.get("timestamp"),
+        "action": ai_response.get("action", "CHECK"),
+        "potential": ai_response.get("potential", "Medium"),
+        "stage": log.get("stage", "Flop")
+    }
+
+
+def _counter_increments(item: Dict) -> Dict:
+    increments = {"total_analyses": 1}
+    if item["action"] in ACTIONS:
+        increments[f"actions.{item['action']}"] = 1
+    if item["potential"] in POTENTIALS:
+        increments[f"potentials.{item['potential']}"] = 1
+    if item["stage"] in STAGES:
+        increments[f"stages.{item['stage']}"] = 1
+    return increments
+
+
+def stats_view(doc: Optional[Dict]) -> Dict:
+    """The /poker/stats response for a poker_stats document."""
+    total = (doc or {}).get("total_analyses", 0)
+    if not total:
+        return {
+            "total_analyses": 0,
+            "message": "No poker hands analyzed yet. Use the AI Assistant to get started!"
+        }
+
+    actions = {k: doc.get("actions", {}).get(k, 0) for k in ACTIONS}
+    potentials = {k: doc.get("potentials", {}).get(k, 0) for k in POTENTIALS}
+    stages = {k: doc.get("stages", {}).get(k, 0) for k in STAGES}
+
+    most_common_action = max(actions, key=actions.get) if any(actions.values()) else None
+    action_pcts = {k: round(v / total * 100, 1) for k, v in actions.items()}
+    potential_pcts = {k: round(v / total * 100, 1) for k, v in potentials.items()}
+
+    return {
+        "total_analyses": total,
+        "action_breakdown": actions,
+        "action_percentages": action_pcts,
+        "potential_breakdown": potentials,
+        "potential_percentages": potential_pcts,
+        "stage_breakdown": stages,
+        "most_common_suggestion": most_common_action,
+        "recent_high_potential_hands": sum(1 for r in doc.get("recent", []) if r.get("potential") == "High"),
+        "insights": {
+            "aggressive_play": action_pcts.get("RAISE", 0) > 30,
+            "conservative_play": action_pcts.get("FOLD", 0) > 40,
+            "strong_hands_ratio": potential_pcts.get("High", 0)
+        },
+        "first_analysis": doc.get("first_analysis"),
+        "last_analysis": doc.get("last_analysis")
+    }
+
+
+# ============== WRITES ==============
+
+async def record_analysis(db, log: Dict) -> None:
+    """Fold a newly inserted poker_analysis_logs entry into its user's stats."""
+    if "ai_response" not in log:
+        return
+    item = analysis_item(log)
+    update = {
+        "$inc": _counter_increments(item),
+        "$push": {"recent": {"$each": [item], "$sort": {"timestamp": -1}, "$slice": RECENT_LIMIT}},
+        "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+    }
+    if item["timestamp"] is not None:
+        update["$min"] = {"first_analysis": item["timestamp"]}
+        update["$max"] = {"last_analysis": item["timestamp"]}
+
+    result = await db.poker_stats.update_one({"user_id": log["user_id"]}, update)
+    if result.matched_count == 0:
+        # No document yet: build it from all of the user's logs, not just this one
+        await rebuild_poker_stats(db, log["user_id"])
+
+
+async def rebuild_poker_stats(db, user_id: str) -> Dict:
+    """Recompute a user's poker_stats document from their analysis logs."""
+    query = {"user_id": user_id, "ai_response": {"$exists": True}}
+    doc = {
+        "total_analyses": 0,
+        "actions": {k: 0 for k in ACTIONS},
+        "potentials": {k: 0 for k in POTENTIALS},
+        "stages": {k: 0 for k in STAGES},
+        "first_analysis": None,
+        "last_analysis": None
+    }
+
+    # Streamed, so a long history never sits in memory
+    async for log in db.poker_analysis_logs.find(query, LOG_PROJECTION):
+        item = analysis_item(log)
+        for key, amount in _counter_increments(item).items():
+            if "." in key:
+                group, name = key.split(".", 1)
+                doc[group][name] += amount
+            else:
+                doc[key] += amount
+        timestamp = item["timestamp"]
+        if timestamp is not None:
+            if doc["first_analysis"] is None or timestamp < doc["first_analysis"]:
+                doc["first_analysis"] = timestamp
+            if doc["last_analysis"] is None or timestamp > doc["last_analysis"]:
+                doc["last_analysis"] = timestamp
+
+    recent = await db.poker_analysis_logs.find(query, LOG_PROJECTION).sort(
+        "timestamp", -1
+    ).limit(RECENT_LIMIT).to_list(RECENT_LIMIT)
+    doc["recent"] = [analysis_item(log) for log in recent]
+    doc["updated_at"] = datetime.now(timezone.utc).isoformat()
+    doc["rebuilt_at"] = doc["updated_at"]
+
+    await db.poker_stats.update_one({"user_id": user_id}, {"$set": doc}, upsert=True)
+    doc["user_id"] = user_id
+    return doc
+
+
+async def invalidate_poker_stats(db, user_id: Optional[str] = None) -> None:
+    """Drop stats after stored analyses were rewritten; they rebuild on next read."""
+    await db.poker_stats.delete_many({"user_id": user_id} if user_id else {})
+
+
+# ============== READS ==============
+
+async def get_poker_stats(db, user_id: str) -> Dict:
+    """The user's poker_stats document (rebuilt on first read if missing)."""
+    doc = await db.poker_stats.find_one({"user_id": user_id}, {"_id": 0})
+    if doc is None:
+        doc = await rebuild_poker_stats(db, user_id)
+    return doc
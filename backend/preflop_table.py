@@ -0,0 +1,153 @@
+"""
+Preflop Equity Table
+
+Read side of the precomputed preflop equities built by build_preflop_table.py.
+
+STARTING-HAND CLASSES (169):
+- 13x13 grid indexed row * 13 + col with rank indexes 0..12 = 2..A
+- pairs on the diagonal (row == col), suited where row > col, offsuit where row < col
+
+FILE LAYOUT (data/preflop_equity.bin, little-endian):
+- 16-byte header: magic b"KVTPF", version (uint8), classes (uint16), max opponents (uint16), padding
+- float32[169][9][3]: (win, tie, equity) vs 1..9 random opponents
+- float32[169][169]:  equity of class a vs class b heads-up, averaged over suit combos
+
+The file is memory-mapped read-only, so every worker on a host shares the
+same page-cache copy and lookups are O(1) index reads.
+"""
+
+import logging
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from poker_engine import RANK_CHARS
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+MAGIC = b"KVTPF"
+VERSION = 1
+NUM_CLASSES = 169
+MAX_OPPONENTS = 9
+HEADER = struct.Struct("<5sBHH6x")
+HEADER_SIZE = HEADER.size
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "preflop_equity.bin")
+
+VS_RANDOM_SHAPE = (NUM_CLASSES, MAX_OPPONENTS, 3)
+MATCHUP_SHAPE = (NUM_CLASSES, NUM_CLASSES)
+
+
+# ============== HAND CLASSES ==============
+
+def class_index(card_a: int, card_b: int) -> int:
+    """Starting-hand class (0..168) of two poker_engine card ints."""
+    high, low = max(card_a >> 2, card_b >> 2), min(card_a >> 2, card_b >> 2)
+    if high == low:
+        return high * 13 + high
+    if (card_a & 3) == (card_b & 3):
+        return high * 13 + low
+    return low * 13 + high
+
+
+def class_name(index: int) -> str:
+    """Conventional name of a class: 'AA', 'AKs', 'T9o'."""
+    row, col = divmod(index, 13)
+    if row == col:
+        return RANK_CHARS[row] * 2
+    if row > col:
+        return RANK_CHARS[row] + RANK_CHARS[col] + "s"
+    return RANK_CHARS[col] + RANK_CHARS[row] + "o"
+
+
+def class_combos(index: int) -> List[Tuple[int, int]]:
+    """Every concrete two-card combo in a class (6 pairs, 4 suited or 12 offsuit)."""
+    row, col = divmod(index, 13)
+    high, low = max(row, col), min(row, col)
+    combos = []
+    for suit_a in range(4):
+        for suit_b in range(4):
+            a, b = high * 4 + suit_a, low * 4 + suit_b
+            if row == col and suit_a >= suit_b:
+                continue
+            if row > col and suit_a != suit_b:
+                continue
+            if row < col and suit_a == suit_b:
+                continue
+            combos.append((a, b))
+    return combos
+
+
+# ============== TABLE ==============
+
+class PreflopTable:
+    """Memory-mapped view over a preflop equity file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            magic, version, classes, max_opponents = HEADER.unpack(f.read(HEADER_SIZE))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a preflop equity table (v{VERSION}): {path}")
+        if classes != NUM_CLASSES or max_opponents != MAX_OPPONENTS:
+            raise ValueError(f"Unexpected preflop table shape: {classes} classes, {max_opponents} opponents")
+
+        self.path = path
+        self.vs_random = np.memmap(path, dtype="<f4", mode="r", offset=HEADER_SIZE, shape=VS_RANDOM_SHAPE)
+        matchup_offset = HEADER_SIZE + self.vs_random.nbytes
+        self.matchups = np.memmap(path, dtype="<f4", mode="r", offset=matchup_offset, shape=MATCHUP_SHAPE)
+
+    def equity_vs_random(self, card_a: int, card_b: int, opponents: int = 1) -> Dict:
+        """Win/tie/equity of a starting hand vs `opponents` random hands (1-9)."""
+        if not 1 <= opponents <= MAX_OPPONENTS:
+            raise ValueError(f"Opponents must be between 1 and {MAX_OPPONENTS}")
+        index = class_index(card_a, card_b)
+        win, tie, equity = (float(v) for v in self.vs_random[index, opponents - 1])
+        return {
+            "win": round(win, 4),
+            "tie": round(tie, 4),
+            "lose": round(1.0 - win - tie, 4),
+            "equity": round(equity, 4),
+            "opponents": opponents,
+            "hand_class": class_name(index),
+            "method": "preflop_table"
+        }
+
+    def matchup_equity(self, class_a: int, class_b: int) -> float:
+        """Heads-up equity of class_a against class_b."""
+        return round(float(self.matchups[class_a, class_b]), 4)
+
+
+def write_table(path: str, vs_random: np.ndarray, matchups: np.ndarray) -> None:
+    """Write a table file in the layout above (used by build_preflop_table.py)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, NUM_CLASSES, MAX_OPPONENTS))
+        f.write(np.ascontiguousarray(vs_random, dtype="<f4").tobytes())
+        f.write(np.ascontiguousarray(matchups, dtype="<f4").tobytes())
+    os.replace(tmp_path, path)
+
+
+_table: Optional[PreflopTable] = None
+_load_failed = False
+
+
+def get_preflop_table() -> Optional[PreflopTable]:
+    """
+    Shared table, mapped on first use. Returns None if the artifact is missing
+    or invalid, in which case callers fall back to Monte Carlo.
+    """
+    global _table, _load_failed
+    if _table is None and not _load_failed:
+        try:
+            _table = PreflopTable(TABLE_PATH)
+            logger.info(f"Preflop equity table mapped: {TABLE_PATH}")
+        except (OSError, ValueError) as e:
+            _load_failed = True
+            logger.warning(f"Preflop equity table unavailable, using Monte Carlo: {e}")
+    return _table
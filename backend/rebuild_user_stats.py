@@ -0,0 +1,40 @@
+"""
+Rebuild materialized user_stats documents from players rows
+Run after deploying user_stats, or to repair drift:
+    python rebuild_user_stats.py              # every user with a result
+    python rebuild_user_stats.py --user ID    # one or more users
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from user_stats import rebuild_all_user_stats
+
+load_dotenv()
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'oddside')
+
+
+async def main(user_ids):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    print(f"Rebuilding user_stats in database: {DB_NAME}")
+    started = time.perf_counter()
+    count = await rebuild_all_user_stats(db, user_ids)
+    print(f"✅ Rebuilt {count} user_stats documents in {time.perf_counter() - started:.1f}s")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", action="append", dest="user_ids", help="user_id to rebuild (repeatable)")
+    args = parser.parse_args()
+    asyncio.run(main(args.user_ids))
@@ -0,0 +1,174 @@
+"""
+Socket Room Access
+Cached authorization for Socket.IO join_game / join_group.
+
+PRINCIPLES:
+1. Grants are cached for ROOM_ACCESS_TTL seconds per (room, user), so a
+   reconnect storm re-joining the same rooms costs one lookup per grant, not
+   two or three queries per join
+2. Denials are never cached: a user who was just added to a group or game
+   can join immediately
+3. Removals revoke explicitly (revoke_group / revoke_game) instead of waiting
+   for the TTL; a group revocation also drops game grants that came from
+   that group's membership
+4. Bounded: grants are swept once expired and both maps are capped at
+   ROOM_ACCESS_SIZE entries, so a long-lived worker doesn't keep every
+   (room, user) it has ever seen
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+# Overridable with the ROOM_ACCESS_TTL env var, read when the process-wide
+# cache is created (after load_dotenv), not at import
+ROOM_ACCESS_TTL = 60.0
+ROOM_ACCESS_SIZE = 10000
+
+
+class RoomAccessDenied(Exception):
+    """The user may not join the room; str(e) is the client-facing reason."""
+
+
+# ============== CACHE ==============
+
+class RoomAccessCache:
+    """TTL cache of (room, user) join grants."""
+
+    def __init__(self, ttl: float = ROOM_ACCESS_TTL, max_entries: int = ROOM_ACCESS_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # ("group", group_id, user_id) / ("game", game_id, user_id) -> (expires, group_id),
+        # in expiry order (one TTL for all grants, re-grants move to the end)
+        self._grants: "OrderedDict[Tuple[str, str, str], Tuple[float, str]]" = OrderedDict()
+        # game_id -> group_id (a game never changes group), least recently used first
+        self._game_groups: "OrderedDict[str, str]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "denied": 0}
+
+    def _cached(self, key: Tuple[str, str, str]) -> bool:
+        entry = self._grants.get(key)
+        if entry is None:
+            return False
+        if entry[0] <= time.monotonic():
+            del self._grants[key]
+            return False
+        self.stats["hits"] += 1
+        return True
+
+    def _grant(self, key: Tuple[str, str, str], group_id: str):
+        now = time.monotonic()
+        self._grants[key] = (now + self.ttl, group_id)
+        self._grants.move_to_end(key)
+        # Oldest first: drop what has expired, then whatever exceeds the cap
+        while self._grants:
+            oldest = next(iter(self._grants.values()))
+            if oldest[0] > now and len(self._grants) <= self.max_entries:
+                break
+            self._grants.popitem(last=False)
+
+    def _game_group(self, game_id: str) -> Optional[str]:
+        group_id = self._game_groups.get(game_id)
+        if group_id is not None:
+            self._game_groups.move_to_end(game_id)
+        return group_id
+
+    def _remember_game_group(self, game_id: str, group_id: str):
+        self._game_groups[game_id] = group_id
+        self._game_groups.move_to_end(game_id)
+        while len(self._game_groups) > self.max_entries:
+            self._game_groups.popitem(last=False)
+
+    async def _is_member(self, db, group_id: str, user_id: str) -> bool:
+        membership = await db.group_members.find_one(
+            {'group_id': group_id, 'user_id': user_id, 'status': 'active'},
+            {'_id': 0, 'user_id': 1}
+        )
+        return membership is not None
+
+    async def authorize_group(self, db, group_id: str, user_id: str) -> None:
+        """
+        Raises:
+            RoomAccessDenied: the user is not an active member of the group
+        """
+        key = ("group", group_id, user_id)
+        if self._cached(key):
+            return
+        self.stats["misses"] += 1
+        if not await self._is_member(db, group_id, user_id):
+            self.stats["denied"] += 1
+            raise RoomAccessDenied('Not a member of this group')
+        self._grant(key, group_id)
+
+    async def authorize_game(self, db, game_id: str, user_id: str) -> None:
+        """
+        A user may join a game room if they are an active member of the game's
+        group, or a player in the game (invited).
+
+        Raises:
+            RoomAccessDenied: game missing, has no group, or user not authorized
+        """
+        key = ("game", game_id, user_id)
+        if self._cached(key):
+            return
+        self.stats["misses"] += 1
+
+        group_id = self._game_group(game_id)
+        if group_id is None:
+            game = await db.game_nights.find_one({'game_id': game_id}, {'_id': 0, 'group_id': 1})
+            if not game:
+                self.stats["denied"] += 1
+                raise RoomAccessDenied('Game not found')
+            group_id = game.get('group_id')
+            if not group_id:
+                self.stats["denied"] += 1
+                raise RoomAccessDenied('Invalid game')
+            self._remember_game_group(game_id, group_id)
+
+        # A cached group grant answers the membership half without a query
+        group_key = ("group", group_id, user_id)
+        if not self._cached(group_key):
+            if await self._is_member(db, group_id, user_id):
+                self._grant(group_key, group_id)
+            else:
+                player = await db.players.find_one(
+                    {'game_id': game_id, 'user_id': user_id},
+                    {'_id': 0, 'user_id': 1}
+                )
+                if not player:
+                    self.stats["denied"] += 1
+                    raise RoomAccessDenied('Not authorized to join this game')
+        self._grant(key, group_id)
+
+    # ---- invalidation ----
+
+    def revoke_group(self, group_id: str, user_id: str):
+        """Drop a user's group grant and every game grant under that group."""
+        for key, (_, granted_via) in list(self._grants.items()):
+            if key[2] == user_id and (key[:2] == ("group", group_id) or (key[0] == "game" and granted_via == group_id)):
+                del self._grants[key]
+
+    def revoke_game(self, game_id: str, user_id: str):
+        """Drop a user's game grant (e.g. removed from the game)."""
+        self._grants.pop(("game", game_id, user_id), None)
+
+    def clear(self):
+        self._grants.clear()
+        self._game_groups.clear()
+
+
+_room_access: Optional[RoomAccessCache] = None
+
+
+def get_room_access() -> RoomAccessCache:
+    """Process-wide room access cache (created on first use)."""
+    global _room_access
+    if _room_access is None:
+        _room_access = RoomAccessCache(ttl=float(os.environ.get("ROOM_ACCESS_TTL", ROOM_ACCESS_TTL)))
+    return _room_access
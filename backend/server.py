@@ -14,10 +14,25 @@ import uuid
 import random
 from datetime import datetime, timezone, timedelta
 import httpx
-import jwt
-from jwt import PyJWKClient
 import socketio
 import wallet_service
+from settlement_engine import optimize_settlement
+from ledger_balances import build_balances, build_consolidated, build_consolidated_detailed
+from enrichment import fetch_games, fetch_users
+from user_stats import get_user_stats, record_game_results, stats_view
+from group_leaderboards import WINDOWS as LEADERBOARD_WINDOWS, get_group_leaderboard, refresh_group_leaderboards_safe
+from game_history import DEFAULT_PAGE_SIZE as DEFAULT_HISTORY_PAGE_SIZE, InvalidCursor, backfill_game_sort_at, fetch_game_history, history_fields
+from hash_executor import get_pin_hash_executor
+from ledger_netting import NettingConflict, apply_netting_plan, compute_group_netting, load_group_pending_entries
+from auth_tokens import TokenExpired, get_token_verifier
+from user_cache import get_user_cache, user_cache_middleware
+from room_access import RoomAccessDenied
+from game_sync import publish_delta as publish_game_delta
+from game_detail import etag_matches, fetch_game_detail, fetch_game_version, game_etag, view_cards_digest
+from game_writes import PlayerWriteRejected, apply_buy_in, apply_cash_out, merge_duplicate_players
+from index_registry import ensure_indexes
+from user_search import backfill_search_tokens, find_users, search_fields
+import poker_stats
 
 # Setup logging early
 logging.basicConfig(level=logging.INFO)
@@ -72,22 +87,16 @@ def get_orchestrator():
             return None
     return _orchestrator
 
-# Supabase config
-SUPABASE_JWT_SECRET = os.environ.get('SUPABASE_JWT_SECRET', '')
-SUPABASE_URL = os.environ.get('SUPABASE_URL', '')
+# Supabase JWT verification (JWKS keys and verified claims are cached in auth_tokens)
+token_verifier = get_token_verifier()
 
-# Initialize JWKS client for RS256 verification (new Supabase signing keys)
-jwks_client = None
-if SUPABASE_URL:
-    try:
-        jwks_url = f"{SUPABASE_URL.rstrip('/')}/auth/v1/jwks"
-        jwks_client = PyJWKClient(jwks_url)
-        logger.info(f"✅ JWKS client initialized: {jwks_url}")
-    except Exception as e:
-        logger.warning(f"Failed to initialize JWKS client: {e}")
+# Short-TTL user/session cache with per-request memoization (see user_cache)
+user_cache = get_user_cache()
 
 # Import WebSocket manager
 from websocket_manager import sio, emit_game_event, notify_player_joined, notify_buy_in, notify_cash_out, notify_chips_edited, notify_game_message, notify_game_state_change, emit_notification, emit_group_message, emit_group_typing
+import websocket_manager
+websocket_manager.init_db(db)
 
 # Create the main app
 fastapi_app = FastAPI(title="ODDSIDE API")
@@ -498,6 +507,10 @@ class LedgerEditRequest(BaseModel):
     amount: float
     reason: str
 
+class LedgerOptimizeRequest(BaseModel):
+    group_id: Optional[str] = None
+    dry_run: bool = True
+
 class InviteMemberRequest(BaseModel):
     email: str
 
@@ -582,45 +595,21 @@ class RegisterPushTokenRequest(BaseModel):
 
 # ============== AUTH HELPERS ==============
 
-async def verify_supabase_jwt(token: str) -> dict:
+async def verify_supabase_jwt(token: str) -> Optional[dict]:
     """
-    Verify Supabase JWT using either:
-    1. New JWKS method (RS256) - auto-fetches public keys
-    2. Legacy secret method (HS256) - uses shared secret
+    Verify a Supabase JWT (RS256 via JWKS, then legacy HS256) using the
+    shared verifier; repeat tokens are served from its claims cache.
     """
-    # Try new JWKS method first (RS256)
-    if jwks_client:
-        try:
-            signing_key = jwks_client.get_signing_key_from_jwt(token)
-            payload = jwt.decode(
-                token,
-                signing_key.key,
-                algorithms=["RS256"],
-                audience="authenticated"
-            )
-            logger.debug("JWT verified using JWKS (RS256)")
-            return payload
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token expired")
-        except Exception as e:
-            logger.debug(f"JWKS verification failed: {e}")
-
-    # Fallback to legacy secret method (HS256)
-    if SUPABASE_JWT_SECRET:
-        try:
-            payload = jwt.decode(
-                token,
-                SUPABASE_JWT_SECRET,
-                algorithms=["HS256"],
-                audience="authenticated"
-            )
-            logger.debug("JWT verified using legacy secret (HS256)")
-            return payload
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token expired")
-        except Exception as e:
-            logger.debug(f"Legacy secret verification failed: {e}")
-
+    try:
+        return await token_verifier.verify(token)
+    except TokenExpired:
+        raise HTTPException(status_code=401, detail="Token expired")
+
+async def _session_user_doc(session_token: str) -> Optional[dict]:
+    """User document for a live session token (cached, see user_cache)."""
+    session_doc = await user_cache.get_session(db, session_token)
+    if session_doc:
+        return await user_cache.get_user(db, session_doc["user_id"])
     return None
 
 async def get_current_user(request: Request) -> User:
@@ -631,60 +620,36 @@ async def get_current_user(request: Request) -> User:
         token = auth_header.split(" ")[1]
 
         # Try Supabase JWT first (with JWKS or legacy secret)
-        if jwks_client or SUPABASE_JWT_SECRET:
+        if token_verifier.enabled:
             payload = await verify_supabase_jwt(token)
             if payload:
-                supabase_id = payload.get("sub")
-                user_doc = await db.users.find_one(
-                    {"supabase_id": supabase_id},
-                    {"_id": 0}
-                )
+                user_doc = await user_cache.get_user_by_supabase_id(db, payload.get("sub"))
                 if user_doc:
                     return User(**user_doc)
         
         # Fallback to session token
-        session_doc = await db.user_sessions.find_one(
-            {"session_token": token},
-            {"_id": 0}
-        )
-        if session_doc:
-            expires_at = session_doc["expires_at"]
-            if isinstance(expires_at, str):
-                expires_at = datetime.fromisoformat(expires_at)
-            if expires_at.tzinfo is None:
-                expires_at = expires_at.replace(tzinfo=timezone.utc)
-            if expires_at >= datetime.now(timezone.utc):
-                user_doc = await db.users.find_one(
-                    {"user_id": session_doc["user_id"]},
-                    {"_id": 0}
-                )
-                if user_doc:
-                    return User(**user_doc)
+        user_doc = await _session_user_doc(token)
+        if user_doc:
+            return User(**user_doc)
     
     # Check cookie
     session_token = request.cookies.get("session_token")
     if session_token:
-        session_doc = await db.user_sessions.find_one(
-            {"session_token": session_token},
-            {"_id": 0}
-        )
-        
-        if session_doc:
-            expires_at = session_doc["expires_at"]
-            if isinstance(expires_at, str):
-                expires_at = datetime.fromisoformat(expires_at)
-            if expires_at.tzinfo is None:
-                expires_at = expires_at.replace(tzinfo=timezone.utc)
-            if expires_at >= datetime.now(timezone.utc):
-                user_doc = await db.users.find_one(
-                    {"user_id": session_doc["user_id"]},
-                    {"_id": 0}
-                )
-                if user_doc:
-                    return User(**user_doc)
+        user_doc = await _session_user_doc(session_token)
+        if user_doc:
+            return User(**user_doc)
     
     raise HTTPException(status_code=401, detail="Not authenticated")
 
+# Platform admins for maintenance endpoints (comma-separated emails)
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()}
+
+async def get_admin_user(user: User = Depends(get_current_user)) -> User:
+    """Require a platform admin (email listed in ADMIN_EMAILS)."""
+    if not user.email or user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
 # ============== AUTH ENDPOINTS ==============
 
 class SyncUserRequest(BaseModel):
@@ -706,14 +671,17 @@ async def sync_user(data: SyncUserRequest, response: Response):
     
     if existing_user:
         user_id = existing_user["user_id"]
+        name = data.name or existing_user.get("name")
         await db.users.update_one(
             {"user_id": user_id},
             {"$set": {
                 "supabase_id": data.supabase_id,
-                "name": data.name or existing_user.get("name"),
-                "picture": data.picture or existing_user.get("picture")
+                "name": name,
+                "picture": data.picture or existing_user.get("picture"),
+                **search_fields(name, existing_user.get("email"))
             }}
         )
+        user_cache.invalidate_user(user_id)
         is_new_user = False
     else:
         new_user = {
@@ -724,6 +692,7 @@ async def sync_user(data: SyncUserRequest, response: Response):
             "picture": data.picture,
             "created_at": datetime.now(timezone.utc).isoformat()
         }
+        new_user.update(search_fields(new_user["name"], data.email))
         await db.users.insert_one(new_user)
         is_new_user = True
         
@@ -816,13 +785,16 @@ async def create_session(request: SessionRequest, response: Response):
     
     if existing_user:
         user_id = existing_user["user_id"]
+        name = data.get("name", existing_user.get("name"))
         await db.users.update_one(
             {"user_id": user_id},
             {"$set": {
-                "name": data.get("name", existing_user.get("name")),
-                "picture": data.get("picture", existing_user.get("picture"))
+                "name": name,
+                "picture": data.get("picture", existing_user.get("picture")),
+                **search_fields(name, existing_user.get("email"))
             }}
         )
+        user_cache.invalidate_user(user_id)
     else:
         new_user = {
             "user_id": user_id,
@@ -831,6 +803,7 @@ async def create_session(request: SessionRequest, response: Response):
             "picture": data.get("picture"),
             "created_at": datetime.now(timezone.utc).isoformat()
         }
+        new_user.update(search_fields(new_user["name"], data["email"]))
         await db.users.insert_one(new_user)
     
     # Create session
@@ -871,6 +844,7 @@ async def logout(request: Request, response: Response):
     session_token = request.cookies.get("session_token")
     if session_token:
         await db.user_sessions.delete_many({"session_token": session_token})
+        user_cache.invalidate_session(session_token)
     
     response.delete_cookie(key="session_token", path="/")
     return {"message": "Logged out successfully"}
@@ -1141,14 +1115,17 @@ async def update_user_profile(data: dict, user: User = Depends(get_current_user)
     """Update current user's profile."""
     allowed_fields = {"name", "nickname", "preferences", "help_improve_ai"}
     update_data = {k: v for k, v in data.items() if k in allowed_fields}
+    if "name" in update_data:
+        update_data.update(search_fields(update_data["name"], user.email))
 
     if update_data:
         await db.users.update_one(
             {"user_id": user.user_id},
             {"$set": update_data}
         )
+        user_cache.invalidate_user(user.user_id)
 
-    updated_user = await db.users.find_one({"user_id": user.user_id}, {"_id": 0})
+    updated_user = await user_cache.get_user(db, user.user_id)
     return updated_user or {"status": "updated"}
 
 @api_router.get("/users/search")
@@ -1157,19 +1134,8 @@ async def search_users(query: str, user: User = Depends(get_current_user)):
     if len(query) < 2:
         return []
     
-    # Search by name or email (case-insensitive)
-    users = await db.users.find(
-        {
-            "$or": [
-                {"name": {"$regex": query, "$options": "i"}},
-                {"email": {"$regex": query, "$options": "i"}}
-            ],
-            "user_id": {"$ne": user.user_id}  # Exclude self
-        },
-        {"_id": 0, "user_id": 1, "name": 1, "email": 1, "picture": 1, "level": 1}
-    ).to_list(20)
-    
-    return users
+    # Prefix match on name words or email (see user_search), excluding self
+    return await find_users(db, query, exclude_user_id=user.user_id, limit=20)
 
 @api_router.get("/users/invites")
 async def get_my_invites(user: User = Depends(get_current_user)):
@@ -1298,6 +1264,7 @@ async def remove_group_member(group_id: str, member_id: str, user: User = Depend
     
     # Remove membership (but keep player records for stats)
     await db.group_members.delete_one({"group_id": group_id, "user_id": member_id})
+    await websocket_manager.revoke_group_member(group_id, member_id)
     
     # Get member name for notification
     removed_user = await db.users.find_one({"user_id": member_id}, {"_id": 0, "name": 1})
@@ -1425,18 +1392,13 @@ async def transfer_group_admin(group_id: str, data: dict, user: User = Depends(g
 @api_router.get("/users/me/badges")
 async def get_my_badges(user: User = Depends(get_current_user)):
     """Get current user's badges and level progress."""
-    user_doc = await db.users.find_one({"user_id": user.user_id}, {"_id": 0})
-    
-    # Calculate stats
-    players = await db.players.find(
-        {"user_id": user.user_id, "net_result": {"$ne": None}},
-        {"_id": 0}
-    ).to_list(1000)
+    user_doc = await user_cache.get_user(db, user.user_id) or {}
     
-    total_games = len(players)
-    total_profit = sum(p.get("net_result", 0) for p in players)
-    wins = sum(1 for p in players if p.get("net_result", 0) > 0)
-    win_rate = (wins / total_games * 100) if total_games > 0 else 0
+    stats = stats_view(await get_user_stats(db, user.user_id))
+    total_games = stats["total_games"]
+    total_profit = stats["net_profit"]
+    wins = stats["wins"]
+    win_rate = stats["win_rate"]
     
     # Determine current level
     current_level = LEVELS[0]
@@ -1488,68 +1450,33 @@ async def get_levels():
     return {"levels": LEVELS, "badges": BADGES}
 
 @api_router.get("/users/game-history")
-async def get_game_history(user: User = Depends(get_current_user)):
-    """Get user's complete game history with stats."""
-    # Get all games where user was a player
-    player_records = await db.players.find(
-        {"user_id": user.user_id},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    game_ids = [p["game_id"] for p in player_records]
-    
-    # Get game details
-    games = []
-    total_winnings = 0
-    total_losses = 0
-    wins = 0
-    
-    for player in player_records:
-        game = await db.game_nights.find_one(
-            {"game_id": player["game_id"]},
-            {"_id": 0}
-        )
-        if game:
-            # Get group info
-            group = await db.groups.find_one(
-                {"group_id": game["group_id"]},
-                {"_id": 0, "name": 1}
-            )
-            
-            net_result = player.get("net_result", 0)
-            
-            games.append({
-                "game_id": game["game_id"],
-                "title": game.get("title", "Game Night"),
-                "status": game["status"],
-                "created_at": game.get("created_at", game.get("started_at")),
-                "group": {"name": group.get("name") if group else "Unknown"},
-                "net_result": net_result if player.get("cashed_out") else None,
-                "total_buy_in": player.get("total_buy_in", 0),
-                "cashed_out": player.get("cashed_out", False)
-            })
-            
-            if player.get("cashed_out") and net_result is not None:
-                if net_result > 0:
-                    total_winnings += net_result
-                    wins += 1
-                else:
-                    total_losses += net_result
-    
-    # Sort by date (newest first)
-    games.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    
-    # Calculate stats
-    completed_games = [g for g in games if g.get("cashed_out")]
-    win_rate = (wins / len(completed_games) * 100) if completed_games else 0
-    
+async def get_game_history(
+    limit: int = DEFAULT_HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    user: User = Depends(get_current_user)
+):
+    """
+    Get user's game history (newest first) with stats.
+
+    Paginated: pass the returned next_cursor to get the following page.
+    Stats come from the materialized user_stats document.
+    """
+    try:
+        page = await fetch_game_history(db, user.user_id, limit, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    stats = stats_view(await get_user_stats(db, user.user_id))
+
     return {
-        "games": games,
+        "games": page["games"],
+        "next_cursor": page["next_cursor"],
+        "has_more": page["next_cursor"] is not None,
         "stats": {
-            "totalGames": len(games),
-            "totalWinnings": total_winnings,
-            "totalLosses": total_losses,
-            "winRate": win_rate
+            "totalGames": stats["total_games"],
+            "totalWinnings": stats["gross_winnings"],
+            "totalLosses": stats["gross_losses"],
+            "winRate": stats["win_rate"]
         }
     }
 
@@ -1570,6 +1497,7 @@ async def remove_member(group_id: str, member_user_id: str, user: User = Depends
     await db.group_members.delete_one(
         {"group_id": group_id, "user_id": member_user_id}
     )
+    await websocket_manager.revoke_group_member(group_id, member_user_id)
     
     return {"message": "Member removed"}
 
@@ -1625,6 +1553,7 @@ async def create_game(data: GameNightCreate, user: User = Depends(get_current_us
     )
     player_dict = player.model_dump()
     player_dict["joined_at"] = player_dict["joined_at"].isoformat()
+    player_dict.update(history_fields(game_dict))
     await db.players.insert_one(player_dict)
     
     # Update game's total chips distributed if auto buy-in was added
@@ -1671,6 +1600,7 @@ async def create_game(data: GameNightCreate, user: User = Depends(get_current_us
             )
             init_player_dict = init_player.model_dump()
             init_player_dict["joined_at"] = init_player_dict["joined_at"].isoformat()
+            init_player_dict.update(history_fields(game_dict))
             await db.players.insert_one(init_player_dict)
 
             # Update game's total chips distributed
@@ -1801,84 +1731,53 @@ async def get_games(group_id: Optional[str] = None, user: User = Depends(get_cur
     
     return games
 
+async def publish_game_state(game_id: str, user_ids=(), removed=(), transactions=(), game_fields=()):
+    """Bump the game's state_version and push the delta to its live room (see game_sync)."""
+    await publish_game_delta(db, game_id, user_ids, removed, transactions, game_fields)
+
 @api_router.get("/games/{game_id}")
-async def get_game(game_id: str, user: User = Depends(get_current_user)):
-    """Get game details."""
-    game = await db.game_nights.find_one({"game_id": game_id}, {"_id": 0})
+async def get_game(game_id: str, request: Request, response: Response, user: User = Depends(get_current_user)):
+    """Get game details (one aggregation; revalidate with If-None-Match, see game_detail)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        head = await fetch_game_version(db, game_id, user.user_id)
+        if head and head["group_id"] and head["is_member"]:
+            etag = game_etag(game_id, head["state_version"], user.user_id, head["cards"])
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    game = await fetch_game_detail(db, game_id, user.user_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
 
     # Check for required fields to prevent KeyError crashes
-    group_id = game.get("group_id")
-    host_id = game.get("host_id")
-    if not group_id:
+    if not game.get("group_id"):
         raise HTTPException(status_code=404, detail="Game data is corrupted (missing group)")
 
     # Verify membership
-    membership = await db.group_members.find_one(
-        {"group_id": group_id, "user_id": user.user_id},
-        {"_id": 0}
-    )
-    if not membership:
+    if not game.pop("_membership"):
         raise HTTPException(status_code=403, detail="Not a member of this group")
-    
-    # Get players
-    players = await db.players.find({"game_id": game_id}, {"_id": 0}).to_list(100)
-    
-    if players:
-        # Batch fetch user info for all players
-        user_ids = [p["user_id"] for p in players]
-        users = await db.users.find(
-            {"user_id": {"$in": user_ids}},
-            {"_id": 0, "user_id": 1, "name": 1, "picture": 1}
-        ).to_list(100)
-        user_map = {u["user_id"]: u for u in users}
-        
-        # Batch fetch all transactions for this game
-        txns = await db.transactions.find(
-            {"game_id": game_id},
-            {"_id": 0}
-        ).to_list(1000)
-        txn_map = {}
-        for txn in txns:
-            if txn["user_id"] not in txn_map:
-                txn_map[txn["user_id"]] = []
-            txn_map[txn["user_id"]].append(txn)
-        
-        # Apply to players
-        for player in players:
-            player["user"] = user_map.get(player["user_id"])
-            player["transactions"] = txn_map.get(player["user_id"], [])
-            player["buy_in_count"] = len([t for t in player["transactions"] if t.get("type") == "buy_in"])
-            # Calculate net_result for settlement display (handle None values)
-            cash_out = player.get("cash_out") or 0
-            total_buy_in = player.get("total_buy_in") or 0
-            player["net_result"] = cash_out - total_buy_in
-    
-    game["players"] = players
-    
-    # Get group info
-    group = await db.groups.find_one({"group_id": group_id}, {"_id": 0})
-    game["group"] = group
 
-    # Get host info (handle missing host_id gracefully)
-    host = None
-    if host_id:
-        host = await db.users.find_one(
-            {"user_id": host_id},
-            {"_id": 0, "user_id": 1, "name": 1, "picture": 1}
-        )
-    game["host"] = host
-
-    # Check if current user is host
-    game["is_host"] = host_id == user.user_id if host_id else False
-    
-    # Get current user's player record (already in players list)
-    current_player = next((p for p in players if p["user_id"] == user.user_id), None)
-    game["current_player"] = current_player
-    
+    response.headers["ETag"] = game_etag(game_id, game["state_version"], user.user_id, view_cards_digest(game))
+    response.headers["Cache-Control"] = "private, no-cache"
     return game
 
+@api_router.get("/games/{game_id}/presence")
+async def get_game_online_players(game_id: str, user: User = Depends(get_current_user)):
+    """Users currently connected to the game's live room."""
+    try:
+        await websocket_manager.room_access.authorize_game(db, game_id, user.user_id)
+    except RoomAccessDenied as e:
+        raise HTTPException(status_code=404 if str(e) == "Game not found" else 403, detail=str(e))
+
+    online = await websocket_manager.get_game_presence(game_id)
+    users = await fetch_users(db, online)
+    return {
+        "game_id": game_id,
+        "online_count": len(online),
+        "online": [users.get(user_id) or {"user_id": user_id} for user_id in online]
+    }
+
 @api_router.post("/games/{game_id}/start")
 async def start_game(game_id: str, user: User = Depends(get_current_user)):
     """Start a scheduled game (host only). Requires minimum 2 players."""
@@ -1914,6 +1813,7 @@ async def start_game(game_id: str, user: User = Depends(get_current_user)):
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    await publish_game_state(game_id)
     
     # Add system message to thread
     message = GameThread(
@@ -1946,81 +1846,6 @@ async def start_game(game_id: str, user: User = Depends(get_current_user)):
     return {"message": "Game started", "player_count": player_count}
 
 
-def optimize_settlement(net_results: list) -> dict:
-    """
-    Deterministic minimum-transaction settlement algorithm.
-    All math in integer cents — no float arithmetic.
-
-    Input:  [{"user_id": str, "net_cents": int}]
-            positive = should receive, negative = owes
-    Output: {
-        "transfers": [{"from_user_id", "to_user_id", "amount_cents": int}],
-        "stats": {"possible_payments": int, "optimized_payments": int}
-    }
-    """
-    # Build creditor/debtor lists
-    creditors = []  # (user_id, amount_cents) — positive
-    debtors = []    # (user_id, amount_cents) — positive (abs of what they owe)
-
-    for p in net_results:
-        cents = p["net_cents"]
-        if cents > 0:
-            creditors.append((p["user_id"], cents))
-        elif cents < 0:
-            debtors.append((p["user_id"], -cents))
-
-    # Deterministic sort: descending by amount, tie-break by user_id
-    creditors.sort(key=lambda x: (-x[1], x[0]))
-    debtors.sort(key=lambda x: (-x[1], x[0]))
-
-    # Verify balance: total debts must equal total credits
-    total_credit = sum(c[1] for c in creditors)
-    total_debt = sum(d[1] for d in debtors)
-
-    # Handle tiny rounding remainder (1 cent max) — assign to largest creditor
-    if total_debt != total_credit and abs(total_debt - total_credit) <= 1 and creditors:
-        diff = total_debt - total_credit
-        creditors[0] = (creditors[0][0], creditors[0][1] + diff)
-        total_credit += diff
-
-    # Count active players (non-zero net) for possible payments calc
-    active_players = len(creditors) + len(debtors)
-    possible_payments = (active_players * (active_players - 1)) // 2 if active_players > 1 else 0
-
-    # Greedy matching
-    transfers = []
-    i, j = 0, 0
-
-    while i < len(debtors) and j < len(creditors):
-        debtor_id, debtor_amt = debtors[i]
-        creditor_id, creditor_amt = creditors[j]
-
-        pay = min(debtor_amt, creditor_amt)
-
-        if pay > 0:
-            transfers.append({
-                "from_user_id": debtor_id,
-                "to_user_id": creditor_id,
-                "amount_cents": pay
-            })
-
-        debtors[i] = (debtor_id, debtor_amt - pay)
-        creditors[j] = (creditor_id, creditor_amt - pay)
-
-        if debtors[i][1] <= 0:
-            i += 1
-        if creditors[j][1] <= 0:
-            j += 1
-
-    return {
-        "transfers": transfers,
-        "stats": {
-            "possible_payments": possible_payments,
-            "optimized_payments": len(transfers)
-        }
-    }
-
-
 async def auto_generate_settlement(game_id: str, game: dict, players: list, generated_by: str = "system") -> dict:
     """
     Smart Settlement — generates optimized settlement using integer cents.
@@ -2043,10 +1868,11 @@ async def auto_generate_settlement(game_id: str, game: dict, players: list, gene
             "net_cents": net_cents
         })
 
-    # Run deterministic optimization
+    # Run deterministic minimum-transfer optimization
     result = optimize_settlement(net_results)
     transfers = result["transfers"]
     stats = result["stats"]
+    algorithm_version = result["algorithm_version"]
 
     # Convert cents back to float for storage (backwards compat)
     settlements = []
@@ -2087,6 +1913,7 @@ async def auto_generate_settlement(game_id: str, game: dict, players: list, gene
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    await publish_game_state(game_id)
 
     # Settlement audit trail
     existing_runs = await db.settlement_runs.count_documents({"game_id": game_id})
@@ -2098,7 +1925,7 @@ async def auto_generate_settlement(game_id: str, game: dict, players: list, gene
         "settlement_version": settlement_version,
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "generated_by": generated_by,
-        "algorithm_version": "greedy_v2_cents",
+        "algorithm_version": algorithm_version,
         "input_snapshot": {"players": input_snapshot},
         "output_payments_count": len(settlements),
         "output_total_amount_cents": sum(t["amount_cents"] for t in transfers),
@@ -2107,8 +1934,12 @@ async def auto_generate_settlement(game_id: str, game: dict, players: list, gene
     }
     await db.settlement_runs.insert_one(audit_record)
 
+    # Fold final (possibly host-corrected) results into each player's user_stats and the group leaderboards
+    await record_game_results(db, game, [p["user_id"] for p in players])
+    await refresh_group_leaderboards_safe(db, game["group_id"])
+
     logger.info(f"Settlement v{settlement_version} for game {game_id}: {stats['optimized_payments']} transactions (from {stats['possible_payments']} possible)")
-    return {"settlements": settlements, "stats": stats, "audit": {"version": settlement_version, "algorithm": "greedy_v2_cents"}}
+    return {"settlements": settlements, "stats": stats, "audit": {"version": settlement_version, "algorithm": algorithm_version}}
 
 
 @api_router.post("/games/{game_id}/end")
@@ -2156,6 +1987,7 @@ async def end_game(game_id: str, user: User = Depends(get_current_user)):
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    await publish_game_state(game_id)
 
     # Add system message
     message = GameThread(
@@ -2261,6 +2093,7 @@ async def update_game(game_id: str, data: GameNightUpdate, user: User = Depends(
     
     if update_data:
         await db.game_nights.update_one({"game_id": game_id}, {"$set": update_data})
+        await publish_game_state(game_id, game_fields=update_data.keys())
     
     return {"message": "Game updated"}
 
@@ -2292,6 +2125,7 @@ async def cancel_game(game_id: str, data: CancelGameRequest, user: User = Depend
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    await publish_game_state(game_id)
     
     # Add system message
     message = GameThread(
@@ -2338,7 +2172,9 @@ async def rsvp_game(game_id: str, data: RSVPRequest, user: User = Depends(get_cu
             user_id=user.user_id,
             rsvp_status=data.status
         )
-        await db.players.insert_one(player.model_dump())
+        await db.players.insert_one({**player.model_dump(), **history_fields(game)})
+
+    await publish_game_state(game_id, [user.user_id])
     
     return {"message": "RSVP updated"}
 
@@ -2381,7 +2217,9 @@ async def join_game(game_id: str, user: User = Depends(get_current_user)):
             user_id=user.user_id,
             rsvp_status="pending"
         )
-        await db.players.insert_one(player.model_dump())
+        await db.players.insert_one({**player.model_dump(), **history_fields(game)})
+
+    await publish_game_state(game_id, [user.user_id])
     
     # Send notification to host
     notification = Notification(
@@ -2461,6 +2299,7 @@ async def approve_join(game_id: str, data: dict, user: User = Depends(get_curren
     txn_dict = txn.model_dump()
     txn_dict["timestamp"] = txn_dict["timestamp"].isoformat()
     await db.transactions.insert_one(txn_dict)
+    await publish_game_state(game_id, [player_user_id], transactions=[txn_dict])
     
     # Get player name
     player_user = await db.users.find_one({"user_id": player_user_id}, {"_id": 0})
@@ -2515,6 +2354,8 @@ async def reject_join(game_id: str, data: dict, user: User = Depends(get_current
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=400, detail="No pending request found")
+    await websocket_manager.revoke_game_player(game_id, player_user_id)
+    await publish_game_state(game_id, removed=[player_user_id])
     
     # Notify the player
     notification = Notification(
@@ -2604,7 +2445,7 @@ async def add_player_to_game(game_id: str, data: dict, user: User = Depends(get_
             total_chips=chips_per_buy_in,
             buy_in_count=1
         )
-        await db.players.insert_one(player.model_dump())
+        await db.players.insert_one({**player.model_dump(), **history_fields(game)})
 
     # Update game's total chips distributed
     await db.game_nights.update_one(
@@ -2625,6 +2466,7 @@ async def add_player_to_game(game_id: str, data: dict, user: User = Depends(get_
     txn_dict = txn.model_dump()
     txn_dict["timestamp"] = txn_dict["timestamp"].isoformat()
     await db.transactions.insert_one(txn_dict)
+    await publish_game_state(game_id, [player_user_id], transactions=[txn_dict])
     
     # Get player name
     player_user = await db.users.find_one({"user_id": player_user_id}, {"_id": 0})
@@ -2672,7 +2514,8 @@ async def remove_player_from_game(game_id: str, data: dict, user: User = Depends
     if (player.get("total_buy_in") or 0) > 0:
         raise HTTPException(status_code=400, detail="Cannot remove a player who has already bought in. Use cash-out instead.")
     await db.players.delete_one({"game_id": game_id, "user_id": player_user_id})
-    await sio.emit("game_update", {"game_id": game_id})
+    await websocket_manager.revoke_game_player(game_id, player_user_id)
+    await publish_game_state(game_id, removed=[player_user_id])
     return {"message": "Player removed"}
 
 @api_router.get("/games/{game_id}/available-players")
@@ -2732,21 +2575,6 @@ async def approve_buy_in(game_id: str, data: dict, user: User = Depends(get_curr
         buy_in_amount = game.get("buy_in_amount", 20.0)
         chips = int((amount / buy_in_amount) * chips_per_buy_in)
     
-    # Update player
-    result = await db.players.update_one(
-        {"game_id": game_id, "user_id": player_user_id},
-        {"$inc": {"total_buy_in": amount, "total_chips": chips, "buy_in_count": 1}}
-    )
-    
-    if result.modified_count == 0:
-        raise HTTPException(status_code=400, detail="Player not found")
-    
-    # Update game's total chips distributed
-    await db.game_nights.update_one(
-        {"game_id": game_id},
-        {"$inc": {"total_chips_distributed": chips}}
-    )
-    
     # Create transaction record
     txn = Transaction(
         game_id=game_id,
@@ -2759,7 +2587,13 @@ async def approve_buy_in(game_id: str, data: dict, user: User = Depends(get_curr
     )
     txn_dict = txn.model_dump()
     txn_dict["timestamp"] = txn_dict["timestamp"].isoformat()
-    await db.transactions.insert_one(txn_dict)
+
+    # Player totals, transaction and game counter (see game_writes)
+    try:
+        await apply_buy_in(db, txn_dict, missing="Player not found")
+    except PlayerWriteRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await publish_game_state(game_id, [player_user_id], transactions=[txn_dict])
     
     # Get player name
     player_user = await db.users.find_one({"user_id": player_user_id}, {"_id": 0})
@@ -2810,26 +2644,6 @@ async def add_buy_in(game_id: str, data: BuyInRequest, user: User = Depends(get_
     # Calculate chips to give (based on amount paid vs standard buy-in)
     chips = data.chips if data.chips else int((data.amount / buy_in_amount) * chips_per_buy_in)
     
-    # Check if player exists
-    player = await db.players.find_one(
-        {"game_id": game_id, "user_id": user.user_id},
-        {"_id": 0}
-    )
-    
-    if not player:
-        # Auto-join if not already a player
-        player_doc = Player(
-            game_id=game_id,
-            user_id=user.user_id,
-            rsvp_status="yes",
-            total_buy_in=0,
-            total_chips=0
-        )
-        player_dict = player_doc.model_dump()
-        player_dict["joined_at"] = player_dict["joined_at"].isoformat()
-        await db.players.insert_one(player_dict)
-        player = player_dict
-    
     # Create transaction with chip info
     txn = Transaction(
         game_id=game_id,
@@ -2841,30 +2655,21 @@ async def add_buy_in(game_id: str, data: BuyInRequest, user: User = Depends(get_
     )
     txn_dict = txn.model_dump()
     txn_dict["timestamp"] = txn_dict["timestamp"].isoformat()
-    await db.transactions.insert_one(txn_dict)
-    
-    # Update player totals
-    new_total_buy_in = player.get("total_buy_in", 0) + data.amount
-    new_total_chips = player.get("total_chips", 0) + chips
-    
-    await db.players.update_one(
-        {"game_id": game_id, "user_id": user.user_id},
-        {"$set": {
-            "total_buy_in": new_total_buy_in,
-            "total_chips": new_total_chips
-        }}
-    )
-    
-    # Update game's total chips distributed
-    await db.game_nights.update_one(
-        {"game_id": game_id},
-        {"$inc": {"total_chips_distributed": chips}}
-    )
+
+    # Auto-join if not already a player
+    player_doc = Player(game_id=game_id, user_id=user.user_id, rsvp_status="yes")
+    player_dict = player_doc.model_dump()
+    player_dict["joined_at"] = player_dict["joined_at"].isoformat()
+    player_dict.update(history_fields(game))
+
+    # Atomic $inc of the player's totals, then the transaction and game counter (see game_writes)
+    player = await apply_buy_in(db, txn_dict, new_player=player_dict)
+    await publish_game_state(game_id, [user.user_id], transactions=[txn_dict])
     
     return {
         "message": "Buy-in added",
-        "total_buy_in": new_total_buy_in,
-        "total_chips": new_total_chips,
+        "total_buy_in": player["total_buy_in"],
+        "total_chips": player["total_chips"],
         "chips_received": chips,
         "chip_value": chip_value
     }
@@ -2896,18 +2701,6 @@ async def admin_buy_in(game_id: str, data: AdminBuyInRequest, user: User = Depen
     # Calculate chips to give
     chips = int((data.amount / buy_in_amount) * chips_per_buy_in)
     
-    # Check if target player exists in game
-    player = await db.players.find_one(
-        {"game_id": game_id, "user_id": data.user_id},
-        {"_id": 0}
-    )
-    
-    if not player:
-        raise HTTPException(status_code=400, detail="Player not in this game")
-    
-    if player.get("cash_out") is not None:
-        raise HTTPException(status_code=400, detail="Player has already cashed out")
-    
     # Create transaction
     txn = Transaction(
         game_id=game_id,
@@ -2920,25 +2713,13 @@ async def admin_buy_in(game_id: str, data: AdminBuyInRequest, user: User = Depen
     )
     txn_dict = txn.model_dump()
     txn_dict["timestamp"] = txn_dict["timestamp"].isoformat()
-    await db.transactions.insert_one(txn_dict)
-    
-    # Update player totals
-    new_total_buy_in = player.get("total_buy_in", 0) + data.amount
-    new_total_chips = player.get("total_chips", 0) + chips
-    
-    await db.players.update_one(
-        {"game_id": game_id, "user_id": data.user_id},
-        {"$set": {
-            "total_buy_in": new_total_buy_in,
-            "total_chips": new_total_chips
-        }}
-    )
-    
-    # Update game's total chips distributed
-    await db.game_nights.update_one(
-        {"game_id": game_id},
-        {"$inc": {"total_chips_distributed": chips}}
-    )
+
+    # Target must be in the game and not cashed out (checked atomically, see game_writes)
+    try:
+        player = await apply_buy_in(db, txn_dict, open_only=True)
+    except PlayerWriteRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await publish_game_state(game_id, [data.user_id], transactions=[txn_dict])
     
     # Create notification for the player
     target_user = await db.users.find_one({"user_id": data.user_id}, {"_id": 0, "name": 1})
@@ -2967,8 +2748,8 @@ async def admin_buy_in(game_id: str, data: AdminBuyInRequest, user: User = Depen
     return {
         "message": "Buy-in added for player",
         "player_user_id": data.user_id,
-        "total_buy_in": new_total_buy_in,
-        "total_chips": new_total_chips,
+        "total_buy_in": player["total_buy_in"],
+        "total_chips": player["total_chips"],
         "chips_added": chips
     }
 
@@ -3093,20 +2874,8 @@ async def admin_cash_out(game_id: str, data: AdminCashOutRequest, user: User = D
     if game["status"] != "active":
         raise HTTPException(status_code=400, detail="Game not active")
     
-    player = await db.players.find_one(
-        {"game_id": game_id, "user_id": data.user_id},
-        {"_id": 0}
-    )
-    
-    if not player:
-        raise HTTPException(status_code=400, detail="Player not in this game")
-    
-    if player.get("cashed_out"):
-        raise HTTPException(status_code=400, detail="Player already cashed out")
-    
     chip_value = game.get("chip_value", 1.0)
     cash_value = data.chips_count * chip_value
-    net_result = cash_value - player.get("total_buy_in", 0)
     
     # Create cash-out transaction
     txn = Transaction(
@@ -3120,25 +2889,16 @@ async def admin_cash_out(game_id: str, data: AdminCashOutRequest, user: User = D
     )
     txn_dict = txn.model_dump()
     txn_dict["timestamp"] = txn_dict["timestamp"].isoformat()
-    await db.transactions.insert_one(txn_dict)
-    
-    # Update player record
-    await db.players.update_one(
-        {"game_id": game_id, "user_id": data.user_id},
-        {"$set": {
-            "cashed_out": True,
-            "chips_returned": data.chips_count,
-            "cash_out": cash_value,
-            "net_result": net_result,
-            "cashed_out_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
-    
-    # Update game's chips returned
-    await db.game_nights.update_one(
-        {"game_id": game_id},
-        {"$inc": {"total_chips_returned": data.chips_count}}
-    )
+
+    # Single guarded update computes net_result from the stored buy-in (see game_writes)
+    try:
+        player = await apply_cash_out(db, txn_dict, datetime.now(timezone.utc).isoformat())
+    except PlayerWriteRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    net_result = player["net_result"]
+    await publish_game_state(game_id, [data.user_id], transactions=[txn_dict])
+
+    await record_game_results(db, game, [data.user_id])
     
     # Get target user for notification
     target_user = await db.users.find_one({"user_id": data.user_id}, {"_id": 0, "name": 1})
@@ -3184,24 +2944,10 @@ async def cash_out(game_id: str, data: CashOutRequest, user: User = Depends(get_
     if game["status"] not in ["active", "ended"]:
         raise HTTPException(status_code=400, detail="Cannot cash out from this game")
     
-    player = await db.players.find_one(
-        {"game_id": game_id, "user_id": user.user_id},
-        {"_id": 0}
-    )
-    
-    if not player:
-        raise HTTPException(status_code=400, detail="Not a player in this game")
-    
-    if player.get("cash_out") is not None:
-        raise HTTPException(status_code=400, detail="Already cashed out")
-    
     # Calculate cash value of chips returned
     chip_value = game.get("chip_value", 1.0)
     cash_out_amount = data.chips_returned * chip_value
     
-    # Calculate net result
-    net_result = cash_out_amount - player.get("total_buy_in", 0)
-    
     # Create transaction
     txn = Transaction(
         game_id=game_id,
@@ -3213,23 +2959,19 @@ async def cash_out(game_id: str, data: CashOutRequest, user: User = Depends(get_
     )
     txn_dict = txn.model_dump()
     txn_dict["timestamp"] = txn_dict["timestamp"].isoformat()
-    await db.transactions.insert_one(txn_dict)
-    
-    await db.players.update_one(
-        {"game_id": game_id, "user_id": user.user_id},
-        {"$set": {
-            "chips_returned": data.chips_returned,
-            "cash_out": cash_out_amount,
-            "net_result": net_result,
-            "cashed_out_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
-    
-    # Update game's total chips returned
-    await db.game_nights.update_one(
-        {"game_id": game_id},
-        {"$inc": {"total_chips_returned": data.chips_returned}}
-    )
+
+    # Single guarded update computes net_result from the stored buy-in (see game_writes)
+    try:
+        player = await apply_cash_out(
+            db, txn_dict, datetime.now(timezone.utc).isoformat(),
+            missing="Not a player in this game", closed="Already cashed out"
+        )
+    except PlayerWriteRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    net_result = player["net_result"]
+    await publish_game_state(game_id, [user.user_id], transactions=[txn_dict])
+
+    await record_game_results(db, game, [user.user_id])
     
     return {
         "message": "Cash-out recorded",
@@ -3287,7 +3029,9 @@ async def edit_player_chips(game_id: str, data: EditPlayerChipsRequest, user: Us
             "cashed_out_at": datetime.now(timezone.utc).isoformat()
         }}
     )
-    
+    # A changed result rebuilds the player's stats (see user_stats)
+    await record_game_results(db, game, [data.user_id])
+
     # Update game's total chips returned
     old_chips = old_chips or 0  # Handle None case
     chip_diff = data.chips_count - old_chips
@@ -3296,6 +3040,7 @@ async def edit_player_chips(game_id: str, data: EditPlayerChipsRequest, user: Us
             {"game_id": game_id},
             {"$inc": {"total_chips_returned": chip_diff}}
         )
+    await publish_game_state(game_id, [data.user_id])
     
     # Get player info for notifications
     target_user = await db.users.find_one({"user_id": data.user_id}, {"_id": 0, "name": 1, "email": 1})
@@ -3491,6 +3236,7 @@ async def unlock_game(game_id: str, user: User = Depends(get_current_user)):
         {"game_id": game_id},
         {"$set": {"is_locked": False, "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
+    await publish_game_state(game_id)
 
     # Audit log
     audit = AuditLog(
@@ -3832,64 +3578,22 @@ async def edit_ledger(ledger_id: str, data: LedgerEditRequest, user: User = Depe
 
 @api_router.get("/stats/me")
 async def get_my_stats(user: User = Depends(get_current_user)):
-    """Get personal statistics."""
-    # Get all player records for this user
-    players = await db.players.find(
-        {"user_id": user.user_id, "net_result": {"$ne": None}},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    if not players:
-        return {
-            "total_games": 0,
-            "total_buy_ins": 0,
-            "total_winnings": 0,
-            "net_profit": 0,
-            "win_rate": 0,
-            "biggest_win": 0,
-            "biggest_loss": 0,
-            "recent_games": []
-        }
-    
-    total_games = len(players)
-    total_buy_ins = sum(p.get("total_buy_in", 0) for p in players)
-    total_winnings = sum(p.get("cash_out", 0) for p in players)
-    net_profit = sum(p.get("net_result", 0) for p in players)
-    wins = sum(1 for p in players if p.get("net_result", 0) > 0)
-    win_rate = (wins / total_games * 100) if total_games > 0 else 0
-    
-    results = [p.get("net_result", 0) for p in players]
-    biggest_win = max(results) if results else 0
-    biggest_loss = min(results) if results else 0
-    
-    # Get recent games
-    recent = sorted(players, key=lambda x: x.get("player_id", ""), reverse=True)[:5]
-    recent_games = []
-    for p in recent:
-        game = await db.game_nights.find_one({"game_id": p["game_id"]}, {"_id": 0})
-        if game:
-            group = await db.groups.find_one({"group_id": game["group_id"]}, {"_id": 0, "name": 1})
-            recent_games.append({
-                "game_id": p["game_id"],
-                "group_name": group["name"] if group else "Unknown",
-                "net_result": p.get("net_result", 0),
-                "date": game.get("ended_at") or game.get("started_at")
-            })
-    
+    """Get personal statistics (from the materialized user_stats document)."""
+    stats = stats_view(await get_user_stats(db, user.user_id))
     return {
-        "total_games": total_games,
-        "total_buy_ins": round(total_buy_ins, 2),
-        "total_winnings": round(total_winnings, 2),
-        "net_profit": round(net_profit, 2),
-        "win_rate": round(win_rate, 1),
-        "biggest_win": round(biggest_win, 2),
-        "biggest_loss": round(biggest_loss, 2),
-        "recent_games": recent_games
+        "total_games": stats["total_games"],
+        "total_buy_ins": round(stats["total_buy_ins"], 2),
+        "total_winnings": round(stats["total_winnings"], 2),
+        "net_profit": round(stats["net_profit"], 2),
+        "win_rate": stats["win_rate"],
+        "biggest_win": round(stats["biggest_win"], 2),
+        "biggest_loss": round(stats["biggest_loss"], 2),
+        "recent_games": stats["recent_games"]
     }
 
 @api_router.get("/stats/group/{group_id}")
-async def get_group_stats(group_id: str, user: User = Depends(get_current_user)):
-    """Get group statistics."""
+async def get_group_stats(group_id: str, window: str = "all_time", user: User = Depends(get_current_user)):
+    """Get group statistics: the materialized leaderboard for a window (30d, 90d, all_time)."""
     # Verify membership
     membership = await db.group_members.find_one(
         {"group_id": group_id, "user_id": user.user_id},
@@ -3898,40 +3602,15 @@ async def get_group_stats(group_id: str, user: User = Depends(get_current_user))
     if not membership:
         raise HTTPException(status_code=403, detail="Not a member of this group")
     
-    # Get all games in group
-    games = await db.game_nights.find(
-        {"group_id": group_id, "status": {"$in": ["ended", "settled"]}},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    game_ids = [g["game_id"] for g in games]
-    
-    # Get player stats across all games
-    pipeline = [
-        {"$match": {"game_id": {"$in": game_ids}, "net_result": {"$ne": None}}},
-        {"$group": {
-            "_id": "$user_id",
-            "total_games": {"$sum": 1},
-            "total_profit": {"$sum": "$net_result"},
-            "total_buy_in": {"$sum": "$total_buy_in"}
-        }},
-        {"$sort": {"total_profit": -1}}
-    ]
-    
-    leaderboard = await db.players.aggregate(pipeline).to_list(100)
-    
-    # Add user info
-    for entry in leaderboard:
-        user_info = await db.users.find_one(
-            {"user_id": entry["_id"]},
-            {"_id": 0, "user_id": 1, "name": 1, "picture": 1}
-        )
-        entry["user"] = user_info
-        entry["user_id"] = entry.pop("_id")
-    
+    board = await get_group_leaderboard(db, group_id, window)
+    if board is None:
+        raise HTTPException(status_code=400, detail=f"window must be one of: {', '.join(LEADERBOARD_WINDOWS)}")
+
     return {
-        "total_games": len(games),
-        "leaderboard": leaderboard
+        "total_games": board["total_games"],
+        "leaderboard": board["entries"],
+        "window": window,
+        "computed_at": board["computed_at"]
     }
 
 # ============== GAME THREAD ENDPOINTS ==============
@@ -4866,6 +4545,8 @@ async def fix_user_data(user: User = Depends(get_current_user)):
         result = await db.users.delete_many(
             {"user_id": {"$in": alt_user_ids}}
         )
+        for alt_user_id in alt_user_ids:
+            user_cache.invalidate_user(alt_user_id)
         fixes["duplicate_users_merged"] = result.deleted_count
 
     return {
@@ -4990,6 +4671,13 @@ class PokerAnalyzeRequest(BaseModel):
     your_hand: List[str]  # ["A of spades", "K of spades"]
     community_cards: List[str] = []  # ["Q of hearts", "J of diamonds", "10 of clubs"]
     game_id: Optional[str] = None  # Optional link to active game for analytics
+    opponents: int = 1  # Number of opponents still in the hand (1-9), used for equity
+
+class PokerRescoreRequest(BaseModel):
+    user_id: Optional[str] = None  # Limit to one user's history
+    only_stale: bool = True  # Skip logs already scored by the current evaluator
+    batch_size: int = 500
+    workers: Optional[int] = None  # Process pool size (default: CPU count)
 
 # --- AI Assistant: Rate Limiting ---
 
@@ -5020,10 +4708,7 @@ async def get_ai_requests_remaining(user_id: str, daily_limit: int) -> int:
 
 async def get_user_ai_limit(user_id: str) -> tuple:
     """Get daily limit and premium status for user."""
-    user_doc = await db.users.find_one(
-        {"user_id": user_id},
-        {"_id": 0, "is_premium": 1}
-    )
+    user_doc = await user_cache.get_user(db, user_id)
     is_premium = user_doc.get("is_premium", False) if user_doc else False
     daily_limit = AI_DAILY_LIMIT_PREMIUM if is_premium else AI_DAILY_LIMIT_FREE
     return daily_limit, is_premium
@@ -5095,14 +4780,15 @@ async def fetch_user_context_summary(database, user_id: str) -> Dict:
         # Profile
         user_doc = await database.users.find_one(
             {"user_id": user_id},
-            {"_id": 0, "name": 1, "level": 1, "total_games": 1, "total_profit": 1, "badges": 1}
+            {"_id": 0, "name": 1, "level": 1, "badges": 1}
         )
         if user_doc:
+            stats = stats_view(await get_user_stats(database, user_id))
             ctx["profile"] = {
                 "name": user_doc.get("name", "Unknown"),
                 "level": user_doc.get("level", "Rookie"),
-                "total_games": user_doc.get("total_games", 0),
-                "total_profit": user_doc.get("total_profit", 0.0),
+                "total_games": stats["total_games"],
+                "total_profit": stats["net_profit"],
                 "badges_count": len(user_doc.get("badges", [])),
             }
 
@@ -5394,60 +5080,47 @@ async def analyze_poker_hand(data: PokerAnalyzeRequest, user: User = Depends(get
 
     Architecture:
     1. Code-based Hand Evaluator - Accurately identifies the poker hand (no LLM errors)
-    2. Rule-based Strategy Advisor - Provides action suggestions based on hand strength
-    3. Optional LLM Enhancement - Can add contextual advice (future feature)
+    2. Equity Calculator - Win/tie/lose odds vs. the given number of opponents
+       (pre-flop: precomputed table lookup; exact on turn/river heads-up;
+       seeded Monte Carlo otherwise)
+    3. Rule-based Strategy Advisor - Provides action suggestions based on equity
+    4. Optional LLM Enhancement - Can add contextual advice (future feature)
 
     This approach eliminates LLM counting/math errors that caused incorrect hand identification.
     """
-    from poker_evaluator import evaluate_hand, get_action_suggestion, get_hand_strength
+    from poker_evaluator import ANALYSIS_MODEL, analyze_hand, get_stage
 
     # Validation
     if len(data.your_hand) != 2:
         raise HTTPException(status_code=400, detail="Must provide exactly 2 hole cards")
 
-    if len(data.community_cards) < 3:
-        raise HTTPException(status_code=400, detail="Must provide at least 3 community cards (flop)")
+    if len(data.community_cards) in (1, 2):
+        raise HTTPException(status_code=400, detail="Community cards must be empty (pre-flop) or at least 3 (flop)")
 
     if len(data.community_cards) > 5:
         raise HTTPException(status_code=400, detail="Cannot have more than 5 community cards")
 
+    if not 1 <= data.opponents <= 9:
+        raise HTTPException(status_code=400, detail="Opponents must be between 1 and 9")
+
     # Check for duplicate cards
     all_cards = data.your_hand + data.community_cards
     normalized = [c.lower().strip() for c in all_cards]
     if len(normalized) != len(set(normalized)):
         raise HTTPException(status_code=400, detail="Duplicate cards detected - each card can only appear once")
 
-    # Determine game stage
-    stage = "Pre-flop"
-    if len(data.community_cards) == 3:
-        stage = "Flop"
-    elif len(data.community_cards) == 4:
-        stage = "Turn"
-    elif len(data.community_cards) == 5:
-        stage = "River"
+    stage = get_stage(data.community_cards)
 
     try:
-        # Step 1: DETERMINISTIC hand evaluation (no LLM - 100% accurate)
-        evaluation = evaluate_hand(data.your_hand, data.community_cards)
-
-        if "error" in evaluation:
-            raise HTTPException(status_code=400, detail=evaluation["error"])
-
-        # Step 2: Rule-based action suggestion
-        suggestion = get_action_suggestion(evaluation, stage)
-
-        # Build the result
-        analysis_result = {
-            "action": suggestion["action"],
-            "potential": suggestion["potential"],
-            "reasoning": suggestion["reasoning"],
-            # Include detailed evaluation for transparency
-            "hand_details": {
-                "hand_name": evaluation["hand_name"],
-                "description": evaluation["description"],
-                "strength": get_hand_strength(evaluation["hand_rank"])
-            }
-        }
+        # Evaluation + equity + suggestion (CPU-bound, keep it off the event loop)
+        analysis = await asyncio.to_thread(
+            analyze_hand, data.your_hand, data.community_cards, data.opponents
+        )
+
+        if "error" in analysis:
+            raise HTTPException(status_code=400, detail=analysis["error"])
+
+        analysis_result = analysis["ai_response"]
 
         # Log the analysis for analytics
         log_entry = {
@@ -5460,15 +5133,15 @@ async def analyze_poker_hand(data: PokerAnalyzeRequest, user: User = Depends(get
             "hole_cards": data.your_hand,
             "community_cards": data.community_cards,
             "all_cards": all_cards,
-            "evaluation": {
-                "hand_rank": int(evaluation["hand_rank"]),
-                "hand_name": evaluation["hand_name"],
-                "description": evaluation["description"]
-            },
+            "evaluation": analysis["evaluation"],
             "ai_response": analysis_result,
-            "model": "deterministic_v1"  # No longer using LLM for hand evaluation
+            "model": ANALYSIS_MODEL  # Deterministic evaluator, no LLM
         }
         await db.poker_analysis_logs.insert_one(log_entry)
+        try:
+            await poker_stats.record_analysis(db, log_entry)
+        except Exception as e:
+            logger.error(f"poker_stats update failed for {user.user_id}: {e}")
 
         return analysis_result
 
@@ -5485,7 +5158,7 @@ async def analyze_poker_hand(data: PokerAnalyzeRequest, user: User = Depends(get
             "hole_cards": data.your_hand,
             "community_cards": data.community_cards,
             "error": str(e),
-            "model": "deterministic_v1"
+            "model": ANALYSIS_MODEL
         }
         await db.poker_analysis_logs.insert_one(error_log)
         raise HTTPException(status_code=500, detail=f"Failed to analyze hand: {str(e)}")
@@ -5517,68 +5190,35 @@ async def get_poker_history(
 
 @api_router.get("/poker/stats")
 async def get_poker_stats(user: User = Depends(get_current_user)):
-    """Get user's poker analysis statistics and insights."""
-    # Get all user's analyses
-    logs = await db.poker_analysis_logs.find(
-        {"user_id": user.user_id, "ai_response": {"$exists": True}},
-        {"_id": 0}
-    ).to_list(1000)
+    """Get user's poker analysis statistics and insights (see poker_stats)."""
+    return poker_stats.stats_view(await poker_stats.get_poker_stats(db, user.user_id))
 
-    if not logs:
-        return {
-            "total_analyses": 0,
-            "message": "No poker hands analyzed yet. Use the AI Assistant to get started!"
-        }
-
-    # Calculate stats
-    total = len(logs)
-    actions = {"FOLD": 0, "CHECK": 0, "CALL": 0, "RAISE": 0}
-    potentials = {"Low": 0, "Medium": 0, "High": 0}
-    stages = {"Pre-flop": 0, "Flop": 0, "Turn": 0, "River": 0}
-
-    for log in logs:
-        ai_resp = log.get("ai_response", {})
-        action = ai_resp.get("action", "CHECK")
-        potential = ai_resp.get("potential", "Medium")
-        stage = log.get("stage", "Flop")
 
-        if action in actions:
-            actions[action] += 1
-        if potential in potentials:
-            potentials[potential] += 1
-        if stage in stages:
-            stages[stage] += 1
+@api_router.post("/admin/poker/rescore")
+async def start_poker_rescore(data: PokerRescoreRequest, user: User = Depends(get_admin_user)):
+    """
+    Re-score stored poker analyses with the current evaluator (admin only).
+    Runs in the background; poll GET /admin/poker/rescore/{job_id} for progress.
+    """
+    from poker_batch import start_rescore_job
 
-    # Most common action
-    most_common_action = max(actions, key=actions.get) if any(actions.values()) else None
+    if not 50 <= data.batch_size <= 5000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 50 and 5000")
+    if data.workers is not None and not 1 <= data.workers <= 64:
+        raise HTTPException(status_code=400, detail="workers must be between 1 and 64")
 
-    # Calculate percentages
-    action_pcts = {k: round(v / total * 100, 1) for k, v in actions.items()}
-    potential_pcts = {k: round(v / total * 100, 1) for k, v in potentials.items()}
+    job = await start_rescore_job(db, started_by=user.user_id, **data.model_dump())
+    logger.info(f"Poker re-score job {job['job_id']} started by {user.user_id}")
+    return job
 
-    # Get recent trend (last 10 hands)
-    recent = logs[:10] if len(logs) >= 10 else logs
-    recent_high_potential = sum(
-        1 for l in recent if l.get("ai_response", {}).get("potential") == "High"
-    )
 
-    return {
-        "total_analyses": total,
-        "action_breakdown": actions,
-        "action_percentages": action_pcts,
-        "potential_breakdown": potentials,
-        "potential_percentages": potential_pcts,
-        "stage_breakdown": stages,
-        "most_common_suggestion": most_common_action,
-        "recent_high_potential_hands": recent_high_potential,
-        "insights": {
-            "aggressive_play": action_pcts.get("RAISE", 0) > 30,
-            "conservative_play": action_pcts.get("FOLD", 0) > 40,
-            "strong_hands_ratio": potential_pcts.get("High", 0)
-        },
-        "first_analysis": logs[-1].get("timestamp") if logs else None,
-        "last_analysis": logs[0].get("timestamp") if logs else None
-    }
+@api_router.get("/admin/poker/rescore/{job_id}")
+async def get_poker_rescore(job_id: str, user: User = Depends(get_admin_user)):
+    """Progress and throughput (hands/sec) of a re-score job (admin only)."""
+    job = await db.poker_rescore_jobs.find_one({"job_id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Re-score job not found")
+    return job
 
 
 # ============== HOST PERSONA / DECISION ENDPOINTS ==============
@@ -5838,11 +5478,9 @@ async def _execute_host_decision(decision: dict) -> dict:
             {"$push": {"players": player_entry}}
         )
         # Emit WebSocket event
-        await sio.emit("game_update", {
-            "type": "player_joined",
-            "game_id": game_id,
+        await emit_game_event(game_id, "player_joined", {
             "player_id": context.get("player_id")
-        }, room=game_id)
+        })
         return {"action": "player_added", "player_id": context.get("player_id")}
 
     elif decision_type == "buy_in":
@@ -5859,13 +5497,11 @@ async def _execute_host_decision(decision: dict) -> dict:
                 }
             }
         )
-        await sio.emit("game_update", {
-            "type": "buy_in_approved",
-            "game_id": game_id,
+        await emit_game_event(game_id, "buy_in_approved", {
             "player_id": player_id,
             "amount": amount,
             "chips": chips
-        }, room=game_id)
+        })
         return {"action": "buy_in_processed", "amount": amount, "chips": chips}
 
     elif decision_type == "cash_out":
@@ -5885,13 +5521,11 @@ async def _execute_host_decision(decision: dict) -> dict:
                 }
             }
         )
-        await sio.emit("game_update", {
-            "type": "cash_out_approved",
-            "game_id": game_id,
+        await emit_game_event(game_id, "cash_out_approved", {
             "player_id": player_id,
             "chips": chips,
             "amount": cash_amount
-        }, room=game_id)
+        })
         return {"action": "cash_out_processed", "chips": chips, "amount": cash_amount}
 
     elif decision_type == "end_game":
@@ -5899,7 +5533,8 @@ async def _execute_host_decision(decision: dict) -> dict:
             {"game_id": game_id},
             {"$set": {"status": "ended", "ended_at": datetime.now(timezone.utc)}}
         )
-        await sio.emit("game_update", {"type": "game_ended", "game_id": game_id}, room=game_id)
+        await emit_game_event(game_id, "game_ended", {}, immediate=True)
+        await publish_game_state(game_id)
         return {"action": "game_ended"}
 
     elif decision_type == "chip_correction":
@@ -5910,12 +5545,10 @@ async def _execute_host_decision(decision: dict) -> dict:
             {"game_id": game_id, "players.user_id": player_id},
             {"$set": {"players.$.chips": new_chips}}
         )
-        await sio.emit("game_update", {
-            "type": "chips_corrected",
-            "game_id": game_id,
+        await emit_game_event(game_id, "chips_corrected", {
             "player_id": player_id,
             "new_chips": new_chips
-        }, room=game_id)
+        })
         return {"action": "chips_corrected", "new_chips": new_chips}
 
     return {"action": "unknown", "decision_type": decision_type}
@@ -6082,7 +5715,7 @@ async def set_wallet_pin(
     if wallet.get("pin_hash"):
         raise HTTPException(status_code=400, detail="PIN already set. Use change PIN endpoint.")
 
-    pin_hash = wallet_service.hash_pin(data.pin)
+    pin_hash = await wallet_service.hash_pin(data.pin)
 
     await db.wallets.update_one(
         {"wallet_id": wallet["wallet_id"]},
@@ -6117,7 +5750,7 @@ async def change_wallet_pin(
         raise HTTPException(status_code=401, detail=pin_error)
 
     # Set new PIN
-    new_pin_hash = wallet_service.hash_pin(data.new_pin)
+    new_pin_hash = await wallet_service.hash_pin(data.new_pin)
     await db.wallets.update_one(
         {"wallet_id": wallet["wallet_id"]},
         {"$set": {"pin_hash": new_pin_hash, "updated_at": datetime.now(timezone.utc).isoformat()}}
@@ -6148,6 +5781,25 @@ async def verify_wallet_pin(
     return {"success": True, "message": "PIN verified"}
 
 
+@api_router.get("/admin/metrics/pin-hash")
+async def get_pin_hash_metrics(user: User = Depends(get_admin_user)):
+    """PIN hashing pool: queue depth, rejections (429s), wait vs compute time (admin only)."""
+    return get_pin_hash_executor().metrics()
+
+
+@api_router.get("/admin/metrics/ai-routing")
+async def get_ai_routing_metrics(user: User = Depends(get_admin_user)):
+    """Assistant routing calls: token usage and prompt-cache hit rate (admin only)."""
+    orchestrator = get_orchestrator()
+    if not orchestrator or not orchestrator.llm_client:
+        return {"available": False}
+    return {
+        "available": True,
+        "tool_schema_version": orchestrator.tool_schema_version,
+        **orchestrator.llm_client.routing_metrics()
+    }
+
+
 @api_router.get("/wallet/lookup/{wallet_id}")
 async def lookup_wallet(wallet_id: str, request: Request, user: User = Depends(get_current_user)):
     """Look up wallet by ID. Returns limited info for privacy."""
@@ -6455,9 +6107,9 @@ async def request_withdrawal(
         raise HTTPException(status_code=404, detail="Wallet not found. Set up wallet first.")
 
     # Verify PIN
-    pin_ok = await wallet_service.verify_pin(wallet["wallet_id"], data.pin, db)
+    pin_ok, pin_error = await wallet_service.verify_pin_with_lockout(wallet, data.pin, db)
     if not pin_ok:
-        raise HTTPException(status_code=400, detail="Invalid PIN")
+        raise HTTPException(status_code=400, detail=pin_error or "Invalid PIN")
 
     # Check balance
     if wallet.get("balance_cents", 0) < data.amount_cents:
@@ -6608,6 +6260,7 @@ async def register_push_token(
         {"$set": {"expo_push_token": token, "push_token_updated_at": datetime.now(timezone.utc).isoformat()}},
         upsert=False,
     )
+    user_cache.invalidate_user(user.user_id)
     return {"success": True, "message": "Push token registered"}
 
 
@@ -6618,51 +6271,13 @@ async def unregister_push_token(user: User = Depends(get_current_user)):
         {"user_id": user.user_id},
         {"$unset": {"expo_push_token": "", "push_token_updated_at": ""}}
     )
+    user_cache.invalidate_user(user.user_id)
     return {"success": True}
 
 @api_router.get("/ledger/balances")
 async def get_balances(user: User = Depends(get_current_user)):
     """Get overall balance summary (who owes/is owed)."""
-    # Amounts user owes
-    owes = await db.ledger.find(
-        {"from_user_id": user.user_id, "status": "pending"},
-        {"_id": 0}
-    ).to_list(100)
-    
-    # Amounts owed to user
-    owed = await db.ledger.find(
-        {"to_user_id": user.user_id, "status": "pending"},
-        {"_id": 0}
-    ).to_list(100)
-    
-    total_owes = sum(e["amount"] for e in owes)
-    total_owed = sum(e["amount"] for e in owed)
-    
-    # Add user info to entries
-    for entry in owes:
-        to_user = await db.users.find_one(
-            {"user_id": entry["to_user_id"]},
-            {"_id": 0, "user_id": 1, "name": 1, "picture": 1}
-        )
-        entry["to_user"] = to_user
-    
-    for entry in owed:
-        from_user = await db.users.find_one(
-            {"user_id": entry["from_user_id"]},
-            {"_id": 0, "user_id": 1, "name": 1, "picture": 1}
-        )
-        entry["from_user"] = from_user
-    
-    return {
-        "total_owes": round(total_owes, 2),
-        "total_owed": round(total_owed, 2),
-        # Aliases for mobile compatibility
-        "you_owe": round(total_owes, 2),
-        "owed_to_you": round(total_owed, 2),
-        "net_balance": round(total_owed - total_owes, 2),
-        "owes": owes,
-        "owed": owed
-    }
+    return await build_balances(db, user.user_id)
 
 
 @api_router.get("/ledger/consolidated")
@@ -6676,62 +6291,7 @@ async def get_consolidated_balances(user: User = Depends(get_current_user)):
     Example: If you owe John $20 from Game A and John owes you $15 from Game B,
     the consolidated view shows: You owe John $5 (net).
     """
-    # Get all pending ledger entries involving this user
-    all_entries = await db.ledger.find(
-        {
-            "$or": [
-                {"from_user_id": user.user_id, "status": "pending"},
-                {"to_user_id": user.user_id, "status": "pending"}
-            ]
-        },
-        {"_id": 0}
-    ).to_list(500)
-
-    # Consolidate by person
-    person_balances = {}  # other_user_id -> net_amount (positive = they owe you)
-
-    for entry in all_entries:
-        if entry["from_user_id"] == user.user_id:
-            # You owe them
-            other_user = entry["to_user_id"]
-            person_balances[other_user] = person_balances.get(other_user, 0) - entry["amount"]
-        else:
-            # They owe you
-            other_user = entry["from_user_id"]
-            person_balances[other_user] = person_balances.get(other_user, 0) + entry["amount"]
-
-    # Build response with user info
-    consolidated = []
-    for other_user_id, net_amount in person_balances.items():
-        if abs(net_amount) < 0.01:
-            continue  # Skip settled balances
-
-        other_user = await db.users.find_one(
-            {"user_id": other_user_id},
-            {"_id": 0, "user_id": 1, "name": 1, "picture": 1}
-        )
-
-        consolidated.append({
-            "user": other_user,
-            "net_amount": round(net_amount, 2),
-            "direction": "owed_to_you" if net_amount > 0 else "you_owe",
-            "display_amount": round(abs(net_amount), 2)
-        })
-
-    # Sort by absolute amount (largest debts first)
-    consolidated.sort(key=lambda x: -x["display_amount"])
-
-    # Calculate totals
-    total_you_owe = sum(-b["net_amount"] for b in consolidated if b["net_amount"] < 0)
-    total_owed_to_you = sum(b["net_amount"] for b in consolidated if b["net_amount"] > 0)
-
-    return {
-        "consolidated": consolidated,
-        "total_you_owe": round(total_you_owe, 2),
-        "total_owed_to_you": round(total_owed_to_you, 2),
-        "net_balance": round(total_owed_to_you - total_you_owe, 2),
-        "people_count": len(consolidated)
-    }
+    return await build_consolidated(db, user.user_id)
 
 
 @api_router.get("/ledger/consolidated-detailed")
@@ -6741,121 +6301,25 @@ async def get_consolidated_balances_detailed(user: User = Depends(get_current_us
     Read-only computation — no mutations. Groups all pending ledger entries
     by (other_user, game_id) and computes netting explanation.
     """
-    all_entries = await db.ledger.find(
-        {
-            "$or": [
-                {"from_user_id": user.user_id, "status": "pending"},
-                {"to_user_id": user.user_id, "status": "pending"}
-            ]
-        },
-        {"_id": 0}
-    ).to_list(500)
-
-    # Group entries by (other_person, game_id)
-    person_games = {}  # other_user_id -> {game_id -> {"entries": [], "net": 0}}
-
-    for entry in all_entries:
-        if entry["from_user_id"] == user.user_id:
-            other_user = entry["to_user_id"]
-            amount = -entry["amount"]  # negative = you owe
-        else:
-            other_user = entry["from_user_id"]
-            amount = entry["amount"]  # positive = owed to you
-
-        if other_user not in person_games:
-            person_games[other_user] = {}
-
-        game_id = entry.get("game_id", "unknown")
-        if game_id not in person_games[other_user]:
-            person_games[other_user][game_id] = {"entries": [], "net": 0}
-        person_games[other_user][game_id]["entries"].append(entry)
-        person_games[other_user][game_id]["net"] += amount
-
-    # Build response with user info and game details
-    consolidated = []
-    for other_user_id, games in person_games.items():
-        total_net = sum(g["net"] for g in games.values())
-
-        if abs(total_net) < 0.01:
-            continue  # Settled — skip
-
-        other_user = await db.users.find_one(
-            {"user_id": other_user_id},
-            {"_id": 0, "user_id": 1, "name": 1, "picture": 1}
-        )
-
-        # Fetch game details for each game
-        game_breakdown = []
-        for game_id, game_data in games.items():
-            game_info = await db.game_nights.find_one(
-                {"game_id": game_id},
-                {"_id": 0, "game_id": 1, "title": 1, "ended_at": 1, "group_id": 1}
-            )
-            game_breakdown.append({
-                "game_id": game_id,
-                "game_title": game_info.get("title", "Game Night") if game_info else "Game",
-                "game_date": game_info.get("ended_at") if game_info else None,
-                "amount": round(abs(game_data["net"]), 2),
-                "direction": "owed_to_you" if game_data["net"] > 0 else "you_owe",
-                "ledger_ids": [e["ledger_id"] for e in game_data["entries"]]
-            })
-
-        # Sort game breakdown by date (newest first)
-        game_breakdown.sort(key=lambda g: g.get("game_date") or "", reverse=True)
-
-        # Compute offset explanation (only when debts flow both ways)
-        you_owe_games = [g for g in game_breakdown if g["direction"] == "you_owe"]
-        they_owe_games = [g for g in game_breakdown if g["direction"] == "owed_to_you"]
-
-        offset_explanation = None
-        if you_owe_games and they_owe_games:
-            gross_you_owe = sum(g["amount"] for g in you_owe_games)
-            gross_they_owe = sum(g["amount"] for g in they_owe_games)
-            offset_amount = min(gross_you_owe, gross_they_owe)
-            offset_explanation = {
-                "offset_amount": round(offset_amount, 2),
-                "gross_you_owe": round(gross_you_owe, 2),
-                "gross_they_owe": round(gross_they_owe, 2)
-            }
-
-        # Collect all ledger_ids across games for this person
-        all_ledger_ids = []
-        for g in game_breakdown:
-            all_ledger_ids.extend(g["ledger_ids"])
-
-        consolidated.append({
-            "user": other_user,
-            "net_amount": round(total_net, 2),
-            "direction": "owed_to_you" if total_net > 0 else "you_owe",
-            "display_amount": round(abs(total_net), 2),
-            "game_count": len(games),
-            "game_breakdown": game_breakdown,
-            "offset_explanation": offset_explanation,
-            "all_ledger_ids": all_ledger_ids
-        })
-
-    consolidated.sort(key=lambda x: -x["display_amount"])
-
-    total_you_owe = sum(-b["net_amount"] for b in consolidated if b["net_amount"] < 0)
-    total_owed_to_you = sum(b["net_amount"] for b in consolidated if b["net_amount"] > 0)
-
-    return {
-        "consolidated": consolidated,
-        "total_you_owe": round(total_you_owe, 2),
-        "total_owed_to_you": round(total_owed_to_you, 2),
-        "net_balance": round(total_owed_to_you - total_you_owe, 2),
-        "people_count": len(consolidated)
-    }
+    return await build_consolidated_detailed(db, user.user_id)
 
 
 @api_router.post("/ledger/optimize")
-async def optimize_ledger(user: User = Depends(get_current_user)):
+async def optimize_ledger(data: Optional[LedgerOptimizeRequest] = None, user: User = Depends(get_current_user)):
     """
-    Optimize ledger entries by consolidating cross-game debts between same players.
+    Optimize ledger entries by consolidating cross-game debts.
+
+    With a group_id: nets every pending entry in the group (all members, all
+    games) down to the minimum transfer set. dry_run (default) returns the
+    preview; applying requires a group admin.
 
-    This creates new consolidated entries and marks old ones as consolidated.
-    Only processes entries where the current user is involved.
+    Without a body: legacy per-user mode. Creates new consolidated entries
+    between the current user and each counterparty and marks old ones as
+    consolidated.
     """
+    if data and data.group_id:
+        return await optimize_group_ledger(data.group_id, data.dry_run, user)
+
     # Get all pending entries for this user
     all_entries = await db.ledger.find(
         {
@@ -6939,6 +6403,61 @@ async def optimize_ledger(user: User = Depends(get_current_user)):
     }
 
 
+async def optimize_group_ledger(group_id: str, dry_run: bool, user: User) -> dict:
+    """Group-wide netting for /ledger/optimize (see ledger_netting)."""
+    membership = await db.group_members.find_one(
+        {"group_id": group_id, "user_id": user.user_id},
+        {"_id": 0, "role": 1}
+    )
+    if not membership:
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+    if not dry_run and membership.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only group admins can apply ledger netting")
+
+    entries = await load_group_pending_entries(db, group_id)
+    plan = compute_group_netting(entries)
+    stats = plan["stats"]
+    worthwhile = stats["transfers_after"] < stats["entries_before"]
+
+    users = await fetch_users(db, plan["net_by_user"].keys())
+    names = {user_id: u.get("name", "Unknown") for user_id, u in users.items()}
+    transfers = [
+        {
+            "from_user_id": t["from_user_id"],
+            "from_name": names.get(t["from_user_id"], "Unknown"),
+            "to_user_id": t["to_user_id"],
+            "to_name": names.get(t["to_user_id"], "Unknown"),
+            "amount": t["amount"]
+        }
+        for t in plan["transfers"]
+    ]
+
+    response = {
+        "group_id": group_id,
+        "dry_run": dry_run,
+        "transfers": transfers,
+        "stats": stats,
+        "algorithm_version": plan["algorithm_version"]
+    }
+    if dry_run or not worthwhile:
+        response["message"] = "Ledger netting preview" if worthwhile else "No optimization needed"
+        response["optimized"] = 0
+        return response
+
+    try:
+        run = await apply_netting_plan(db, client, group_id, plan, user.user_id)
+    except NettingConflict as e:
+        raise HTTPException(status_code=409, detail=f"Ledger changed while netting, please retry: {e}")
+
+    response.update({
+        "message": "Ledger optimized",
+        "run_id": run["run_id"],
+        "optimized": stats["entries_before"],
+        "entries_consolidated": stats["entries_before"],
+        "new_ledger_ids": run["new_ledger_ids"]
+    })
+    return response
+
 # ============== STRIPE PAYMENT ENDPOINTS ==============
 
 class StripeCheckoutRequest(BaseModel):
@@ -7101,12 +6620,10 @@ async def prepare_pay_net(data: dict, user: User = Depends(get_current_user)):
     amount_dollars = round(net_cents / 100, 2)
 
     # Build breakdown for display
+    games_info = await fetch_games(db, (e.get("game_id", "") for e in entries))
     breakdown = []
     for e in entries:
-        game_info = await db.game_nights.find_one(
-            {"game_id": e.get("game_id", "")},
-            {"_id": 0, "title": 1, "ended_at": 1}
-        )
+        game_info = games_info.get(e.get("game_id", ""))
         direction = "you_owe" if e["from_user_id"] == user.user_id else "owed_to_you"
         breakdown.append({
             "game_title": game_info.get("title", "Game") if game_info else "Game",
@@ -9049,6 +8566,8 @@ async def get_automation_health(
 # Include the router
 fastapi_app.include_router(api_router)
 
+fastapi_app.middleware("http")(user_cache_middleware)
+
 fastapi_app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -9060,12 +8579,27 @@ fastapi_app.add_middleware(
 @fastapi_app.on_event("startup")
 async def create_indexes():
     """Create database indexes and start background services."""
-    await db.group_messages.create_index([("group_id", 1), ("created_at", -1)])
-    await db.group_messages.create_index("message_id", unique=True)
-    await db.polls.create_index([("group_id", 1), ("status", 1)])
-    await db.polls.create_index("poll_id", unique=True)
-    await db.host_updates.create_index([("group_id", 1), ("created_at", -1)])
-    logger.info("Database indexes ensured for group_messages, polls, host_updates")
+    # Fold duplicate players rows so the unique player_game_lookup index can be built (see game_writes)
+    await merge_duplicate_players(db)
+
+    # Build any registry index the database is missing (see index_registry)
+    await ensure_indexes(db)
+
+    # Fill users.search_tokens for accounts created before prefix search (see user_search)
+    asyncio.create_task(backfill_search_tokens(db))
+
+    # Copy game timestamps onto players rows written before paginated history (see game_history)
+    asyncio.create_task(backfill_game_sort_at(db))
+
+    # Prefetch Supabase signing keys and keep them fresh in the background
+    await token_verifier.start()
+
+    # Heartbeat this worker's socket presence (shared store when SOCKETIO_MESSAGE_QUEUE is set)
+    await websocket_manager.start_presence()
+
+    # Map the precomputed preflop equity table so the first /poker/analyze doesn't pay for it
+    from preflop_table import get_preflop_table
+    get_preflop_table()
 
     # Start proactive scheduler for AI game suggestions
     try:
@@ -9095,32 +8629,6 @@ async def create_indexes():
     except Exception as e:
         logger.exception("❌ EventListenerService init failed (@kvitt disabled): %s", e)
 
-    # Create indexes for engagement collections
-    await db.engagement_nudges_log.create_index([("target_id", 1), ("nudge_type", 1), ("sent_at", -1)])
-    await db.engagement_nudges_log.create_index([("group_id", 1), ("sent_at", -1)])
-    await db.engagement_settings.create_index("group_id", unique=True)
-    logger.info("Database indexes ensured for engagement collections")
-
-    # Create indexes for feedback collections
-    await db.feedback.create_index([("user_id", 1), ("created_at", -1)])
-    await db.feedback.create_index([("group_id", 1), ("status", 1)])
-    await db.feedback.create_index("feedback_id", unique=True)
-    await db.feedback.create_index([("content_hash", 1), ("group_id", 1), ("created_at", -1)])
-    await db.feedback.create_index([("status", 1), ("sla_due_at", 1)])
-    await db.feedback_surveys.create_index([("game_id", 1), ("user_id", 1)])
-    await db.feedback_surveys.create_index("survey_id", unique=True)
-    await db.auto_fix_log.create_index([("feedback_id", 1), ("created_at", -1)])
-    await db.auto_fix_log.create_index([("fix_type", 1), ("feedback_id", 1)])
-    logger.info("Database indexes ensured for feedback collections")
-
-    # Create indexes for automation collections
-    await db.user_automations.create_index([("user_id", 1), ("enabled", 1)])
-    await db.user_automations.create_index("automation_id", unique=True)
-    await db.user_automations.create_index([("trigger.type", 1), ("enabled", 1)])
-    await db.automation_runs.create_index([("automation_id", 1), ("started_at", -1)])
-    await db.automation_runs.create_index([("user_id", 1), ("started_at", -1)])
-    await db.automation_runs.create_index("run_id", unique=True)
-    logger.info("Database indexes ensured for automation collections")
 
 @fastapi_app.on_event("shutdown")
 async def shutdown_db_client():
@@ -9134,4 +8642,7 @@ async def shutdown_db_client():
         await stop_engagement_scheduler()
     except Exception:
         pass
+    await token_verifier.stop()
+    await websocket_manager.flush_game_events()
+    await websocket_manager.stop_presence()
     client.close()
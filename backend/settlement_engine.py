@@ -0,0 +1,174 @@
+"""
+Settlement Engine
+Computes who-pays-whom from per-player net results.
+
+PAYMENT ENGINEERING PRINCIPLES:
+1. All math in INTEGER CENTS (no float arithmetic)
+2. Deterministic: same input always produces the same transfers
+3. Minimum number of transfers: a group of n people whose balances split into
+   k independent zero-sum subgroups needs exactly n - k transfers
+
+ALGORITHMS:
+- subset_partition_v1_cents: exact. Dynamic programming over subsets of the
+  non-zero balances finds the maximum number of disjoint zero-sum subgroups,
+  each settled with the greedy matcher. Used up to EXACT_MAX_PARTICIPANTS.
+- greedy_v3_pairs_cents: exact one-to-one matches are paired off first, then
+  the largest debtor pays the largest creditor. Bounded time for larger
+  groups. (greedy_v2_cents, in older settlement_runs, is the same matcher
+  without the pairing step.)
+"""
+
+from typing import Dict, List, Tuple
+
+
+# ============== CONSTANTS ==============
+
+ALGORITHM_EXACT = "subset_partition_v1_cents"
+ALGORITHM_GREEDY = "greedy_v3_pairs_cents"
+
+# 2^12 subsets x 12 members is ~50k steps; each extra member doubles it
+EXACT_MAX_PARTICIPANTS = 12
+
+
+# ============== PUBLIC API ==============
+
+def optimize_settlement(net_results: List[Dict]) -> Dict:
+    """
+    Minimum-transfer settlement.
+
+    Input:  [{"user_id": str, "net_cents": int}]
+            positive = should receive, negative = owes
+    Output: {
+        "transfers": [{"from_user_id", "to_user_id", "amount_cents": int}],
+        "stats": {"possible_payments": int, "optimized_payments": int},
+        "algorithm_version": str
+    }
+    """
+    balances = _balances(net_results)
+
+    active_players = len(balances)
+    possible_payments = (active_players * (active_players - 1)) // 2 if active_players > 1 else 0
+
+    balanced = sum(cents for _, cents in balances) == 0
+    if balanced and active_players <= EXACT_MAX_PARTICIPANTS:
+        transfers = []
+        for group in _zero_sum_groups(balances):
+            transfers.extend(_greedy_transfers(group))
+        algorithm = ALGORITHM_EXACT
+    else:
+        transfers, rest = _pair_exact_matches(balances)
+        transfers.extend(_greedy_transfers(rest))
+        algorithm = ALGORITHM_GREEDY
+
+    return {
+        "transfers": transfers,
+        "stats": {
+            "possible_payments": possible_payments,
+            "optimized_payments": len(transfers)
+        },
+        "algorithm_version": algorithm
+    }
+
+
+# ============== HELPERS ==============
+
+def _balances(net_results: List[Dict]) -> List[Tuple[str, int]]:
+    """
+    Non-zero (user_id, net_cents) pairs in a deterministic order, with a
+    1-cent rounding remainder assigned to the largest creditor.
+    """
+    balances = [(p["user_id"], int(p["net_cents"])) for p in net_results if p["net_cents"]]
+    balances.sort(key=lambda b: (-b[1], b[0]))
+
+    diff = -sum(cents for _, cents in balances)
+    if diff and abs(diff) <= 1 and balances and balances[0][1] > 0:
+        balances[0] = (balances[0][0], balances[0][1] + diff)
+        balances = [b for b in balances if b[1]]
+    return balances
+
+
+def _zero_sum_groups(balances: List[Tuple[str, int]]) -> List[List[Tuple[str, int]]]:
+    """
+    Partition balanced `balances` into the maximum number of zero-sum groups.
+
+    best[mask] = most zero-sum groups that the members of `mask` can be cut into
+    when mask itself sums to zero (members are removed one at a time; every time
+    the remaining set sums to zero a group boundary is counted).
+    """
+    n = len(balances)
+    full = (1 << n) - 1
+    sums = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        low = (mask & -mask).bit_length() - 1
+        sums[mask] = sums[mask & (mask - 1)] + balances[low][1]
+
+    best = [0] * (full + 1)
+    choice = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        top, pick = -1, 0
+        rest = mask
+        while rest:
+            bit = rest & -rest
+            if best[mask ^ bit] > top:
+                top, pick = best[mask ^ bit], bit
+            rest ^= bit
+        best[mask] = top + (1 if sums[mask] == 0 else 0)
+        choice[mask] = pick
+
+    # Walk the removal chain; members removed between zero-sum states form a group
+    groups, current = [], []
+    mask = full
+    while mask:
+        bit = choice[mask]
+        current.append(balances[bit.bit_length() - 1])
+        mask ^= bit
+        if sums[mask] == 0:
+            groups.append(current)
+            current = []
+    return groups
+
+
+def _pair_exact_matches(balances: List[Tuple[str, int]]) -> Tuple[List[Dict], List[Tuple[str, int]]]:
+    """Settle debtor/creditor pairs with identical amounts directly (one transfer each)."""
+    creditors: Dict[int, List[str]] = {}
+    for user_id, cents in balances:
+        if cents > 0:
+            creditors.setdefault(cents, []).append(user_id)
+
+    transfers, paired = [], set()
+    for user_id, cents in sorted(balances, key=lambda b: (b[1], b[0])):
+        if cents < 0 and creditors.get(-cents):
+            creditor_id = creditors[-cents].pop(0)
+            transfers.append({"from_user_id": user_id, "to_user_id": creditor_id, "amount_cents": -cents})
+            paired.update((user_id, creditor_id))
+    return transfers, [b for b in balances if b[0] not in paired]
+
+
+def _greedy_transfers(balances: List[Tuple[str, int]]) -> List[Dict]:
+    """Largest debtor pays largest creditor until everyone is settled."""
+    creditors = sorted(((u, c) for u, c in balances if c > 0), key=lambda x: (-x[1], x[0]))
+    debtors = sorted(((u, -c) for u, c in balances if c < 0), key=lambda x: (-x[1], x[0]))
+
+    transfers = []
+    i, j = 0, 0
+    while i < len(debtors) and j < len(creditors):
+        debtor_id, debtor_amt = debtors[i]
+        creditor_id, creditor_amt = creditors[j]
+
+        pay = min(debtor_amt, creditor_amt)
+        if pay > 0:
+            transfers.append({
+                "from_user_id": debtor_id,
+                "to_user_id": creditor_id,
+                "amount_cents": pay
+            })
+
+        debtors[i] = (debtor_id, debtor_amt - pay)
+        creditors[j] = (creditor_id, creditor_amt - pay)
+
+        if debtors[i][1] <= 0:
+            i += 1
+        if creditors[j][1] <= 0:
+            j += 1
+
+    return transfers
@@ -0,0 +1,112 @@
+"""
+Socket Event Coalescing
+Per-room emission queue for game_update: events raised within
+COALESCE_WINDOW of each other go out as one frame.
+
+PRINCIPLES:
+1. Ordering: a room's events are delivered in the order they were raised,
+   whether batched or sent immediately (sends hold a per-room FIFO lock, and
+   an immediate event flushes the room's pending batch first)
+2. Compatible: a window holding a single event sends that event unchanged;
+   only real bursts use the envelope {"type": "batch", "events": [...]}
+3. Opt-out: latency-critical events (chat, game start/end) skip the window,
+   and a burst never waits past MAX_BATCH events
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+COALESCE_WINDOW = 0.05  # seconds
+MAX_BATCH = 50
+
+
+# ============== EMITTER ==============
+
+class RoomEmitter:
+    """Coalesces events per room and hands each frame to `send(room, payload)`."""
+
+    def __init__(
+        self,
+        send: Callable[[str, Dict], Awaitable[None]],
+        window: float = COALESCE_WINDOW,
+        max_batch: int = MAX_BATCH
+    ):
+        self._send = send
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[str, List[Dict]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._senders: Dict[str, int] = {}  # deliveries holding or waiting on a room's lock
+        self.stats = {"events": 0, "frames": 0, "batched_frames": 0, "errors": 0}
+
+    async def emit(self, room: str, event: Dict, immediate: bool = False):
+        """Queue an event for the room (or send it now, after anything pending)."""
+        self.stats["events"] += 1
+        if immediate:
+            await self.flush(room)
+            await self._deliver(room, [event])
+            return
+
+        pending = self._pending.setdefault(room, [])
+        pending.append(event)
+        if len(pending) >= self.max_batch:
+            await self.flush(room)
+        elif room not in self._timers:
+            self._timers[room] = asyncio.create_task(self._flush_later(room))
+
+    async def _flush_later(self, room: str):
+        await asyncio.sleep(self.window)
+        self._timers.pop(room, None)
+        await self.flush(room)
+
+    async def flush(self, room: str):
+        """Send the room's pending events now."""
+        timer = self._timers.pop(room, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        events = self._pending.pop(room, None)
+        if events:
+            await self._deliver(room, events)
+
+    async def flush_all(self):
+        for room in list(self._pending):
+            await self.flush(room)
+
+    async def _deliver(self, room: str, events: List[Dict]):
+        # Pending events were taken in order; the FIFO lock keeps frames in that order
+        lock = self._locks.setdefault(room, asyncio.Lock())
+        self._senders[room] = self._senders.get(room, 0) + 1
+        try:
+            async with lock:
+                await self._send(room, batch_payload(events))
+                self.stats["frames"] += 1
+                if len(events) > 1:
+                    self.stats["batched_frames"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Emit to {room} failed ({len(events)} event(s)): {e}")
+        finally:
+            self._senders[room] -= 1
+            if not self._senders[room]:
+                del self._senders[room]
+                del self._locks[room]
+
+
+def batch_payload(events: List[Dict]) -> Dict:
+    """One event as-is; several wrapped in a batch envelope."""
+    if len(events) == 1:
+        return events[0]
+    return {
+        "type": "batch",
+        "game_id": events[0].get("game_id"),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "events": events
+    }
@@ -0,0 +1,278 @@
+"""
+Socket Cluster
+Cross-process plumbing for Socket.IO so several uvicorn workers (on one or
+many hosts) behave like one server.
+
+PRINCIPLES:
+1. Pluggable by URL (SOCKETIO_MESSAGE_QUEUE):
+   - unset:     single process, in-memory manager (the default)
+   - redis://…: python-socketio's AsyncRedisManager for fan-out plus a Redis
+                presence store
+   - local://:  in-process pub/sub bus, a stand-in for tests and local runs
+2. Fan-out is the client manager's job: an emit on any worker is published
+   once and each worker delivers to the sockets it holds, so adding workers
+   adds connection capacity linearly
+3. Presence is shared state, not per-worker memory. Each worker writes its
+   own sids; readers drop entries whose worker stopped heartbeating, so a
+   crashed worker's sockets disappear within PRESENCE_WORKER_TTL
+4. Worker-to-worker control messages (e.g. access revocations) ride the same
+   pub/sub channel as fan-out, as an emit of CONTROL_EVENT that the receiving
+   managers hand to their control_handler instead of to clients
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from socket_rooms import RoomRegistry
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+SOCKETIO_CHANNEL = os.environ.get("SOCKETIO_CHANNEL", "oddside-socketio")
+PRESENCE_PREFIX = "oddside:presence"
+PRESENCE_WORKER_TTL = 30  # seconds without a heartbeat before a worker's sids are ignored
+PRESENCE_HEARTBEAT = 10  # seconds between heartbeats
+
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+CONTROL_EVENT = "oddside:control"  # reserved; never delivered to clients
+
+
+# ============== LOCAL PUB/SUB (stand-in) ==============
+
+class LocalPubSubBus:
+    """In-process broker: every subscriber receives every published message."""
+
+    def __init__(self):
+        self._subscribers: List[asyncio.Queue] = []
+        self.published = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        return queue
+
+    async def publish(self, message: str):
+        self.published += 1
+        for queue in self._subscribers:
+            queue.put_nowait(message)
+
+
+_default_bus: Optional[LocalPubSubBus] = None
+
+
+def get_local_bus() -> LocalPubSubBus:
+    global _default_bus
+    if _default_bus is None:
+        _default_bus = LocalPubSubBus()
+    return _default_bus
+
+
+# ============== CONTROL MESSAGES ==============
+
+class ControlMessageMixin:
+    """
+    Adds worker-to-worker messages to a pub/sub client manager. A message
+    published here reaches every other worker's control_handler; the
+    publishing worker applies its own change directly.
+    """
+
+    control_handler: Optional[Callable[[Dict], Awaitable[None]]] = None
+
+    async def publish_control(self, data: Dict):
+        await self._publish({
+            "method": "emit", "event": CONTROL_EVENT, "data": data, "namespace": "/",
+            "room": None, "skip_sid": None, "callback": None, "host_id": self.host_id
+        })
+
+    async def _handle_emit(self, message):
+        if message.get("event") != CONTROL_EVENT:
+            return await super()._handle_emit(message)
+        if self.control_handler is not None:
+            await self.control_handler(message.get("data") or {})
+
+
+async def publish_control(manager, data: Dict):
+    """Send a control message to the other workers (no-op for a single process)."""
+    if isinstance(manager, ControlMessageMixin):
+        await manager.publish_control(data)
+
+
+class LocalPubSubManager(ControlMessageMixin, AsyncPubSubManager):
+    """AsyncPubSubManager over a LocalPubSubBus (messages are JSON, as on Redis)."""
+
+    name = "localpubsub"
+
+    def __init__(self, bus: Optional[LocalPubSubBus] = None, channel: str = SOCKETIO_CHANNEL, write_only: bool = False):
+        super().__init__(channel=channel, write_only=write_only)
+        self.bus = bus or get_local_bus()
+        self._queue = self.bus.subscribe()
+
+    async def _publish(self, data):
+        await self.bus.publish(self.json.dumps(data))
+
+    async def _listen(self):
+        while True:
+            yield await self._queue.get()
+
+
+class RedisManager(ControlMessageMixin, socketio.AsyncRedisManager):
+    """python-socketio's Redis manager plus control messages."""
+
+
+def make_client_manager(url: str = "", channel: str = SOCKETIO_CHANNEL):
+    """Socket.IO client manager for a message-queue URL (None = single process)."""
+    if not url:
+        return None
+    if url.startswith("local://"):
+        return LocalPubSubManager(channel=channel)
+    return RedisManager(url, channel=channel)
+
+
+# ============== PRESENCE ==============
+
+class MemoryPresenceStore:
+    """
+    Presence in a RoomRegistry held in this process. Shared by every simulated
+    worker that is handed the same instance (tests, local://).
+    """
+
+    def __init__(self, registry: Optional[RoomRegistry] = None):
+        self.registry = registry or RoomRegistry()
+
+    async def connect(self, sid: str, user_id: str):
+        self.registry.connect(sid, user_id)
+
+    async def join(self, sid: str, user_id: str, room: str):
+        self.registry.join(sid, room)
+
+    async def leave(self, sid: str, room: str):
+        self.registry.leave(sid, room)
+
+    async def disconnect(self, sid: str, user_id: Optional[str], rooms: Iterable[str]):
+        self.registry.disconnect(sid)
+
+    async def users_in(self, room: str) -> Set[str]:
+        return self.registry.users_in(room)
+
+    async def is_online(self, user_id: str) -> bool:
+        return self.registry.is_online(user_id)
+
+    async def sids_of(self, user_id: str) -> Set[str]:
+        return self.registry.sids_of(user_id)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class RedisPresenceStore:
+    """
+    Presence in Redis, shared by every worker:
+      {prefix}:room:{room}     hash sid -> "user_id|worker_id"
+      {prefix}:user:{user_id}  hash sid -> worker_id
+      {prefix}:worker:{id}     heartbeat key, expires after PRESENCE_WORKER_TTL
+    """
+
+    def __init__(self, url: str, worker_id: str = WORKER_ID, prefix: str = PRESENCE_PREFIX):
+        from redis import asyncio as aioredis
+        self.redis = aioredis.Redis.from_url(url, decode_responses=True)
+        self.worker_id = worker_id
+        self.prefix = prefix
+        self._task: Optional[asyncio.Task] = None
+
+    def _room_key(self, room: str) -> str:
+        return f"{self.prefix}:room:{room}"
+
+    def _user_key(self, user_id: str) -> str:
+        return f"{self.prefix}:user:{user_id}"
+
+    def _worker_key(self, worker_id: str) -> str:
+        return f"{self.prefix}:worker:{worker_id}"
+
+    async def connect(self, sid: str, user_id: str):
+        await self.redis.hset(self._user_key(user_id), sid, self.worker_id)
+
+    async def join(self, sid: str, user_id: str, room: str):
+        await self.redis.hset(self._room_key(room), sid, f"{user_id}|{self.worker_id}")
+
+    async def leave(self, sid: str, room: str):
+        await self.redis.hdel(self._room_key(room), sid)
+
+    async def disconnect(self, sid: str, user_id: Optional[str], rooms: Iterable[str]):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for room in rooms:
+                pipe.hdel(self._room_key(room), sid)
+            if user_id:
+                pipe.hdel(self._user_key(user_id), sid)
+            await pipe.execute()
+
+    async def _alive(self, worker_ids: Set[str]) -> Set[str]:
+        if not worker_ids:
+            return set()
+        ordered = sorted(worker_ids)
+        beats = await self.redis.mget([self._worker_key(w) for w in ordered])
+        return {w for w, beat in zip(ordered, beats) if beat is not None}
+
+    async def users_in(self, room: str) -> Set[str]:
+        entries: Dict[str, str] = await self.redis.hgetall(self._room_key(room))
+        parsed = {sid: value.rsplit("|", 1) for sid, value in entries.items()}
+        alive = await self._alive({worker for _, worker in parsed.values()})
+        stale = [sid for sid, (_, worker) in parsed.items() if worker not in alive]
+        if stale:
+            await self.redis.hdel(self._room_key(room), *stale)
+        return {user_id for user_id, worker in parsed.values() if worker in alive}
+
+    async def sids_of(self, user_id: str) -> Set[str]:
+        """The user's sids on live workers (any worker)."""
+        entries: Dict[str, str] = await self.redis.hgetall(self._user_key(user_id))
+        alive = await self._alive(set(entries.values()))
+        stale = [sid for sid, worker in entries.items() if worker not in alive]
+        if stale:
+            await self.redis.hdel(self._user_key(user_id), *stale)
+        return {sid for sid, worker in entries.items() if worker in alive}
+
+    async def is_online(self, user_id: str) -> bool:
+        return bool(await self.sids_of(user_id))
+
+    async def _heartbeat_loop(self):
+        while True:
+            try:
+                await self.redis.set(self._worker_key(self.worker_id), "1", ex=PRESENCE_WORKER_TTL)
+            except Exception as e:
+                logger.warning(f"Presence heartbeat failed: {e}")
+            await asyncio.sleep(PRESENCE_HEARTBEAT)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.redis.delete(self._worker_key(self.worker_id))
+        except Exception as e:
+            logger.warning(f"Presence shutdown cleanup failed: {e}")
+
+
+def make_presence_store(url: str = ""):
+    """Presence store matching make_client_manager's URL."""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisPresenceStore(url)
+    return MemoryPresenceStore()
@@ -0,0 +1,103 @@
+"""
+Socket Room Registry
+Per-worker bookkeeping of which socket (sid) is in which room, indexed both
+ways so every operation touches only the rooms involved.
+
+PRINCIPLES:
+1. Membership is tracked per sid, not per user: closing one tab never evicts
+   the user's other tabs from a room
+2. Reverse index (sid -> rooms) makes disconnect proportional to the
+   socket's own rooms instead of scanning every room on the worker
+3. Presence ("who is online in game X") is derived from the same index:
+   the distinct users behind a room's sids
+"""
+
+from typing import Dict, Optional, Set, Tuple
+
+
+def game_room(game_id: str) -> str:
+    return f"game_{game_id}"
+
+
+def group_room(group_id: str) -> str:
+    return f"group_{group_id}"
+
+
+def user_room(user_id: str) -> str:
+    """Every socket of one user (target of emit_to_user)."""
+    return f"user_{user_id}"
+
+
+class RoomRegistry:
+    """sid <-> user and sid <-> room indexes for one worker."""
+
+    def __init__(self):
+        self.user_sids: Dict[str, Set[str]] = {}
+        self.sid_user: Dict[str, str] = {}
+        self.sid_rooms: Dict[str, Set[str]] = {}
+        self.room_sids: Dict[str, Set[str]] = {}
+
+    # ---- connections ----
+
+    def connect(self, sid: str, user_id: str):
+        self.sid_user[sid] = user_id
+        self.user_sids.setdefault(user_id, set()).add(sid)
+        self.sid_rooms.setdefault(sid, set())
+
+    def disconnect(self, sid: str) -> Tuple[Optional[str], Set[str]]:
+        """Forget a socket. Returns (user_id, rooms it was in)."""
+        user_id = self.sid_user.pop(sid, None)
+        if user_id is not None:
+            sids = self.user_sids.get(user_id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self.user_sids[user_id]
+        rooms = self.sid_rooms.pop(sid, set())
+        for room in rooms:
+            self._discard_from_room(room, sid)
+        return user_id, rooms
+
+    # ---- rooms ----
+
+    def join(self, sid: str, room: str):
+        self.sid_rooms.setdefault(sid, set()).add(room)
+        self.room_sids.setdefault(room, set()).add(sid)
+
+    def leave(self, sid: str, room: str) -> bool:
+        """Remove a socket from a room. Returns False if it wasn't in it."""
+        rooms = self.sid_rooms.get(sid)
+        if not rooms or room not in rooms:
+            return False
+        rooms.discard(room)
+        self._discard_from_room(room, sid)
+        return True
+
+    def leave_user(self, user_id: str, room: str) -> Set[str]:
+        """Remove all of a user's sockets from a room. Returns the sids removed."""
+        return {sid for sid in list(self.user_sids.get(user_id, ())) if self.leave(sid, room)}
+
+    def _discard_from_room(self, room: str, sid: str):
+        sids = self.room_sids.get(room)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self.room_sids[room]
+
+    # ---- queries ----
+
+    def sids_of(self, user_id: str) -> Set[str]:
+        return set(self.user_sids.get(user_id, ()))
+
+    def rooms_of(self, sid: str) -> Set[str]:
+        return set(self.sid_rooms.get(sid, ()))
+
+    def sids_in(self, room: str) -> Set[str]:
+        return set(self.room_sids.get(room, ()))
+
+    def users_in(self, room: str) -> Set[str]:
+        """Distinct users with at least one socket in the room."""
+        return {self.sid_user[sid] for sid in self.room_sids.get(room, ()) if sid in self.sid_user}
+
+    def is_online(self, user_id: str) -> bool:
+        return user_id in self.user_sids
@@ -9,6 +9,8 @@ from typing import Optional, Dict, Any
 from pydantic import BaseModel, Field
 from fastapi import APIRouter, HTTPException, Request, Depends
 
+from user_cache import invalidate_user
+
 logger = logging.getLogger(__name__)
 
 # Premium Plans
@@ -200,6 +202,7 @@ async def check_payment_status(
                     "premium_started_at": datetime.now(timezone.utc).isoformat()
                 }}
             )
+            invalidate_user(user_id)
             
             logger.info(f"User {user_id} upgraded to {plan_id} premium")
         
@@ -236,6 +239,7 @@ async def handle_subscription_renewal(user_id: str, plan_id: str, db):
                 "updated_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        invalidate_user(user_id)
         logger.info(f"Subscription renewed for user {user_id}, plan {plan_id} until {new_expiry}")
 
 
@@ -248,6 +252,7 @@ async def handle_subscription_cancelled(user_id: str, cancellation_date: str, db
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_user(user_id)
     logger.info(f"Subscription cancelled for user {user_id}, access until premium_until date")
 
 
@@ -264,6 +269,7 @@ async def handle_payment_failed(user_id: str, db):
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_user(user_id)
     logger.warning(f"Payment failed for user {user_id}, grace period until {grace_period}")
 
 
@@ -278,6 +284,7 @@ async def handle_subscription_expired(user_id: str, db):
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_user(user_id)
     logger.info(f"Subscription expired for user {user_id}, premium access revoked")
 
 
@@ -0,0 +1,501 @@
+"""
+Shared test doubles for the backend unit tests
+
+- FakeDB / Collection / Cursor: an in-memory stand-in for the Motor API the
+  backend modules use (find/find_one/updates/bulk_write/aggregate), with
+  MongoDB's matching, projection and update-operator semantics for the
+  operators this codebase uses. Every awaited operation is one "round trip":
+  it is recorded in db.calls and can be given a simulated latency
+- mongo_db: a throwaway database on a real mongod (MONGO_URL, default
+  mongodb://localhost:27017); tests that use it are skipped when none answers.
+  run_motor() runs a coroutine against it through Motor, the way the server does
+
+The fakes are for logic and query-count tests. Anything that depends on the
+server itself (atomicity, unique indexes, aggregation semantics) runs against
+mongo_db.
+"""
+
+import asyncio
+import itertools
+import os
+import uuid
+
+import pytest
+from pymongo import InsertOne, UpdateMany, UpdateOne
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+
+_object_ids = itertools.count(1)
+
+
+# ============== DOCUMENT HELPERS ==============
+
+_MISSING = object()
+
+
+def get_path(doc, path):
+    """Value at a dotted path, or _MISSING."""
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return _MISSING
+        doc = doc[part]
+    return doc
+
+
+def set_path(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def unset_path(doc, path):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def _compare(op, value, operand):
+    if value is _MISSING or value is None:
+        return False
+    try:
+        return {"$gt": value > operand, "$gte": value >= operand,
+                "$lt": value < operand, "$lte": value <= operand}[op]
+    except TypeError:
+        return False
+
+
+def _equals(value, cond):
+    if value is _MISSING:
+        return cond is None
+    if isinstance(value, list) and not isinstance(cond, list):
+        return cond in value
+    return value == cond
+
+
+def _match_condition(value, cond):
+    if not (isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond)):
+        return _equals(value, cond)
+    for op, operand in cond.items():
+        if op == "$eq":
+            ok = _equals(value, operand)
+        elif op == "$ne":
+            ok = not _equals(value, operand)
+        elif op == "$in":
+            ok = any(_equals(value, o) for o in operand)
+        elif op == "$nin":
+            ok = not any(_equals(value, o) for o in operand)
+        elif op == "$elemMatch":
+            ok = isinstance(value, list) and any(
+                matches(v, operand) if isinstance(v, dict) else _match_condition(v, operand) for v in value
+            )
+        elif op == "$exists":
+            ok = (value is not _MISSING) == bool(operand)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            # Each operator on its own: on an array, different elements may satisfy each
+            values = value if isinstance(value, list) else [value]
+            ok = any(_compare(op, v, operand) for v in values)
+        else:
+            raise NotImplementedError(f"query operator {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches(doc, query):
+    """MongoDB query matching for the operators the backend uses."""
+    for key, cond in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, branch) for branch in cond):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, branch) for branch in cond):
+                return False
+        elif not _match_condition(get_path(doc, key), cond):
+            return False
+    return True
+
+
+def project(doc, projection):
+    """Apply an inclusion or exclusion projection (dotted paths allowed)."""
+    if not projection:
+        return _copy(doc)
+    include_id = projection.get("_id", 1)
+    included = [k for k, v in projection.items() if v and k != "_id"]
+    if included:
+        out = {}
+        for path in included:
+            value = get_path(doc, path)
+            if value is not _MISSING:
+                set_path(out, path, _copy(value))
+        if include_id and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    out = _copy(doc)
+    for path, value in projection.items():
+        if not value:
+            unset_path(out, path)
+    return out
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def evaluate(expr, doc):
+    """Aggregation expressions used in pipeline-style updates."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = get_path(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, dict) and len(expr) == 1:
+        (op, args), = expr.items()
+        if op == "$subtract":
+            a, b = (evaluate(e, doc) for e in args)
+            return a - b
+        if op == "$add":
+            return sum(evaluate(e, doc) for e in args)
+        if op == "$ifNull":
+            value, default = (evaluate(e, doc) for e in args)
+            return default if value is None else value
+        if op == "$eq":
+            a, b = (evaluate(e, doc) for e in args)
+            return a == b
+        if op == "$cond":
+            if isinstance(args, dict):
+                args = [args["if"], args["then"], args["else"]]
+            condition, then, otherwise = args
+            return evaluate(then, doc) if evaluate(condition, doc) else evaluate(otherwise, doc)
+    return expr
+
+
+def apply_update(doc, update):
+    """Apply an update document or an update pipeline ($set stages) in place."""
+    if isinstance(update, list):
+        for stage in update:
+            (op, fields), = stage.items()
+            if op not in ("$set", "$addFields"):
+                raise NotImplementedError(f"pipeline update stage {op}")
+            values = {k: evaluate(v, doc) for k, v in fields.items()}
+            for key, value in values.items():
+                set_path(doc, key, value)
+        return
+
+    for op, fields in update.items():
+        for path, value in fields.items():
+            current = get_path(doc, path)
+            if op == "$set":
+                set_path(doc, path, _copy(value))
+            elif op == "$setOnInsert":
+                continue
+            elif op == "$unset":
+                unset_path(doc, path)
+            elif op == "$inc":
+                set_path(doc, path, (0 if current is _MISSING else current) + value)
+            elif op == "$max":
+                if current is _MISSING or current is None or value > current:
+                    set_path(doc, path, value)
+            elif op == "$min":
+                # BSON order puts null below every number, so $min never replaces a null
+                if current is _MISSING or (current is not None and value < current):
+                    set_path(doc, path, value)
+            elif op == "$push":
+                items = [] if current is _MISSING else list(current)
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(_copy(value["$each"]))
+                    if "$sort" in value:
+                        for key, direction in reversed(list(value["$sort"].items())):
+                            items.sort(key=lambda i: i.get(key), reverse=direction < 0)
+                    if "$slice" in value:
+                        items = items[:value["$slice"]]
+                else:
+                    items.append(_copy(value))
+                set_path(doc, path, items)
+            elif op == "$addToSet":
+                items = [] if current is _MISSING else list(current)
+                for item in (value["$each"] if isinstance(value, dict) and "$each" in value else [value]):
+                    if item not in items:
+                        items.append(item)
+                set_path(doc, path, items)
+            else:
+                raise NotImplementedError(f"update operator {op}")
+
+
+def _sort_rows(rows, keys):
+    for key, direction in reversed(keys):
+        present = [r for r in rows if get_path(r, key) not in (_MISSING, None)]
+        absent = [r for r in rows if get_path(r, key) in (_MISSING, None)]
+        present.sort(key=lambda r: get_path(r, key), reverse=direction < 0)
+        rows[:] = absent + present if direction > 0 else present + absent
+
+
+# ============== FAKES ==============
+
+class Result:
+    def __init__(self, matched_count=0, modified_count=0, upserted_id=None, deleted_count=0, inserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.deleted_count = deleted_count
+        self.inserted_id = inserted_id
+
+
+class Cursor:
+    """Motor-style cursor over precomputed rows; fetching is one round trip."""
+
+    def __init__(self, collection, rows, op="find"):
+        self.collection, self.rows, self.op = collection, rows, op
+        self._skip, self._limit = 0, None
+
+    def sort(self, key, direction=None):
+        keys = key if isinstance(key, list) else [(key, direction if direction is not None else 1)]
+        _sort_rows(self.rows, keys)
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def limit(self, n):
+        self._limit = n or None
+        return self
+
+    def _window(self):
+        rows = self.rows[self._skip:]
+        return rows if self._limit is None else rows[:self._limit]
+
+    async def to_list(self, length=None):
+        await self.collection.round_trip(self.op)
+        rows = self._window()
+        return rows if length is None else rows[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self.collection.round_trip(self.op)
+        for row in self._window():
+            yield row
+
+
+class Collection:
+    """In-memory Motor collection. Documents passed in are stored as given."""
+
+    def __init__(self, db, name, docs=()):
+        self.db, self.name = db, name
+        self.docs = list(docs)
+        self.inserted = []
+        self.aggregate_rows = []
+        self.pipelines = []
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+
+    async def round_trip(self, op):
+        self.db.calls.append((self.name, op))
+        await asyncio.sleep(self.db.latency)
+
+    def _matching(self, query):
+        return [d for d in self.docs if matches(d, query)]
+
+    # Reads
+
+    def find(self, query=None, projection=None):
+        return Cursor(self, [project(d, projection) for d in self._matching(query)])
+
+    async def find_one(self, query=None, projection=None):
+        await self.round_trip("find_one")
+        found = self._matching(query)
+        return project(found[0], projection) if found else None
+
+    async def count_documents(self, query):
+        await self.round_trip("count_documents")
+        return len(self._matching(query))
+
+    async def distinct(self, key, query=None):
+        await self.round_trip("distinct")
+        values = []
+        for doc in self._matching(query):
+            value = get_path(doc, key)
+            if value is not _MISSING and value not in values:
+                values.append(value)
+        return values
+
+    def aggregate(self, pipeline):
+        """Records the pipeline and returns aggregate_rows (pipelines run on mongo_db)."""
+        self.pipelines.append(pipeline)
+        return Cursor(self, [_copy(r) for r in self.aggregate_rows], op="aggregate")
+
+    # Writes (each applies atomically, like a single-document write on the server)
+
+    async def insert_one(self, doc):
+        await self.round_trip("insert_one")
+        doc.setdefault("_id", next(_object_ids))
+        self.docs.append(_copy(doc))
+        self.inserted.append(doc)
+        return Result(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs, ordered=True):
+        await self.round_trip("insert_many")
+        for doc in docs:
+            doc.setdefault("_id", next(_object_ids))
+            self.docs.append(_copy(doc))
+        return Result()
+
+    def _upsert(self, query, update):
+        doc = {"_id": next(_object_ids)}
+        for key, cond in query.items():
+            if not key.startswith("$") and not (isinstance(cond, dict) and any(k.startswith("$") for k in cond)):
+                set_path(doc, key, _copy(cond))
+        if isinstance(update, dict):
+            for path, value in update.get("$setOnInsert", {}).items():
+                set_path(doc, path, _copy(value))
+        self.docs.append(doc)
+        return doc
+
+    def _update(self, query, update, upsert):
+        doc = next(iter(self._matching(query)), None)
+        if doc is None:
+            if not upsert:
+                return None, None, Result()
+            doc = self._upsert(query, update)
+            before = None
+        else:
+            before = _copy(doc)
+        apply_update(doc, update)
+        modified = int(before is not None and before != doc)
+        return before, doc, Result(matched_count=int(before is not None), modified_count=modified,
+                                   upserted_id=doc["_id"] if before is None else None)
+
+    async def update_one(self, query, update, upsert=False):
+        await self.round_trip("update_one")
+        return self._update(query, update, upsert)[2]
+
+    async def update_many(self, query, update, upsert=False):
+        await self.round_trip("update_many")
+        found = self._matching(query)
+        modified = 0
+        for doc in found:
+            before = _copy(doc)
+            apply_update(doc, update)
+            modified += before != doc
+        if not found and upsert:
+            apply_update(self._upsert(query, update), update)
+        return Result(matched_count=len(found), modified_count=modified)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False,
+                                  sort=None):
+        await self.round_trip("find_one_and_update")
+        before, after, _ = self._update(query, update, upsert)
+        doc = after if return_document else before
+        return project(doc, projection) if doc is not None else None
+
+    async def delete_one(self, query):
+        await self.round_trip("delete_one")
+        found = self._matching(query)[:1]
+        self.docs = [d for d in self.docs if not any(d is f for f in found)]
+        return Result(deleted_count=len(found))
+
+    async def delete_many(self, query):
+        await self.round_trip("delete_many")
+        kept = [d for d in self.docs if not matches(d, query)]
+        deleted = len(self.docs) - len(kept)
+        self.docs = kept
+        return Result(deleted_count=deleted)
+
+    async def bulk_write(self, requests, ordered=True):
+        await self.round_trip("bulk_write")
+        for request in requests:
+            if isinstance(request, UpdateMany):
+                for doc in self._matching(request._filter):
+                    apply_update(doc, request._doc)
+            elif isinstance(request, UpdateOne):
+                self._update(request._filter, request._doc, request._upsert)
+            elif isinstance(request, InsertOne):
+                request._doc.setdefault("_id", next(_object_ids))
+                self.docs.append(_copy(request._doc))
+            else:
+                raise NotImplementedError(f"bulk operation {type(request).__name__}")
+        return Result()
+
+    # Indexes
+
+    async def index_information(self):
+        await self.round_trip("index_information")
+        return _copy(self.indexes)
+
+    async def create_index(self, keys, name=None, **options):
+        await self.round_trip("create_index")
+        name = name or "_".join(f"{k}_{d}" for k, d in keys)
+        self.indexes[name] = {"key": list(keys), **options}
+        return name
+
+
+class FakeDB:
+    """
+    Collections are created on first access (db.users, db["users"]).
+
+    calls: (collection, op) for every round trip, in order
+    latency: seconds each round trip takes (simulated with asyncio.sleep)
+    """
+
+    def __init__(self, latency=0.0, **collections):
+        self.calls = []
+        self.latency = latency
+        self._collections = {}
+        for name, docs in collections.items():
+            self[name].docs = list(docs)
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = Collection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    @property
+    def queries(self):
+        return len(self.calls)
+
+
+# ============== REAL MONGOD ==============
+
+@pytest.fixture(scope="session")
+def mongo_client():
+    pymongo = pytest.importorskip("pymongo")
+    client = pymongo.MongoClient(MONGO_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except Exception:
+        pytest.skip(f"no mongod at {MONGO_URL}")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def mongo_db(mongo_client):
+    """Name of a fresh database on the local mongod, dropped afterwards."""
+    name = f"oddside_test_{uuid.uuid4().hex[:8]}"
+    yield name
+    mongo_client.drop_database(name)
+
+
+def run_motor(db_name, scenario):
+    """asyncio.run(scenario(db)) with a Motor database on the local mongod."""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def main():
+        client = AsyncIOMotorClient(MONGO_URL)
+        try:
+            return await scenario(client[db_name])
+        finally:
+            client.close()
+
+    return asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Test suite for assistant routing (tool schemas + prompt caching)
+
+Pure unit tests with a fake Anthropic client that caches prompt prefixes the
+way the API does (no network or API key needed):
+- Tool schemas are built once per orchestrator and versioned
+- The routing request carries a cache breakpoint covering tools + system,
+  so every call after the first reads the prefix from cache
+- Usage and cache-hit metrics per call and in aggregate
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service.claude_client import ROUTING_SYSTEM_PROMPT, ClaudeClient
+from ai_service.orchestrator import AIOrchestrator
+from conftest import FakeDB
+
+
+class FakeMessages:
+    """Counts ~4 chars per token and caches everything up to the last cache_control."""
+
+    def __init__(self):
+        self.requests = []
+        self.cached_prefixes = set()
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        system = kwargs["system"]
+        assert system[-1].get("cache_control") == {"type": "ephemeral"}
+        prefix = json.dumps([kwargs["tools"], system], sort_keys=True)
+        prefix_tokens = len(prefix) // 4
+        key = hashlib.sha256(prefix.encode()).hexdigest()
+        hit = key in self.cached_prefixes
+        self.cached_prefixes.add(key)
+        usage = SimpleNamespace(
+            input_tokens=len(json.dumps(kwargs["messages"])) // 4,
+            output_tokens=12,
+            cache_creation_input_tokens=0 if hit else prefix_tokens,
+            cache_read_input_tokens=prefix_tokens if hit else 0,
+        )
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text="Sure! ---FOLLOW_UPS---[]---END_FOLLOW_UPS---")],
+            stop_reason="end_turn",
+            usage=usage,
+        )
+
+
+def fake_claude():
+    client = ClaudeClient(api_key="test")
+    client.client = object()
+    client.async_client = SimpleNamespace(messages=FakeMessages())
+    return client
+
+
+class TestToolSchemas:
+    """Built once, versioned"""
+
+    def test_built_once_and_versioned(self):
+        orchestrator = AIOrchestrator(db=None)
+        first = orchestrator._build_tool_schemas()
+        assert first is orchestrator._build_tool_schemas()
+        assert len(first) > 20
+        assert len(orchestrator.tool_schema_version) == 12
+        assert AIOrchestrator(db=None)._build_tool_schemas() == first
+        assert AIOrchestrator(db=None).tool_schema_version is None  # lazy until first routing call
+
+
+class TestPromptCaching:
+    """Cache breakpoint on the tools + system prefix"""
+
+    def test_requests_share_a_cached_prefix(self):
+        claude = fake_claude()
+        db = FakeDB()
+        orchestrator = AIOrchestrator(db=db, llm_client=claude)
+        orchestrator._build_tool_schemas()
+        orchestrator._preselector.k = 0  # full catalog every time (preselection: test_tool_preselector)
+
+        async def scenario():
+            for text in ("who owes me?", "what are my stats?", "help"):
+                result = await orchestrator.process(text, context={"group_id": "grp1"}, user_id="u1")
+                assert result["success"] and result["type"] == "general"
+
+        asyncio.run(scenario())
+        requests = claude.async_client.messages.requests
+        assert all(r["tools"] is requests[0]["tools"] for r in requests)
+        assert all("cache_control" not in tool for tool in requests[0]["tools"])
+        assert requests[0]["system"][0]["text"] == ROUTING_SYSTEM_PROMPT
+
+        calls = [doc["llm"] for doc in db.ai_orchestrator_logs.docs]
+        assert [c["tool_schema_version"] for c in calls] == [orchestrator.tool_schema_version] * 3
+        assert calls[0]["usage"]["cache_creation_input_tokens"] > 0
+        assert all(c["usage"]["cache_read_input_tokens"] > 0 for c in calls[1:])
+        assert all(c["latency_ms"] is not None for c in calls)
+
+        metrics = claude.routing_metrics()
+        print(f"\nrouting metrics: {metrics}")
+        assert metrics["calls"] == 3 and metrics["cache_hits"] == 2
+        assert metrics["cache_hit_rate"] == round(2 / 3, 3)
+        assert metrics["cached_prompt_share"] > 0.5
+
+    def test_errors_are_counted(self):
+        claude = fake_claude()
+
+        async def boom(**kwargs):
+            raise RuntimeError("overloaded")
+
+        claude.async_client.messages.create = boom
+        result = asyncio.run(claude.route_with_tools("hi", {}, tools=[]))
+        assert result["stop_reason"] == "error"
+        assert claude.routing_metrics()["errors"] == 1
+        assert claude.routing_metrics()["cache_hit_rate"] == 0.0
@@ -0,0 +1,189 @@
+"""
+Test suite for shared Supabase token verification
+
+Pure unit tests (no running server or Supabase project needed):
+- RS256 tokens verify against a JWKS fetched asynchronously, HS256 as fallback
+- Verified claims are cached by token hash until exp
+- Unknown kids trigger one rate-limited JWKS refetch (key rotation)
+- Expired tokens raise TokenExpired, invalid ones return None
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+import auth_tokens
+from auth_tokens import JWKSKeyStore, TokenExpired, TokenVerifier
+
+SECRET = "legacy-secret-for-tests-0123456789abcdef"
+
+
+def make_key(kid):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(RSAAlgorithm.to_jwk(private.public_key()))
+    jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return private, jwk
+
+
+def sign(private, kid, ttl=3600, sub="user-1"):
+    claims = {"sub": sub, "aud": "authenticated", "exp": int(time.time()) + ttl}
+    return jwt.encode(claims, private, algorithm="RS256", headers={"kid": kid})
+
+
+class FakeJWKS:
+    """JWKS endpoint stand-in that counts fetches."""
+
+    def __init__(self, *jwks):
+        self.jwks = list(jwks)
+        self.fetches = 0
+
+    async def __call__(self, url):
+        self.fetches += 1
+        return {"keys": self.jwks}
+
+
+class TestVerification:
+    """RS256 via JWKS, HS256 fallback"""
+
+    def test_rs256_and_hs256(self):
+        private, jwk = make_key("k1")
+        verifier = TokenVerifier(JWKSKeyStore("https://x/jwks", fetcher=FakeJWKS(jwk)), secret=SECRET)
+        hs_token = jwt.encode({"sub": "user-2", "aud": "authenticated", "exp": int(time.time()) + 60}, SECRET, algorithm="HS256")
+
+        async def scenario():
+            rs = await verifier.verify(sign(private, "k1"))
+            hs = await verifier.verify(hs_token)
+            bad = await verifier.verify("not-a-jwt")
+            return rs, hs, bad
+
+        rs, hs, bad = asyncio.run(scenario())
+        assert rs["sub"] == "user-1"
+        assert hs["sub"] == "user-2"
+        assert bad is None
+
+    def test_wrong_key_rejected(self):
+        _, jwk = make_key("k1")
+        other, _ = make_key("k1")
+        verifier = TokenVerifier(JWKSKeyStore("https://x/jwks", fetcher=FakeJWKS(jwk)))
+        assert asyncio.run(verifier.verify(sign(other, "k1"))) is None
+
+    def test_expired_token_raises(self):
+        private, jwk = make_key("k1")
+        verifier = TokenVerifier(JWKSKeyStore("https://x/jwks", fetcher=FakeJWKS(jwk)))
+        try:
+            asyncio.run(verifier.verify(sign(private, "k1", ttl=-10)))
+        except TokenExpired:
+            return
+        raise AssertionError("expected TokenExpired")
+
+
+class TestClaimsCache:
+    """Repeat tokens skip the signature check until exp"""
+
+    def test_cache_hit_skips_decode(self, monkeypatch):
+        private, jwk = make_key("k1")
+        verifier = TokenVerifier(JWKSKeyStore("https://x/jwks", fetcher=FakeJWKS(jwk)))
+        token = sign(private, "k1")
+
+        asyncio.run(verifier.verify(token))
+        monkeypatch.setattr(auth_tokens.jwt, "decode", lambda *a, **k: (_ for _ in ()).throw(AssertionError("decoded")))
+        claims = asyncio.run(verifier.verify(token))
+
+        assert claims["sub"] == "user-1"
+        assert verifier.stats["hits"] == 1
+        assert token not in str(verifier._claims)
+
+    def test_cached_token_expires(self, monkeypatch):
+        private, jwk = make_key("k1")
+        verifier = TokenVerifier(JWKSKeyStore("https://x/jwks", fetcher=FakeJWKS(jwk)))
+        token = sign(private, "k1", ttl=60)
+        asyncio.run(verifier.verify(token))
+
+        later = time.time() + 120
+        monkeypatch.setattr(auth_tokens.time, "time", lambda: later)
+        try:
+            asyncio.run(verifier.verify(token))
+        except TokenExpired:
+            assert not verifier._claims
+            return
+        raise AssertionError("expected TokenExpired")
+
+    def test_cache_bounded(self):
+        verifier = TokenVerifier(secret=SECRET, max_entries=3)
+
+        async def scenario():
+            for i in range(5):
+                token = jwt.encode({"sub": f"u{i}", "aud": "authenticated", "exp": int(time.time()) + 60}, SECRET, algorithm="HS256")
+                await verifier.verify(token)
+
+        asyncio.run(scenario())
+        assert len(verifier._claims) == 3
+
+    def test_benchmark_cached_verify(self):
+        private, jwk = make_key("k1")
+        verifier = TokenVerifier(JWKSKeyStore("https://x/jwks", fetcher=FakeJWKS(jwk)))
+        token = sign(private, "k1")
+
+        async def scenario(n):
+            start = time.perf_counter()
+            for _ in range(n):
+                await verifier.verify(token)
+            return (time.perf_counter() - start) / n
+
+        cold = asyncio.run(scenario(1))
+        warm = asyncio.run(scenario(1000))
+        print(f"\nverify: first {cold * 1e6:.0f}us, cached {warm * 1e6:.1f}us")
+        assert warm < cold
+
+
+class TestKeyRotation:
+    """Unknown kids refetch the JWKS, at most once per gap"""
+
+    def test_unknown_kid_refetches_once(self):
+        old_private, old_jwk = make_key("old")
+        new_private, new_jwk = make_key("new")
+        endpoint = FakeJWKS(old_jwk)
+        store = JWKSKeyStore("https://x/jwks", fetcher=endpoint)
+        verifier = TokenVerifier(store)
+
+        async def scenario():
+            await store.refresh()
+            assert (await verifier.verify(sign(old_private, "old")))["sub"] == "user-1"
+
+            # Rotation: the new key is published, the gap has elapsed
+            endpoint.jwks.append(new_jwk)
+            store._fetched_at -= auth_tokens.JWKS_MIN_REFETCH_GAP
+            tokens = [sign(new_private, "new", sub=f"u{i}") for i in range(10)]
+            results = await asyncio.gather(*(verifier.verify(t) for t in tokens))
+            assert all(r is not None for r in results)
+            assert endpoint.fetches == 2
+
+            # A bogus kid right after does not hammer the endpoint
+            assert await verifier.verify(sign(new_private, "bogus")) is None
+            assert endpoint.fetches == 2
+
+        asyncio.run(scenario())
+
+    def test_failed_refresh_keeps_keys(self):
+        private, jwk = make_key("k1")
+        endpoint = FakeJWKS(jwk)
+        store = JWKSKeyStore("https://x/jwks", fetcher=endpoint)
+
+        async def failing(url):
+            raise OSError("network down")
+
+        async def scenario():
+            assert await store.refresh()
+            store._fetch = failing
+            assert not await store.refresh()
+            return store.kids
+
+        assert asyncio.run(scenario()) == {"k1"}
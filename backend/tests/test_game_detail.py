@@ -0,0 +1,208 @@
+"""
+Test suite for the single-aggregation game detail read
+
+- One aggregation per read; ETags are per viewer, per state_version and per
+  group/user cards; revalidation uses point reads only (in-memory FakeDB)
+- The pipeline's lookups and per-player math, executed on a local mongod
+  (skipped when none answers at MONGO_URL)
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conftest import FakeDB, run_motor
+from game_detail import (
+    build_game_detail_pipeline, cards_digest, etag_matches, fetch_game_detail, fetch_game_version,
+    finish_game_detail, game_etag, view_cards_digest,
+)
+
+
+def make_db(games=(), members=(), rows=()):
+    db = FakeDB(game_nights=games, group_members=members)
+    db.game_nights.aggregate_rows = list(rows)
+    return db
+
+
+def seed(db):
+    """A small game: host u1 (admin), u2 playing, u3 not in the group."""
+    db.groups.insert_one({"group_id": "grp", "name": "Friday Crew"})
+    db.group_members.insert_many([
+        {"group_id": "grp", "user_id": "u1", "role": "admin"},
+        {"group_id": "grp", "user_id": "u2", "role": "member"},
+    ])
+    db.users.insert_many([
+        {"user_id": "u1", "name": "Ann", "picture": None, "email": "ann@example.com"},
+        {"user_id": "u2", "name": "Bob", "picture": "b.png", "email": "bob@example.com"},
+    ])
+    db.game_nights.insert_many([
+        {"game_id": "g1", "group_id": "grp", "host_id": "u1", "title": "Friday", "status": "active"},
+        {"game_id": "g2", "group_id": "grp", "host_id": "u2", "status": "active"},
+    ])
+    db.players.insert_many([
+        {"game_id": "g1", "user_id": "u1", "total_buy_in": 40.0, "cash_out": 55.0},
+        {"game_id": "g1", "user_id": "u2", "total_buy_in": 20.0},
+        {"game_id": "g2", "user_id": "u2", "total_buy_in": 99.0},
+    ])
+    db.transactions.insert_many([
+        {"transaction_id": "t1", "game_id": "g1", "user_id": "u1", "type": "buy_in", "amount": 20.0},
+        {"transaction_id": "t2", "game_id": "g1", "user_id": "u1", "type": "buy_in", "amount": 20.0},
+        {"transaction_id": "t3", "game_id": "g1", "user_id": "u1", "type": "cash_out", "amount": 55.0},
+        {"transaction_id": "t4", "game_id": "g1", "user_id": "u2", "type": "buy_in", "amount": 20.0},
+        {"transaction_id": "t5", "game_id": "g2", "user_id": "u2", "type": "buy_in", "amount": 99.0},
+    ])
+
+
+class TestPipeline:
+    """Single aggregation for the whole view"""
+
+    def test_stage_shape(self):
+        pipeline = build_game_detail_pipeline("g1", "u1")
+        stages = [next(iter(stage)) for stage in pipeline]
+        assert stages == [
+            "$match", "$limit", "$project", "$lookup", "$lookup", "$lookup",
+            "$addFields", "$addFields", "$lookup", "$lookup", "$addFields", "$project"
+        ]
+        assert pipeline[0] == {"$match": {"game_id": "g1"}}
+        lookups = [s["$lookup"]["from"] for s in pipeline if "$lookup" in s]
+        assert lookups == ["group_members", "players", "transactions", "groups", "users"]
+        assert pipeline[3]["$lookup"]["pipeline"][0] == {"$match": {"user_id": "u1"}}
+        assert pipeline[-2]["$addFields"]["is_host"] == {"$eq": ["$host_id", "u1"]}
+
+    def test_one_round_trip(self):
+        row = {"game_id": "g1", "group_id": "grp", "host_id": "u1", "_membership": [{"role": "admin"}],
+               "players": [{"user_id": "u1", "transactions": []}], "state_version": 3, "is_host": True}
+        db = make_db(rows=[row])
+        game = asyncio.run(fetch_game_detail(db, "g1", "u1"))
+        assert db.calls == [("game_nights", "aggregate")]
+        assert game["players"][0]["user"] is None
+        assert game["group"] is None and game["current_player"] is None
+
+    def test_missing_game_and_host(self):
+        assert asyncio.run(fetch_game_detail(make_db(), "g1", "u1")) is None
+        game = finish_game_detail({"game_id": "g1", "host": {"user_id": None}, "players": []})
+        assert game["host"] is None
+
+
+class TestEtag:
+    """Per-viewer, per-version validators"""
+
+    def test_etag_varies_by_viewer_and_version(self):
+        etag = game_etag("g1", 4, "u1")
+        assert etag.startswith('W/"') and etag.endswith('.4"')
+        assert etag != game_etag("g1", 4, "u2")
+        assert etag != game_etag("g1", 5, "u1")
+        assert etag == game_etag("g1", 4, "u1")
+        assert etag != game_etag("g1", 4, "u1", "cards")
+
+    def test_cards_digest(self):
+        group = {"group_id": "grp", "name": "Friday Crew"}
+        ann = {"user_id": "u1", "name": "Ann"}
+        bob = {"user_id": "u2", "name": "Bob"}
+        digest = cards_digest(group, [ann, bob])
+        # Order, duplicates (host is also a player) and missing cards don't matter
+        assert digest == cards_digest(group, [bob, None, ann, ann])
+        assert digest != cards_digest({**group, "name": "Saturday Crew"}, [ann, bob])
+        assert digest != cards_digest(group, [{**ann, "name": "Anne"}, bob])
+        assert digest != cards_digest(group, [{**ann, "picture": "a.png"}, bob])
+
+        view = {"group": group, "host": ann, "players": [{"user": ann}, {"user": bob}, {"user": None}]}
+        assert view_cards_digest(view) == digest
+
+    def test_if_none_match(self):
+        etag = game_etag("g1", 4, "u1")
+        assert etag_matches(etag, etag)
+        assert etag_matches(etag[2:], etag)  # strong form of the same tag
+        assert etag_matches(f'"other", {etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(game_etag("g1", 3, "u1"), etag)
+        assert not etag_matches(None, etag)
+
+
+class TestRevalidation:
+    """A 304 needs point reads only, no aggregation"""
+
+    def test_version_and_membership(self):
+        db = make_db(
+            games=[{"game_id": "g1", "group_id": "grp", "state_version": 7}],
+            members=[{"group_id": "grp", "user_id": "u1", "role": "member"}],
+        )
+        head = asyncio.run(fetch_game_version(db, "g1", "u1"))
+        assert head == {"group_id": "grp", "state_version": 7, "is_member": True, "cards": cards_digest(None, [])}
+        assert db.calls == [
+            ("game_nights", "find_one"), ("group_members", "find_one"),
+            ("groups", "find_one"), ("players", "find"),
+        ]
+
+        db.calls.clear()
+        outsider = asyncio.run(fetch_game_version(db, "g1", "u2"))
+        assert outsider["is_member"] is False and "cards" not in outsider
+        assert db.calls == [("game_nights", "find_one"), ("group_members", "find_one")]
+        assert asyncio.run(fetch_game_version(db, "missing", "u1")) is None
+
+    def test_group_edit_and_rename_change_the_cards(self):
+        db = FakeDB(
+            game_nights=[{"game_id": "g1", "group_id": "grp", "host_id": "u1"}],
+            group_members=[{"group_id": "grp", "user_id": "u1", "role": "admin"}],
+            groups=[{"group_id": "grp", "name": "Friday Crew"}],
+            players=[{"game_id": "g1", "user_id": "u1"}, {"game_id": "g1", "user_id": "u2"}],
+            users=[
+                {"user_id": "u1", "name": "Ann", "picture": None, "email": "ann@example.com"},
+                {"user_id": "u2", "name": "Bob", "picture": "b.png", "email": "bob@example.com"},
+            ],
+        )
+        cards = asyncio.run(fetch_game_version(db, "g1", "u1"))["cards"]
+        assert cards == cards_digest(
+            {"group_id": "grp", "name": "Friday Crew"},
+            [{"user_id": "u1", "name": "Ann", "picture": None}, {"user_id": "u2", "name": "Bob", "picture": "b.png"}]
+        )
+
+        asyncio.run(db.groups.update_one({"group_id": "grp"}, {"$set": {"name": "Saturday Crew"}}))
+        renamed_group = asyncio.run(fetch_game_version(db, "g1", "u1"))["cards"]
+        assert renamed_group != cards
+
+        asyncio.run(db.users.update_one({"user_id": "u2"}, {"$set": {"name": "Robert"}}))
+        assert asyncio.run(fetch_game_version(db, "g1", "u1"))["cards"] != renamed_group
+
+
+class TestPipelineOnMongo:
+    """The aggregation itself (local mongod)"""
+
+    def test_full_view(self, mongo_client, mongo_db):
+        seed(mongo_client[mongo_db])
+
+        async def scenario(db):
+            return (
+                await fetch_game_detail(db, "g1", "u2"),
+                await fetch_game_detail(db, "g1", "u3"),
+                await fetch_game_detail(db, "missing", "u1"),
+            )
+
+        game, outsider, missing = run_motor(mongo_db, scenario)
+        assert missing is None
+        assert game["title"] == "Friday" and "_id" not in game and "_transactions" not in game
+        assert game["_membership"] == [{"role": "member"}]
+        assert game["group"] == {"group_id": "grp", "name": "Friday Crew"}
+        assert game["host"] == {"user_id": "u1", "name": "Ann", "picture": None}
+        assert game["is_host"] is False and game["state_version"] == 0
+
+        players = {p["user_id"]: p for p in game["players"]}
+        assert set(players) == {"u1", "u2"}
+        assert players["u1"]["user"] == {"user_id": "u1", "name": "Ann", "picture": None}
+        assert [t["transaction_id"] for t in players["u1"]["transactions"]] == ["t1", "t2", "t3"]
+        assert players["u1"]["buy_in_count"] == 2 and players["u1"]["net_result"] == 15.0
+        assert players["u2"]["buy_in_count"] == 1 and players["u2"]["net_result"] == -20.0
+        assert game["current_player"]["user_id"] == "u2"
+
+        assert outsider["_membership"] == [] and outsider["current_player"] is None
+
+    def test_revalidation_cards_match_the_view(self, mongo_client, mongo_db):
+        seed(mongo_client[mongo_db])
+
+        async def scenario(db):
+            return await fetch_game_detail(db, "g1", "u2"), await fetch_game_version(db, "g1", "u2")
+
+        game, head = run_motor(mongo_db, scenario)
+        assert head["cards"] == view_cards_digest(game)
@@ -0,0 +1,159 @@
+"""
+Test suite for paginated game history
+
+- Cursor tokens round-trip and reject garbage
+- The keyset $match/$sort/$limit run on players before any $lookup
+- Look-ahead row becomes next_cursor; rows for missing games are dropped
+- game_sort_at is written with new rows and backfilled (in-memory FakeDB)
+- Paging through a long history on a local mongod: complete, in order, and
+  each page examines O(page) index keys (skipped when no mongod answers)
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conftest import FakeDB, run_motor
+from game_history import (
+    InvalidCursor, backfill_game_sort_at, build_history_pipeline, decode_cursor, encode_cursor,
+    fetch_game_history, game_sort_at, history_fields, paginate,
+)
+from index_registry import ensure_indexes, plan_stages, winning_plan
+
+
+class TestCursor:
+    """Opaque keyset cursor"""
+
+    def test_round_trip(self):
+        token = encode_cursor("2026-05-01T20:00:00+00:00", "game_abc")
+        assert "=" not in token
+        assert decode_cursor(token) == ("2026-05-01T20:00:00+00:00", "game_abc")
+
+    def test_rejects_garbage(self):
+        for bad in ("not base64!!", encode_cursor("x", "y")[:-3], "W10"):
+            try:
+                decode_cursor(bad)
+            except InvalidCursor:
+                continue
+            raise AssertionError(f"expected InvalidCursor for {bad!r}")
+
+
+class TestPipeline:
+    """Single aggregation per page, paginated before the joins"""
+
+    def test_first_page(self):
+        pipeline = build_history_pipeline("u1", 20)
+        stages = [next(iter(stage)) for stage in pipeline]
+        assert stages == ["$match", "$sort", "$limit", "$lookup", "$unwind", "$lookup", "$project"]
+        assert pipeline[0] == {"$match": {"user_id": "u1"}}
+        assert pipeline[1] == {"$sort": {"game_sort_at": -1, "game_id": -1}}
+        assert pipeline[2] == {"$limit": 21}
+
+    def test_keyset_filter_follows_cursor(self):
+        pipeline = build_history_pipeline("u1", 20, encode_cursor("2026-05-01", "game_b"))
+        assert pipeline[0]["$match"] == {"user_id": "u1", "$or": [
+            {"game_sort_at": {"$lt": "2026-05-01"}},
+            {"game_sort_at": "2026-05-01", "game_id": {"$lt": "game_b"}}
+        ]}
+        assert next(iter(pipeline[1])) == "$sort"
+
+
+class TestPaginate:
+    """Look-ahead row handling"""
+
+    def rows(self, n):
+        return [{"game_id": f"g{i}", "sort_at": f"2026-01-{30 - i:02d}"} for i in range(n)]
+
+    def test_more_pages(self):
+        games, cursor = paginate(self.rows(3), 2)
+        assert [g["game_id"] for g in games] == ["g0", "g1"]
+        assert all("sort_at" not in g for g in games)
+        assert decode_cursor(cursor) == ("2026-01-29", "g1")
+
+    def test_last_page(self):
+        games, cursor = paginate(self.rows(2), 2)
+        assert len(games) == 2 and cursor is None
+        assert paginate([], 5) == ([], None)
+
+    def test_missing_game_still_advances_cursor(self):
+        rows = self.rows(3)
+        rows[1]["missing_game"] = True
+        games, cursor = paginate(rows, 2)
+        assert [g["game_id"] for g in games] == ["g0"]
+        assert decode_cursor(cursor) == ("2026-01-29", "g1")
+
+
+class TestSortKey:
+    """game_sort_at on players rows"""
+
+    def test_sort_key(self):
+        assert game_sort_at({"created_at": "2026-05-01T20:00:00+00:00"}) == "2026-05-01T20:00:00+00:00"
+        started = datetime(2026, 5, 1, 20, tzinfo=timezone.utc)
+        assert game_sort_at({"created_at": None, "started_at": started}) == started.isoformat()
+        assert game_sort_at(None) == "" and history_fields({}) == {"game_sort_at": ""}
+
+    def test_backfill(self):
+        db = FakeDB(
+            game_nights=[{"game_id": f"g{i}", "created_at": f"2026-01-{i + 1:02d}"} for i in range(5)],
+            players=[{"game_id": f"g{i % 6}", "user_id": f"u{i}"} for i in range(12)]
+            + [{"game_id": "g0", "user_id": "done", "game_sort_at": "kept"}],
+        )
+        assert asyncio.run(backfill_game_sort_at(db, batch_size=4)) == 6
+        rows = {r["user_id"]: r["game_sort_at"] for r in db.players.docs}
+        assert rows["u1"] == "2026-01-02" and rows["u5"] == "" and rows["done"] == "kept"
+        assert asyncio.run(backfill_game_sort_at(db)) == 0
+
+
+def cursor_explain(explain):
+    """The players-side plan of an aggregate explain (whole-pipeline or $cursor layout)."""
+    return explain if "queryPlanner" in explain else explain["stages"][0]["$cursor"]
+
+
+class TestPagingOnMongo:
+    """Deep pages cost the same as the first (local mongod)"""
+
+    GAMES = 400
+    PAGE = 25
+
+    def test_pages(self, mongo_client, mongo_db):
+        db = mongo_client[mongo_db]
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        games = [{"game_id": f"g{i:04d}", "group_id": "grp", "title": f"Game {i}", "status": "ended",
+                  "created_at": (start + timedelta(hours=i // 2)).isoformat()} for i in range(self.GAMES)]
+        db.game_nights.insert_many(games)
+        db.groups.insert_one({"group_id": "grp", "name": "Friday Crew"})
+        db.players.insert_many([
+            {"game_id": g["game_id"], "user_id": "u1", "total_buy_in": 20.0, "cashed_out": True,
+             "net_result": 5.0, **history_fields(g)}
+            for g in games[:-1]
+        ] + [{"game_id": "gone", "user_id": "u1", "game_sort_at": "2024-01-01"}])
+        run_motor(mongo_db, ensure_indexes)
+
+        async def all_pages(motor_db):
+            seen, cursor = [], None
+            while True:
+                page = await fetch_game_history(motor_db, "u1", self.PAGE, cursor)
+                seen.extend(page["games"])
+                cursor = page["next_cursor"]
+                if not cursor:
+                    return seen
+
+        seen = run_motor(mongo_db, all_pages)
+        expected = sorted(games[:-1], key=lambda g: (g["created_at"], g["game_id"]), reverse=True)
+        assert [g["game_id"] for g in seen] == [g["game_id"] for g in expected]
+        assert seen[0]["group"] == {"name": "Friday Crew"} and seen[0]["net_result"] == 5.0
+
+        deep = expected[300]
+        pipeline = build_history_pipeline("u1", self.PAGE, encode_cursor(deep["created_at"], deep["game_id"]))
+        explain = cursor_explain(db.command(
+            "explain", {"aggregate": "players", "pipeline": pipeline, "cursor": {}}, verbosity="executionStats"
+        ))
+        stats = explain["executionStats"]
+        print(f"\ndeep page: {stats['totalKeysExamined']} keys, {stats['totalDocsExamined']} docs examined")
+        assert "SORT" not in plan_stages(winning_plan(explain))
+        # players index entries plus the two per-row lookups, nowhere near the 400-row history
+        assert stats["totalKeysExamined"] <= 4 * (self.PAGE + 1)
+
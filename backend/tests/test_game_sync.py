@@ -0,0 +1,182 @@
+"""
+Test suite for versioned game state deltas
+
+Pure unit tests against the in-memory FakeDB (no MongoDB needed):
+- Concurrent mutations get distinct, gapless state_versions
+- Deltas carry absolute player totals, new transactions, JSON-safe values
+- sync_since catches a client up, or tells it to reload
+- ai_service tools that change a game bump its version and push the delta
+- Benchmark: delta size vs the full game detail payload
+"""
+
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_sync
+import websocket_manager
+from ai_service.tools.game_manager import GameManagerTool
+from ai_service.tools.scheduler import SchedulerTool
+from conftest import FakeDB
+from game_sync import record_delta, sync_since
+
+
+def game(**extra):
+    return {"game_id": "g1", "group_id": "grp", "status": "active", "total_chips_distributed": 0, **extra}
+
+
+def player(user_id, **extra):
+    return {"game_id": "g1", "user_id": user_id, "rsvp_status": "yes", "total_buy_in": 20.0, "total_chips": 20, **extra}
+
+
+class TestRecordDelta:
+    """Versioning and delta contents"""
+
+    def test_concurrent_versions_distinct_and_gapless(self):
+        db = FakeDB(game_nights=[game()], players=[player("u1")])
+
+        async def scenario():
+            return await asyncio.gather(*(record_delta(db, "g1", ["u1"]) for _ in range(50)))
+
+        deltas = asyncio.run(scenario())
+        assert sorted(d["version"] for d in deltas) == list(range(1, 51))
+        assert sorted(d["version"] for d in db.game_state_deltas.docs) == list(range(1, 51))
+        assert db.game_nights.docs[0]["state_version"] == 50
+
+    def test_delta_contents(self):
+        cashed_out_at = datetime(2026, 1, 1, 23, 30, tzinfo=timezone.utc)
+        db = FakeDB(
+            game_nights=[game(title="Friday", total_chips_distributed=60)],
+            players=[
+                player("u1", total_buy_in=40.0, cash_out=55.0, cashed_out_at=cashed_out_at),
+                player("u2"),
+            ],
+            users=[{"user_id": "u1", "name": "Ana", "picture": None, "email": "a@x.io"}],
+        )
+        txn = {"transaction_id": "txn_1", "user_id": "u1", "type": "cash_out", "amount": 55.0, "_id": object()}
+
+        delta = asyncio.run(record_delta(db, "g1", ["u1", "u1"], removed=["u3"], transactions=[txn]))
+
+        assert delta["version"] == 1
+        assert delta["game"] == {"status": "active", "total_chips_distributed": 60}
+        assert len(delta["players"]) == 1
+        p = delta["players"][0]
+        assert p["total_buy_in"] == 40.0 and p["net_result"] == 15.0
+        assert p["cashed_out_at"] == cashed_out_at.isoformat()
+        assert p["user"] == {"user_id": "u1", "name": "Ana", "picture": None}
+        assert delta["removed"] == ["u3"]
+        assert delta["transactions"] == [{k: v for k, v in txn.items() if k != "_id"}]
+        json.dumps(delta)  # socket payloads must be JSON
+
+    def test_extra_game_fields_and_missing_game(self):
+        db = FakeDB(game_nights=[game(title="Friday")])
+        delta = asyncio.run(record_delta(db, "g1", game_fields=["title"]))
+        assert delta["game"]["title"] == "Friday"
+        assert asyncio.run(record_delta(db, "missing")) is None
+
+
+class TestSyncSince:
+    """Catch-up for clients that missed deltas"""
+
+    def setup_db(self, versions):
+        db = FakeDB(game_nights=[game()], players=[player("u1")])
+
+        async def scenario():
+            for _ in range(versions):
+                await record_delta(db, "g1", ["u1"])
+
+        asyncio.run(scenario())
+        return db
+
+    def test_catch_up_and_current(self):
+        db = self.setup_db(5)
+        result = asyncio.run(sync_since(db, "g1", 2))
+        assert result["version"] == 5
+        assert [d["version"] for d in result["deltas"]] == [3, 4, 5]
+        assert asyncio.run(sync_since(db, "g1", 5)) == {"version": 5, "deltas": []}
+
+    def test_gap_stops_the_run(self):
+        db = self.setup_db(5)
+        db.game_state_deltas.docs = [d for d in db.game_state_deltas.docs if d["version"] != 4]
+        result = asyncio.run(sync_since(db, "g1", 1))
+        assert [d["version"] for d in result["deltas"]] == [2, 3]
+
+    def test_resync_when_too_far_behind_or_ahead(self, monkeypatch):
+        monkeypatch.setattr(game_sync, "DELTA_RETENTION", 3)
+        db = self.setup_db(5)
+        assert asyncio.run(sync_since(db, "g1", 1)) == {"version": 5, "resync": True}
+        assert asyncio.run(sync_since(db, "g1", 9)) == {"version": 5, "resync": True}
+        assert asyncio.run(sync_since(db, "missing", 0))["resync"] is True
+
+    def test_old_deltas_pruned(self, monkeypatch):
+        monkeypatch.setattr(game_sync, "DELTA_RETENTION", 10)
+        monkeypatch.setattr(game_sync, "PRUNE_EVERY", 5)
+        db = self.setup_db(25)
+        assert min(d["version"] for d in db.game_state_deltas.docs) == 16
+
+
+class TestPublish:
+    """Writers outside server.py go through publish_delta"""
+
+    def test_ai_tools_bump_version_and_push(self, monkeypatch):
+        pushed = []
+
+        async def emit_game_event(game_id, event_type, data, **kwargs):
+            pushed.append((game_id, event_type, data["version"], data["game"]))
+
+        monkeypatch.setattr(websocket_manager, "emit_game_event", emit_game_event)
+        db = FakeDB(game_nights=[game(status="scheduled")])
+
+        async def scenario():
+            games = GameManagerTool(db=db)
+            assert (await games.execute("start_game", game_id="g1")).success
+            assert (await SchedulerTool(db=db).execute("schedule_game", game_id="g1", scheduled_time="2026-05-01T20:00")).success
+            assert (await games.execute("end_game", game_id="g1")).success
+            assert not (await games.execute("end_game", game_id="g1")).success  # no change, no version
+            return await sync_since(db, "g1", 0)
+
+        synced = asyncio.run(scenario())
+        assert [(p[0], p[1], p[2]) for p in pushed] == [("g1", "state_delta", v) for v in (1, 2, 3)]
+        assert pushed[0][3]["status"] == "active" and pushed[1][3]["scheduled_time"] == "2026-05-01T20:00"
+        assert pushed[2][3]["status"] == "ended" and pushed[2][3]["ended_at"]
+        assert db.game_nights.docs[0]["state_version"] == 3 and len(synced["deltas"]) == 3
+
+    def test_push_failure_does_not_raise(self, monkeypatch):
+        async def broken(*args, **kwargs):
+            raise RuntimeError("socket down")
+
+        monkeypatch.setattr(websocket_manager, "emit_game_event", broken)
+        db = FakeDB(game_nights=[game()])
+        assert asyncio.run(game_sync.publish_delta(db, "g1")) is None
+        assert db.game_nights.docs[0]["state_version"] == 1
+
+
+class TestBenchmark:
+    """A buy-in at a 10-player table: delta vs full game detail refetch"""
+
+    def test_delta_vs_detail_payload(self):
+        users = [{"user_id": f"u{i}", "name": f"Player {i}", "picture": None} for i in range(10)]
+        players = [player(f"u{i}", player_id=f"plr_{i}", joined_at="2026-01-01T20:00:00+00:00") for i in range(10)]
+        txns = [
+            {"transaction_id": f"txn_{i}_{n}", "game_id": "g1", "user_id": f"u{i}", "type": "buy_in",
+             "amount": 20.0, "chips": 20, "chip_value": 1.0, "timestamp": "2026-01-01T20:00:00+00:00", "notes": None}
+            for i in range(10) for n in range(3)
+        ]
+        db = FakeDB(game_nights=[game(title="Friday night", total_chips_distributed=600)], players=players, users=users)
+
+        # Shape of GET /games/{game_id}: every player with user info and transactions
+        detail = dict(db.game_nights.docs[0])
+        detail["players"] = [
+            {**p, "user": users[i], "transactions": [t for t in txns if t["user_id"] == p["user_id"]]}
+            for i, p in enumerate(players)
+        ]
+        delta = asyncio.run(record_delta(db, "g1", ["u3"], transactions=[txns[9]]))
+
+        detail_bytes = len(json.dumps(detail))
+        delta_bytes = len(json.dumps(delta))
+        print(f"\ndetail refetch: {detail_bytes} bytes, delta: {delta_bytes} bytes")
+        assert delta_bytes * 5 < detail_bytes
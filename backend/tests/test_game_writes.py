@@ -0,0 +1,214 @@
+"""
+Test suite for atomic buy-in / cash-out writes
+
+Logic tests run against the in-memory FakeDB with a simulated round trip per
+operation. The fake applies each update in one step, so it shows the flow
+issues no read-modify-write, but it can't prove the server is atomic; the
+concurrency claims are checked on a local mongod (skipped when none answers):
+- 100 parallel buy-ins (host and player racing) produce exact totals
+- Concurrent auto-joins of a new player seat them once (unique index)
+- Cash-out computes net_result in the update and can't happen twice
+- Duplicate rows from before the unique index are merged
+- Benchmark: p99 latency vs the old read / insert / $set / $inc sequence
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from conftest import FakeDB, run_motor
+from game_writes import PlayerWriteRejected, apply_buy_in, apply_cash_out, merge_duplicate_players
+from index_registry import ensure_indexes
+
+ROUND_TRIP_SECONDS = 0.005
+
+
+def make_db(players=()):
+    return FakeDB(
+        latency=ROUND_TRIP_SECONDS,
+        players=players,
+        game_nights=[{"game_id": "g1", "total_chips_distributed": 0, "total_chips_returned": 0}],
+    )
+
+
+def txn(user_id, amount, chips, type_="buy_in"):
+    return {"game_id": "g1", "user_id": user_id, "type": type_, "amount": amount, "chips": chips}
+
+
+def seated(user_id, **extra):
+    return {"game_id": "g1", "user_id": user_id, "total_buy_in": 0.0, "total_chips": 0, **extra}
+
+
+async def legacy_buy_in(db, t):
+    """The previous flow: read, insert, $set totals computed in Python, $inc game."""
+    player = await db.players.find_one({"game_id": t["game_id"], "user_id": t["user_id"]})
+    await db.transactions.insert_one(t)
+    await db.players.update_one(
+        {"game_id": t["game_id"], "user_id": t["user_id"]},
+        {"$set": {"total_buy_in": player["total_buy_in"] + t["amount"],
+                  "total_chips": player["total_chips"] + t["chips"]}}
+    )
+    await db.game_nights.update_one({"game_id": t["game_id"]}, {"$inc": {"total_chips_distributed": t["chips"]}})
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+def p99(samples):
+    return sorted(samples)[int(len(samples) * 0.99) - 1]
+
+
+class TestBuyIn:
+    """Exact totals under concurrency"""
+
+    def test_parallel_buy_ins_exact(self):
+        db = make_db(players=[seated("u1")])
+
+        async def scenario():
+            await asyncio.gather(*(apply_buy_in(db, txn("u1", 20.0, 20)) for _ in range(100)))
+
+        asyncio.run(scenario())
+        player = db.players.docs[0]
+        assert player["total_buy_in"] == 2000.0
+        assert player["total_chips"] == 2000
+        assert player["buy_in_count"] == 100
+        assert len(db.transactions.docs) == 100
+        assert db.game_nights.docs[0]["total_chips_distributed"] == 2000
+
+    def test_auto_join_and_rejections(self):
+        db = make_db(players=[seated("u2", cash_out=30.0, cashed_out=True)])
+
+        async def scenario():
+            new = {"game_id": "g1", "user_id": "u1", "rsvp_status": "yes", "total_buy_in": 0.0}
+            player = await apply_buy_in(db, txn("u1", 20.0, 20), new_player=new)
+            assert player["total_buy_in"] == 20.0 and player["rsvp_status"] == "yes"
+
+            with pytest.raises(PlayerWriteRejected, match="already cashed out"):
+                await apply_buy_in(db, txn("u2", 20.0, 20), open_only=True)
+            with pytest.raises(PlayerWriteRejected, match="not in this game"):
+                await apply_buy_in(db, txn("nobody", 20.0, 20))
+
+        asyncio.run(scenario())
+        assert len(db.transactions.docs) == 1
+
+
+class TestCashOut:
+    """net_result in the update; double submits rejected"""
+
+    def test_cash_out_once(self):
+        db = make_db(players=[seated("u1", total_buy_in=40.0, total_chips=40)])
+
+        async def scenario():
+            return await asyncio.gather(
+                *(apply_cash_out(db, txn("u1", 55.0, 55, "cash_out"), "2026-01-01T23:00:00+00:00") for _ in range(5)),
+                return_exceptions=True
+            )
+
+        results = asyncio.run(scenario())
+        ok = [r for r in results if isinstance(r, dict)]
+        assert len(ok) == 1
+        assert ok[0]["net_result"] == 15.0 and ok[0]["cashed_out"] is True
+        assert all(isinstance(r, PlayerWriteRejected) for r in results if r not in ok)
+        assert len(db.transactions.docs) == 1
+        assert db.game_nights.docs[0]["total_chips_returned"] == 55
+
+
+class TestOnMongo:
+    """The same races against a real server (local mongod)"""
+
+    def test_parallel_writes(self, mongo_client, mongo_db):
+        mongo_client[mongo_db].players.insert_one(seated("u1"))
+        mongo_client[mongo_db].game_nights.insert_one({"game_id": "g1", "total_chips_distributed": 0, "total_chips_returned": 0})
+
+        async def scenario(db):
+            await ensure_indexes(db)
+            new = {"game_id": "g1", "user_id": "u2", "rsvp_status": "yes", "total_buy_in": 0.0}
+            await asyncio.gather(
+                *(apply_buy_in(db, txn("u1", 20.0, 20)) for _ in range(100)),
+                *(apply_buy_in(db, txn("u2", 10.0, 10), new_player=new) for _ in range(20)),
+            )
+            cash_outs = await asyncio.gather(
+                *(apply_cash_out(db, txn("u1", 2500.0, 2500, "cash_out"), "2026-01-01T23:00:00+00:00") for _ in range(5)),
+                return_exceptions=True
+            )
+            players = await db.players.find({}, {"_id": 0}).sort("user_id", 1).to_list(None)
+            game = await db.game_nights.find_one({"game_id": "g1"})
+            return players, game, cash_outs, await db.transactions.count_documents({})
+
+        players, game, cash_outs, transactions = run_motor(mongo_db, scenario)
+        u1, u2 = players  # u2 was seated exactly once
+        assert (u1["total_buy_in"], u1["total_chips"], u1["buy_in_count"]) == (2000.0, 2000, 100)
+        assert (u2["total_buy_in"], u2["buy_in_count"], u2["rsvp_status"]) == (200.0, 20, "yes")
+        assert u1["net_result"] == 500.0
+        assert sum(isinstance(r, dict) for r in cash_outs) == 1
+        assert game["total_chips_distributed"] == 2200 and game["total_chips_returned"] == 2500
+        assert transactions == 121
+
+    def test_duplicates_merged_before_unique_index(self, mongo_client, mongo_db):
+        mongo_client[mongo_db].players.insert_many([
+            seated("u1", total_buy_in=20.0, total_chips=20, buy_in_count=1, rsvp_status="yes"),
+            seated("u1", total_buy_in=40.0, total_chips=40, buy_in_count=2),
+            seated("u2", total_buy_in=20.0, total_chips=20, buy_in_count=1),
+        ])
+
+        async def scenario(db):
+            removed = await merge_duplicate_players(db)
+            report = await ensure_indexes(db)
+            return removed, report, await db.players.find({}, {"_id": 0}).sort("user_id", 1).to_list(None)
+
+        removed, report, players = run_motor(mongo_db, scenario)
+        assert removed == 1 and "players.player_game_lookup" in report["created"]
+        assert players[0]["total_buy_in"] == 60.0 and players[0]["buy_in_count"] == 3
+        assert players[0]["rsvp_status"] == "yes" and players[1]["total_buy_in"] == 20.0
+
+
+class TestMergeDuplicates:
+    """Rows left by racing auto-joins before the unique index"""
+
+    def test_merge(self):
+        db = FakeDB(players=[
+            {"_id": 1, **seated("u1", total_buy_in=20.0, total_chips=20, buy_in_count=1, rsvp_status="yes")},
+            {"_id": 2, **seated("u1", total_buy_in=40.0, total_chips=40, buy_in_count=2, cash_out=100.0, cashed_out=True)},
+            {"_id": 3, **seated("u2", total_buy_in=20.0)},
+        ])
+        db.players.aggregate_rows = [{"_id": {"game_id": "g1", "user_id": "u1"}, "ids": [2, 1]}]
+
+        assert asyncio.run(merge_duplicate_players(db)) == 1
+        merged, other = db.players.docs
+        assert merged["_id"] == 1 and other["user_id"] == "u2"
+        assert (merged["total_buy_in"], merged["total_chips"], merged["buy_in_count"]) == (60.0, 60, 3)
+        assert merged["rsvp_status"] == "yes" and merged["cash_out"] == 100.0 and merged["net_result"] == 40.0
+        assert db.user_stats.docs[0]["total_games"] == 1  # rebuilt from the merged row
+
+    def test_noop_once_unique(self):
+        db = FakeDB(players=[seated("u1"), seated("u1")])
+        db.players.indexes["player_game_lookup"] = {"key": [("game_id", 1), ("user_id", 1)], "unique": True}
+        assert asyncio.run(merge_duplicate_players(db)) == 0
+        assert db.players.pipelines == [] and len(db.players.docs) == 2
+
+
+class TestBenchmark:
+    """100 parallel buy-ins: old sequence vs atomic writes"""
+
+    def test_lost_updates_and_p99(self):
+        async def run(flow):
+            db = make_db(players=[seated("u1")])
+            latencies = await asyncio.gather(*(timed(flow(db, txn("u1", 20.0, 20))) for _ in range(100)))
+            return db.players.docs[0]["total_buy_in"], latencies
+
+        legacy_total, legacy_latencies = asyncio.run(run(legacy_buy_in))
+        atomic_total, atomic_latencies = asyncio.run(run(apply_buy_in))
+
+        print(f"\nlegacy: total ${legacy_total:.0f} of $2000, p99 {p99(legacy_latencies) * 1000:.1f}ms")
+        print(f"atomic: total ${atomic_total:.0f} of $2000, p99 {p99(atomic_latencies) * 1000:.1f}ms")
+        assert legacy_total < 2000.0  # the race the atomic path removes
+        assert atomic_total == 2000.0
+        assert p99(atomic_latencies) < p99(legacy_latencies)
@@ -0,0 +1,67 @@
+"""
+Test suite for materialized group leaderboards
+
+Pure unit tests (no running server or MongoDB needed):
+- Rolling windows include only games that ended inside them
+- Ranking by profit in integer cents, with stable tie-breaks
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from group_leaderboards import WINDOWS, build_leaderboards
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+def ago(days):
+    return (NOW - timedelta(days=days)).isoformat()
+
+
+GAMES = [
+    {"game_id": "recent", "ended_at": ago(3)},
+    {"game_id": "older", "ended_at": ago(60)},
+    {"game_id": "ancient", "ended_at": NOW - timedelta(days=400)},  # legacy datetime value
+]
+PLAYERS = [
+    {"game_id": "recent", "user_id": "a", "net_result": 10.1, "total_buy_in": 20.0},
+    {"game_id": "recent", "user_id": "b", "net_result": -10.1, "total_buy_in": 20.0},
+    {"game_id": "older", "user_id": "b", "net_result": 50.0, "total_buy_in": 20.0},
+    {"game_id": "older", "user_id": "c", "net_result": -50.0, "total_buy_in": 60.0},
+    {"game_id": "ancient", "user_id": "c", "net_result": 100.0, "total_buy_in": 20.0},
+    {"game_id": "ancient", "user_id": "a", "net_result": -100.0, "total_buy_in": 120.0},
+]
+
+
+class TestWindows:
+    """30d / 90d / all_time"""
+
+    def test_every_window_is_built(self):
+        assert set(build_leaderboards(GAMES, PLAYERS, NOW)) == set(WINDOWS)
+
+    def test_rolling_windows(self):
+        boards = build_leaderboards(GAMES, PLAYERS, NOW)
+        assert boards["30d"]["total_games"] == 1
+        assert [e["user_id"] for e in boards["30d"]["entries"]] == ["a", "b"]
+        assert boards["90d"]["total_games"] == 2
+        assert [e["user_id"] for e in boards["90d"]["entries"]] == ["b", "a", "c"]
+        assert boards["all_time"]["since"] is None
+        assert boards["all_time"]["total_games"] == 3
+
+    def test_totals(self):
+        entries = {e["user_id"]: e for e in build_leaderboards(GAMES, PLAYERS, NOW)["all_time"]["entries"]}
+        assert entries["a"]["total_profit"] == -89.9
+        assert entries["b"]["total_games"] == 2 and entries["b"]["wins"] == 1 and entries["b"]["win_rate"] == 50.0
+        assert entries["c"]["total_buy_in"] == 80.0
+        assert [entries[u]["rank"] for u in ("c", "b", "a")] == [1, 2, 3]
+
+    def test_custom_window_and_ties(self):
+        players = [
+            {"game_id": "recent", "user_id": "z", "net_result": 5.0},
+            {"game_id": "recent", "user_id": "y", "net_result": 5.0},
+        ]
+        board = build_leaderboards(GAMES, players, NOW, {"week": timedelta(days=7)})["week"]
+        assert [e["user_id"] for e in board["entries"]] == ["y", "z"]
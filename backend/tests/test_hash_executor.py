@@ -0,0 +1,129 @@
+"""
+Test suite for the bounded PIN hashing executor
+
+Pure unit tests (no running server needed):
+- bcrypt work runs off the event loop
+- Saturation is rejected immediately (back-pressure), not queued forever
+- Wait and compute time are measured separately
+- Pool size comes from the environment when the executor is created
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+
+import hash_executor
+from hash_executor import BoundedHashExecutor, HashExecutorSaturated, get_pin_hash_executor
+
+
+def slow(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class TestOffloading:
+    """Event loop keeps ticking while hashes run"""
+
+    def test_loop_not_blocked(self):
+        executor = BoundedHashExecutor(max_workers=2, max_queue=4)
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.005)
+
+            task = asyncio.create_task(ticker())
+            salt = bcrypt.gensalt(rounds=10)
+            hashed = await executor.run(bcrypt.hashpw, b"1234", salt)
+            ok = await executor.run(bcrypt.checkpw, b"1234", hashed)
+            task.cancel()
+            return ok, ticks
+
+        ok, ticks = asyncio.run(scenario())
+        assert ok
+        assert ticks > 3
+        executor.shutdown()
+
+
+class TestBackPressure:
+    """Queue depth limit"""
+
+    def test_rejects_when_full(self):
+        executor = BoundedHashExecutor(max_workers=1, max_queue=2)
+
+        async def scenario():
+            jobs = [asyncio.create_task(executor.run(slow, 0.05)) for _ in range(5)]
+            return await asyncio.gather(*jobs, return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        rejected = [r for r in results if isinstance(r, HashExecutorSaturated)]
+        assert len(rejected) == 2
+        assert [r for r in results if r == 0.05] == [0.05] * 3
+
+        metrics = executor.metrics()
+        assert metrics["completed"] == 3 and metrics["rejected"] == 2
+        assert metrics["queue_depth"] == 0
+        executor.shutdown()
+
+
+class TestMetrics:
+    """Wait vs compute"""
+
+    def test_wait_grows_with_queue(self):
+        executor = BoundedHashExecutor(max_workers=1, max_queue=3)
+
+        async def scenario():
+            await asyncio.gather(*(executor.run(slow, 0.03) for _ in range(3)))
+
+        asyncio.run(scenario())
+        metrics = executor.metrics()
+        assert metrics["compute_ms"]["p50"] >= 25
+        # The third job waited for the first two
+        assert metrics["wait_ms"]["max"] >= 50
+        executor.shutdown()
+
+
+class TestConfiguration:
+    """Env vars set after import (e.g. by load_dotenv) still apply"""
+
+    def test_env_read_on_first_use(self, monkeypatch):
+        monkeypatch.setattr(hash_executor, "_pin_executor", None)
+        monkeypatch.setenv("PIN_HASH_WORKERS", "3")
+        monkeypatch.setenv("PIN_HASH_MAX_QUEUE", "7")
+        executor = get_pin_hash_executor()
+        assert (executor.max_workers, executor.max_queue) == (3, 7)
+        assert get_pin_hash_executor() is executor
+        executor.shutdown()
+
+
+class TestWalletPins:
+    """wallet_service PIN helpers go through the executor"""
+
+    def test_round_trip_and_429(self, monkeypatch):
+        import wallet_service
+        from fastapi import HTTPException
+
+        monkeypatch.setattr(wallet_service, "PIN_BCRYPT_ROUNDS", 4)
+        pin_hash = asyncio.run(wallet_service.hash_pin("2468"))
+        assert asyncio.run(wallet_service.verify_pin("2468", pin_hash))
+        assert not asyncio.run(wallet_service.verify_pin("1111", pin_hash))
+
+        full = BoundedHashExecutor(max_workers=1, max_queue=0)
+        full._pending = 1
+        monkeypatch.setattr(wallet_service, "get_pin_hash_executor", lambda: full)
+        try:
+            asyncio.run(wallet_service.verify_pin("2468", pin_hash))
+        except HTTPException as e:
+            assert e.status_code == 429
+        else:
+            raise AssertionError("expected 429")
+        full.shutdown()
@@ -0,0 +1,146 @@
+"""
+Test suite for the declarative index registry
+
+- Reconciliation is idempotent, matches by key pattern and logs conflicts
+  (in-memory FakeDB, no MongoDB needed)
+- Every hot query is planned without a COLLSCAN (needs a local mongod at
+  MONGO_URL, default mongodb://localhost:27017; skipped when none answers)
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo.errors import OperationFailure
+
+from conftest import FakeDB, run_motor
+from index_registry import HOT_QUERIES, INDEXES, IndexSpec, ensure_indexes, plan_stages, winning_plan
+
+def with_indexes(db, collection, **indexes):
+    db[collection].indexes.update(indexes)
+    return db
+
+
+async def duplicate_key_error(*args, **kwargs):
+    raise OperationFailure("E11000 duplicate key error")
+
+
+def collections_indexed(db):
+    return [collection for collection, op in db.calls if op == "create_index"]
+
+
+class TestRegistry:
+    """Declarations"""
+
+    def test_no_duplicate_keys_or_names(self):
+        keys = [(s.collection, s.keys) for s in INDEXES]
+        names = [(s.collection, s.default_name()) for s in INDEXES]
+        assert len(keys) == len(set(keys))
+        assert len(names) == len(set(names))
+
+    def test_hot_queries_have_a_leading_index(self):
+        """Cheap static check; the mongod test below is the real one."""
+        leading = {(s.collection, s.keys[0][0]) for s in INDEXES}
+        for collection, query, _ in HOT_QUERIES:
+            common = {k: v for k, v in query.items() if k != "$or"}
+            for branch in query.get("$or", [{}]):
+                fields = {**common, **branch}
+                assert any((collection, field) in leading for field in fields), (collection, fields)
+
+    def test_default_names_match_mongodb(self):
+        spec = IndexSpec("notifications", (("user_id", 1), ("created_at", -1)))
+        assert spec.default_name() == "user_id_1_created_at_-1"
+
+
+class TestReconciliation:
+    """Idempotent startup reconciliation"""
+
+    def test_creates_missing_then_noop(self):
+        db = FakeDB()
+        first = asyncio.run(ensure_indexes(db))
+        assert len(first["created"]) == len(INDEXES)
+        second = asyncio.run(ensure_indexes(db))
+        assert second["created"] == [] and len(second["existing"]) == len(INDEXES)
+
+    def test_matches_by_key_not_name(self):
+        """Indexes built by the old startup hook had default or different names."""
+        spec = IndexSpec("players", (("game_id", 1), ("user_id", 1)), name="player_game_lookup")
+        db = with_indexes(FakeDB(), "players", legacy={"key": [("game_id", 1), ("user_id", 1.0)]})
+        report = asyncio.run(ensure_indexes(db, [spec]))
+        assert report["existing"] == ["players.player_game_lookup"]
+        assert collections_indexed(db) == []
+
+    def test_conflicts_and_failures_are_not_fatal(self):
+        specs = [
+            IndexSpec("wallets", (("user_id", 1),), name="wallet_user_unique", unique=True),
+            IndexSpec("users", (("user_id", 1),)),
+            IndexSpec("groups", (("group_id", 1),)),
+        ]
+        db = FakeDB()
+        with_indexes(db, "wallets", wallet_user_unique={"key": [("user_id", 1)]})
+        with_indexes(db, "users", user_id_1={"key": [("email", 1)]})
+        db["groups"].create_index = duplicate_key_error
+        db.command = duplicate_key_error  # wallets: duplicates block the unique conversion
+        report = asyncio.run(ensure_indexes(db, specs))
+        assert sorted(report["conflicts"]) == ["users.user_id_1", "wallets.wallet_user_unique"]
+        assert report["failed"] == ["groups.group_id_1"]
+        assert report["created"] == []
+
+
+    def test_converts_existing_index_to_unique(self):
+        spec = next(s for s in INDEXES if s.default_name() == "player_game_lookup")
+        assert spec.unique
+        commands = []
+
+        async def command(name, collection, **kwargs):
+            commands.append((name, collection, kwargs["index"]))
+
+        db = with_indexes(FakeDB(), "players", player_game_lookup={"key": [("game_id", 1), ("user_id", 1)]})
+        db.command = command
+        report = asyncio.run(ensure_indexes(db, [spec]))
+        assert report["converted"] == ["players.player_game_lookup"] and report["conflicts"] == []
+        key = {"game_id": 1, "user_id": 1}
+        assert commands == [
+            ("collMod", "players", {"keyPattern": key, "prepareUnique": True}),
+            ("collMod", "players", {"keyPattern": key, "unique": True}),
+        ]
+        assert collections_indexed(db) == []
+
+
+class TestPlans:
+    """explain() plan walking"""
+
+    def test_plan_stages(self):
+        explain = {"queryPlanner": {"winningPlan": {
+            "stage": "SORT", "inputStage": {"stage": "OR", "inputStages": [
+                {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+                {"stage": "COLLSCAN"},
+            ]}
+        }}}
+        assert plan_stages(winning_plan(explain)) == ["SORT", "OR", "FETCH", "IXSCAN", "COLLSCAN"]
+        sbe = {"queryPlanner": {"winningPlan": {"queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}}}
+        assert plan_stages(winning_plan(sbe)) == ["FETCH", "IXSCAN"]
+
+
+class TestQueryPlans:
+    """Every hot query uses an index (local mongod)"""
+
+    def test_no_collscan(self, mongo_client, mongo_db):
+        report = run_motor(mongo_db, ensure_indexes)
+        assert report["failed"] == [] and report["conflicts"] == []
+
+        db = mongo_client[mongo_db]
+        for collection in {c for c, _, _ in HOT_QUERIES}:
+            db[collection].insert_one({"seed": True})  # plan against a real, non-empty collection
+
+        collscans = []
+        for collection, query, sort in HOT_QUERIES:
+            command = {"find": collection, "filter": query}
+            if sort:
+                command["sort"] = dict(sort)
+            explain = db.command("explain", command, verbosity="queryPlanner")
+            if "COLLSCAN" in plan_stages(winning_plan(explain)):
+                collscans.append((collection, query))
+        assert collscans == []
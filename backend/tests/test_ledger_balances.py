@@ -0,0 +1,102 @@
+"""
+Test suite for the ledger balance views
+
+Pure unit tests against the in-memory FakeDB (no MongoDB needed):
+- Query count stays constant as the ledger grows (no N+1 lookups)
+- Response shape matches the /ledger/balances and /ledger/consolidated* contracts
+- Latency benchmark with simulated per-query round trips
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conftest import FakeDB
+from ledger_balances import build_balances, build_consolidated, build_consolidated_detailed
+
+ROUND_TRIP_SECONDS = 0.002
+
+
+def make_db(counterparties, games_per_person, latency=0.0):
+    """'me' owes and is owed across `games_per_person` games with every counterparty."""
+    users = [{"user_id": "me", "name": "Me"}]
+    games, ledger = [], []
+    for g in range(games_per_person):
+        games.append({"game_id": f"g{g}", "title": f"Game {g}", "ended_at": f"2026-01-{g % 28 + 1:02d}", "group_id": "grp"})
+    for p in range(counterparties):
+        users.append({"user_id": f"u{p}", "name": f"User {p}", "picture": None, "email": "secret"})
+        for g in range(games_per_person):
+            me_pays = (p + g) % 3 == 0
+            ledger.append({
+                "ledger_id": f"led_{p}_{g}", "group_id": "grp", "game_id": f"g{g}",
+                "from_user_id": "me" if me_pays else f"u{p}", "to_user_id": f"u{p}" if me_pays else "me",
+                "amount": 5.0 + g, "status": "pending"
+            })
+    return FakeDB(latency=latency, ledger=ledger, users=users, game_nights=games)
+
+
+def query_count(view, db):
+    db.calls.clear()
+    result = asyncio.run(view(db, "me"))
+    return db.queries, result
+
+
+class TestConstantQueryCount:
+    """Queries do not scale with counterparties or games"""
+
+    def test_balances(self):
+        small, _ = query_count(build_balances, make_db(2, 2))
+        large, result = query_count(build_balances, make_db(20, 4))
+        assert small == large == 3
+        assert all(e["to_user"]["name"].startswith("User") for e in result["owes"])
+        assert "email" not in result["owed"][0]["from_user"]
+
+    def test_consolidated(self):
+        small, _ = query_count(build_consolidated, make_db(2, 2))
+        large, result = query_count(build_consolidated, make_db(40, 10))
+        assert small == large == 2
+        assert result["people_count"] == len(result["consolidated"]) > 0
+
+    def test_consolidated_detailed(self):
+        small, _ = query_count(build_consolidated_detailed, make_db(2, 2))
+        large, result = query_count(build_consolidated_detailed, make_db(40, 10))
+        assert small == large == 3
+        person = result["consolidated"][0]
+        assert person["game_count"] == 10
+        assert person["game_breakdown"][0]["game_title"].startswith("Game")
+        assert person["offset_explanation"] is not None
+
+
+class TestViewContents:
+    """Netting and unknown references behave like the per-record lookups did"""
+
+    def test_settled_counterparty_is_skipped(self):
+        db = FakeDB(
+            ledger=[
+                {"ledger_id": "l1", "game_id": "g1", "from_user_id": "me", "to_user_id": "u1", "amount": 10.0, "status": "pending"},
+                {"ledger_id": "l2", "game_id": "g2", "from_user_id": "u1", "to_user_id": "me", "amount": 10.0, "status": "pending"},
+                {"ledger_id": "l3", "game_id": "gone", "from_user_id": "ghost", "to_user_id": "me", "amount": 4.0, "status": "pending"},
+            ],
+            users=[{"user_id": "u1", "name": "One"}],
+        )
+        result = asyncio.run(build_consolidated_detailed(db, "me"))
+        [person] = result["consolidated"]
+        assert person["user"] is None
+        assert person["game_breakdown"][0]["game_title"] == "Game"
+        assert result["total_owed_to_you"] == 4.0
+
+
+class TestLatencyBenchmark:
+    """Page latency is bounded by a few round trips, not ledger size"""
+
+    def test_detailed_latency_is_flat(self):
+        db = make_db(50, 8, latency=ROUND_TRIP_SECONDS)
+        started = time.perf_counter()
+        queries, _ = query_count(build_consolidated_detailed, db)
+        elapsed = time.perf_counter() - started
+        # The per-record version needed 1 + 50 users + 400 games = 451 round trips
+        assert queries == 3
+        assert elapsed < 100 * ROUND_TRIP_SECONDS
@@ -0,0 +1,81 @@
+"""
+Test suite for group-wide ledger netting
+
+Pure unit tests (no running server or MongoDB needed):
+- Cross-game IOUs collapse to the minimum transfer set
+- Every member's net position is preserved, in integer cents
+- Netted entries match the LedgerEntry document shape
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger_netting import NETTED_GAME_ID, build_netted_entries, compute_group_netting
+
+
+def entry(ledger_id, from_user, to_user, amount, game_id="game_1"):
+    return {
+        "ledger_id": ledger_id, "group_id": "grp_1", "game_id": game_id,
+        "from_user_id": from_user, "to_user_id": to_user, "amount": amount, "status": "pending"
+    }
+
+
+def net_after(plan):
+    balance = {}
+    for t in plan["transfers"]:
+        balance[t["from_user_id"]] = balance.get(t["from_user_id"], 0) - t["amount_cents"]
+        balance[t["to_user_id"]] = balance.get(t["to_user_id"], 0) + t["amount_cents"]
+    return {u: c for u, c in balance.items() if c}
+
+
+class TestComputeGroupNetting:
+    """Debt graph -> minimum transfers"""
+
+    def test_cycle_across_games_cancels(self):
+        plan = compute_group_netting([
+            entry("led_1", "a", "b", 20.0, "g1"),
+            entry("led_2", "b", "c", 20.0, "g2"),
+            entry("led_3", "c", "a", 20.0, "g3"),
+        ])
+        assert plan["transfers"] == []
+        assert plan["ledger_ids"] == ["led_1", "led_2", "led_3"]
+        assert plan["stats"]["volume_after_cents"] == 0
+
+    def test_chain_collapses_and_preserves_balances(self):
+        entries = [
+            entry("led_1", "a", "b", 10.0, "g1"),
+            entry("led_2", "b", "c", 10.0, "g2"),
+            entry("led_3", "a", "c", 5.25, "g3"),
+            entry("led_4", "d", "a", 3.10, "g3"),
+            entry("led_5", "c", "d", 0.35, "g4"),
+        ]
+        plan = compute_group_netting(entries)
+        assert plan["stats"]["entries_before"] == 5
+        assert plan["stats"]["transfers_after"] < 5
+        assert net_after(plan) == {u: c for u, c in plan["net_by_user"].items() if c}
+        assert plan["net_by_user"]["a"] == -1215
+
+    def test_float_amounts_are_netted_in_cents(self):
+        plan = compute_group_netting([entry("led_1", "a", "b", 0.1), entry("led_2", "a", "b", 0.2)])
+        assert [t["amount_cents"] for t in plan["transfers"]] == [30]
+        assert plan["transfers"][0]["amount"] == 0.3
+
+    def test_empty(self):
+        plan = compute_group_netting([])
+        assert plan["transfers"] == [] and plan["stats"]["entries_before"] == 0
+
+
+class TestNettedEntries:
+    """New ledger documents for the applied plan"""
+
+    def test_shape(self):
+        plan = compute_group_netting([entry("led_1", "a", "b", 12.5), entry("led_2", "b", "a", 2.5, "g2")])
+        [doc] = build_netted_entries("grp_1", plan, "net_x", datetime.now(timezone.utc))
+        assert doc["ledger_id"].startswith("led_")
+        assert doc["group_id"] == "grp_1" and doc["game_id"] == NETTED_GAME_ID
+        assert (doc["from_user_id"], doc["to_user_id"], doc["amount"]) == ("a", "b", 10.0)
+        assert doc["status"] == "pending" and doc["netting_run_id"] == "net_x"
+        assert isinstance(doc["created_at"], str)
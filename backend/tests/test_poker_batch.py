@@ -0,0 +1,86 @@
+"""
+Test suite for poker history re-scoring
+
+Pure unit tests (no running server or MongoDB needed):
+- score_batch produces the same documents /api/poker/analyze stores
+- Malformed legacy rows are reported, not raised
+- Background jobs are held until done; one that dies is marked failed
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import poker_batch
+from conftest import FakeDB
+from poker_batch import evaluate_hands_batch, score_batch, start_rescore_job
+from poker_evaluator import ANALYSIS_MODEL
+
+
+class TestScoreBatch:
+    """Worker-side scoring of stored logs"""
+
+    def test_rescored_document_shape(self):
+        rows = [{
+            "_id": "log-1",
+            "hole_cards": ["A of hearts", "A of spades"],
+            "community_cards": ["A of clubs", "K of diamonds", "K of hearts"],
+            "ai_response": {"equity": {"opponents": 2}}
+        }]
+        [(row_id, doc)] = score_batch(rows)
+        assert row_id == "log-1"
+        assert doc["model"] == ANALYSIS_MODEL
+        assert doc["stage"] == "Flop"
+        assert doc["evaluation"]["hand_name"] == "Full House"
+        assert doc["ai_response"]["action"] == "RAISE"
+        assert doc["ai_response"]["equity"]["opponents"] == 2
+
+    def test_legacy_rows_default_to_heads_up(self):
+        rows = [{"_id": 1, "hole_cards": ["2 of clubs", "7 of diamonds"], "community_cards": [], "ai_response": {"action": "FOLD"}}]
+        [(_, doc)] = evaluate_hands_batch(rows)
+        assert doc["ai_response"]["equity"]["opponents"] == 1
+        assert doc["ai_response"]["equity"]["method"] in ("preflop_table", "monte_carlo")
+
+    def test_malformed_rows_are_skipped(self):
+        rows = [
+            {"_id": 1, "hole_cards": ["Z of hearts", "A of spades"], "community_cards": ["2c", "3c", "4c"]},
+            {"_id": 2, "hole_cards": None, "community_cards": None},
+        ]
+        assert [doc for _, doc in score_batch(rows)] == [None, None]
+
+
+class TestRescoreJob:
+    """start_rescore_job's background task"""
+
+    def run_job(self, monkeypatch, job):
+        monkeypatch.setattr(poker_batch, "rescore_poker_history", job)
+        db = FakeDB()
+
+        async def scenario():
+            started = await start_rescore_job(db, "admin")
+            assert len(poker_batch._rescore_tasks) == 1
+            while poker_batch._rescore_tasks:
+                await asyncio.gather(*list(poker_batch._rescore_tasks), return_exceptions=True)
+            return started
+
+        started = asyncio.run(scenario())
+        return db.poker_rescore_jobs.docs[0], started
+
+    def test_job_is_held_until_done(self, monkeypatch):
+        async def job(db, job_id, **options):
+            await db.poker_rescore_jobs.update_one({"job_id": job_id}, {"$set": {"status": "completed"}})
+
+        doc, started = self.run_job(monkeypatch, job)
+        assert started["status"] == "running" and doc["status"] == "completed"
+        assert not poker_batch._rescore_tasks
+
+    def test_job_that_raises_is_marked_failed(self, monkeypatch):
+        async def job(db, job_id, **options):
+            raise RuntimeError("stats rebuild failed")
+
+        doc, _ = self.run_job(monkeypatch, job)
+        assert doc["status"] == "failed" and doc["error"] == "stats rebuild failed"
+        assert "finished_at" in doc
+        assert not poker_batch._rescore_tasks
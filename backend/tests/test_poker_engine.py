@@ -0,0 +1,76 @@
+"""
+Test suite for the integer-encoded poker hand engine
+
+Pure unit tests (no running server needed):
+- poker_engine.evaluate_cards agrees with brute force over 5-card subsets
+- poker_evaluator.evaluate_hand returns the exact 5 cards used
+- compare_hands ranks two hands on the same board
+"""
+
+import os
+import sys
+import random
+from itertools import combinations
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import poker_engine
+from poker_evaluator import HandRank, evaluate_hand, compare_hands, parse_card_int
+
+
+class TestEngine:
+    """Core table lookups"""
+
+    def test_seven_cards_match_best_five_subset(self):
+        rng = random.Random(7)
+        for _ in range(2000):
+            cards = rng.sample(range(52), 7)
+            best = max(poker_engine.evaluate_cards(c) for c in combinations(cards, 5))
+            assert poker_engine.evaluate_cards(cards) == best
+
+    def test_category_ordering(self):
+        quads = [parse_card_int(c) for c in ["2h", "2d", "2c", "2s", "3h"]]
+        full_house = [parse_card_int(c) for c in ["Ah", "Ad", "Ac", "Ks", "Kh"]]
+        wheel = [parse_card_int(c) for c in ["Ah", "2d", "3c", "4s", "5h"]]
+        six_high = [parse_card_int(c) for c in ["6h", "2d", "3c", "4s", "5h"]]
+        assert poker_engine.evaluate_cards(quads) > poker_engine.evaluate_cards(full_house)
+        assert poker_engine.evaluate_cards(six_high) > poker_engine.evaluate_cards(wheel)
+        assert poker_engine.evaluate_cards(wheel) < 1 << 32
+
+    def test_card_count_is_validated(self):
+        for count in (4, 8):
+            with pytest.raises(ValueError):
+                poker_engine.evaluate_cards(list(range(count)))
+        result = evaluate_hand(["Ah", "Kh"], ["2c", "3c", "4c", "5c", "6c", "7c"])
+        assert "error" in result
+
+
+class TestEvaluateHand:
+    """evaluate_hand adapter keeps its result shape"""
+
+    def test_full_house_not_quads(self):
+        result = evaluate_hand(["2 of hearts", "5 of diamonds"], ["2 of clubs", "2 of diamonds", "5 of spades"])
+        assert result["hand_rank"] == HandRank.FULL_HOUSE
+        assert result["description"] == "Full House, 2s full of 5s"
+
+    def test_straight_returns_cards_used(self):
+        result = evaluate_hand(["A of spades", "2 of hearts"], ["3 of clubs", "4 of diamonds", "5 of spades", "K of hearts"])
+        assert result["hand_rank"] == HandRank.STRAIGHT
+        assert result["description"] == "Straight, 5-high"
+        assert result["cards_used"] == [("5", "spades"), ("4", "diamonds"), ("3", "clubs"), ("2", "hearts"), ("A", "spades")]
+
+    def test_royal_flush(self):
+        result = evaluate_hand(["A of hearts", "K of hearts"], ["Q of hearts", "J of hearts", "10 of hearts", "2 of clubs"])
+        assert result["hand_rank"] == HandRank.ROYAL_FLUSH
+        assert len(result["cards_used"]) == 5
+
+    def test_duplicate_and_invalid_cards(self):
+        assert "error" in evaluate_hand(["Ah", "A of hearts"], ["2c", "3c", "4c"])
+        assert "error" in evaluate_hand(["Zh", "Ah"], ["2c", "3c", "4c"])
+
+    def test_compare_hands(self):
+        board = ["K of hearts", "7 of clubs", "2 of diamonds", "9 of spades", "3 of hearts"]
+        assert compare_hands(["A of spades", "K of clubs"], ["Q of spades", "Q of clubs"], board) == 1
+        assert compare_hands(["4 of spades", "5 of clubs"], ["4 of hearts", "5 of diamonds"], board) == 0
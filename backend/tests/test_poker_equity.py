@@ -0,0 +1,71 @@
+"""
+Test suite for the poker equity calculator
+
+Pure unit tests (no running server needed):
+- Exhaustive enumeration on turn/river heads-up
+- Seeded Monte Carlo is reproducible and fast on the flop
+- get_action_suggestion uses equity when it is provided
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poker_equity import calculate_equity
+from poker_evaluator import calculate_hand_equity, evaluate_hand, get_action_suggestion, parse_card_int
+
+
+def cards(*names):
+    return [parse_card_int(n) for n in names]
+
+
+class TestExhaustive:
+    """Heads-up with 0 or 1 cards to come is enumerated exactly"""
+
+    def test_river_nuts_never_loses(self):
+        result = calculate_equity(cards("Ah", "Kh"), cards("Qh", "Jh", "10h", "2c", "3d"))
+        assert result["method"] == "exhaustive"
+        assert result["samples"] == 990
+        assert result["win"] == 1.0
+
+    def test_turn_counts_every_runout(self):
+        result = calculate_equity(cards("Ah", "Kh"), cards("Qh", "Jh", "2c", "3d"))
+        assert result["method"] == "exhaustive"
+        assert result["samples"] == 46 * 990
+        assert abs(result["win"] + result["tie"] + result["lose"] - 1.0) < 1e-3
+
+
+class TestMonteCarlo:
+    """Flop/preflop and multiway spots are sampled"""
+
+    def test_seeded_runs_are_reproducible(self):
+        spot = (cards("Ah", "Kh"), cards("Qh", "Jh", "2c"))
+        first = calculate_equity(*spot, opponents=3, time_budget_ms=None)
+        second = calculate_equity(*spot, opponents=3, time_budget_ms=None)
+        assert first["equity"] == second["equity"]
+        assert first["method"] == "monte_carlo"
+
+    def test_aces_preflop(self):
+        result = calculate_equity(cards("Ah", "Ad"), [], time_budget_ms=None)
+        assert 0.83 < result["equity"] < 0.88
+
+    def test_flop_within_budget(self):
+        calculate_equity(cards("9c", "8c"), cards("7c", "6d", "2h"))
+        result = calculate_equity(cards("9c", "8c"), cards("7c", "6d", "2h"))
+        assert result["elapsed_ms"] < 50
+
+
+class TestSuggestion:
+    """Suggestions account for draws, not just the made hand"""
+
+    def test_ace_high_flush_and_straight_draw_is_not_a_fold(self):
+        hole, board = ["A of hearts", "K of hearts"], ["Q of hearts", "J of hearts", "2 of clubs", "3 of diamonds"]
+        evaluation = evaluate_hand(hole, board)
+        equity = calculate_hand_equity(hole, board)
+        suggestion = get_action_suggestion(evaluation, "Turn", equity)
+        assert suggestion["action"] in ("CALL", "RAISE")
+
+    def test_bad_input_returns_error(self):
+        assert "error" in calculate_hand_equity(["Ah", "Ah"], ["2c", "3c", "4c"])
+        assert "error" in calculate_hand_equity(["Ah", "Kd"], ["2c", "3c", "4c"], opponents=12)
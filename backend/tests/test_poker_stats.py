@@ -0,0 +1,108 @@
+"""
+Test suite for materialized poker analysis stats
+
+Pure unit tests against the in-memory FakeDB (no MongoDB needed):
+- $inc updates at log time agree with a rebuild from the logs
+- The recent window is the newest hands by timestamp, whatever the insert order
+- /poker/stats reads one document; a missing one is rebuilt first
+"""
+
+import asyncio
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conftest import FakeDB
+from poker_stats import (
+    RECENT_LIMIT, get_poker_stats, invalidate_poker_stats, rebuild_poker_stats, record_analysis, stats_view,
+)
+
+
+def make_logs(n, seed=3):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    logs = []
+    for i in range(n):
+        logs.append({
+            "user_id": "u1",
+            "timestamp": start + timedelta(minutes=rng.randrange(100000)),
+            "stage": rng.choice(["Pre-flop", "Flop", "Turn", "River"]),
+            "ai_response": {"action": rng.choice(["FOLD", "CHECK", "CALL", "RAISE"]),
+                            "potential": rng.choice(["Low", "Medium", "High"])},
+        })
+    return logs
+
+
+async def analyze(db, log):
+    """What analyze_poker_hand does: insert the log, then fold it in."""
+    await db.poker_analysis_logs.insert_one(log)
+    await record_analysis(db, log)
+
+
+class TestIncremental:
+    """$inc at log time == rebuild from logs"""
+
+    def test_matches_rebuild(self):
+        db = FakeDB()
+        logs = make_logs(60)
+
+        async def scenario():
+            for log in logs:
+                await analyze(db, log)
+            await analyze(db, {"user_id": "u1", "timestamp": datetime(2026, 6, 1), "error": "boom"})
+            incremental = await db.poker_stats.find_one({"user_id": "u1"})
+            rebuilt = await rebuild_poker_stats(db, "u1")
+            return incremental, rebuilt
+
+        incremental, rebuilt = asyncio.run(scenario())
+        assert stats_view(incremental) == stats_view(rebuilt)
+        view = stats_view(incremental)
+        assert view["total_analyses"] == 60
+        assert sum(view["action_breakdown"].values()) == 60
+        assert view["first_analysis"] == min(l["timestamp"] for l in logs)
+        assert view["last_analysis"] == max(l["timestamp"] for l in logs)
+
+    def test_recent_window_is_newest_by_timestamp(self):
+        db = FakeDB()
+        logs = make_logs(40, seed=11)
+
+        async def scenario():
+            for log in logs:  # timestamps are not in insert order
+                await analyze(db, log)
+            return await db.poker_stats.find_one({"user_id": "u1"})
+
+        doc = asyncio.run(scenario())
+        newest = sorted(logs, key=lambda l: l["timestamp"], reverse=True)[:RECENT_LIMIT]
+        assert [r["timestamp"] for r in doc["recent"]] == [l["timestamp"] for l in newest]
+        expected_high = sum(1 for l in newest if l["ai_response"]["potential"] == "High")
+        assert stats_view(doc)["recent_high_potential_hands"] == expected_high
+
+
+class TestReads:
+    """One document per /poker/stats call"""
+
+    def test_single_read(self):
+        db = FakeDB()
+
+        async def scenario():
+            for log in make_logs(30):
+                await analyze(db, log)
+            db.calls.clear()
+            return await get_poker_stats(db, "u1")
+
+        doc = asyncio.run(scenario())
+        assert db.calls == [("poker_stats", "find_one")]
+        assert doc["total_analyses"] == 30
+
+    def test_missing_doc_rebuilds_and_empty_view(self):
+        db = FakeDB()
+        db.poker_analysis_logs.docs = make_logs(5)
+        assert asyncio.run(get_poker_stats(db, "u1"))["total_analyses"] == 5
+        assert len(db.poker_stats.docs) == 1
+
+        asyncio.run(invalidate_poker_stats(db, "u1"))
+        assert db.poker_stats.docs == []
+        assert stats_view(asyncio.run(get_poker_stats(db, "nobody")))["total_analyses"] == 0
@@ -0,0 +1,79 @@
+"""
+Test suite for the precomputed preflop equity table
+
+Pure unit tests (no running server needed):
+- 169 starting-hand classes and their combos
+- Table file round trip through write_table / PreflopTable (memory-mapped)
+- Shipped artifact answers pre-flop equity queries
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preflop_table import (
+    MATCHUP_SHAPE, NUM_CLASSES, VS_RANDOM_SHAPE, PreflopTable,
+    class_combos, class_index, class_name, get_preflop_table, write_table,
+)
+from poker_evaluator import calculate_hand_equity, parse_card_int, preflop_matchup_equity
+
+
+class TestHandClasses:
+    """Class indexing covers all 1326 combos exactly once"""
+
+    def test_every_combo_maps_to_its_class(self):
+        total = 0
+        for index in range(NUM_CLASSES):
+            combos = class_combos(index)
+            assert len(combos) in (4, 6, 12)
+            assert all(class_index(a, b) == index for a, b in combos)
+            total += len(combos)
+        assert total == 1326
+
+    def test_names(self):
+        assert class_name(class_index(parse_card_int("Ah"), parse_card_int("Kh"))) == "AKs"
+        assert class_name(class_index(parse_card_int("10d"), parse_card_int("9c"))) == "T9o"
+        assert class_name(class_index(parse_card_int("2s"), parse_card_int("2c"))) == "22"
+
+
+class TestTableFile:
+    """write_table output is readable through the memory map"""
+
+    def test_round_trip(self, tmp_path):
+        vs_random = np.random.default_rng(1).random(VS_RANDOM_SHAPE, dtype=np.float32)
+        matchups = np.random.default_rng(2).random(MATCHUP_SHAPE, dtype=np.float32)
+        path = str(tmp_path / "preflop.bin")
+        write_table(path, vs_random, matchups)
+
+        table = PreflopTable(path)
+        assert isinstance(table.vs_random, np.memmap)
+        assert np.array_equal(table.vs_random, vs_random)
+        assert table.matchup_equity(3, 7) == round(float(matchups[3, 7]), 4)
+
+    def test_rejects_foreign_file(self, tmp_path):
+        path = tmp_path / "junk.bin"
+        path.write_bytes(b"\0" * 64)
+        try:
+            PreflopTable(str(path))
+        except ValueError:
+            return
+        raise AssertionError("expected ValueError")
+
+
+class TestShippedTable:
+    """The artifact in data/ is used for pre-flop queries"""
+
+    def test_preflop_lookup(self):
+        assert get_preflop_table() is not None
+        result = calculate_hand_equity(["A of hearts", "A of spades"], [], opponents=1)
+        assert result["method"] == "preflop_table"
+        assert 0.83 < result["equity"] < 0.88
+        assert calculate_hand_equity(["A of hearts", "A of spades"], [], opponents=9)["equity"] < result["equity"]
+
+    def test_matchup(self):
+        result = preflop_matchup_equity(["Q of hearts", "Q of spades"], ["A of clubs", "K of diamonds"])
+        assert result["hand_a"] == "QQ" and result["hand_b"] == "AKo"
+        assert 0.53 < result["equity"] < 0.60
@@ -0,0 +1,221 @@
+"""
+Test suite for Socket.IO authorization and connection reuse
+
+Pure unit tests against the in-memory FakeDB (no MongoDB or socket
+clients needed; the Socket.IO session/room calls are replaced with no-ops):
+- Join grants are cached (bounded); denials are not; removals revoke immediately
+- Socket events use the server's database instead of opening new clients
+- The grant TTL comes from the environment when the cache is created
+- Reconnect-storm benchmark: 200 clients reconnect and rejoin their rooms
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+import pytest
+
+import room_access as room_access_module
+import websocket_manager
+from auth_tokens import TokenVerifier
+from conftest import FakeDB
+from room_access import RoomAccessCache, RoomAccessDenied
+from socket_cluster import MemoryPresenceStore
+from socket_rooms import RoomRegistry
+from user_cache import UserCache
+
+SECRET = "socket-test-secret-0123456789abcdef"
+ROUND_TRIP_SECONDS = 0.001
+
+
+def make_db(users=(), members=(), games=(), players=(), latency=0.0):
+    return FakeDB(latency=latency, users=users, group_members=members, game_nights=games, players=players)
+
+
+def member(group_id, user_id):
+    return {"group_id": group_id, "user_id": user_id, "status": "active"}
+
+
+class TestRoomAccessCache:
+    """Grant caching and revocation"""
+
+    def test_grants_cached_denials_not(self):
+        db = make_db(members=[member("grp", "u1")], games=[{"game_id": "g1", "group_id": "grp"}])
+        access = RoomAccessCache(ttl=60)
+
+        async def scenario():
+            await access.authorize_game(db, "g1", "u1")
+            await access.authorize_game(db, "g1", "u1")
+            await access.authorize_group(db, "grp", "u1")  # granted by the game check
+            assert db.queries == 2
+
+            with pytest.raises(RoomAccessDenied):
+                await access.authorize_group(db, "grp", "u2")
+            db.group_members.docs.append(member("grp", "u2"))
+            await access.authorize_group(db, "grp", "u2")
+
+        asyncio.run(scenario())
+
+    def test_invited_player_and_missing_game(self):
+        db = make_db(games=[{"game_id": "g1", "group_id": "grp"}], players=[{"game_id": "g1", "user_id": "guest"}])
+        access = RoomAccessCache()
+
+        async def scenario():
+            await access.authorize_game(db, "g1", "guest")
+            with pytest.raises(RoomAccessDenied, match="Game not found"):
+                await access.authorize_game(db, "nope", "guest")
+            with pytest.raises(RoomAccessDenied, match="Not authorized"):
+                await access.authorize_game(db, "g1", "stranger")
+
+        asyncio.run(scenario())
+
+    def test_revoke_group_drops_game_grants(self):
+        db = make_db(members=[member("grp", "u1")], games=[{"game_id": "g1", "group_id": "grp"}])
+        access = RoomAccessCache(ttl=60)
+
+        async def scenario():
+            await access.authorize_game(db, "g1", "u1")
+            db.group_members.docs.clear()
+            access.revoke_group("grp", "u1")
+            with pytest.raises(RoomAccessDenied):
+                await access.authorize_game(db, "g1", "u1")
+            with pytest.raises(RoomAccessDenied):
+                await access.authorize_group(db, "grp", "u1")
+
+        asyncio.run(scenario())
+
+    def test_bounded(self, monkeypatch):
+        games = [{"game_id": f"g{i}", "group_id": "grp"} for i in range(5)]
+        db = make_db(members=[member("grp", f"u{i}") for i in range(5)], games=games)
+        access = RoomAccessCache(ttl=60, max_entries=3)
+        clock = [1000.0]
+        monkeypatch.setattr(room_access_module.time, "monotonic", lambda: clock[0])
+
+        async def scenario():
+            for i in range(5):
+                await access.authorize_game(db, f"g{i}", f"u{i}")
+            assert len(access._grants) == 3 and len(access._game_groups) == 3
+            assert list(access._game_groups) == ["g2", "g3", "g4"]
+
+            # Expired grants are swept on the next insert, not just on read
+            clock[0] += 61
+            await access.authorize_group(db, "grp", "u0")
+            assert list(access._grants) == [("group", "grp", "u0")]
+
+        asyncio.run(scenario())
+
+    def test_ttl_read_on_first_use(self, monkeypatch):
+        monkeypatch.setattr(room_access_module, "_room_access", None)
+        monkeypatch.setenv("ROOM_ACCESS_TTL", "5")
+        access = room_access_module.get_room_access()
+        assert access.ttl == 5.0 and room_access_module.get_room_access() is access
+
+
+@pytest.fixture
+def socket_env(monkeypatch):
+    """websocket_manager wired to a fake database with Socket.IO calls stubbed."""
+    sessions = {}
+
+    async def save_session(sid, session):
+        sessions[sid] = session
+
+    async def get_session(sid):
+        return sessions.get(sid)
+
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(websocket_manager.sio, "save_session", save_session)
+    monkeypatch.setattr(websocket_manager.sio, "get_session", get_session)
+    monkeypatch.setattr(websocket_manager.sio, "enter_room", noop)
+    monkeypatch.setattr(websocket_manager.sio, "leave_room", noop)
+    monkeypatch.setattr(websocket_manager, "token_verifier", TokenVerifier(secret=SECRET))
+    monkeypatch.setattr(websocket_manager, "user_cache", UserCache(ttl=30))
+    monkeypatch.setattr(websocket_manager, "room_access", RoomAccessCache(ttl=60))
+    registry = RoomRegistry()
+    monkeypatch.setattr(websocket_manager, "rooms", registry)
+    monkeypatch.setattr(websocket_manager, "connected_users", registry.user_sids)
+    monkeypatch.setattr(websocket_manager, "presence", MemoryPresenceStore())
+
+    clients = {"created": 0}
+
+    class CountingClient:
+        def __init__(self, *args, **kwargs):
+            clients["created"] += 1
+
+    import motor.motor_asyncio
+    monkeypatch.setattr(motor.motor_asyncio, "AsyncIOMotorClient", CountingClient)
+    monkeypatch.setattr(websocket_manager, "_db", None)
+    return clients
+
+
+def token_for(supabase_id):
+    claims = {"sub": supabase_id, "aud": "authenticated", "exp": int(time.time()) + 3600}
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+class TestReconnectStorm:
+    """200 phones drop off Wi-Fi and reconnect at once"""
+
+    CLIENTS = 200
+
+    def test_reconnect_storm(self, socket_env):
+        users = [{"user_id": f"u{i}", "supabase_id": f"sb{i}", "name": f"P{i}"} for i in range(self.CLIENTS)]
+        db = make_db(
+            users=users,
+            members=[member("grp", u["user_id"]) for u in users],
+            games=[{"game_id": "g1", "group_id": "grp"}],
+            latency=ROUND_TRIP_SECONDS
+        )
+        websocket_manager.init_db(db)
+        tokens = [token_for(u["supabase_id"]) for u in users]
+
+        async def wave(tag):
+            async def one(i):
+                sid = f"{tag}-{i}"
+                assert await websocket_manager.connect(sid, {}, {"token": tokens[i]}) is True
+                assert (await websocket_manager.join_game(sid, {"game_id": "g1"}))["status"] == "joined"
+                assert (await websocket_manager.join_group(sid, {"group_id": "grp"}))["status"] == "joined"
+                return sid
+
+            before = db.queries
+            start = time.perf_counter()
+            sids = await asyncio.gather(*(one(i) for i in range(self.CLIENTS)))
+            elapsed = time.perf_counter() - start
+            return sids, db.queries - before, elapsed
+
+        async def scenario():
+            sids, cold_queries, cold = await wave("first")
+            for sid in sids:
+                await websocket_manager.disconnect(sid)
+            _, storm_queries, storm = await wave("reconnect")
+            return cold_queries, cold, storm_queries, storm
+
+        cold_queries, cold, storm_queries, storm = asyncio.run(scenario())
+        print(f"\n{self.CLIENTS} clients: first connect {cold_queries} queries / {cold * 1000:.0f}ms, "
+              f"reconnect storm {storm_queries} queries / {storm * 1000:.0f}ms, "
+              f"{socket_env['created']} Mongo clients created")
+
+        assert socket_env["created"] == 0
+        # Cold: user, game and membership lookups per client (concurrent joins race on the game)
+        assert cold_queries <= 3 * self.CLIENTS
+        assert storm_queries == 0
+        assert len(asyncio.run(websocket_manager.get_game_presence("g1"))) == self.CLIENTS
+
+    def test_removed_member_cannot_rejoin(self, socket_env):
+        db = make_db(users=[{"user_id": "u1", "supabase_id": "sb1", "name": "A"}], members=[member("grp", "u1")])
+        websocket_manager.init_db(db)
+
+        async def scenario():
+            assert await websocket_manager.connect("s1", {}, {"token": token_for("sb1")})
+            assert (await websocket_manager.join_group("s1", {"group_id": "grp"}))["status"] == "joined"
+            db.group_members.docs.clear()
+            await websocket_manager.revoke_group_member("grp", "u1")
+            assert await websocket_manager.get_group_presence("grp") == []
+            return await websocket_manager.join_group("s1", {"group_id": "grp"})
+
+        assert asyncio.run(scenario()) == {"error": "Not a member of this group"}
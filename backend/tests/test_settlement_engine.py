@@ -0,0 +1,77 @@
+"""
+Test suite for the minimum-transfer settlement engine
+
+Pure unit tests (no running server needed):
+- Exact solver finds zero-sum subgroup splits the greedy matcher misses
+- Transfers always settle every balance, in integer cents
+- Large groups fall back to bounded-time greedy
+"""
+
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from settlement_engine import (
+    ALGORITHM_EXACT, ALGORITHM_GREEDY, EXACT_MAX_PARTICIPANTS, optimize_settlement,
+)
+
+
+def nets(*cents):
+    return [{"user_id": f"u{i}", "net_cents": c} for i, c in enumerate(cents)]
+
+
+def settles(net_results, result):
+    balance = {p["user_id"]: p["net_cents"] for p in net_results}
+    for t in result["transfers"]:
+        assert isinstance(t["amount_cents"], int) and t["amount_cents"] > 0
+        balance[t["from_user_id"]] += t["amount_cents"]
+        balance[t["to_user_id"]] -= t["amount_cents"]
+    return all(v == 0 for v in balance.values())
+
+
+class TestExactSolver:
+    """Subset partitioning up to EXACT_MAX_PARTICIPANTS"""
+
+    def test_splits_zero_sum_subgroups(self):
+        # Greedy pairs -5000 with +4000 first and needs 4 transfers; {-5000,+4000,+1000} and {-3000,+3000} need 3
+        net_results = nets(-5000, -3000, 4000, 3000, 1000)
+        result = optimize_settlement(net_results)
+        assert result["algorithm_version"] == ALGORITHM_EXACT
+        assert result["stats"]["optimized_payments"] == 3
+        assert settles(net_results, result)
+
+    def test_deterministic(self):
+        net_results = nets(-2500, -2500, 1000, 1500, 2500)
+        assert optimize_settlement(net_results) == optimize_settlement(list(reversed(net_results)))
+
+    def test_random_tables_settle(self):
+        rng = random.Random(5)
+        for _ in range(200):
+            values = [rng.choice([-4, -2, -1, 1, 2, 3]) * 1000 for _ in range(rng.randint(1, 11))]
+            net_results = nets(*values, -sum(values))
+            result = optimize_settlement(net_results)
+            assert settles(net_results, result)
+            assert result["stats"]["optimized_payments"] <= len([v for v in values + [-sum(values)] if v]) - 1
+
+    def test_one_cent_rounding_goes_to_largest_creditor(self):
+        result = optimize_settlement(nets(-333, -333, 667))
+        assert [t["amount_cents"] for t in result["transfers"]] == [333, 333]
+
+
+class TestGreedyFallback:
+    """Groups above the exact limit"""
+
+    def test_large_group_uses_greedy(self):
+        values = [(-1) ** i * (i + 1) * 100 for i in range(EXACT_MAX_PARTICIPANTS + 5)]
+        net_results = nets(*values, -sum(values))
+        result = optimize_settlement(net_results)
+        assert result["algorithm_version"] == ALGORITHM_GREEDY
+        # Pairing before greedy is a different algorithm from the baseline greedy_v2_cents
+        assert ALGORITHM_GREEDY == "greedy_v3_pairs_cents"
+        assert settles(net_results, result)
+
+    def test_empty_and_all_even(self):
+        assert optimize_settlement([])["transfers"] == []
+        assert optimize_settlement(nets(0, 0))["stats"]["optimized_payments"] == 0
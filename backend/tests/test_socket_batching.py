@@ -0,0 +1,139 @@
+"""
+Test suite for coalesced game_update emission
+
+Pure unit tests (no running server or socket clients needed):
+- Bursts within the window become one frame, in order
+- A lone event is sent unchanged (no envelope)
+- Immediate events flush what's pending first, preserving order
+- Benchmark: frames sent for a 12-player cash-out rush
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from socket_batching import RoomEmitter
+
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.frames = []
+        self.delay = delay
+
+    async def __call__(self, room, payload):
+        await asyncio.sleep(self.delay)
+        self.frames.append((room, payload))
+
+    def events(self, room):
+        out = []
+        for r, payload in self.frames:
+            if r == room:
+                out += payload["events"] if payload["type"] == "batch" else [payload]
+        return [e["seq"] for e in out]
+
+
+def event(seq, type_="buy_in"):
+    return {"type": type_, "game_id": "g1", "seq": seq}
+
+
+class TestCoalescing:
+    """Window batching and ordering"""
+
+    def test_burst_becomes_one_frame(self):
+        send = Recorder()
+        emitter = RoomEmitter(send, window=0.02)
+
+        async def scenario():
+            for i in range(5):
+                await emitter.emit("game_g1", event(i))
+            assert send.frames == []
+            await asyncio.sleep(0.05)
+
+        asyncio.run(scenario())
+        assert len(send.frames) == 1
+        room, payload = send.frames[0]
+        assert room == "game_g1" and payload["type"] == "batch" and payload["game_id"] == "g1"
+        assert send.events("game_g1") == [0, 1, 2, 3, 4]
+
+    def test_single_event_unwrapped(self):
+        send = Recorder()
+        emitter = RoomEmitter(send, window=0.01)
+
+        async def scenario():
+            await emitter.emit("game_g1", event(7))
+            await asyncio.sleep(0.03)
+
+        asyncio.run(scenario())
+        assert send.frames == [("game_g1", event(7))]
+
+    def test_immediate_preserves_order(self):
+        send = Recorder(delay=0.005)
+        emitter = RoomEmitter(send, window=0.05)
+
+        async def scenario():
+            await emitter.emit("game_g1", event(0))
+            await emitter.emit("game_g1", event(1))
+            await emitter.emit("game_g1", event(2, "message"), immediate=True)
+            await emitter.emit("game_g1", event(3))
+            await asyncio.sleep(0.1)
+
+        asyncio.run(scenario())
+        assert send.events("game_g1") == [0, 1, 2, 3]
+        assert len(send.frames) == 3  # [0, 1], [2], [3]
+
+    def test_rooms_independent_and_max_batch(self):
+        send = Recorder()
+        emitter = RoomEmitter(send, window=1.0, max_batch=3)
+
+        async def scenario():
+            for i in range(3):
+                await emitter.emit("game_g1", event(i))
+            await emitter.emit("game_g2", event(9))
+            assert send.events("game_g1") == [0, 1, 2]  # flushed at max_batch, no wait
+            await emitter.flush_all()
+
+        asyncio.run(scenario())
+        assert send.events("game_g2") == [9]
+        assert not emitter._pending and not emitter._timers and not emitter._locks
+
+    def test_send_failure_does_not_block_room(self):
+        calls = []
+
+        async def flaky(room, payload):
+            calls.append(payload)
+            if len(calls) == 1:
+                raise ConnectionError("boom")
+
+        emitter = RoomEmitter(flaky, window=0.01)
+
+        async def scenario():
+            await emitter.emit("game_g1", event(0), immediate=True)
+            await emitter.emit("game_g1", event(1), immediate=True)
+
+        asyncio.run(scenario())
+        assert len(calls) == 2 and emitter.stats["errors"] == 1
+
+
+class TestBenchmark:
+    """End-of-night cash-out rush at a 12-player table"""
+
+    def test_cash_out_rush_frames(self):
+        send = Recorder(delay=0.001)
+        emitter = RoomEmitter(send, window=0.05)
+
+        async def player(p):
+            # cash-out plus a chip edit per player, a few ms apart
+            await asyncio.sleep(p * 0.002)
+            await emitter.emit("game_g1", event(p * 2, "cash_out"))
+            await emitter.emit("game_g1", event(p * 2 + 1, "chips_edited"))
+
+        async def scenario():
+            await asyncio.gather(*(player(p) for p in range(12)))
+            await asyncio.sleep(0.1)
+
+        asyncio.run(scenario())
+        print(f"\n24 events -> {len(send.frames)} frame(s)")
+        assert send.events("game_g1") == list(range(24))
+        assert len(send.frames) <= 2
@@ -0,0 +1,79 @@
+"""
+Test suite for the socket room registry
+
+Pure unit tests (no running server or socket clients needed):
+- Membership is per sid: one tab leaving doesn't evict the user's other tabs
+- Disconnect touches only the socket's own rooms
+- Presence lists distinct online users per room
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from socket_rooms import RoomRegistry, game_room, group_room
+
+
+class TestMembership:
+    """sid-level bookkeeping"""
+
+    def test_two_tabs_one_leaves(self):
+        rooms = RoomRegistry()
+        rooms.connect("tab1", "u1")
+        rooms.connect("tab2", "u1")
+        rooms.join("tab1", game_room("g1"))
+        rooms.join("tab2", game_room("g1"))
+
+        rooms.disconnect("tab1")
+        assert rooms.users_in(game_room("g1")) == {"u1"}
+        assert rooms.is_online("u1")
+
+        rooms.leave("tab2", game_room("g1"))
+        assert rooms.users_in(game_room("g1")) == set()
+        assert game_room("g1") not in rooms.room_sids
+
+    def test_disconnect_cleans_every_index(self):
+        rooms = RoomRegistry()
+        rooms.connect("s1", "u1")
+        rooms.join("s1", game_room("g1"))
+        rooms.join("s1", group_room("grp"))
+
+        user_id, left = rooms.disconnect("s1")
+        assert user_id == "u1"
+        assert left == {game_room("g1"), group_room("grp")}
+        assert not rooms.user_sids and not rooms.sid_user and not rooms.sid_rooms and not rooms.room_sids
+        assert rooms.disconnect("s1") == (None, set())
+
+    def test_leave_user_removes_all_tabs(self):
+        rooms = RoomRegistry()
+        for sid in ("a", "b"):
+            rooms.connect(sid, "u1")
+            rooms.join(sid, group_room("grp"))
+        rooms.connect("c", "u2")
+        rooms.join("c", group_room("grp"))
+
+        assert rooms.leave_user("u1", group_room("grp")) == {"a", "b"}
+        assert rooms.users_in(group_room("grp")) == {"u2"}
+        assert rooms.rooms_of("a") == set()
+
+
+class TestScaling:
+    """Disconnect cost doesn't grow with the number of rooms on the worker"""
+
+    def test_disconnect_independent_of_room_count(self):
+        def disconnect_time(total_rooms):
+            rooms = RoomRegistry()
+            for i in range(total_rooms):
+                rooms.connect(f"s{i}", f"u{i}")
+                rooms.join(f"s{i}", game_room(f"g{i}"))
+            start = time.perf_counter()
+            for i in range(0, total_rooms, total_rooms // 100):
+                rooms.disconnect(f"s{i}")
+            return time.perf_counter() - start
+
+        small, large = disconnect_time(1000), disconnect_time(50000)
+        print(f"\n100 disconnects: 1k rooms {small * 1e6:.0f}us, 50k rooms {large * 1e6:.0f}us")
+        # A full scan would be ~50x slower; allow generous noise
+        assert large < small * 10 + 0.005
@@ -0,0 +1,223 @@
+"""
+Test suite for two-stage tool preselection
+
+Pure unit tests with a fake Anthropic client (no network or API key needed):
+- Local ranking puts the obvious tool/agent in the top k
+- The exposed subset is small, in catalog order, and ends with the catch-all
+- Off by default: the full catalog is sent as one prompt-cacheable prefix
+- Calling the catch-all re-routes once with the full catalog
+- Offline evaluation: labels from logs, accuracy vs prompt tokens and
+  cache-priced effective tokens per k; live replay scores Claude's choices
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service.claude_client import ROUTING_SYSTEM_PROMPT, ClaudeClient
+from ai_service.orchestrator import AIOrchestrator
+from ai_service.tool_preselector import (
+    CATALOG_TOOL, CATALOG_TOOL_NAME, PromptCacheModel, ToolPreselector, effective_tokens, evaluate_preselection,
+    replay_routing, routing_record,
+)
+
+
+def orchestrator_with(responses, k=8):
+    """An orchestrator whose Claude replies with `responses` in order (preselecting k tools)."""
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        return responses[len(requests) - 1]
+
+    client = ClaudeClient(api_key="test")
+    client.client = object()
+    client.async_client = SimpleNamespace(messages=SimpleNamespace(create=create))
+    orchestrator = AIOrchestrator(db=None, llm_client=client)
+    orchestrator._build_tool_schemas()
+    orchestrator._preselector.k = k
+    return orchestrator, requests
+
+
+def usage(tokens):
+    return SimpleNamespace(input_tokens=tokens, output_tokens=10,
+                           cache_creation_input_tokens=0, cache_read_input_tokens=0)
+
+
+class TestSelection:
+    """Ranking and the exposed subset"""
+
+    def test_obvious_tool_is_selected(self):
+        orchestrator = AIOrchestrator(db=None)
+        orchestrator._build_tool_schemas()
+        preselector = orchestrator._preselector
+
+        assert preselector.rank("evaluate my poker hand")[0][0] == "poker_evaluator"
+        assert preselector.rank("show me the leaderboard")[0][0] == "agent_analytics"
+        hints = orchestrator._routing_hints("who owes me money?", {})
+        assert preselector.select_names("who owes me money?", hints, k=8)[:2] == [
+            "agent_payment_reconciliation", "payment_tracker"
+        ]
+
+    def test_subset_shape(self):
+        catalog = AIOrchestrator(db=None)._build_tool_schemas()
+        preselector = ToolPreselector(catalog, k=5)
+        names = [s["name"] for s in catalog]
+
+        exposed = preselector.select("remind everyone about the game on friday")
+        assert 2 <= len(exposed) <= 6
+        assert exposed[-1] is CATALOG_TOOL
+        positions = [names.index(s["name"]) for s in exposed[:-1]]
+        assert positions == sorted(positions)
+        assert all(a is b for a, b in zip(exposed, preselector.select("remind everyone about the game on friday")))
+
+        assert preselector.select("anything", k=0) is preselector.schemas
+        assert preselector.select("anything", k=len(catalog)) is preselector.schemas
+        assert preselector.select("qwxz") == [CATALOG_TOOL]
+
+
+class TestDefault:
+    """Preselection is opt-in"""
+
+    def test_full_catalog_unless_enabled(self, monkeypatch):
+        monkeypatch.delenv("TOOL_PRESELECT_K", raising=False)
+        orchestrator = AIOrchestrator(db=None)
+        assert orchestrator._preselect_tools("evaluate my hand", {}) is orchestrator._build_tool_schemas()
+
+        monkeypatch.setenv("TOOL_PRESELECT_K", "5")
+        enabled = AIOrchestrator(db=None)
+        assert enabled._preselect_tools("evaluate my hand", {})[-1] is CATALOG_TOOL
+
+    def test_default_sends_one_call_with_every_tool(self, monkeypatch):
+        monkeypatch.delenv("TOOL_PRESELECT_K", raising=False)
+        orchestrator, requests = orchestrator_with([
+            SimpleNamespace(content=[SimpleNamespace(type="text", text="Hi!")], stop_reason="end_turn", usage=usage(300)),
+        ], k=0)
+        llm_call = {}
+        asyncio.run(orchestrator._process_with_llm("hello there", {}, "u1", llm_call))
+        assert requests[0]["tools"] is orchestrator._build_tool_schemas()
+        assert llm_call["preselected"] is None and llm_call["escalated"] is False
+
+
+class TestEscalation:
+    """The catch-all re-routes with every tool"""
+
+    def test_catch_all_routes_again_with_full_catalog(self):
+        orchestrator, requests = orchestrator_with([
+            SimpleNamespace(content=[SimpleNamespace(type="tool_use", name=CATALOG_TOOL_NAME, input={}, id="t1")],
+                            stop_reason="tool_use", usage=usage(300)),
+            SimpleNamespace(content=[SimpleNamespace(type="text", text="Sure! ---FOLLOW_UPS---[]---END_FOLLOW_UPS---")],
+                            stop_reason="end_turn", usage=usage(2000)),
+        ])
+        llm_call = {}
+        result = asyncio.run(orchestrator._process_with_llm("evaluate my hand", {}, "u1", llm_call))
+
+        assert result["_handler"] == "llm_general"
+        first, second = requests
+        assert first["tools"][-1] is CATALOG_TOOL and len(first["tools"]) < len(second["tools"])
+        assert second["tools"] is orchestrator._build_tool_schemas()
+        assert llm_call["escalated"] is True
+        assert llm_call["preselected"] == [t["name"] for t in first["tools"]]
+        assert llm_call["usage"]["input_tokens"] == 2300
+
+    def test_no_escalation_single_call(self):
+        orchestrator, requests = orchestrator_with([
+            SimpleNamespace(content=[SimpleNamespace(type="text", text="Hi!")], stop_reason="end_turn", usage=usage(300)),
+        ])
+        llm_call = {}
+        asyncio.run(orchestrator._process_with_llm("hello there", {}, "u1", llm_call))
+        assert len(requests) == 1
+        assert llm_call["escalated"] is False and llm_call["usage"]["input_tokens"] == 300
+
+
+class TestEvaluation:
+    """Labels from ai_orchestrator_logs, accuracy vs tokens"""
+
+    def test_routing_record(self):
+        catalog = {"poker_evaluator", "agent_analytics"}
+
+        def log(handler, method="llm_tool_use", **llm):
+            return {"user_input": "q", "context": {}, "llm": llm,
+                    "result": {"routing_method": method, "handler": handler}}
+
+        assert routing_record(log("poker_evaluator"), catalog)["label"] == "poker_evaluator"
+        assert routing_record(log("llm_general"), catalog)["label"] is None
+        assert routing_record(log("poker_evaluator", method="keyword_fallback"), catalog) is None
+        assert routing_record(log("general"), catalog) is None
+        assert routing_record(log("agent_analytics", preselected=["agent_analytics"]), catalog) is None
+        escalated = log("agent_analytics", preselected=["poker_evaluator"], escalated=True)
+        assert routing_record(escalated, catalog)["label"] == "agent_analytics"
+
+    RECORDS = [
+        {"user_input": "evaluate my hand, I have AhKd", "label": "poker_evaluator"},
+        {"user_input": "who owes me money?", "label": "agent_payment_reconciliation"},
+        {"user_input": "remind everyone about the game", "label": "agent_notification"},
+        {"user_input": "show me the leaderboard", "label": "agent_analytics"},
+        {"user_input": "thanks, that's all", "label": None},
+        {"user_input": "send an email to the group", "label": "email_sender"},
+        {"user_input": "plan a game next week", "label": "agent_game_planner"},
+    ]
+
+    def test_cache_pricing(self):
+        assert effective_tokens({"input_tokens": 100, "cache_creation_input_tokens": 2000,
+                                 "cache_read_input_tokens": 0}) == 2600
+        assert effective_tokens({"input_tokens": 100, "cache_read_input_tokens": 2000}) == 300
+        cache = PromptCacheModel(min_tokens=1024, ttl=300)
+        assert cache.cost("a", 500) == 500 and cache.cost("a", 500) == 500  # too short to cache
+        assert cache.cost("b", 2000, at=0) == 2500 and cache.cost("b", 2000, at=299) == 200
+        assert cache.cost("b", 2000, at=598) == 200  # a hit refreshes the TTL
+        assert cache.cost("b", 2000, at=899) == 2500
+
+    def replay(self, spacing):
+        orchestrator = AIOrchestrator(db=None)
+        catalog = orchestrator._build_tool_schemas()
+        # The same kinds of requests keep coming back, `spacing` seconds apart
+        records = [{**r, "timestamp": i * spacing} for i, r in enumerate(self.RECORDS * 10)]
+        rows = evaluate_preselection(
+            records, orchestrator._preselector, [1, 3, 8, len(catalog)],
+            hints_for=orchestrator._routing_hints, system_prompt=ROUTING_SYSTEM_PROMPT
+        )
+        print("\n" + "\n".join(f"every {spacing}s, k={r['k']}: {r}" for r in rows))
+        by_k = {row["k"]: row for row in rows}
+        return by_k, by_k.pop(len(catalog))
+
+    def test_accuracy_vs_tokens(self):
+        by_k, full = self.replay(spacing=60)
+
+        assert full["accuracy"] == 1.0 and full["escalation_rate"] == 0.0
+        assert full["avg_prompt_tokens"] == full["full_catalog_tokens"]
+        assert by_k[8]["accuracy"] == 1.0
+        assert by_k[8]["avg_prompt_tokens"] * 2 < full["avg_prompt_tokens"]
+        assert by_k[1]["escalation_rate"] > 0  # too small: some requests pay for two calls
+        assert by_k[1]["accuracy"] <= by_k[3]["accuracy"] <= by_k[8]["accuracy"]
+        # Fewer raw tokens, but each subset recurs less often than the cache
+        # TTL while the shared catalog stays warm, so every subset costs more
+        assert all(row["avg_effective_tokens"] > full["avg_effective_tokens"] for row in by_k.values())
+
+    def test_effective_cost_depends_on_traffic(self):
+        """The harness measures rather than assumes: bursts of repeats favor small subsets."""
+        by_k, full = self.replay(spacing=1)
+        assert by_k[3]["avg_effective_tokens"] < full["avg_effective_tokens"]
+
+    def test_live_replay_scores_claudes_choice(self):
+        catalog = AIOrchestrator(db=None)._build_tool_schemas()
+        records = self.RECORDS[:3]
+        routed = []
+
+        async def route(record, tools):
+            routed.append(len(tools))
+            if len(tools) < len(catalog) and record["label"] == "agent_notification":
+                name = CATALOG_TOOL_NAME  # Claude asks for every tool
+            elif record["label"] == "poker_evaluator":
+                name = "agent_analytics"  # exposed, but Claude picks something else
+            else:
+                name = record["label"]
+            return {"tool_calls": [{"name": name}],
+                    "usage": {"input_tokens": 50, "cache_read_input_tokens": 1000, "cache_creation_input_tokens": 0}}
+
+        result = asyncio.run(replay_routing(records, lambda r: catalog[:3] + [CATALOG_TOOL], route, catalog))
+        assert result == {"accuracy": round(2 / 3, 3), "escalation_rate": round(1 / 3, 3), "avg_effective_tokens": 200}
+        assert routed == [4, 4, 4, len(catalog)]
@@ -0,0 +1,126 @@
+"""
+Test suite for the user/session resolution cache
+
+Pure unit tests against the in-memory FakeDB (no MongoDB needed):
+- One request never fetches the same user twice
+- Documents are reused across requests until the TTL or an invalidation
+- Sessions are never served past expires_at; logout drops them immediately
+- The TTL comes from the environment when the cache is created
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import user_cache as user_cache_module
+from conftest import FakeDB
+from user_cache import UserCache, _request_scope
+
+
+def in_request(fn):
+    """Run coroutine fn() inside a fresh request scope (what the middleware does)."""
+    async def scoped():
+        token = _request_scope.set({})
+        try:
+            return await fn()
+        finally:
+            _request_scope.reset(token)
+    return asyncio.run(scoped())
+
+
+def make_db(expires_in=timedelta(days=7)):
+    return FakeDB(
+        users=[{"user_id": "u1", "supabase_id": "sb1", "name": "Ann", "is_premium": False}],
+        user_sessions=[{"session_token": "tok", "user_id": "u1", "expires_at": (datetime.now(timezone.utc) + expires_in).isoformat()}]
+    )
+
+
+class TestRequestMemoization:
+    """Auth + handler re-reads cost one query per request"""
+
+    def test_same_user_fetched_once_per_request(self):
+        db = make_db()
+        cache = UserCache(ttl=0)  # no cross-request caching: only the request scope
+
+        async def handler():
+            auth = await cache.get_user_by_supabase_id(db, "sb1")    # get_current_user
+            again = await cache.get_user(db, auth["user_id"])        # e.g. get_my_badges
+            limit = await cache.get_user(db, auth["user_id"])        # e.g. get_user_ai_limit
+            return again, limit
+
+        again, limit = in_request(handler)
+        assert again["name"] == "Ann" and limit["is_premium"] is False
+        assert db.queries == 1
+
+        in_request(handler)
+        assert db.queries == 2
+
+    def test_returns_copies(self):
+        db = make_db()
+        cache = UserCache()
+
+        async def handler():
+            doc = await cache.get_user(db, "u1")
+            doc["name"] = "mutated"
+            return await cache.get_user(db, "u1")
+
+        assert in_request(handler)["name"] == "Ann"
+
+
+class TestTTLAndInvalidation:
+    """Cross-request reuse with explicit invalidation"""
+
+    def test_reused_across_requests_until_ttl(self, monkeypatch):
+        db = make_db()
+        cache = UserCache(ttl=30)
+        now = [1000.0]
+        monkeypatch.setattr(user_cache_module.time, "monotonic", lambda: now[0])
+
+        in_request(lambda: cache.get_user(db, "u1"))
+        in_request(lambda: cache.get_user(db, "u1"))
+        assert db.queries == 1
+
+        now[0] += 31
+        in_request(lambda: cache.get_user(db, "u1"))
+        assert db.queries == 2
+
+    def test_invalidate_user_sees_write(self):
+        db = make_db()
+        cache = UserCache(ttl=30)
+
+        async def update_profile():
+            await cache.get_user(db, "u1")
+            db.users.docs[0]["is_premium"] = True
+            cache.invalidate_user("u1")
+            return await cache.get_user(db, "u1")
+
+        assert in_request(update_profile)["is_premium"] is True
+        assert in_request(lambda: cache.get_user_by_supabase_id(db, "sb1"))["is_premium"] is True
+
+    def test_session_expiry_and_logout(self):
+        db = make_db()
+        cache = UserCache(ttl=30)
+
+        assert in_request(lambda: cache.get_session(db, "tok"))["user_id"] == "u1"
+        cache.invalidate_session("tok")
+        db.user_sessions.docs.clear()
+        assert in_request(lambda: cache.get_session(db, "tok")) is None
+
+        expired = make_db(expires_in=timedelta(seconds=-1))
+        assert in_request(lambda: cache.get_session(expired, "tok")) is None
+
+    def test_misses_not_cached(self):
+        db = make_db()
+        cache = UserCache(ttl=30)
+        assert in_request(lambda: cache.get_user(db, "new")) is None
+        db.users.docs.append({"user_id": "new", "name": "New"})
+        assert in_request(lambda: cache.get_user(db, "new"))["name"] == "New"
+
+    def test_ttl_read_on_first_use(self, monkeypatch):
+        monkeypatch.setattr(user_cache_module, "_user_cache", None)
+        monkeypatch.setenv("USER_CACHE_TTL", "5")
+        cache = user_cache_module.get_user_cache()
+        assert cache.ttl == 5.0 and user_cache_module.get_user_cache() is cache
@@ -0,0 +1,176 @@
+"""
+Test suite for prefix user search
+
+Pure unit tests against the in-memory FakeDB (no running server or MongoDB needed):
+- Token normalization and the index-bounded prefix query
+- Caller exclusion, email namespacing, and narrowing from cached prefixes
+- Wallet search joins wallets in one query
+- Benchmark: unanchored regex scan vs a sorted token index (the shape of
+  the multikey search_tokens index). USER_SEARCH_BENCH_USERS sets the
+  population (default 200k; run with 1000000 for the 1M figure)
+"""
+
+import asyncio
+import bisect
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import user_search
+from conftest import FakeDB
+from user_search import (
+    SearchCache, build_search_query, find_users, normalize, search_fields, search_tokens,
+)
+
+BENCH_USERS = int(os.environ.get("USER_SEARCH_BENCH_USERS", 200_000))
+
+
+def finds(db, collection):
+    return db.calls.count((collection, "find"))
+
+
+def user(user_id, name, email):
+    return {"user_id": user_id, "name": name, "email": email, **search_fields(name, email)}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(user_search, "_search_cache", SearchCache())
+
+
+class TestTokens:
+    """Normalization and query shape"""
+
+    def test_normalize_and_tokens(self):
+        assert normalize("  José   NÚÑEZ ") == "jose nunez"
+        assert search_tokens("José Núñez", "J.Nunez@Example.com") == [
+            "jose", "nunez", "jose nunez", "@j.nunez@example.com", "@j.nunez"
+        ]
+        assert search_tokens(None, None) == []
+
+    def test_cache_ttl_read_on_first_use(self, monkeypatch):
+        monkeypatch.setattr(user_search, "_search_cache", None)
+        monkeypatch.setenv("USER_SEARCH_CACHE_TTL", "3")
+        cache = user_search.get_search_cache()
+        assert cache.ttl == 3.0 and user_search.get_search_cache() is cache
+
+    def test_query_is_anchored_range(self):
+        query = build_search_query("jo", include_email=False)
+        assert query == {"search_tokens": {"$elemMatch": {"$gte": "jo", "$lt": "jp"}}}
+        assert "$regex" not in str(build_search_query("jo", include_email=True))
+
+
+class TestFindUsers:
+    """Semantics and caching"""
+
+    def test_prefix_match_excludes_caller(self):
+        db = FakeDB(users=[
+            user("u1", "John Smith", "js@example.com"),
+            user("u2", "Johanna Lee", "jl@example.com"),
+            user("u3", "Bob Johnson", "bob@example.com"),
+            user("u4", "Ann Kim", "john.k@example.com"),
+        ])
+        found = asyncio.run(find_users(db, "JOH", exclude_user_id="u2"))
+        assert sorted(u["user_id"] for u in found) == ["u1", "u3", "u4"]
+        assert all("search_tokens" not in u for u in found)
+        assert [u["user_id"] for u in asyncio.run(find_users(db, "john sm"))] == ["u1"]
+        assert asyncio.run(find_users(db, "j")) == []
+
+    def test_names_only_never_match_email(self):
+        db = FakeDB(users=[user("u4", "Ann Kim", "john.k@example.com")])
+        assert asyncio.run(find_users(db, "john", include_email=False)) == []
+
+    def test_keystrokes_narrow_from_cache(self):
+        db = FakeDB(users=[user(f"u{i}", f"Player{i} Smith", f"p{i}@example.com") for i in range(5)])
+
+        async def typing():
+            for typed in ("sm", "smi", "smit", "smith"):
+                assert len(await find_users(db, typed)) == 5
+            return await find_users(db, "player3")
+
+        assert [u["user_id"] for u in asyncio.run(typing())] == ["u3"]
+        assert finds(db, "users") == 2  # "sm" and "player3"; the rest came from "sm"'s results
+
+    def test_truncated_results_are_not_narrowed(self):
+        db = FakeDB(users=[user(f"u{i}", f"Sam {i}", f"s{i}@example.com") for i in range(30)])
+
+        async def typing():
+            await find_users(db, "sa", limit=5)
+            return await find_users(db, "sam", limit=5)
+
+        assert len(asyncio.run(typing())) == 5
+        assert finds(db, "users") == 2
+
+
+class TestWalletSearch:
+    """One wallets query for all matching users"""
+
+    def test_batched_join(self):
+        import wallet_service
+
+        db = FakeDB(
+            users=[user("u1", "John Smith", "js@example.com"), user("u2", "Johnny Cash", "jc@example.com"),
+                   user("me", "John Me", "me@example.com")],
+            wallets=[{"user_id": "u1", "wallet_id": "KVT-AAAAAA"}, {"user_id": "me", "wallet_id": "KVT-MMMMMM"}],
+        )
+        results = asyncio.run(wallet_service.search_wallets("john", db, exclude_user_id="me"))
+        assert results == [{"wallet_id": "KVT-AAAAAA", "display_name": "John S.", "picture": None, "status": "active"}]
+        assert finds(db, "wallets") == 1
+
+
+class TestBenchmark:
+    """Unanchored regex scan vs index range at BENCH_USERS users"""
+
+    def test_prefix_vs_regex(self):
+        rng = random.Random(7)
+        first = [f"{a}{b}" for a in ("al", "be", "ca", "da", "el", "fa", "gi", "ha", "io", "ja") for b in
+                 ("ron", "lia", "mes", "nna", "vin", "ssa", "bert", "rry", "nka", "dre")]
+        last = [f"{a}{b}" for a in ("sm", "jo", "ko", "lu", "ma", "no", "pe", "ri", "st", "wa") for b in
+                ("ith", "hnson", "wal", "cas", "rtin", "vak", "rez", "vera", "one", "lker")]
+        users = []
+        for i in range(BENCH_USERS):
+            name = f"{rng.choice(first)} {rng.choice(last)}{i}"
+            users.append((name, f"user{i}@example.com"))
+
+        # The multikey index: sorted (token, user) pairs
+        index = sorted((t, i) for i, (n, e) in enumerate(users) for t in search_tokens(n, e))
+        tokens = [t for t, _ in index]
+
+        def indexed(q):
+            prefix = normalize(q)
+            hits = []
+            for bounds in build_search_query(prefix, include_email=True)["$or"]:
+                start = bisect.bisect_left(tokens, bounds["search_tokens"]["$elemMatch"]["$gte"])
+                end = bisect.bisect_left(tokens, bounds["search_tokens"]["$elemMatch"]["$lt"])
+                hits.extend(index[k][1] for k in range(start, min(end, start + 21)))
+            return list(dict.fromkeys(hits))[:20]
+
+        def regex_scan(q):
+            rx = re.compile(re.escape(q), re.IGNORECASE)
+            hits = []
+            for i, (name, email) in enumerate(users):
+                if rx.search(name) or rx.search(email):
+                    hits.append(i)
+                    if len(hits) == 20:
+                        break
+            return hits
+
+        queries = [users[-3][0].split()[1], "zzq", f"user{BENCH_USERS // 2}@"]
+
+        def timed(fn):
+            start = time.perf_counter()
+            for q in queries:
+                fn(q)
+            return (time.perf_counter() - start) / len(queries)
+
+        assert indexed(queries[0]) == [BENCH_USERS - 3]
+        assert indexed("zzq") == regex_scan("zzq") == []
+        scan, prefix = timed(regex_scan), timed(indexed)
+        print(f"\n{BENCH_USERS} users: regex scan {scan * 1000:.1f}ms/query, prefix range {prefix * 1000:.3f}ms/query")
+        assert prefix * 100 < scan
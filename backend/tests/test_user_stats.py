@@ -0,0 +1,151 @@
+"""
+Test suite for materialized user stats
+
+Pure unit tests (no running server or MongoDB needed):
+- Player rows contribute integer cents
+- Aggregation matches the totals the stats endpoints used to compute
+- Recording results one at a time reaches the same document as a rebuild,
+  including when the document was first built with no games
+- A claimed result is counted exactly once when the update fails or a
+  rebuild races the recorder
+- stats_view produces the dollar figures the API returns
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conftest import FakeDB
+from user_stats import (
+    EMPTY_STATS, aggregate_contributions, get_user_stats, player_contribution, rebuild_user_stats,
+    record_player_result, stats_view,
+)
+
+
+PLAYERS = [
+    {"game_id": "g1", "total_buy_in": 20.0, "cash_out": 55.5, "net_result": 35.5},
+    {"game_id": "g2", "total_buy_in": 40.0, "cash_out": 0.0, "net_result": -40.0},
+    {"game_id": "g3", "total_buy_in": 20.0, "cash_out": 20.0, "net_result": 0.0},
+    {"game_id": "g4", "total_buy_in": 0.1, "cash_out": 0.3, "net_result": 0.2},
+]
+
+
+class TestContributions:
+    """players rows -> cents"""
+
+    def test_no_result_contributes_nothing(self):
+        assert player_contribution({"game_id": "g", "total_buy_in": 20.0, "net_result": None}) is None
+
+    def test_cents(self):
+        assert player_contribution(PLAYERS[3]) == {"net_cents": 20, "buy_in_cents": 10, "cash_out_cents": 30}
+
+
+class TestAggregation:
+    """Totals match the per-request scans they replace"""
+
+    def test_totals(self):
+        stats = aggregate_contributions(player_contribution(p) for p in PLAYERS)
+        assert stats["total_games"] == 4
+        assert stats["wins"] == 2
+        assert stats["net_profit_cents"] == round(sum(p["net_result"] for p in PLAYERS) * 100)
+        assert stats["biggest_win_cents"] == 3550 and stats["biggest_loss_cents"] == -4000
+        assert stats["gross_winnings_cents"] == 3570 and stats["gross_losses_cents"] == -4000
+
+    def test_no_games_has_no_extremes(self):
+        stats = aggregate_contributions([])
+        assert stats["biggest_win_cents"] is None and stats["biggest_loss_cents"] is None
+        assert stats_view(stats)["biggest_win"] == 0 and stats_view(stats)["biggest_loss"] == 0
+
+
+def totals(doc):
+    return {k: doc[k] for k in EMPTY_STATS if k != "recent_games"}
+
+
+class TestRecording:
+    """$inc/$max/$min one game at a time == rebuild from players rows"""
+
+    def play(self, nets, open_stats_first):
+        db = FakeDB(game_nights=[{"game_id": f"g{i}", "group_id": "grp"} for i in range(len(nets))])
+
+        async def scenario():
+            if open_stats_first:  # a new user opens their stats before playing
+                await get_user_stats(db, "u1")
+            for i, net in enumerate(nets):
+                await db.players.insert_one({
+                    "game_id": f"g{i}", "user_id": "u1", "total_buy_in": 20.0, "cash_out": 20.0 + net,
+                    "net_result": net, "cashed_out_at": f"2026-01-0{i + 1}T23:00:00+00:00"
+                })
+                await record_player_result(db, {"game_id": f"g{i}", "group_id": "grp"}, "u1")
+            recorded = await db.user_stats.find_one({"user_id": "u1"}, {"_id": 0})
+            return recorded, await rebuild_user_stats(db, "u1")
+
+        return asyncio.run(scenario())
+
+    def test_matches_rebuild(self):
+        for open_stats_first in (False, True):
+            for nets in ([50.0], [-20.0], [35.5, -40.0, 0.0, 0.2]):
+                recorded, rebuilt = self.play(nets, open_stats_first)
+                assert totals(recorded) == totals(rebuilt), (nets, open_stats_first)
+                assert recorded["biggest_win_cents"] == round(max(nets) * 100)
+                assert recorded["biggest_loss_cents"] == round(min(nets) * 100)
+
+
+class TestClaimSafety:
+    """stats_applied never says counted when user_stats disagrees"""
+
+    def setup_db(self):
+        db = FakeDB(game_nights=[{"game_id": f"g{i}", "group_id": "grp"} for i in range(2)])
+        db.players.docs.append({"game_id": "g0", "user_id": "u1", "total_buy_in": 20.0, "cash_out": 30.0, "net_result": 10.0})
+        asyncio.run(record_player_result(db, {"game_id": "g0", "group_id": "grp"}, "u1"))
+        # The second game's result, not yet recorded
+        db.players.docs.append({"game_id": "g1", "user_id": "u1", "total_buy_in": 20.0, "cash_out": 15.0, "net_result": -5.0})
+        return db
+
+    def test_failed_update_falls_back_to_rebuild(self):
+        db = self.setup_db()
+        update_one = db.user_stats.update_one
+        calls = []
+
+        async def flaky(query, update, **kwargs):
+            calls.append(query)
+            if len(calls) == 1:
+                raise RuntimeError("primary stepped down")
+            return await update_one(query, update, **kwargs)
+
+        db.user_stats.update_one = flaky
+        asyncio.run(record_player_result(db, {"game_id": "g1", "group_id": "grp"}, "u1"))
+        stats = asyncio.run(get_user_stats(db, "u1"))
+        assert stats["total_games"] == 2 and stats["net_profit_cents"] == 500
+
+    def test_rebuild_racing_the_recorder_counts_once(self):
+        db = self.setup_db()
+        update_one = db.players.update_one
+
+        async def claim_then_rebuild(query, update, **kwargs):
+            result = await update_one(query, update, **kwargs)
+            if "stats_applied" in query and query["game_id"] == "g1":
+                await rebuild_user_stats(db, "u1")  # e.g. a correction for another game
+            return result
+
+        db.players.update_one = claim_then_rebuild
+        asyncio.run(record_player_result(db, {"game_id": "g1", "group_id": "grp"}, "u1"))
+        stats = asyncio.run(get_user_stats(db, "u1"))
+        assert stats["total_games"] == 2 and stats["net_profit_cents"] == 500
+
+
+class TestView:
+    """API-facing dollars"""
+
+    def test_view(self):
+        doc = aggregate_contributions(player_contribution(p) for p in PLAYERS)
+        doc["recent_games"] = [{"game_id": "g4", "group_name": "Friday", "net_cents": 20, "date": None, "played_at": "x"}]
+        view = stats_view(doc)
+        assert view["win_rate"] == 50.0
+        assert view["net_profit"] == -4.3
+        assert view["recent_games"] == [{"game_id": "g4", "group_name": "Friday", "net_result": 0.2, "date": None}]
+
+    def test_empty(self):
+        view = stats_view(None)
+        assert view["total_games"] == 0 and view["win_rate"] == 0 and view["recent_games"] == []
@@ -0,0 +1,194 @@
+"""
+User Resolution Cache
+Short-TTL in-process cache of user and session documents for
+get_current_user, plus per-request memoization.
+
+PRINCIPLES:
+1. One request never fetches the same user twice: lookups are memoized in a
+   request scope (user_cache_middleware), so a handler re-reading the
+   caller's document after get_current_user costs nothing
+2. Across requests, documents are reused for at most USER_CACHE_TTL seconds.
+   Writers that change what auth or handlers read (profile updates, premium
+   status, logout) invalidate explicitly; the TTL only bounds staleness for
+   other workers and for writes without a hook
+3. Only hits are cached. A new user or session is visible immediately, and a
+   session is never served past its own expires_at
+4. Callers get copies; cached documents are never mutated in place
+"""
+
+import copy
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+# Overridable with the USER_CACHE_TTL env var, read when the process-wide
+# cache is created (after load_dotenv), not at import
+USER_CACHE_TTL = 30.0
+USER_CACHE_SIZE = 10000
+
+
+# ============== REQUEST SCOPE ==============
+
+# {("user", user_id): doc, ("supabase", supabase_id): user_id, ("session", key): doc}
+_request_scope: ContextVar[Optional[Dict]] = ContextVar("user_cache_request_scope", default=None)
+
+
+async def user_cache_middleware(request, call_next):
+    """HTTP middleware opening a fresh memoization scope for each request."""
+    token = _request_scope.set({})
+    try:
+        return await call_next(request)
+    finally:
+        _request_scope.reset(token)
+
+
+def _session_key(session_token: str) -> str:
+    return hashlib.sha256(session_token.encode()).hexdigest()
+
+
+def session_expires_at(session_doc: Dict) -> datetime:
+    """A session's expires_at as an aware datetime (stored as ISO string or datetime)."""
+    expires_at = session_doc["expires_at"]
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at
+
+
+# ============== CACHE ==============
+
+class UserCache:
+    """TTL cache of users (by user_id and supabase_id) and sessions (by token hash)."""
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_entries: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, object]]" = OrderedDict()
+        self.stats = {"request_hits": 0, "hits": 0, "misses": 0}
+
+    # ---- storage ----
+
+    def _get(self, key: Tuple[str, str]):
+        scope = _request_scope.get()
+        if scope is not None and key in scope:
+            self.stats["request_hits"] += 1
+            return scope[key]
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                if scope is not None:
+                    scope[key] = value
+                return value
+            del self._entries[key]
+        return None
+
+    def _put(self, key: Tuple[str, str], value, ttl: Optional[float] = None):
+        scope = _request_scope.get()
+        if scope is not None:
+            scope[key] = value
+        ttl = self.ttl if ttl is None else min(self.ttl, ttl)
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _drop(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        scope = _request_scope.get()
+        if scope is not None:
+            scope.pop(key, None)
+
+    # ---- lookups ----
+
+    async def get_user(self, db, user_id: str) -> Optional[Dict]:
+        """The full users document for user_id."""
+        doc = self._get(("user", user_id))
+        if doc is None:
+            self.stats["misses"] += 1
+            doc = await db.users.find_one({"user_id": user_id}, {"_id": 0})
+            if doc is None:
+                return None
+            self._put(("user", user_id), doc)
+        return copy.deepcopy(doc)
+
+    async def get_user_by_supabase_id(self, db, supabase_id: str) -> Optional[Dict]:
+        """The full users document linked to a Supabase auth id."""
+        user_id = self._get(("supabase", supabase_id))
+        if user_id is not None:
+            doc = await self.get_user(db, user_id)
+            if doc is not None and doc.get("supabase_id") == supabase_id:
+                return doc
+
+        self.stats["misses"] += 1
+        doc = await db.users.find_one({"supabase_id": supabase_id}, {"_id": 0})
+        if doc is None:
+            return None
+        self._put(("supabase", supabase_id), doc["user_id"])
+        self._put(("user", doc["user_id"]), doc)
+        return copy.deepcopy(doc)
+
+    async def get_session(self, db, session_token: str) -> Optional[Dict]:
+        """The user_sessions document for a token, if it exists and hasn't expired."""
+        key = ("session", _session_key(session_token))
+        session_doc = self._get(key)
+        if session_doc is None:
+            self.stats["misses"] += 1
+            session_doc = await db.user_sessions.find_one({"session_token": session_token}, {"_id": 0})
+            if session_doc is None:
+                return None
+            remaining = (session_expires_at(session_doc) - datetime.now(timezone.utc)).total_seconds()
+            self._put(key, session_doc, ttl=remaining)
+
+        if session_expires_at(session_doc) < datetime.now(timezone.utc):
+            self._drop(key)
+            return None
+        return copy.deepcopy(session_doc)
+
+    # ---- invalidation ----
+
+    def invalidate_user(self, user_id: str):
+        """Forget a user's document (call after writing to users)."""
+        self._drop(("user", user_id))
+
+    def invalidate_session(self, session_token: str):
+        """Forget a session (call on logout)."""
+        self._drop(("session", _session_key(session_token)))
+
+    def clear(self):
+        self._entries.clear()
+        scope = _request_scope.get()
+        if scope is not None:
+            scope.clear()
+
+
+_user_cache: Optional[UserCache] = None
+
+
+def get_user_cache() -> UserCache:
+    """Process-wide user cache (created on first use)."""
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = UserCache(ttl=float(os.environ.get("USER_CACHE_TTL", USER_CACHE_TTL)))
+    return _user_cache
+
+
+def invalidate_user(user_id: str):
+    """Module-level hook for writers outside server.py (e.g. stripe_service)."""
+    get_user_cache().invalidate_user(user_id)
@@ -0,0 +1,216 @@
+"""
+User Search
+Prefix search over users through a normalized `search_tokens` array kept on
+each users document, for /users/search and wallet search.
+
+PRINCIPLES:
+1. Anchored and index-bounded: a query is a [prefix, successor) range on the
+   multikey users.search_tokens index, never a $regex over name/email, so a
+   keystroke costs O(log n + results) instead of a collection scan. The range
+   is an $elemMatch: on an array, bare $gte/$lt may be satisfied by two
+   different tokens (matching nearly every user) and can't be intersected
+   into one set of index bounds
+2. Tokens are written with the user: every insert or name change $sets
+   search_fields(); backfill_search_tokens() covers older documents
+3. Email tokens are namespaced with "@", so name-only searches (wallets) can
+   never match on someone's email address
+4. Keystroke-friendly: results are cached briefly per prefix, and a longer
+   prefix is answered from a shorter one's cached results when those were
+   complete (fewer than the limit)
+"""
+
+import copy
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+# Overridable with the USER_SEARCH_CACHE_TTL env var, read when the
+# process-wide cache is created (after load_dotenv), not at import
+SEARCH_CACHE_TTL = 15.0
+SEARCH_CACHE_SIZE = 2000
+MIN_QUERY_LENGTH = 2
+EMAIL_PREFIX = "@"
+
+SEARCH_PROJECTION = {
+    "_id": 0, "user_id": 1, "name": 1, "email": 1, "picture": 1, "level": 1, "search_tokens": 1
+}
+
+_WORD = re.compile(r"\w+")
+
+
+# ============== TOKENS ==============
+
+def normalize(text: Optional[str]) -> str:
+    """Lower-cased, accent-free, single-spaced: "  José  Núñez" -> "jose nunez"."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def search_tokens(name: Optional[str], email: Optional[str]) -> List[str]:
+    """
+    Every word of the name plus the whole name (so "john sm" matches
+    "John Smith"), and the email and its local part under EMAIL_PREFIX.
+    """
+    tokens = []
+    full_name = normalize(name)
+    if full_name:
+        tokens.extend(_WORD.findall(full_name))
+        tokens.append(full_name)
+    address = normalize(email)
+    if address:
+        tokens.append(EMAIL_PREFIX + address)
+        tokens.append(EMAIL_PREFIX + address.split("@")[0])
+    return list(dict.fromkeys(tokens))
+
+
+def search_fields(name: Optional[str], email: Optional[str]) -> Dict:
+    """The $set payload that keeps a user searchable; use on every name/email write."""
+    return {"search_tokens": search_tokens(name, email)}
+
+
+def _prefix_range(prefix: str) -> Dict:
+    """Some token starts with `prefix` (one element in [prefix, successor))."""
+    return {"$elemMatch": {"$gte": prefix, "$lt": prefix[:-1] + chr(ord(prefix[-1]) + 1)}}
+
+
+def build_search_query(prefix: str, include_email: bool) -> Dict:
+    if not include_email:
+        return {"search_tokens": _prefix_range(prefix)}
+    return {"$or": [
+        {"search_tokens": _prefix_range(prefix)},
+        {"search_tokens": _prefix_range(EMAIL_PREFIX + prefix)},
+    ]}
+
+
+def _matches(doc: Dict, prefix: str, include_email: bool) -> bool:
+    for token in doc.get("search_tokens", []):
+        if token.startswith(prefix) or (include_email and token.startswith(EMAIL_PREFIX + prefix)):
+            return True
+    return False
+
+
+# ============== CACHE ==============
+
+class SearchCache:
+    """TTL cache of raw search results keyed by (include_email, limit, prefix)."""
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[bool, int, str], Tuple[float, List[Dict], bool]]" = OrderedDict()
+        self.stats = {"hits": 0, "narrowed": 0, "misses": 0}
+
+    def get(self, include_email: bool, limit: int, prefix: str) -> Optional[List[Dict]]:
+        now = time.monotonic()
+        for end in range(len(prefix), MIN_QUERY_LENGTH - 1, -1):
+            key = (include_email, limit, prefix[:end])
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            expires, docs, complete = entry
+            if expires <= now:
+                del self._entries[key]
+                continue
+            if end == len(prefix):
+                self.stats["hits"] += 1
+                return docs
+            if complete:
+                # Every match for the shorter prefix is here, so filtering is exact
+                self.stats["narrowed"] += 1
+                return [d for d in docs if _matches(d, prefix, include_email)]
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, include_email: bool, limit: int, prefix: str, docs: List[Dict], complete: bool):
+        if self.ttl <= 0:
+            return
+        key = (include_email, limit, prefix)
+        self._entries[key] = (time.monotonic() + self.ttl, docs, complete)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+_search_cache: Optional[SearchCache] = None
+
+
+def get_search_cache() -> SearchCache:
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchCache(ttl=float(os.environ.get("USER_SEARCH_CACHE_TTL", SEARCH_CACHE_TTL)))
+    return _search_cache
+
+
+# ============== SEARCH ==============
+
+async def find_users(
+    db,
+    query: str,
+    include_email: bool = True,
+    exclude_user_id: Optional[str] = None,
+    limit: int = 20
+) -> List[Dict]:
+    """
+    Users whose name (or, with include_email, email) has a word starting
+    with `query`. Returns SEARCH_PROJECTION fields without search_tokens.
+    """
+    prefix = normalize(query)
+    if len(prefix) < MIN_QUERY_LENGTH:
+        return []
+
+    # One spare row so excluding the caller still leaves `limit` results
+    fetch = limit + 1
+    cache = get_search_cache()
+    docs = cache.get(include_email, fetch, prefix)
+    if docs is None:
+        docs = await db.users.find(build_search_query(prefix, include_email), SEARCH_PROJECTION).to_list(fetch)
+        cache.put(include_email, fetch, prefix, docs, complete=len(docs) < fetch)
+
+    results = []
+    for doc in docs:
+        if exclude_user_id and doc.get("user_id") == exclude_user_id:
+            continue
+        result = copy.deepcopy(doc)
+        result.pop("search_tokens", None)
+        results.append(result)
+    return results[:limit]
+
+
+async def backfill_search_tokens(db, batch_size: int = 500) -> int:
+    """Set search_tokens on users that predate them. Returns how many were updated."""
+    from pymongo import UpdateOne
+
+    updated = 0
+    try:
+        while True:
+            docs = await db.users.find(
+                {"search_tokens": {"$exists": False}},
+                {"_id": 1, "name": 1, "email": 1}
+            ).to_list(batch_size)
+            if not docs:
+                break
+            await db.users.bulk_write([
+                UpdateOne({"_id": d["_id"]}, {"$set": search_fields(d.get("name"), d.get("email"))})
+                for d in docs
+            ], ordered=False)
+            updated += len(docs)
+    except Exception as e:
+        logger.exception(f"search_tokens backfill stopped after {updated} users: {e}")
+    if updated:
+        logger.info(f"search_tokens backfilled for {updated} users")
+    return updated
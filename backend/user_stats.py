@@ -0,0 +1,273 @@
+"""
+Materialized User Stats
+One user_stats document per user, maintained incrementally as players cash
+out, so profile/stats reads are a single indexed fetch instead of a scan of
+every players row.
+
+PRINCIPLES:
+1. All totals in INTEGER CENTS; converted to dollars only by stats_view
+2. Idempotent: each players row records what it has contributed
+   (players.stats_applied). Re-recording an unchanged result is a no-op,
+   and concurrent recorders race on a compare-and-set of that field. The
+   incremental update only applies if the document hasn't been rebuilt
+   since the recorder looked (rebuilt_at), and a failed update falls back
+   to a rebuild, so a claimed result is counted exactly once
+3. First contribution of a game is a single $inc/$max/$min/$push update.
+   Corrections (chip edits, re-settlement) rebuild the user's document from
+   their players rows, since biggest win/loss can't be decremented.
+   Biggest win/loss are null until the first result, which always goes
+   through a rebuild (the incremental update only matches total_games > 0),
+   so $max/$min never compare against a placeholder
+4. A missing document is rebuilt on first read, so backfill is optional
+   (rebuild_user_stats.py does it eagerly)
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from enrichment import fetch_by_ids, fetch_games
+
+logger = logging.getLogger(__name__)
+
+
+# ============== CONSTANTS ==============
+
+RECENT_GAMES_LIMIT = 5
+
+PLAYER_PROJECTION = {
+    "_id": 0, "game_id": 1, "user_id": 1, "total_buy_in": 1, "cash_out": 1,
+    "net_result": 1, "cashed_out_at": 1, "stats_applied": 1
+}
+
+EMPTY_STATS = {
+    "total_games": 0,
+    "wins": 0,
+    "total_buy_ins_cents": 0,
+    "total_winnings_cents": 0,
+    "net_profit_cents": 0,
+    "gross_winnings_cents": 0,
+    "gross_losses_cents": 0,
+    "biggest_win_cents": None,
+    "biggest_loss_cents": None,
+    "recent_games": []
+}
+
+
+# ============== CONTRIBUTIONS ==============
+
+def player_contribution(player: Dict) -> Optional[Dict]:
+    """What one players row adds to its user's stats (None until it has a result)."""
+    if player.get("net_result") is None:
+        return None
+    return {
+        "net_cents": round(player["net_result"] * 100),
+        "buy_in_cents": round((player.get("total_buy_in") or 0) * 100),
+        "cash_out_cents": round((player.get("cash_out") or 0) * 100)
+    }
+
+
+def _recent_item(player: Dict, game: Optional[Dict], group_name: Optional[str]) -> Dict:
+    game = game or {}
+    return {
+        "game_id": player["game_id"],
+        "group_name": group_name or "Unknown",
+        "net_cents": round(player["net_result"] * 100),
+        "date": game.get("ended_at") or game.get("started_at"),
+        "played_at": player.get("cashed_out_at") or game.get("ended_at") or game.get("started_at") or ""
+    }
+
+
+def aggregate_contributions(contributions: Iterable[Dict]) -> Dict:
+    """Fold contributions into the stored (cents) totals."""
+    stats = {k: v for k, v in EMPTY_STATS.items() if k != "recent_games"}
+    nets = []
+    for c in contributions:
+        net = c["net_cents"]
+        nets.append(net)
+        stats["total_games"] += 1
+        stats["wins"] += 1 if net > 0 else 0
+        stats["total_buy_ins_cents"] += c["buy_in_cents"]
+        stats["total_winnings_cents"] += c["cash_out_cents"]
+        stats["net_profit_cents"] += net
+        if net > 0:
+            stats["gross_winnings_cents"] += net
+        else:
+            stats["gross_losses_cents"] += net
+    if nets:
+        stats["biggest_win_cents"] = max(nets)
+        stats["biggest_loss_cents"] = min(nets)
+    return stats
+
+
+def stats_view(doc: Optional[Dict]) -> Dict:
+    """Dollar-denominated stats for API responses."""
+    doc = {**EMPTY_STATS, **(doc or {})}
+    total_games = doc["total_games"]
+    return {
+        "total_games": total_games,
+        "wins": doc["wins"],
+        "win_rate": round(doc["wins"] / total_games * 100, 1) if total_games else 0,
+        "total_buy_ins": doc["total_buy_ins_cents"] / 100,
+        "total_winnings": doc["total_winnings_cents"] / 100,
+        "net_profit": doc["net_profit_cents"] / 100,
+        "gross_winnings": doc["gross_winnings_cents"] / 100,
+        "gross_losses": doc["gross_losses_cents"] / 100,
+        "biggest_win": (doc["biggest_win_cents"] or 0) / 100,
+        "biggest_loss": (doc["biggest_loss_cents"] or 0) / 100,
+        "recent_games": [
+            {
+                "game_id": g["game_id"],
+                "group_name": g["group_name"],
+                "net_result": g["net_cents"] / 100,
+                "date": g["date"]
+            }
+            for g in doc["recent_games"]
+        ]
+    }
+
+
+# ============== WRITES ==============
+
+async def record_player_result(db, game: Dict, user_id: str) -> None:
+    """
+    Fold a player's (new or changed) result for `game` into user_stats.
+    Call after the players row has been updated.
+    """
+    player = await db.players.find_one({"game_id": game["game_id"], "user_id": user_id}, PLAYER_PROJECTION)
+    if not player:
+        return
+
+    previous = player.get("stats_applied")
+    current = player_contribution(player)
+    if current == previous:
+        return
+
+    # A rebuild that lands after this read already counts the game; the
+    # incremental update below only applies if none has (see PRINCIPLES 2)
+    baseline = await db.user_stats.find_one({"user_id": user_id}, {"_id": 0, "rebuilt_at": 1})
+
+    # Claim the change; a concurrent recorder that got here first wins
+    claimed = await db.players.update_one(
+        {"game_id": game["game_id"], "user_id": user_id, "stats_applied": previous},
+        {"$set": {"stats_applied": current}}
+    )
+    if claimed.modified_count == 0:
+        return
+
+    try:
+        if previous is not None or current is None:
+            await rebuild_user_stats(db, user_id)
+        else:
+            await _apply_first_result(db, game, player, current, (baseline or {}).get("rebuilt_at"))
+    except Exception as e:
+        # Never leave the row claimed but uncounted: recount from the rows,
+        # or hand the change back to the next recorder
+        logger.warning(f"user_stats update failed for {user_id} in {game['game_id']}, rebuilding: {e}")
+        try:
+            await rebuild_user_stats(db, user_id)
+        except Exception:
+            await db.players.update_one(
+                {"game_id": game["game_id"], "user_id": user_id, "stats_applied": current},
+                {"$set": {"stats_applied": previous}}
+            )
+            raise
+
+
+async def _apply_first_result(db, game: Dict, player: Dict, current: Dict, rebuilt_at: Optional[str]) -> None:
+    user_id = player["user_id"]
+    group = await db.groups.find_one({"group_id": game.get("group_id")}, {"_id": 0, "name": 1})
+    net = current["net_cents"]
+    result = await db.user_stats.update_one(
+        {"user_id": user_id, "total_games": {"$gt": 0}, "rebuilt_at": rebuilt_at},
+        {
+            "$inc": {
+                "total_games": 1,
+                "wins": 1 if net > 0 else 0,
+                "total_buy_ins_cents": current["buy_in_cents"],
+                "total_winnings_cents": current["cash_out_cents"],
+                "net_profit_cents": net,
+                "gross_winnings_cents": net if net > 0 else 0,
+                "gross_losses_cents": net if net <= 0 else 0
+            },
+            "$max": {"biggest_win_cents": net},
+            "$min": {"biggest_loss_cents": net},
+            "$push": {"recent_games": {
+                "$each": [_recent_item(player, game, group.get("name") if group else None)],
+                "$sort": {"played_at": -1},
+                "$slice": RECENT_GAMES_LIMIT
+            }},
+            "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+        }
+    )
+    if result.matched_count == 0:
+        # No document, one with no games yet, or one rebuilt since the claim
+        # (which may already count this game): build it from all of the
+        # user's rows, which also seeds biggest win/loss
+        await rebuild_user_stats(db, user_id)
+
+
+async def record_game_results(db, game: Dict, user_ids: Iterable[str]) -> None:
+    """record_player_result for every player of a settled game. Never raises."""
+    for user_id in user_ids:
+        try:
+            await record_player_result(db, game, user_id)
+        except Exception as e:
+            logger.error(f"user_stats update failed for {user_id} in {game.get('game_id')}: {e}")
+
+
+async def rebuild_user_stats(db, user_id: str) -> Dict:
+    """Recompute a user's stats document from their players rows."""
+    players = await db.players.find(
+        {"user_id": user_id, "net_result": {"$ne": None}},
+        PLAYER_PROJECTION
+    ).to_list(None)
+
+    contributions = [player_contribution(p) for p in players]
+    doc = aggregate_contributions(contributions)
+
+    recent = sorted(players, key=lambda p: p.get("cashed_out_at") or "", reverse=True)[:RECENT_GAMES_LIMIT]
+    games = await fetch_games(db, (p["game_id"] for p in recent))
+    groups = await fetch_by_ids(db.groups, "group_id", (g.get("group_id") for g in games.values()), {"_id": 0, "name": 1})
+    doc["recent_games"] = []
+    for p in recent:
+        game = games.get(p["game_id"])
+        group = groups.get(game.get("group_id")) if game else None
+        doc["recent_games"].append(_recent_item(p, game, group.get("name") if group else None))
+    doc["recent_games"].sort(key=lambda g: g["played_at"], reverse=True)
+    doc["updated_at"] = datetime.now(timezone.utc).isoformat()
+    doc["rebuilt_at"] = doc["updated_at"]
+
+    await db.user_stats.update_one({"user_id": user_id}, {"$set": doc}, upsert=True)
+
+    # Re-baseline what each row has contributed so later deltas stay exact
+    ops = [
+        UpdateOne({"game_id": p["game_id"], "user_id": user_id}, {"$set": {"stats_applied": c}})
+        for p, c in zip(players, contributions) if p.get("stats_applied") != c
+    ]
+    if ops:
+        await db.players.bulk_write(ops, ordered=False)
+
+    doc["user_id"] = user_id
+    return doc
+
+
+async def rebuild_all_user_stats(db, user_ids: Optional[List[str]] = None) -> int:
+    """Backfill: rebuild every user with at least one result (or just `user_ids`)."""
+    if user_ids is None:
+        user_ids = await db.players.distinct("user_id", {"net_result": {"$ne": None}})
+    for user_id in user_ids:
+        await rebuild_user_stats(db, user_id)
+    return len(user_ids)
+
+
+# ============== READS ==============
+
+async def get_user_stats(db, user_id: str) -> Dict:
+    """The user's stats document (rebuilt on first read if missing)."""
+    doc = await db.user_stats.find_one({"user_id": user_id}, {"_id": 0})
+    if doc is None:
+        doc = await rebuild_user_stats(db, user_id)
+    return doc
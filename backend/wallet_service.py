@@ -19,11 +19,15 @@ from datetime import datetime, timezone, timedelta
 from typing import Optional, Tuple, List, Dict, Any
 from fastapi import Request, HTTPException
 
+from hash_executor import HashExecutorSaturated, get_pin_hash_executor
+from user_search import find_users
+
 
 # ============== CONSTANTS ==============
 
 PIN_MAX_ATTEMPTS = 5
 PIN_LOCKOUT_DURATION = timedelta(minutes=30)
+PIN_BCRYPT_ROUNDS = 12
 DEFAULT_DAILY_LIMIT_CENTS = 50000       # $500
 DEFAULT_PER_TXN_LIMIT_CENTS = 20000     # $200
 MIN_DEPOSIT_CENTS = 500                  # $5
@@ -102,20 +106,42 @@ async def generate_unique_wallet_id(db) -> str:
 
 # ============== PIN SECURITY ==============
 
-def hash_pin(pin: str) -> str:
-    """Hash PIN using bcrypt with cost factor 12."""
-    salt = bcrypt.gensalt(rounds=12)
+def hash_pin_sync(pin: str) -> str:
+    """Hash PIN using bcrypt with cost factor 12 (blocking, ~250 ms)."""
+    salt = bcrypt.gensalt(rounds=PIN_BCRYPT_ROUNDS)
     return bcrypt.hashpw(pin.encode('utf-8'), salt).decode('utf-8')
 
 
-def verify_pin(pin: str, pin_hash: str) -> bool:
-    """Verify a PIN against its bcrypt hash."""
+def verify_pin_sync(pin: str, pin_hash: str) -> bool:
+    """Verify a PIN against its bcrypt hash (blocking)."""
     try:
         return bcrypt.checkpw(pin.encode('utf-8'), pin_hash.encode('utf-8'))
     except Exception:
         return False
 
 
+async def _run_pin_work(fn, *args):
+    """Run bcrypt work on the bounded PIN executor; 429 when it is saturated."""
+    try:
+        return await get_pin_hash_executor().run(fn, *args)
+    except HashExecutorSaturated:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many PIN requests right now. Please try again in a moment.",
+            headers={"Retry-After": "1"}
+        )
+
+
+async def hash_pin(pin: str) -> str:
+    """Hash PIN off the event loop."""
+    return await _run_pin_work(hash_pin_sync, pin)
+
+
+async def verify_pin(pin: str, pin_hash: str) -> bool:
+    """Verify PIN off the event loop."""
+    return await _run_pin_work(verify_pin_sync, pin, pin_hash)
+
+
 async def verify_pin_with_lockout(
     wallet: dict,
     pin: str,
@@ -144,7 +170,7 @@ async def verify_pin_with_lockout(
             return False, f"PIN locked. Try again in {remaining} minute{'s' if remaining != 1 else ''}."
 
     # Verify PIN
-    if verify_pin(pin, wallet["pin_hash"]):
+    if await verify_pin(pin, wallet["pin_hash"]):
         await db.wallets.update_one(
             {"wallet_id": wallet_id},
             {"$set": {"pin_attempts": 0, "pin_locked_until": None}}
@@ -758,16 +784,18 @@ async def search_wallets(
         if wallet:
             results.append(wallet)
 
-    # Search by name
-    users = await db.users.find({
-        "name": {"$regex": query, "$options": "i"}
-    }).limit(limit).to_list(limit)
+    # Search by name (prefix match on search_tokens), then one query for their wallets
+    users = await find_users(db, query, include_email=False, exclude_user_id=exclude_user_id, limit=limit)
+    wallets = {}
+    if users:
+        wallet_docs = await db.wallets.find(
+            {"user_id": {"$in": [u["user_id"] for u in users]}},
+            {"_id": 0, "user_id": 1, "wallet_id": 1, "status": 1}
+        ).to_list(len(users))
+        wallets = {w["user_id"]: w for w in wallet_docs}
 
     for user in users:
-        if exclude_user_id and user["user_id"] == exclude_user_id:
-            continue
-
-        wallet = await db.wallets.find_one({"user_id": user["user_id"]})
+        wallet = wallets.get(user["user_id"])
         if wallet and wallet.get("wallet_id"):
             name = user.get("name", "Unknown")
             parts = name.split()
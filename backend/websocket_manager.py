@@ -9,102 +9,89 @@ import jwt
 import os
 from datetime import datetime, timezone
 from typing import Optional
-from jwt import PyJWKClient
+
+from auth_tokens import TokenExpired, get_token_verifier
+from game_sync import sync_since
+from room_access import RoomAccessDenied, get_room_access
+from socket_batching import RoomEmitter
+from socket_cluster import make_client_manager, make_presence_store, publish_control
+from socket_rooms import RoomRegistry, game_room, group_room, user_room
+from user_cache import get_user_cache
 
 logger = logging.getLogger(__name__)
 
-# Get Supabase configuration from environment
-SUPABASE_JWT_SECRET = os.environ.get('SUPABASE_JWT_SECRET', '')
-SUPABASE_URL = os.environ.get('SUPABASE_URL', '')
+# Shared with server.get_current_user: one JWKS key set and claims cache
+token_verifier = get_token_verifier()
 
-# JWKS client factory for clean refresh
-def make_jwks_client():
-    """Create JWKS client with 12-hour cache"""
-    jwks_url = f"{SUPABASE_URL.rstrip('/')}/auth/v1/jwks"
-    return PyJWKClient(jwks_url, cache_keys=True, lifespan=43200)
+# Shared with server.get_current_user: user/session documents
+user_cache = get_user_cache()
 
-# Initialize JWKS client for RS256 verification (new Supabase signing keys)
-jwks_client = None
-if SUPABASE_URL:
-    try:
-        jwks_client = make_jwks_client()
-        logger.info(f"✅ JWKS client initialized (TTL: 12h)")
-    except Exception as e:
-        logger.warning(f"Failed to initialize JWKS client: {e}")
+# Cached join_game / join_group authorization
+room_access = get_room_access()
+
+# Database handle: the server's client (init_db), never one client per event
+_db = None
+
+
+def init_db(database):
+    """Use the server's Motor database (and its connection pool) for socket events."""
+    global _db
+    _db = database
+
+
+def _get_db():
+    """The shared database; outside server.py, lazily one client per process."""
+    global _db
+    if _db is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+        db_name = os.environ.get('DB_NAME', 'oddside')
+        _db = AsyncIOMotorClient(mongo_url)[db_name]
+    return _db
+
+# Cross-worker fan-out: unset = single process, redis://... = shared queue
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE', '')
 
 # Create Socket.IO server with CORS
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins='*',
     logger=False,
-    engineio_logger=False
+    engineio_logger=False,
+    client_manager=make_client_manager(SOCKETIO_MESSAGE_QUEUE)
 )
 
-# Track connected users: {user_id: set(sid)}
-connected_users: dict[str, set[str]] = {}
+# Socket bookkeeping for this worker: sid <-> user and sid <-> room indexes
+rooms = RoomRegistry()
+
+# Who is online across all workers (see socket_cluster)
+presence = make_presence_store(SOCKETIO_MESSAGE_QUEUE)
+
+
+async def _send_game_update(room: str, payload: dict):
+    await sio.emit('game_update', payload, room=room)
+
 
-# Track game rooms: {game_id: set(user_id)}
-game_rooms: dict[str, set[str]] = {}
+# game_update coalescing per room (see socket_batching)
+game_emitter = RoomEmitter(_send_game_update)
 
-# Track group rooms: {group_id: set(user_id)}
-group_rooms: dict[str, set[str]] = {}
+# Latency-critical game events that skip the coalescing window
+IMMEDIATE_GAME_EVENTS = {'message', 'game_state'}
 
-# Track sid to user_id mapping
-sid_to_user: dict[str, str] = {}
+# Track connected users: {user_id: set(sid)} (the registry's own index)
+connected_users = rooms.user_sids
 
 
 async def verify_supabase_jwt(token: str) -> Optional[dict]:
     """
-    Verify Supabase JWT using either:
-    1. New JWKS method (RS256) - auto-fetches public keys with retry on unknown kid
-    2. Legacy secret method (HS256) - uses shared secret
+    Verify a Supabase JWT with the shared verifier (RS256 via JWKS, then
+    legacy HS256). Expired or invalid tokens return None.
     """
-    global jwks_client
-
-    # Try new JWKS method first (RS256)
-    if jwks_client:
-        for attempt in range(2):
-            try:
-                signing_key = jwks_client.get_signing_key_from_jwt(token)
-                payload = jwt.decode(
-                    token,
-                    signing_key.key,
-                    algorithms=["RS256"],
-                    audience="authenticated"
-                )
-                logger.debug(f"JWT verified using JWKS (RS256)")
-                return payload
-            except jwt.exceptions.PyJWKClientError as e:
-                # Unknown kid - recreate client (clean refresh) and retry once
-                if attempt == 0 and "Unable to find" in str(e):
-                    logger.warning(f"Unknown kid, refreshing JWKS client (attempt {attempt + 1}/2)")
-                    try:
-                        jwks_client = make_jwks_client()
-                        continue
-                    except Exception as refresh_err:
-                        logger.error(f"Failed to refresh JWKS client: {refresh_err}")
-                        break
-                logger.debug(f"JWKS verification failed: {e}")
-                break
-            except Exception as e:
-                logger.debug(f"JWKS verification failed: {e}")
-                break
-
-    # Fallback to legacy secret method (HS256)
-    if SUPABASE_JWT_SECRET:
-        try:
-            payload = jwt.decode(
-                token,
-                SUPABASE_JWT_SECRET,
-                algorithms=["HS256"],
-                audience="authenticated"
-            )
-            logger.debug("JWT verified using legacy secret (HS256)")
-            return payload
-        except Exception as e:
-            logger.debug(f"Legacy secret verification failed: {e}")
-
-    return None
+    try:
+        return await token_verifier.verify(token)
+    except TokenExpired:
+        logger.debug("JWT expired")
+        return None
 
 
 @sio.event
@@ -118,21 +105,14 @@ async def connect(sid, environ, auth):
 
     user_id = None
 
-    def _get_db():
-        from motor.motor_asyncio import AsyncIOMotorClient
-        mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-        db_name = os.environ.get('DB_NAME', 'oddside')
-        return AsyncIOMotorClient(mongo_url)[db_name]
-
     # Method 1: Try JWT verification (JWKS or HS256)
-    if jwks_client or SUPABASE_JWT_SECRET:
+    if token_verifier.enabled:
         try:
             payload = await verify_supabase_jwt(token)
             if payload:
                 supabase_id = payload.get("sub")
                 if supabase_id:
-                    _db = _get_db()
-                    user_doc = await _db.users.find_one({"supabase_id": supabase_id}, {"_id": 0})
+                    user_doc = await user_cache.get_user_by_supabase_id(_get_db(), supabase_id)
                     if user_doc:
                         user_id = user_doc.get("user_id")
         except Exception:
@@ -141,18 +121,9 @@ async def connect(sid, environ, auth):
     # Method 2: Fallback to session token lookup in DB
     if not user_id:
         try:
-            _db = _get_db()
-            session_doc = await _db.user_sessions.find_one(
-                {"session_token": token}, {"_id": 0}
-            )
+            session_doc = await user_cache.get_session(_get_db(), token)
             if session_doc:
-                expires_at = session_doc.get("expires_at")
-                if isinstance(expires_at, str):
-                    expires_at = datetime.fromisoformat(expires_at)
-                if expires_at and expires_at.tzinfo is None:
-                    expires_at = expires_at.replace(tzinfo=timezone.utc)
-                if expires_at and expires_at >= datetime.now(timezone.utc):
-                    user_id = session_doc.get("user_id")
+                user_id = session_doc.get("user_id")
         except Exception as e:
             logger.error(f"Session token lookup error (sid: {sid}): {e}")
 
@@ -168,10 +139,7 @@ async def connect(sid, environ, auth):
             )
             supabase_id = payload.get("sub")
             if supabase_id:
-                _db = _get_db()
-                user_doc = await _db.users.find_one(
-                    {"supabase_id": supabase_id}, {"_id": 0}
-                )
+                user_doc = await user_cache.get_user_by_supabase_id(_get_db(), supabase_id)
                 if user_doc:
                     user_id = user_doc.get("user_id")
                     logger.info(f"Auth via JWT decode fallback for supabase_id {supabase_id[:8]}...")
@@ -182,11 +150,10 @@ async def connect(sid, environ, auth):
         logger.warning(f"Connection rejected - auth failed (sid: {sid})")
         return False
 
-    # Track connection
-    if user_id not in connected_users:
-        connected_users[user_id] = set()
-    connected_users[user_id].add(sid)
-    sid_to_user[sid] = user_id
+    # Track connection; the per-user room lets emit_to_user reach every worker
+    rooms.connect(sid, user_id)
+    await sio.enter_room(sid, user_room(user_id))
+    await presence.connect(sid, user_id)
 
     await sio.save_session(sid, {'user_id': user_id})
     logger.info(f"✅ User {user_id[:8]}... connected (sid: {sid})")
@@ -196,36 +163,16 @@ async def connect(sid, environ, auth):
 @sio.event
 async def disconnect(sid):
     """Handle disconnection"""
-    # Get user_id from sid mapping
-    user_id = sid_to_user.get(sid)
+    # Socket.IO drops the sid from its rooms itself; only our indexes need
+    # cleaning, and only for the rooms this sid was in
+    user_id, left = rooms.disconnect(sid)
+    try:
+        await presence.disconnect(sid, user_id, left)
+    except Exception as e:
+        logger.warning(f"Presence cleanup failed (sid: {sid}): {e}")
 
     if user_id:
-        # Clean up connected_users tracking
-        if user_id in connected_users:
-            connected_users[user_id].discard(sid)
-            if not connected_users[user_id]:
-                del connected_users[user_id]
-
-        # Leave all game rooms
-        for game_id, users in list(game_rooms.items()):
-            if user_id in users:
-                users.discard(user_id)
-                await sio.leave_room(sid, f"game_{game_id}")
-                if not users:
-                    del game_rooms[game_id]
-
-        # Leave all group rooms
-        for group_id, users in list(group_rooms.items()):
-            if user_id in users:
-                users.discard(user_id)
-                await sio.leave_room(sid, f"group_{group_id}")
-                if not users:
-                    del group_rooms[group_id]
-
-        # Clean up sid mapping
-        del sid_to_user[sid]
-
-        logger.info(f"User {user_id} disconnected (sid: {sid})")
+        logger.info(f"User {user_id} disconnected (sid: {sid}, rooms: {len(left)})")
     else:
         logger.info(f"Disconnected (sid: {sid})")
 
@@ -233,9 +180,6 @@ async def disconnect(sid):
 @sio.event
 async def join_game(sid, data):
     """User joins a game room for real-time updates"""
-    from motor.motor_asyncio import AsyncIOMotorClient
-    import os
-
     session = await sio.get_session(sid)
     user_id = session.get('user_id') if session else None
     game_id = data.get('game_id')
@@ -244,84 +188,67 @@ async def join_game(sid, data):
         logger.warning(f"join_game rejected - missing user_id or game_id (sid: {sid})")
         return {'error': 'Missing user_id or game_id'}
 
-    # AUTHORIZATION: Verify user has access to this game
+    # AUTHORIZATION: member of the game's group, or a player in the game
     try:
-        # Get database connection
-        mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-        db_name = os.environ.get('DB_NAME', 'oddside')
-        client = AsyncIOMotorClient(mongo_url)
-        db = client[db_name]
-
-        # Check if user is in the game's group or is a player in the game
-        game = await db.game_nights.find_one({'game_id': game_id})
-        if not game:
-            logger.warning(f"join_game rejected - game {game_id} not found (user: {user_id})")
-            return {'error': 'Game not found'}
-
-        group_id = game.get('group_id')
-        if not group_id:
-            logger.warning(f"join_game rejected - game {game_id} has no group_id")
-            return {'error': 'Invalid game'}
-
-        # Check if user is a member of the group
-        membership = await db.group_members.find_one({
-            'group_id': group_id,
-            'user_id': user_id,
-            'status': 'active'
-        })
-
-        if not membership:
-            # Also check if user is a player in this specific game (invited)
-            player = await db.players.find_one({
-                'game_id': game_id,
-                'user_id': user_id
-            })
-
-            if not player:
-                logger.warning(f"join_game rejected - user {user_id} not authorized for game {game_id}")
-                return {'error': 'Not authorized to join this game'}
-
-        # Authorization passed - join room
-        room = f"game_{game_id}"
-        await sio.enter_room(sid, room)
-
-        if game_id not in game_rooms:
-            game_rooms[game_id] = set()
-        game_rooms[game_id].add(user_id)
-
-        logger.info(f"✅ User {user_id} joined game room {game_id}")
-        return {'status': 'joined', 'room': room}
-
+        await room_access.authorize_game(_get_db(), game_id, user_id)
+    except RoomAccessDenied as e:
+        logger.warning(f"join_game rejected - {e} (user: {user_id}, game: {game_id})")
+        return {'error': str(e)}
     except Exception as e:
         logger.error(f"join_game error for user {user_id}, game {game_id}: {e}")
         return {'error': 'Authorization check failed'}
 
+    # Authorization passed - join room
+    room = game_room(game_id)
+    await sio.enter_room(sid, room)
+    rooms.join(sid, room)
+    await presence.join(sid, user_id, room)
+
+    logger.info(f"✅ User {user_id} joined game room {game_id}")
+    return {'status': 'joined', 'room': room}
+
 
 @sio.event
 async def leave_game(sid, data):
     """User leaves a game room"""
-    session = await sio.get_session(sid)
-    user_id = session.get('user_id') if session else None
     game_id = data.get('game_id')
     
     if game_id:
-        room = f"game_{game_id}"
+        room = game_room(game_id)
         await sio.leave_room(sid, room)
-        
-        if game_id in game_rooms and user_id:
-            game_rooms[game_id].discard(user_id)
-            if not game_rooms[game_id]:
-                del game_rooms[game_id]
+        if rooms.leave(sid, room):
+            await presence.leave(sid, room)
     
     return {'status': 'left'}
 
 
+@sio.event
+async def sync_game(sid, data):
+    """Catch up on game state deltas after the client's state_version (see game_sync)"""
+    session = await sio.get_session(sid)
+    user_id = session.get('user_id') if session else None
+    game_id = data.get('game_id')
+
+    if not user_id or not game_id:
+        return {'error': 'Missing user_id or game_id'}
+    try:
+        since_version = int(data.get('since_version', 0))
+    except (TypeError, ValueError):
+        return {'error': 'Invalid since_version'}
+
+    try:
+        await room_access.authorize_game(_get_db(), game_id, user_id)
+        return await sync_since(_get_db(), game_id, since_version)
+    except RoomAccessDenied as e:
+        return {'error': str(e)}
+    except Exception as e:
+        logger.error(f"sync_game error for user {user_id}, game {game_id}: {e}")
+        return {'error': 'Sync failed'}
+
+
 @sio.event
 async def join_group(sid, data):
     """User joins a group's chat room for real-time messages"""
-    from motor.motor_asyncio import AsyncIOMotorClient
-    import os
-
     session = await sio.get_session(sid)
     user_id = session.get('user_id') if session else None
     group_id = data.get('group_id')
@@ -332,52 +259,34 @@ async def join_group(sid, data):
 
     # Verify user is a member of the group
     try:
-        mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-        db_name = os.environ.get('DB_NAME', 'oddside')
-        client = AsyncIOMotorClient(mongo_url)
-        db = client[db_name]
-
-        membership = await db.group_members.find_one({
-            'group_id': group_id,
-            'user_id': user_id,
-            'status': 'active'
-        })
-
-        if not membership:
-            logger.warning(f"join_group rejected - user {user_id} not member of group {group_id}")
-            return {'error': 'Not a member of this group'}
-
-        # Join the group room
-        room = f"group_{group_id}"
-        await sio.enter_room(sid, room)
-
-        if group_id not in group_rooms:
-            group_rooms[group_id] = set()
-        group_rooms[group_id].add(user_id)
-
-        logger.info(f"User {user_id[:8]}... joined group room {group_id}")
-        return {'status': 'joined', 'room': room}
-
+        await room_access.authorize_group(_get_db(), group_id, user_id)
+    except RoomAccessDenied as e:
+        logger.warning(f"join_group rejected - user {user_id} not member of group {group_id}")
+        return {'error': str(e)}
     except Exception as e:
         logger.error(f"join_group error for user {user_id}, group {group_id}: {e}")
         return {'error': 'Authorization check failed'}
 
+    # Join the group room
+    room = group_room(group_id)
+    await sio.enter_room(sid, room)
+    rooms.join(sid, room)
+    await presence.join(sid, user_id, room)
+
+    logger.info(f"User {user_id[:8]}... joined group room {group_id}")
+    return {'status': 'joined', 'room': room}
+
 
 @sio.event
 async def leave_group(sid, data):
     """User leaves a group's chat room"""
-    session = await sio.get_session(sid)
-    user_id = session.get('user_id') if session else None
     group_id = data.get('group_id')
 
     if group_id:
-        room = f"group_{group_id}"
+        room = group_room(group_id)
         await sio.leave_room(sid, room)
-
-        if group_id in group_rooms and user_id:
-            group_rooms[group_id].discard(user_id)
-            if not group_rooms[group_id]:
-                del group_rooms[group_id]
+        if rooms.leave(sid, room):
+            await presence.leave(sid, room)
 
     return {'status': 'left'}
 
@@ -398,9 +307,106 @@ async def group_typing(sid, data):
         }, room=f"group_{group_id}", skip_sid=sid)
 
 
+# ============== PRESENCE ==============
+
+async def get_game_presence(game_id: str) -> list[str]:
+    """User ids with at least one socket in the game's room (any worker)."""
+    return sorted(await presence.users_in(game_room(game_id)))
+
+
+async def get_group_presence(group_id: str) -> list[str]:
+    """User ids with at least one socket in the group's room (any worker)."""
+    return sorted(await presence.users_in(group_room(group_id)))
+
+
+async def is_user_online(user_id: str) -> bool:
+    return await presence.is_online(user_id)
+
+
+async def start_presence():
+    """Start the presence heartbeat (no-op for the in-memory store)."""
+    await presence.start()
+
+
+async def stop_presence():
+    await presence.stop()
+
+
+@sio.event
+async def game_presence(sid, data):
+    """Who is online in a game room (caller must be allowed in the room)"""
+    game_id = (data or {}).get('game_id')
+    user_id = rooms.sid_user.get(sid)
+    if not user_id or not game_id:
+        return {'error': 'Missing user_id or game_id'}
+
+    if game_room(game_id) not in rooms.sid_rooms.get(sid, ()):
+        try:
+            await room_access.authorize_game(_get_db(), game_id, user_id)
+        except RoomAccessDenied as e:
+            return {'error': str(e)}
+        except Exception as e:
+            logger.error(f"game_presence error for user {user_id}, game {game_id}: {e}")
+            return {'error': 'Authorization check failed'}
+
+    return {'game_id': game_id, 'online_user_ids': await get_game_presence(game_id)}
+
+
+# ============== ACCESS REVOCATION ==============
+
+def revocation_handler(access, registry):
+    """
+    Control-message handler applying another worker's revocation to this
+    worker's grant cache and room bookkeeping (the sockets themselves are
+    taken out of the room by the revoking worker's leave_room calls).
+    """
+    async def apply(message: dict):
+        kind, user_id = message.get('type'), message.get('user_id')
+        if kind == 'revoke_group':
+            access.revoke_group(message['group_id'], user_id)
+            registry.leave_user(user_id, group_room(message['group_id']))
+        elif kind == 'revoke_game':
+            access.revoke_game(message['game_id'], user_id)
+
+    return apply
+
+
+async def revoke_group_member(group_id: str, user_id: str):
+    """
+    A user left or was removed from a group: drop cached grants on every
+    worker and take all of the user's sockets, wherever they are connected,
+    out of the group room.
+    """
+    room_access.revoke_group(group_id, user_id)
+    await publish_control(sio.manager, {'type': 'revoke_group', 'group_id': group_id, 'user_id': user_id})
+    room = group_room(group_id)
+    rooms.leave_user(user_id, room)
+    # Presence knows the sids on every worker; leave_room on a sid held by
+    # another worker is forwarded to it over the message queue
+    for sid in await presence.sids_of(user_id):
+        await sio.leave_room(sid, room)
+        await presence.leave(sid, room)
+
+
+async def revoke_game_player(game_id: str, user_id: str):
+    """A player was removed from a game: drop the cached grant for its room on every worker."""
+    room_access.revoke_game(game_id, user_id)
+    await publish_control(sio.manager, {'type': 'revoke_game', 'game_id': game_id, 'user_id': user_id})
+
+
+# Revocations published by other workers (only reached with a message queue)
+sio.manager.control_handler = revocation_handler(room_access, rooms)
+
+
 # ============== EVENT EMITTERS ==============
 
-async def emit_game_event(game_id: str, event_type: str, data: dict, exclude_user: Optional[str] = None):
+async def emit_game_event(
+    game_id: str,
+    event_type: str,
+    data: dict,
+    exclude_user: Optional[str] = None,
+    immediate: Optional[bool] = None
+):
     """
     Emit a game event to all users in the game room
     
@@ -414,33 +420,43 @@ async def emit_game_event(game_id: str, event_type: str, data: dict, exclude_use
     - game_started: Game started
     - game_ended: Game ended
     - message: New chat message
+
+    Events within COALESCE_WINDOW are sent as one batched game_update frame;
+    IMMEDIATE_GAME_EVENTS (or immediate=True) skip the window.
     """
-    room = f"game_{game_id}"
-    
     event_data = {
         'type': event_type,
         'game_id': game_id,
         'timestamp': datetime.now(timezone.utc).isoformat(),
         **data
     }
-    
-    await sio.emit('game_update', event_data, room=room)
-    logger.info(f"Emitted {event_type} to game {game_id}")
+
+    if immediate is None:
+        immediate = event_type in IMMEDIATE_GAME_EVENTS
+    await game_emitter.emit(game_room(game_id), event_data, immediate=immediate)
+    logger.debug(f"Queued {event_type} for game {game_id}")
+
+
+async def flush_game_events():
+    """Send every pending game_update batch now (e.g. on shutdown)."""
+    await game_emitter.flush_all()
 
 
 async def emit_to_user(user_id: str, event_type: str, data: dict):
-    """Emit event to a specific user (all their connections)"""
-    if user_id in connected_users:
-        event_data = {
-            'type': event_type,
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            **data
-        }
-        
-        for sid in connected_users[user_id]:
-            await sio.emit('notification', event_data, to=sid)
-        
-        logger.info(f"Emitted {event_type} to user {user_id}")
+    """Emit event to a specific user (all their connections, on any worker)"""
+    # Single process: nothing to do if they aren't connected here
+    if not SOCKETIO_MESSAGE_QUEUE and user_id not in connected_users:
+        return
+
+    event_data = {
+        'type': event_type,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        **data
+    }
+
+    # One emit to the per-user room reaches every tab in a single frame build
+    await sio.emit('notification', event_data, room=user_room(user_id))
+    logger.info(f"Emitted {event_type} to user {user_id}")
 
 
 async def emit_notification(user_id: str, notification: dict):
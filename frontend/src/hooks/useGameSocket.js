@@ -2,6 +2,7 @@ import { useEffect, useRef, useCallback, useState } from 'react';
 import { io } from 'socket.io-client';
 import { useAuth } from '@/context/AuthContext';
 import { supabase, isSupabaseConfigured } from '@/lib/supabase';
+import { unwrapGameUpdate } from '@/lib/gameState';
 
 const SOCKET_URL = process.env.REACT_APP_BACKEND_URL?.replace('/api', '') || '';
 
@@ -60,18 +61,22 @@ export function useGameSocket(gameId) {
 
       socket.on('game_update', (data) => {
         console.log('Game update:', data);
-        setLastEvent(data);
 
-        // Call registered listeners
-        const handler = listenersRef.current[data.type];
-        if (handler) {
-          handler(data);
-        }
+        const events = unwrapGameUpdate(data);
+        setLastEvent(events[events.length - 1]);
 
-        // Call generic handler
-        if (listenersRef.current['*']) {
-          listenersRef.current['*'](data);
-        }
+        events.forEach((event) => {
+          // Call registered listeners
+          const handler = listenersRef.current[event.type];
+          if (handler) {
+            handler(event);
+          }
+
+          // Call generic handler
+          if (listenersRef.current['*']) {
+            listenersRef.current['*'](event);
+          }
+        });
       });
 
       socket.on('notification', (data) => {
@@ -113,11 +118,24 @@ export function useGameSocket(gameId) {
     delete listenersRef.current[eventType];
   }, []);
 
+  // Deltas after sinceVersion; { resync: true } when the game must be reloaded
+  const sync = useCallback((sinceVersion) => new Promise((resolve) => {
+    const socket = socketRef.current;
+    if (!socket?.connected) {
+      resolve({ resync: true });
+      return;
+    }
+    socket.timeout(5000).emit('sync_game', { game_id: gameId, since_version: sinceVersion }, (err, ack) => {
+      resolve(!err && ack && !ack.error ? ack : { resync: true });
+    });
+  }), [gameId]);
+
   return {
     isConnected,
     lastEvent,
     on,
     off,
+    sync,
   };
 }
 
@@ -0,0 +1,50 @@
+// Versioned game state: apply socket deltas (backend/game_sync.py) to the
+// game loaded once from GET /games/{game_id}.
+
+// Socket bursts arrive as one { type: 'batch', events: [...] } frame
+export function unwrapGameUpdate(data) {
+  return data?.type === 'batch' ? data.events : [data];
+}
+
+// True when deltas were missed and the client should call sync_game
+export function hasGap(game, delta) {
+  return delta.version > (game?.state_version ?? 0) + 1;
+}
+
+// Deltas carry absolute totals, so an old or repeated delta is a no-op
+export function applyGameDelta(game, delta, userId) {
+  if (!game || delta.version <= (game.state_version ?? 0)) return game;
+
+  const removed = new Set(delta.removed || []);
+  const changed = new Map((delta.players || []).map((p) => [p.user_id, p]));
+  const newTxns = delta.transactions || [];
+
+  const merge = (player, update) => {
+    const seen = new Set((player.transactions || []).map((t) => t.transaction_id));
+    const transactions = [
+      ...(player.transactions || []),
+      ...newTxns.filter((t) => t.user_id === player.user_id && !seen.has(t.transaction_id)),
+    ];
+    const merged = { ...player, ...update, user: update?.user || player.user, transactions };
+    merged.buy_in_count = transactions.filter((t) => t.type === 'buy_in').length;
+    return merged;
+  };
+
+  const players = (game.players || [])
+    .filter((p) => !removed.has(p.user_id))
+    .map((p) => merge(p, changed.get(p.user_id)));
+  for (const [id, update] of changed) {
+    if (!players.some((p) => p.user_id === id)) {
+      players.push(merge({ user_id: id, game_id: game.game_id }, update));
+    }
+  }
+
+  const currentId = userId ?? game.current_player?.user_id;
+  return {
+    ...game,
+    ...delta.game,
+    players,
+    current_player: players.find((p) => p.user_id === currentId) || null,
+    state_version: delta.version,
+  };
+}
@@ -21,6 +21,8 @@ export default function GameHistory() {
   const [games, setGames] = useState([]);
   const [filteredGames, setFilteredGames] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState("");
   const [statusFilter, setStatusFilter] = useState("all");
   const [sortBy, setSortBy] = useState("newest");
@@ -45,6 +47,7 @@ export default function GameHistory() {
     try {
       const response = await axios.get(`${API}/users/game-history`, { withCredentials: true });
       setGames(response.data.games || []);
+      setNextCursor(response.data.next_cursor || null);
       setStats(response.data.stats || {
         totalGames: 0,
         totalWinnings: 0,
@@ -60,6 +63,23 @@ export default function GameHistory() {
     }
   };
 
+  const fetchMoreGames = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${API}/users/game-history`, {
+        params: { cursor: nextCursor },
+        withCredentials: true
+      });
+      setGames(prev => [...prev, ...(response.data.games || [])]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (error) {
+      toast.error("Failed to load more games");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const filterAndSortGames = () => {
     let result = [...games];
     
@@ -258,6 +278,13 @@ export default function GameHistory() {
                 </CardContent>
               </Card>
             ))}
+            {nextCursor && (
+              <div className="flex justify-center pt-2">
+                <Button variant="outline" onClick={fetchMoreGames} disabled={loadingMore}>
+                  {loadingMore ? "Loading..." : "Load more"}
+                </Button>
+              </div>
+            )}
           </div>
         )}
       </main>
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import { useParams, useNavigate } from "react-router-dom";
 import axios from "axios";
 import { useAuth } from "@/context/AuthContext";
@@ -19,6 +19,7 @@ import {
 } from "lucide-react";
 import Navbar from "@/components/Navbar";
 import { useGameSocket } from "@/hooks/useGameSocket";
+import { applyGameDelta, hasGap } from "@/lib/gameState";
 import SpotifyPlayer from "@/components/SpotifyPlayer";
 import PokerAIAssistant from "@/components/PokerAIAssistant";
 import SettlementCalculator from "@/components/SettlementCalculator";
@@ -65,19 +66,48 @@ export default function GameNight() {
   const [needsSettle, setNeedsSettle] = useState(false);
 
   // WebSocket for real-time updates
-  const { isConnected, on } = useGameSocket(gameId);
+  const { isConnected, on, sync } = useGameSocket(gameId);
+
+  // Latest game state; deltas in one socket frame apply back to back
+  const gameRef = useRef(null);
+  const showGame = useCallback((next) => {
+    gameRef.current = next;
+    setGame(next);
+  }, []);
+
+  // Catch up through sync_game (then apply `delta`), or reload if too far behind
+  const catchUp = useCallback(async (delta) => {
+    if (!gameRef.current) return;
+    const result = await sync(gameRef.current.state_version ?? 0);
+    // Already-applied deltas are no-ops, so concurrent catch-ups are safe
+    const caughtUp = (result.deltas || []).reduce((g, d) => applyGameDelta(g, d, user?.user_id), gameRef.current);
+    if (result.resync || (delta && hasGap(caughtUp, delta))) {
+      fetchGame();
+      return;
+    }
+    showGame(delta ? applyGameDelta(caughtUp, delta, user?.user_id) : caughtUp);
+  }, [sync, user?.user_id, showGame]);
 
   // Listen for real-time game updates
   useEffect(() => {
     if (!isConnected) return;
 
+    // Reconnected: fetch only what was missed
+    catchUp();
+
     const unsubscribe = on('*', (event) => {
-      // Refresh game data on any update
-      if (['player_joined', 'buy_in', 'cash_out', 'chips_edited', 'game_state'].includes(event.type)) {
-        fetchGame();
-        if (event.type !== 'message') {
-          toast.info(`${event.player_name || 'Game'}: ${event.type.replace(/_/g, ' ')}`);
+      // Versioned state: apply deltas instead of reloading the game
+      if (event.type === 'state_delta') {
+        if (!gameRef.current) return;
+        if (hasGap(gameRef.current, event)) {
+          catchUp(event);
+        } else {
+          showGame(applyGameDelta(gameRef.current, event, user?.user_id));
         }
+        return;
+      }
+      if (['player_joined', 'buy_in', 'cash_out', 'chips_edited', 'game_state'].includes(event.type)) {
+        toast.info(`${event.player_name || 'Game'}: ${event.type.replace(/_/g, ' ')}`);
       }
       // Add new messages to thread
       if (event.type === 'message') {
@@ -91,7 +121,7 @@ export default function GameNight() {
     });
 
     return unsubscribe;
-  }, [isConnected, on]);
+  }, [isConnected, on, catchUp, showGame, user?.user_id]);
 
   const fetchGame = useCallback(async () => {
     try {
@@ -99,26 +129,27 @@ export default function GameNight() {
         axios.get(`${API}/games/${gameId}`),
         axios.get(`${API}/games/${gameId}/thread`)
       ]);
-      setGame(gameRes.data);
+      showGame(gameRes.data);
       setThread(threadRes.data);
       
       // Set default buy-in from game settings
       if (!selectedBuyIn && gameRes.data.buy_in_amount) {
         setSelectedBuyIn(gameRes.data.buy_in_amount);
       }
-      
-      // Get pending join requests for host
-      if (gameRes.data.is_host) {
-        const pending = gameRes.data.players?.filter(p => p.rsvp_status === "pending") || [];
-        setPendingRequests(pending);
-      }
     } catch (error) {
       toast.error("Failed to load game");
       navigate("/groups");
     } finally {
       setLoading(false);
     }
-  }, [gameId, navigate, selectedBuyIn]);
+  }, [gameId, navigate, selectedBuyIn, showGame]);
+
+  // Get pending join requests for host
+  useEffect(() => {
+    if (game?.is_host) {
+      setPendingRequests(game.players?.filter(p => p.rsvp_status === "pending") || []);
+    }
+  }, [game]);
 
   // Fetch available players for adding
   const fetchAvailablePlayers = async () => {
@@ -165,9 +196,15 @@ export default function GameNight() {
     if (!user?.user_id) return;
 
     fetchGame();
+  }, [fetchGame, user?.user_id]);
+
+  // Poll only while the socket is down; otherwise deltas keep the game current
+  useEffect(() => {
+    if (!user?.user_id || isConnected) return;
+
     const interval = setInterval(fetchGame, 10000);
     return () => clearInterval(interval);
-  }, [fetchGame, user?.user_id]);
+  }, [fetchGame, user?.user_id, isConnected]);
 
   // Game timer
   useEffect(() => {
@@ -27,6 +27,7 @@ import { useAuth } from "../context/AuthContext";
 import type { RootStackParamList } from "../navigation/RootNavigator";
 import type { Socket } from "socket.io-client";
 import { createSocket } from "../lib/socket";
+import { applyGameDelta, hasGap, unwrapGameUpdate, GameDelta, SyncResult } from "../lib/gameState";
 import type { NativeStackNavigationProp } from "@react-navigation/native-stack";
 
 type Nav = NativeStackNavigationProp<RootStackParamList>;
@@ -67,6 +68,7 @@ export function GameNightScreen() {
 
   const socketRef = useRef<Socket | null>(null);
   const [snapshot, setSnapshot] = useState<any>(null);
+  const snapshotRef = useRef<any>(null);
   const [connected, setConnected] = useState(false);
   const [reconnecting, setReconnecting] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -158,6 +160,7 @@ export function GameNightScreen() {
     try {
       const data = await getGame(gameId);
       if (reqId === lastReqId.current) {
+        snapshotRef.current = data;
         setSnapshot(data);
         setError(null);
       }
@@ -174,6 +177,37 @@ export function GameNightScreen() {
     }
   }, [gameId]);
 
+  const showSnapshot = useCallback((next: any) => {
+    snapshotRef.current = next;
+    setSnapshot(next);
+  }, []);
+
+  // Catch up through sync_game (then apply `delta`), or reload if too far behind
+  const catchUp = useCallback(async (delta?: GameDelta) => {
+    const s = socketRef.current;
+    if (!snapshotRef.current || !s?.connected) {
+      await resyncGameState();
+      return;
+    }
+    const result: SyncResult = await new Promise((resolve) => {
+      s.timeout(5000).emit(
+        "sync_game",
+        { game_id: gameId, since_version: snapshotRef.current.state_version ?? 0 },
+        (err: any, ack: SyncResult) => resolve(!err && ack && !ack.error ? ack : { resync: true })
+      );
+    });
+    // Already-applied deltas are no-ops, so concurrent catch-ups are safe
+    const caughtUp = (result.deltas ?? []).reduce(
+      (g, d) => applyGameDelta(g, d, user?.user_id),
+      snapshotRef.current
+    );
+    if (result.resync || (delta && hasGap(caughtUp, delta))) {
+      await resyncGameState();
+      return;
+    }
+    showSnapshot(delta ? applyGameDelta(caughtUp, delta, user?.user_id) : caughtUp);
+  }, [gameId, resyncGameState, showSnapshot, user?.user_id]);
+
   const setupSocket = useCallback(async () => {
     try {
       const s = await createSocket();
@@ -182,7 +216,8 @@ export function GameNightScreen() {
       s.on("connect", async () => {
         setConnected(true);
         setReconnecting(false);
-        await resyncGameState();
+        // Reconnected: fetch only what was missed
+        await catchUp();
       });
 
       s.on("disconnect", () => {
@@ -190,8 +225,16 @@ export function GameNightScreen() {
         setReconnecting(true);
       });
 
-      s.on("game_update", () => {
-        resyncGameState();
+      // Versioned state: apply deltas instead of reloading the game
+      s.on("game_update", (data: any) => {
+        for (const event of unwrapGameUpdate(data)) {
+          if (event?.type !== "state_delta" || !snapshotRef.current) continue;
+          if (hasGap(snapshotRef.current, event)) {
+            catchUp(event);
+          } else {
+            showSnapshot(applyGameDelta(snapshotRef.current, event, user?.user_id));
+          }
+        }
       });
 
       s.emit("join_game", { game_id: gameId }, (ack: any) => {
@@ -202,7 +245,7 @@ export function GameNightScreen() {
     } catch (e: any) {
       setError(e?.message ?? "Connection unavailable.");
     }
-  }, [gameId, resyncGameState]);
+  }, [gameId, catchUp, showSnapshot, user?.user_id]);
 
   // Load game thread
   const loadThread = useCallback(async () => {
@@ -280,7 +323,7 @@ export function GameNightScreen() {
   useEffect(() => {
     const handleAppStateChange = (nextAppState: AppStateStatus) => {
       if (nextAppState === "active") {
-        resyncGameState();
+        catchUp();
         if (socketRef.current && !socketRef.current.connected) {
           setReconnecting(true);
         }
@@ -288,7 +331,7 @@ export function GameNightScreen() {
     };
     const subscription = AppState.addEventListener("change", handleAppStateChange);
     return () => subscription.remove();
-  }, [resyncGameState]);
+  }, [catchUp]);
 
   // Search players
   const searchPlayers = async (query: string) => {
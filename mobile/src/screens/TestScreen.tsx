@@ -93,8 +93,9 @@ export default function TestScreen() {
       });
 
       sock.on("game_update", (data) => {
+        const event = data.type === "batch" ? data.events[data.events.length - 1] : data;
         setLastEvent(
-          `${data.type} at ${new Date(data.timestamp).toLocaleTimeString()}`
+          `${event.type} at ${new Date(event.timestamp).toLocaleTimeString()}`
         );
       });
 